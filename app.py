@@ -1,15 +1,19 @@
 import os
-import logging
-from logging.handlers import RotatingFileHandler
 from flask import Flask, render_template, request, current_app
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config, TestConfig
-from extensions import db, login_manager, mail, csrf, rq, migrate
+from extensions import db, login_manager, mail, csrf, rq, migrate, password_hasher, throttle, assets, journal, event_broker, metrics, slow_queries, profiler, request_logging, tasks, outbox, scheduler, trip_search, settlement_summary, compression
 from utils import nl2br_filter, inject_current_year, url_for_static_bust # Wszystkie funkcje pomocnicze
 from routes.auth import auth_bp
 from routes.main import main_bp
 from routes.trips import trips_bp
 from routes.admin import admin_bp
 from models import User # Potrzebne do ładowania użytkownika
+from seed import seed_command
+from outbox import outbox_cli
+from scheduler import scheduler_cli
+from search import search_cli
+from settlement_summary import settlements_cli
 
 def create_app(config_class=Config):
     """
@@ -23,13 +27,33 @@ def create_app(config_class=Config):
     else:
         app.config.from_object(config_class)
 
+    # Za proxy request.remote_addr to adres proxy - bez tego wszyscy dzieliliby limit per IP
+    if app.config.get('PROXY_FIX_X_FOR') or app.config.get('PROXY_FIX_X_PROTO'):
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config.get('PROXY_FIX_X_FOR', 0),
+                                x_proto=app.config.get('PROXY_FIX_X_PROTO', 0))
+
     # --- 1. INICJALIZACJA ROZSZERZEŃ ---
     db.init_app(app)
     login_manager.init_app(app)
     mail.init_app(app)
     csrf.init_app(app)
-    #rq.init_app(app)
+    rq.init_app(app)
+    tasks.init_app(app) # Zadania w tle: RQ, pula wątków lub synchronicznie (TASKS_BACKEND)
+    outbox.init_app(app) # Skrzynka nadawcza e-maili (wysyłka po zatwierdzeniu transakcji)
+    scheduler.init_app(app) # Nocna archiwizacja, podgrzewanie bazy i przypomnienia (scheduler.py)
+    trip_search.init_app(app) # Indeks pełnotekstowy zleceń (FTS5 / tsvector)
     migrate.init_app(app, db) # Potrzebne do migracji bazy danych
+    password_hasher.init_app(app) # Ograniczona pula do haszowania haseł
+    throttle.init_app(app) # Limity żądań dla logowania i resetu hasła
+    assets.init_app(app) # Manifest zasobów statycznych (wczytywany raz przy starcie)
+    journal.init_app(app) # Dziennik zmian zleceń (synchronizacja przyrostowa kalendarza)
+    settlement_summary.init_app(app) # Podsumowanie rozliczeń przeliczane dla zmienionych miesięcy
+    event_broker.init_app(app) # Powiadomienia o zmianach dla strumienia SSE
+    metrics.init_app(app) # Metryki wydajności żądań (/admin/metrics)
+    slow_queries.init_app(app) # Dziennik wolnych zapytań SQL (/admin/slow-queries)
+    profiler.init_app(app) # Profilowanie wybranych żądań (/admin/profiles)
+    request_logging.init_app(app) # Logi JSON z identyfikatorem żądania, zapis w osobnym wątku (AUDYT 3.3)
+    compression.init_app(app) # Kompresja gzip/Brotli odpowiedzi (po metrykach i logach - widzą rozmiar po kompresji)
 
     # --- 2. REJESTRACJA FUNKCJI W JINJA ---
     with app.app_context():
@@ -48,6 +72,17 @@ def create_app(config_class=Config):
     app.register_blueprint(trips_bp, url_prefix='/trip')
     app.register_blueprint(admin_bp, url_prefix='/admin')
 
+    # Komenda 'flask seed' - dane syntetyczne do testów wydajności
+    app.cli.add_command(seed_command)
+    # Komendy 'flask outbox ...' - wysyłka i obsługa skrzynki nadawczej e-maili
+    app.cli.add_command(outbox_cli)
+    # Komendy 'flask scheduler ...' - zadania okresowe bez procesów WWW lub na żądanie
+    app.cli.add_command(scheduler_cli)
+    # Komenda 'flask search rebuild' - indeks wyszukiwania w istniejącej bazie
+    app.cli.add_command(search_cli)
+    # Komendy 'flask settlements ...' - przeliczanie podsumowania rozliczeń
+    app.cli.add_command(settlements_cli)
+
     # --- 4. FLASK-LOGIN KONFIGURACJA ---
     login_manager.login_view = 'auth.login'
     login_manager.login_message = "Proszę się zalogować, aby uzyskać dostęp do tej strony."
@@ -58,22 +93,7 @@ def create_app(config_class=Config):
         # Używamy db.session.get (nowa metoda) zamiast query.get
         return db.session.get(User, int(user_id))
 
-    # --- 5. LOGOWANIE DO PLIKU (AUDYT 3.3) ---
-    if not app.debug and not app.testing:
-        if not os.path.exists('logs'):
-            os.mkdir('logs')
-        
-        # Ustawia logowanie błędów do pliku logs/grafik.log (z rotacją)
-        file_handler = RotatingFileHandler('logs/grafik.log', maxBytes=10240, backupCount=10)
-        file_handler.setFormatter(logging.Formatter(
-            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-        ))
-        file_handler.setLevel(logging.INFO)
-        app.logger.addHandler(file_handler)
-        app.logger.setLevel(logging.INFO)
-        app.logger.info('Grafik startup')
-
-    # --- 6. HANDLERY BŁĘDÓW (AUDYT 3.2) ---
+    # --- 5. HANDLERY BŁĘDÓW (AUDYT 3.2) ---
     # Logowanie błędów 404 dla informacji
     @app.errorhandler(404)
     def not_found_error(error):
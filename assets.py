@@ -0,0 +1,680 @@
+"""
+Potok zasobów statycznych (asset pipeline).
+Plik: assets.py
+
+Polecenie 'flask assets vendor':
+- pobiera przypięte wersje bibliotek zewnętrznych (FullCalendar, czcionki) do static/vendor/,
+- przycina czcionki do używanych znaków (fontTools) i tworzy vendor/fonts/fonts.css.
+
+Polecenie 'flask assets build':
+- minifikuje pliki CSS/JS z katalogu static/ (tylko białe znaki i komentarze poza napisami),
+- nadaje im nazwy z hashem treści (np. css/style.3f2a9c1b04.css) w static/dist/,
+- zapisuje obok wersje skompresowane (.gz oraz .br, jeśli jest pakiet 'brotli'),
+- tworzy manifest static/dist/assets-manifest.json.
+
+Manifest jest wczytywany RAZ przy starcie aplikacji, więc url_for_static_bust
+to zwykłe wyszukanie w słowniku (bez os.path.exists/getmtime przy każdym renderze).
+Pliki z hashem w nazwie nigdy się nie zmieniają, więc serwujemy je
+z nagłówkiem 'Cache-Control: public, max-age=31536000, immutable'.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+import urllib.request
+import click
+from flask import current_app, request, send_from_directory, url_for, abort, render_template
+from flask.cli import with_appcontext
+
+try:
+    import brotli
+except ImportError:  # Kompresja Brotli jest opcjonalna
+    brotli = None
+
+try:
+    from fontTools import subset as font_subset
+except ImportError:  # Przycinanie czcionek jest opcjonalne (pakiet 'fonttools')
+    font_subset = None
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'assets-manifest.json'
+
+# Pliki, które muszą zachować stały adres URL (rejestracja PWA)
+EXCLUDED_FILES = {'manifest.json', 'vendor/vendor-lock.json'}
+EXCLUDED_NAMES = {'.gitkeep'}
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.json', '.svg', '.txt', '.html', '.map', '.ttf', '.otf'}
+# Poniżej tego rozmiaru kompresja nie przynosi zysku
+MIN_COMPRESS_SIZE = 512
+# Pliki pobierane przez service workera już przy instalacji (App Shell)
+PRECACHE_EXTENSIONS = ('.css', '.js', '.woff2')
+
+
+# --- MINIFIKACJA ---
+
+# Napisy i komentarze CSS - minifikacja nie może zmieniać treści napisów (np. content: " > ")
+_CSS_TOKENS = re.compile(r'"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'|/\*.*?\*/', re.S)
+_CSS_WHITESPACE = re.compile(r'\s+')
+_CSS_AROUND_PUNCT = re.compile(r'\s*([{};,>])\s*')
+_CSS_AFTER_COLON = re.compile(r':\s+')
+# Znacznik napisu na czas minifikacji (bez białych znaków i interpunkcji)
+_PLACEHOLDER = re.compile(r'\x00(\d+)\x00')
+
+
+def minify_css(text):
+    """Usuwa komentarze i zbędne białe znaki z CSS (bez zmiany semantyki selektorów i treści napisów)."""
+    if '\x00' in text:
+        return text
+    literals = []
+
+    def hide(match):
+        if match.group(0).startswith('/*'):
+            return ' '
+        literals.append(match.group(0))
+        return f'\x00{len(literals) - 1}\x00'
+
+    text = _CSS_TOKENS.sub(hide, text)
+    text = _CSS_WHITESPACE.sub(' ', text)
+    text = _CSS_AROUND_PUNCT.sub(r'\1', text)
+    # Spację PRZED ':' zostawiamy ('a :hover' != 'a:hover'), usuwamy tylko tę po
+    text = _CSS_AFTER_COLON.sub(':', text)
+    text = text.replace(';}', '}').strip()
+    return _PLACEHOLDER.sub(lambda match: literals[int(match.group(1))], text)
+
+
+# Po tych znakach i słowach '/' zaczyna wyrażenie regularne, a nie dzielenie
+_JS_REGEX_AFTER = set('(,=:[!&|?{};+-*%<>~^')
+_JS_REGEX_KEYWORDS = {'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void',
+                      'throw', 'case', 'do', 'else', 'yield', 'await'}
+
+
+def _js_literal_end(text, start, quote):
+    """Koniec napisu '...' / "..." lub wyrażenia regularnego /.../ (None, gdy niezakończony w linii)."""
+    i, in_class = start + 1, False
+    while i < len(text):
+        char = text[i]
+        if char == '\\':
+            i += 2
+            continue
+        if char == '\n':
+            return None
+        if quote == '/' and char == '[':
+            in_class = True
+        elif quote == '/' and char == ']':
+            in_class = False
+        elif char == quote and not in_class:
+            return i + 1
+        i += 1
+    return None
+
+
+def _js_template_end(text, start):
+    """Koniec fragmentu szablonu `...` (za '`' albo za '${'); drugi element: czy otwarto '${'."""
+    i = start
+    while i < len(text):
+        if text[i] == '\\':
+            i += 2
+        elif text[i] == '`':
+            return i + 1, False
+        elif text.startswith('${', i):
+            return i + 2, True
+        else:
+            i += 1
+    return None, False
+
+
+def _js_hide_literals(text):
+    """
+    Zamienia napisy, szablony i wyrażenia regularne na znaczniki, a komentarze na
+    spację lub nową linię. Zwraca (kod, literały) albo None, gdy kod jest dla
+    prostego skanera niejednoznaczny - wtedy plik zostaje bez zmian.
+    """
+    out, literals = [], []
+    templates = []  # Głębokość nawiasów '{' w każdym otwartym '${ ... }'
+    prev = ''  # Ostatni znaczący znak lub słowo kodu
+    i = 0
+
+    def hide(literal):
+        literals.append(literal)
+        out.append(f'\x00{len(literals) - 1}\x00')
+
+    while i < len(text):
+        char = text[i]
+        if text.startswith('//', i):
+            end = text.find('\n', i)
+            i = len(text) if end == -1 else end
+            continue
+        if text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            if end == -1:
+                return None
+            # Komentarz z nową linią jest dla ASI końcem linii
+            out.append('\n' if '\n' in text[i:end] else ' ')
+            i = end + 2
+            continue
+        if char in '\'"' or (char == '/' and (not prev or prev in _JS_REGEX_AFTER or prev in _JS_REGEX_KEYWORDS)):
+            end = _js_literal_end(text, i, char)
+            if end is None:
+                return None
+            hide(text[i:end])
+            i, prev = end, ')'
+            continue
+        if char == '`' or (char == '}' and templates and templates[-1] == 0):
+            if char == '}':
+                templates.pop()
+            end, opened = _js_template_end(text, i + 1)
+            if end is None:
+                return None
+            hide(text[i:end])
+            if opened:
+                templates.append(0)
+            i, prev = end, '(' if opened else ')'
+            continue
+        if char == '{' and templates:
+            templates[-1] += 1
+        elif char == '}' and templates:
+            templates[-1] -= 1
+        if char.isalnum() or char in '_$':
+            prev = prev + char if prev[-1:].isalnum() or prev[-1:] in ('_', '$') else char
+        elif not char.isspace():
+            prev = char
+        out.append(char)
+        i += 1
+    if templates:
+        return None
+    return ''.join(out), literals
+
+
+def minify_js(text):
+    """
+    Ostrożna minifikacja JS: usuwa wcięcia, puste linie i komentarze poza napisami,
+    szablonami `...` i wyrażeniami regularnymi (ich treść zostaje bez zmian).
+    Zachowuje podziały linii, więc automatyczne wstawianie średników działa jak wcześniej.
+    """
+    hidden = None if '\x00' in text else _js_hide_literals(text)
+    if hidden is None:
+        return text
+    code, literals = hidden
+    lines = [line.strip() for line in code.splitlines()]
+    code = '\n'.join(line for line in lines if line) + '\n'
+    return _PLACEHOLDER.sub(lambda match: literals[int(match.group(1))], code)
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+# --- BUDOWANIE ---
+
+_CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def rewrite_css_urls(text, css_path, files):
+    """
+    Podmienia względne odwołania url(...) w arkuszu na pliki z hashem w nazwie
+    (np. czcionki w vendor/fonts/fonts.css). Adresy bezwzględne i data: zostają bez zmian.
+    """
+    css_dir = os.path.dirname(css_path)
+
+    def replace(match):
+        quote, target = match.group(1), match.group(2)
+        if re.match(r'^(data:|https?:|//|/|#)', target):
+            return match.group(0)
+        clean = target.split('?', 1)[0].split('#', 1)[0]
+        resolved = os.path.normpath(os.path.join(css_dir, clean)).replace(os.sep, '/')
+        hashed = files.get(resolved)
+        if not hashed:
+            return match.group(0)
+        relative = os.path.relpath(hashed, css_dir or '.').replace(os.sep, '/')
+        return f'url({quote}{relative}{quote})'
+
+    return _CSS_URL.sub(replace, text)
+
+
+def _iter_source_files(static_folder):
+    for root, dirs, files in os.walk(static_folder):
+        rel_root = os.path.relpath(root, static_folder)
+        if rel_root == DIST_DIR or rel_root.startswith(DIST_DIR + os.sep):
+            dirs[:] = []
+            continue
+        dirs.sort()
+        for name in sorted(files):
+            rel_path = os.path.normpath(os.path.join(rel_root, name)).replace(os.sep, '/')
+            if name in EXCLUDED_NAMES or rel_path in EXCLUDED_FILES:
+                continue
+            yield rel_path
+
+
+def _write_compressed(path, data):
+    """Zapisuje obok pliku wersje .gz i .br (tylko gdy są mniejsze od oryginału)."""
+    written = []
+    gz_data = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gz_data) < len(data):
+        with open(path + '.gz', 'wb') as f:
+            f.write(gz_data)
+        written.append('gzip')
+    if brotli is not None:
+        br_data = brotli.compress(data, quality=11)
+        if len(br_data) < len(data):
+            with open(path + '.br', 'wb') as f:
+                f.write(br_data)
+            written.append('br')
+    return written
+
+
+def build_assets(static_folder, minify=True, compress=True):
+    """
+    Buduje katalog static/dist/ i zwraca słownik manifestu:
+    {'version': ..., 'files': {'css/style.css': 'css/style.<hash>.css'}, 'encodings': {...}}
+    """
+    dist_folder = os.path.join(static_folder, DIST_DIR)
+    if os.path.isdir(dist_folder):
+        shutil.rmtree(dist_folder)
+    os.makedirs(dist_folder)
+
+    files = {}
+    encodings = {}
+    # Najpierw pliki inne niż CSS, aby arkusze mogły wskazywać na ich nazwy z hashem
+    sources = sorted(_iter_source_files(static_folder), key=lambda p: p.lower().endswith('.css'))
+    for rel_path in sources:
+        with open(os.path.join(static_folder, rel_path), 'rb') as f:
+            data = f.read()
+
+        base, ext = os.path.splitext(rel_path)
+        if ext.lower() == '.css':
+            data = rewrite_css_urls(data.decode('utf-8'), rel_path, files).encode('utf-8')
+        minifier = MINIFIERS.get(ext.lower())
+        if minify and minifier and not base.endswith('.min'):
+            data = minifier(data.decode('utf-8')).encode('utf-8')
+
+        digest = hashlib.sha256(data).hexdigest()[:10]
+        hashed_path = f'{base}.{digest}{ext}'
+        target = os.path.join(dist_folder, hashed_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+
+        files[rel_path] = hashed_path
+        if compress and ext.lower() in COMPRESSIBLE_EXTENSIONS and len(data) >= MIN_COMPRESS_SIZE:
+            written = _write_compressed(target, data)
+            if written:
+                encodings[hashed_path] = written
+
+    # Wersja manifestu zmienia się, gdy zmieni się którykolwiek plik
+    version = hashlib.sha256(json.dumps(files, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    manifest = {'version': version, 'files': files, 'encodings': encodings}
+    with open(os.path.join(dist_folder, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_folder):
+    """Wczytuje manifest z dysku lub zwraca None, jeśli zasoby nie zostały zbudowane."""
+    path = os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# --- BIBLIOTEKI ZEWNĘTRZNE (VENDOR) ---
+
+VENDOR_DIR = 'vendor'
+VENDOR_LOCK = 'vendor-lock.json'
+
+# Znaki używane w interfejsie: ASCII, polskie litery i typograficzne znaki interpunkcyjne
+UI_GLYPHS = (
+    ''.join(chr(c) for c in range(0x20, 0x7f))
+    + 'ĄąĆćĘęŁłŃńÓóŚśŹźŻż'
+    + '\u00a0«»–—‘’‚“”„…•·×©®°€→←↑↓✓✔✕'
+)
+# Czcionka logotypu wyświetla tylko nazwę aplikacji
+BRAND_GLYPHS = 'Grafik Firmowy'
+
+# Przypięte wersje - zmiana wersji zmienia ścieżkę, więc stare pliki nie kolidują z nowymi.
+# 'cdn' to adres używany w szablonach, dopóki 'flask assets vendor' nie został uruchomiony.
+VENDOR_SOURCES = {
+    'fullcalendar': {
+        'version': '6.1.13',
+        'url': 'https://cdn.jsdelivr.net/npm/fullcalendar@6.1.13/index.global.min.js',
+        'path': 'vendor/fullcalendar/6.1.13/index.global.min.js',
+    },
+    'font-inter-latin': {
+        'version': '5.0.18',
+        'url': 'https://cdn.jsdelivr.net/npm/@fontsource-variable/inter@5.0.18/files/inter-latin-wght-normal.woff2',
+        'path': 'vendor/fonts/inter-latin-wght-normal.woff2',
+        'glyphs': UI_GLYPHS,
+    },
+    'font-inter-latin-ext': {
+        'version': '5.0.18',
+        'url': 'https://cdn.jsdelivr.net/npm/@fontsource-variable/inter@5.0.18/files/inter-latin-ext-wght-normal.woff2',
+        'path': 'vendor/fonts/inter-latin-ext-wght-normal.woff2',
+        'glyphs': UI_GLYPHS,
+    },
+    'font-frijole': {
+        'version': '5.0.8',
+        'url': 'https://cdn.jsdelivr.net/npm/@fontsource/frijole@5.0.8/files/frijole-latin-400-normal.woff2',
+        'path': 'vendor/fonts/frijole-latin-400-normal.woff2',
+        'glyphs': BRAND_GLYPHS,
+    },
+}
+
+# Adresy CDN używane, gdy pliki nie zostały jeszcze pobrane do static/vendor/
+VENDOR_FALLBACKS = {
+    'vendor/fullcalendar/6.1.13/index.global.min.js': VENDOR_SOURCES['fullcalendar']['url'],
+    'vendor/fonts/fonts.css': 'https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600&family=Frijole&display=swap',
+}
+
+# unicode-range kolejnych podzbiorów (jak w arkuszach Google Fonts)
+_LATIN_RANGE = ('U+0000-00FF, U+0131, U+0152-0153, U+02BB-02BC, U+02C6, U+02DA, U+02DC, '
+                'U+0304, U+0308, U+0329, U+2000-206F, U+2074, U+20AC, U+2122, U+2191, U+2193, '
+                'U+2212, U+2215, U+FEFF, U+FFFD')
+_LATIN_EXT_RANGE = ('U+0100-02AF, U+0304, U+0308, U+0329, U+1E00-1E9F, U+1EF2-1EFF, U+2020, '
+                    'U+20A0-20AB, U+20AD-20C0, U+2113, U+2C60-2C7F, U+A720-A7FF')
+
+FONTS_CSS = """/* Wygenerowane przez 'flask assets vendor' - nie edytować ręcznie. */
+@font-face {{
+  font-family: 'Inter';
+  font-style: normal;
+  font-weight: 400 600;
+  font-display: swap;
+  src: url('inter-latin-ext-wght-normal.woff2') format('woff2');
+  unicode-range: {latin_ext};
+}}
+@font-face {{
+  font-family: 'Inter';
+  font-style: normal;
+  font-weight: 400 600;
+  font-display: swap;
+  src: url('inter-latin-wght-normal.woff2') format('woff2');
+  unicode-range: {latin};
+}}
+@font-face {{
+  font-family: 'Frijole';
+  font-style: normal;
+  font-weight: 400;
+  font-display: swap;
+  src: url('frijole-latin-400-normal.woff2') format('woff2');
+}}
+"""
+
+
+def subset_font(path, glyphs):
+    """Przycina czcionkę WOFF2 do podanych znaków (w miejscu). Zwraca False bez fontTools."""
+    if font_subset is None:
+        return False
+    options = font_subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = ['*']  # Zachowujemy kerning i ligatury
+    options.name_IDs = ['*']
+    font = font_subset.load_font(path, options)
+    subsetter = font_subset.Subsetter(options)
+    subsetter.populate(text=glyphs)
+    subsetter.subset(font)
+    font_subset.save_font(font, path, options)
+    font.close()
+    return True
+
+
+def _download(url):
+    with urllib.request.urlopen(url, timeout=60) as response:
+        return response.read()
+
+
+def vendor_assets(static_folder, fetch=_download, echo=print, update_lock=False):
+    """
+    Pobiera biblioteki z VENDOR_SOURCES do static/vendor/ i generuje fonts.css.
+    Każdy plik musi mieć wpis w zatwierdzonym vendor-lock.json (ta sama wersja
+    i suma SHA-256 pobranego pliku) - brak wpisu lub inna suma przerywa pobieranie
+    (ochrona przed podmianą na CDN). update_lock=True zapisuje sumy od nowa -
+    tylko przy świadomej zmianie wersji, a nowy lock trzeba przejrzeć i zatwierdzić.
+    Bez pliku vendor-lock.json nic nie jest pobierane (zwraca None) - szablony
+    zostają przy adresach CDN.
+    """
+    lock_path = os.path.join(static_folder, VENDOR_DIR, VENDOR_LOCK)
+    if not update_lock and not os.path.exists(lock_path):
+        echo(f"UWAGA: brak {VENDOR_DIR}/{VENDOR_LOCK} - pomijam pobieranie, szablony użyją adresów CDN. "
+             f"Uruchom 'flask assets vendor --update-lock' i zatwierdź lock razem z plikami.")
+        return None
+    try:
+        with open(lock_path, encoding='utf-8') as f:
+            lock = json.load(f)
+    except (OSError, ValueError):
+        lock = {}
+
+    if not update_lock:
+        # Sprawdzamy lock przed pobieraniem - bez wpisów nie ma z czym porównać sum
+        missing = [f"{name} {source['version']}" for name, source in VENDOR_SOURCES.items()
+                   if lock.get(name, {}).get('version') != source['version']]
+        if missing:
+            raise click.ClickException(
+                f"Brak wpisów w {VENDOR_LOCK}: {', '.join(missing)}. "
+                f"Uruchom 'flask assets vendor --update-lock' i zatwierdź {VENDOR_LOCK}."
+            )
+
+    for name, source in VENDOR_SOURCES.items():
+        data = fetch(source['url'])
+        digest = hashlib.sha256(data).hexdigest()
+        if update_lock:
+            lock[name] = {'version': source['version'], 'url': source['url'], 'sha256': digest}
+        elif lock[name]['sha256'] != digest:
+            raise click.ClickException(
+                f"Suma kontrolna {name} {source['version']} nie zgadza się z {VENDOR_LOCK}."
+            )
+
+        target = os.path.join(static_folder, source['path'])
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+        if source.get('glyphs') and subset_font(target, source['glyphs']):
+            echo(f"{name} {source['version']}: {len(data)} B -> {os.path.getsize(target)} B (przycięta)")
+        else:
+            echo(f"{name} {source['version']}: {len(data)} B")
+
+    with open(os.path.join(static_folder, VENDOR_DIR, 'fonts', 'fonts.css'), 'w', encoding='utf-8') as f:
+        f.write(FONTS_CSS.format(latin=_LATIN_RANGE, latin_ext=_LATIN_EXT_RANGE))
+    if update_lock:
+        with open(lock_path, 'w', encoding='utf-8') as f:
+            json.dump(lock, f, indent=2, sort_keys=True)
+            f.write('\n')
+    return lock
+
+
+# --- ROZSZERZENIE FLASK ---
+
+class AssetManifest:
+    """
+    Rozszerzenie: wczytuje manifest przy starcie, rejestruje trasę /static/dist/
+    (z nagłówkami immutable i wersjami .br/.gz) oraz polecenie 'flask assets'.
+    """
+
+    def __init__(self, app=None):
+        self.manifest = None
+        self._fallback_urls = {}
+        self._vendored = set()
+        self._preload_header = None
+        self._service_worker = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASSETS_MAX_AGE', 31536000)
+        app.config.setdefault('ASSETS_PRELOAD', [])
+        self.manifest = load_manifest(app.static_folder)
+        self._fallback_urls = {}
+        self._preload_header = None
+        self._service_worker = None
+        # Pliki pobrane przez 'flask assets vendor' (sprawdzane raz przy starcie)
+        self._vendored = {
+            path for path in list(VENDOR_FALLBACKS) + [s['path'] for s in VENDOR_SOURCES.values()]
+            if os.path.exists(os.path.join(app.static_folder, path))
+        }
+        app.extensions['assets'] = self
+        app.add_url_rule(
+            f'{app.static_url_path}/{DIST_DIR}/<path:filename>',
+            endpoint='static_dist',
+            view_func=self.serve_dist,
+        )
+        app.after_request(self._add_preload_links)
+        app.jinja_env.globals.update(vendor_url=self.vendor_url)
+        app.cli.add_command(assets_cli)
+
+    @property
+    def version(self):
+        return self.manifest['version'] if self.manifest else None
+
+    @property
+    def files(self):
+        return self.manifest['files'] if self.manifest else {}
+
+    def url_for(self, filename):
+        """Adres pliku z hashem w nazwie (lub adres z ?v=mtime, gdy brak manifestu)."""
+        hashed = self.files.get(filename)
+        if hashed:
+            return url_for('static_dist', filename=hashed)
+        return self._fallback_url(filename)
+
+    def is_local(self, filename):
+        """Czy plik jest serwowany lokalnie (zbudowany w manifeście lub pobrany do vendor/)."""
+        return filename in self.files or filename in self._vendored
+
+    def vendor_url(self, filename):
+        """
+        Adres biblioteki zewnętrznej: lokalna kopia z hashem, a jeśli
+        'flask assets vendor' nie był uruchomiony - dotychczasowy adres CDN.
+        """
+        if self.is_local(filename) or filename not in VENDOR_FALLBACKS:
+            return self.url_for(filename)
+        return VENDOR_FALLBACKS[filename]
+
+    def preload(self, response, filename, as_type):
+        """Dodaje do odpowiedzi nagłówek Link: rel=preload dla lokalnego zasobu."""
+        if self.is_local(filename):
+            response.headers.add('Link', self._preload_value(filename, as_type))
+        return response
+
+    def _preload_value(self, filename, as_type):
+        value = f'<{self.url_for(filename)}>; rel=preload; as={as_type}'
+        if as_type == 'font':
+            value += '; type="font/woff2"; crossorigin'
+        return value
+
+    def _add_preload_links(self, response):
+        """Zasoby krytyczne (CSS, czcionki) zapowiadamy w nagłówku każdej strony HTML."""
+        if response.mimetype != 'text/html' or response.status_code != 200:
+            return response
+        if self._preload_header is None:
+            links = [
+                self._preload_value(filename, as_type)
+                for filename, as_type in current_app.config['ASSETS_PRELOAD']
+                if self.is_local(filename)
+            ]
+            self._preload_header = ', '.join(links)
+        if self._preload_header:
+            response.headers.add('Link', self._preload_header)
+        return response
+
+    def service_worker(self):
+        """
+        Zwraca (treść, wersja) service workera wygenerowanego z szablonu i manifestu.
+        Wersja to hash treści, więc zmienia się automatycznie przy każdej zmianie
+        plików statycznych (lub samego szablonu) - bez ręcznej edycji CACHE_NAME.
+        """
+        if self._service_worker is not None and not current_app.debug:
+            return self._service_worker
+
+        precache_urls = [
+            url_for('static_dist', filename=hashed)
+            for hashed in sorted(self.files.values())
+            if hashed.endswith(PRECACHE_EXTENSIONS)
+        ]
+        placeholder = '__GRAFIK_SW_VERSION__'
+        body = render_template(
+            'service-worker.js',
+            version=placeholder,
+            precache_urls=precache_urls,
+            api_prefixes=[url_for('main.api_events')],
+            logout_path=url_for('auth.logout'),
+            offline_store_url=self.url_for('js/offline_store.js'),
+            csrf_url=url_for('main.api_csrf_token'),
+            dist_prefix=url_for('static_dist', filename=''),
+            static_prefix=current_app.static_url_path + '/',
+        )
+        version = hashlib.sha256(body.encode('utf-8')).hexdigest()[:12]
+        self._service_worker = (body.replace(placeholder, version), version)
+        return self._service_worker
+
+    def _fallback_url(self, filename):
+        # Bez zbudowanego manifestu (np. dewelopersko) liczymy mtime raz na plik.
+        # W trybie debug sprawdzamy go za każdym razem, aby widzieć zmiany od razu.
+        if not current_app.debug and filename in self._fallback_urls:
+            return self._fallback_urls[filename]
+        filepath = os.path.join(current_app.static_folder, filename)
+        if os.path.exists(filepath):
+            url = f"{url_for('static', filename=filename)}?v={int(os.path.getmtime(filepath))}"
+        else:
+            url = url_for('static', filename=filename)
+        self._fallback_urls[filename] = url
+        return url
+
+    def serve_dist(self, filename):
+        """Serwuje plik z hashem, wybierając wersję .br/.gz zgodnie z Accept-Encoding."""
+        dist_folder = os.path.join(current_app.static_folder, DIST_DIR)
+        available = (self.manifest or {}).get('encodings', {}).get(filename, [])
+        accepted = request.accept_encodings
+
+        encoding = None
+        for candidate in ('br', 'gzip'):
+            if candidate in available and accepted[candidate]:
+                encoding = candidate
+                break
+
+        if encoding:
+            suffix = '.br' if encoding == 'br' else '.gz'
+            mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            response = send_from_directory(dist_folder, filename + suffix, mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+        else:
+            if not os.path.isfile(os.path.join(dist_folder, filename)):
+                abort(404)
+            response = send_from_directory(dist_folder, filename)
+
+        max_age = current_app.config['ASSETS_MAX_AGE']
+        response.headers['Cache-Control'] = f'public, max-age={max_age}, immutable'
+        response.vary.add('Accept-Encoding')
+        return response
+
+
+@click.group('assets')
+def assets_cli():
+    """Zarządzanie zasobami statycznymi (minifikacja, hashowanie, kompresja)."""
+
+
+@assets_cli.command('vendor')
+@click.option('--update-lock', is_flag=True,
+              help=f'Zapisz nowe sumy SHA-256 do {VENDOR_LOCK} (po zmianie wersji w VENDOR_SOURCES).')
+@with_appcontext
+def vendor_command(update_lock):
+    """Pobiera FullCalendar i czcionki do static/vendor/ (przycinając czcionki) i sprawdza sumy z locka."""
+    if vendor_assets(current_app.static_folder, echo=click.echo, update_lock=update_lock) is None:
+        return
+    if update_lock:
+        click.echo(f"Zapisano {VENDOR_LOCK} - przejrzyj i zatwierdź go razem z plikami static/vendor/.")
+    if font_subset is None:
+        click.echo("Uwaga: brak pakietu 'fonttools' - czcionki nie zostały przycięte.")
+    click.echo("Uruchom teraz 'flask assets build', aby nadać plikom hash w nazwie.")
+
+
+@assets_cli.command('build')
+@click.option('--no-minify', is_flag=True, help='Nie minifikuj CSS/JS.')
+@click.option('--no-compress', is_flag=True, help='Nie twórz wersji .gz/.br.')
+@with_appcontext
+def build_command(no_minify, no_compress):
+    """Buduje static/dist/ i manifest zasobów."""
+    manifest = build_assets(current_app.static_folder, minify=not no_minify, compress=not no_compress)
+    current_app.extensions['assets'].manifest = manifest
+    click.echo(f"Zbudowano {len(manifest['files'])} plików (wersja {manifest['version']}).")
+    if brotli is None:
+        click.echo("Uwaga: brak pakietu 'brotli' - utworzono tylko wersje .gz.")
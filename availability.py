@@ -0,0 +1,87 @@
+"""
+Miesięczna macierz dostępności pracowników (użytkownicy x dni) dla kierowników.
+Plik: availability.py
+
+Wszystkie zapisy miesiąca pobiera jedno zapytanie (Trip LEFT JOIN Signup, same
+kolumny); drugie, lekkie zapytanie to lista użytkowników. Tabela powstaje
+wektorowo (pandas/NumPy): status komórki to najważniejszy status dnia
+(potwierdzony > wstępnie zapisany > rezerwowy > niedyspozycyjny), a wolne
+miejsca dnia to suma wolnych miejsc jego zleceń.
+"""
+import calendar
+from datetime import date
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+# Kod statusu = indeks w krotce; wyższy kod wygrywa, gdy pracownik ma kilka zapisów jednego dnia
+STATUSES = (None, 'niedyspozycyjny', 'rezerwowy', 'wstępnie zapisany', 'potwierdzony')
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES) if status}
+# Statusy zajmujące miejsce w zleceniu (jak w trips.trip_details)
+OCCUPYING = ('potwierdzony', 'wstępnie zapisany')
+
+
+def parse_month(value, today=None):
+    """(rok, miesiąc) z 'RRRR-MM'; brak wartości - bieżący miesiąc; błędna wartość - None."""
+    if not value:
+        today = today or date.today()
+        return today.year, today.month
+    try:
+        year, month = (int(part) for part in value.split('-'))
+        date(year, month, 1)
+    except ValueError:
+        return None
+    return year, month
+
+
+def build_matrix(year, month):
+    """
+    Macierz dostępności miesiąca jako słownik gotowy do szablonu i JSON:
+    days (daty), users (id, name, surname, agency), cells (dla każdego
+    użytkownika lista statusów dni lub None), trips, spots i free_spots (na dzień).
+    """
+    from extensions import db
+    from models import User, Trip, Signup
+    days_count = calendar.monthrange(year, month)[1]
+    first = date(year, month, 1)
+    last = date(year, month, days_count)
+
+    users = db.session.execute(
+        select(User.id, User.name, User.surname, User.agency)
+        .where(User.status != 'zablokowany')
+        .order_by(User.surname, User.name, User.id)
+    ).all()
+    rows = db.session.execute(
+        select(Trip.id, Trip.trip_date, Trip.spots, Signup.user_id, Signup.status)
+        .outerjoin(Signup, Signup.trip_id == Trip.id)
+        .where(Trip.trip_date >= first, Trip.trip_date <= last)
+    ).all()
+
+    frame = pd.DataFrame(rows, columns=['trip_id', 'trip_date', 'spots', 'user_id', 'status'])
+    day = pd.to_datetime(frame['trip_date']).dt.day.to_numpy(dtype=np.int64) - 1
+    code = frame['status'].map(STATUS_CODES).fillna(0).to_numpy(dtype=np.int8)
+    user_pos = pd.Index([user.id for user in users], dtype='float64').get_indexer(frame['user_id'].astype('float64'))
+
+    # Komórki: maksimum kodów statusów (pracownik, dzień); zablokowani i zlecenia bez zapisów pomijani
+    grid = np.zeros((len(users), days_count), dtype=np.int8)
+    known = (user_pos >= 0) & (code > 0)
+    np.maximum.at(grid, (user_pos[known], day[known]), code[known])
+
+    # Wolne miejsca: na zlecenie (miejsca - zajęte, nie mniej niż 0), potem suma na dzień
+    frame['day'] = day
+    frame['occupying'] = frame['status'].isin(OCCUPYING)
+    trips = frame.groupby('trip_id').agg(day=('day', 'first'), spots=('spots', 'first'), taken=('occupying', 'sum'))
+    spots = trips['spots'].fillna(0).to_numpy(dtype=np.int64)
+    trip_days = trips['day'].to_numpy(dtype=np.int64)
+    free = np.clip(spots - trips['taken'].to_numpy(dtype=np.int64), 0, None)
+
+    labels = np.array(STATUSES, dtype=object)
+    return {
+        'month': f'{year:04d}-{month:02d}',
+        'days': [date(year, month, number) for number in range(1, days_count + 1)],
+        'users': [{'id': user.id, 'name': user.name, 'surname': user.surname, 'agency': user.agency} for user in users],
+        'cells': labels[grid].tolist(),
+        'trips': np.bincount(trip_days, minlength=days_count).tolist(),
+        'spots': np.bincount(trip_days, weights=spots, minlength=days_count).astype(np.int64).tolist(),
+        'free_spots': np.bincount(trip_days, weights=free, minlength=days_count).astype(np.int64).tolist(),
+    }
@@ -0,0 +1,273 @@
+"""
+Benchmark najważniejszych widoków na danych syntetycznych (seed.py).
+Plik: benchmarks/bench_endpoints.py
+
+Dla każdej skali danych tworzy świeżą bazę SQLite w pliku, wypełnia ją przez
+seed.generate() i mierzy scenariusze przez klienta testowego Flask (bez sieci):
+ops/s, p50/p95/max i średnią liczbę zapytań SQL na żądanie.
+Wynik trafia do pliku JSON, który można porównać z innym commitem:
+
+    python benchmarks/bench_endpoints.py --scales small,medium --output bench_before.json
+    (zmiany w kodzie)
+    python benchmarks/bench_endpoints.py --scales small,medium --output bench_after.json
+    python benchmarks/compare.py bench_before.json bench_after.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SECRET_KEY', 'benchmark-secret-key')
+
+import pandas as pd  # noqa: E402
+import sqlalchemy  # noqa: E402
+from sqlalchemy import event, extract  # noqa: E402
+from config import Config  # noqa: E402
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import User, Trip, Signup  # noqa: E402
+from seed import generate  # noqa: E402
+from bench_password_hashing import percentile  # noqa: E402
+
+# Skale danych: (użytkownicy, zlecenia)
+SCALES = {
+    'small': (50, 500),
+    'medium': (300, 5000),
+    'large': (800, 20000),
+}
+PASSWORD = 'haslo123'
+
+
+class Scenario:
+    """Jeden mierzony rodzaj żądania: prepare() raz na skalę, request() w każdej iteracji."""
+
+    def __init__(self, name, role, request, prepare=None):
+        self.name = name
+        self.role = role
+        self.request = request
+        self.prepare = prepare or (lambda ctx: None)
+
+
+def _month_range(day):
+    start = day.replace(day=1)
+    end = (start.replace(day=28) + pd.Timedelta(days=4)).replace(day=1)
+    return start, end
+
+
+def _prepare_busy_trips(ctx):
+    # Zlecenia z największą liczbą zapisów - najgorszy przypadek dla szczegółów
+    ctx['busy_trip_ids'] = [row.trip_id for row in db.session.query(Signup.trip_id).group_by(Signup.trip_id)
+                            .order_by(sqlalchemy.func.count().desc()).limit(20)]
+
+
+def _prepare_settlements(ctx):
+    today = date.today()
+    trips = Trip.query.filter(
+        Trip.is_archived == False,  # noqa: E712
+        extract('year', Trip.trip_date) == today.year,
+        extract('month', Trip.trip_date) == today.month,
+    ).all()
+    ctx['settlement_trips'] = [(trip.id, trip.spots or 1) for trip in trips]
+    ctx['settlement_km'] = ['123,4', '98,7']
+
+
+def _settlement_form(ctx):
+    # Kilometry zmieniają się co żądanie - każdy zapis naprawdę aktualizuje wiersze
+    km = _next(ctx, 'settlement_km')
+    form = {}
+    for trip_id, spots in ctx['settlement_trips']:
+        form[f'km-{trip_id}'] = km
+        form[f'spots-{trip_id}'] = str(spots)
+        form[f'work_start-{trip_id}'] = '07:00'
+        form[f'work_end-{trip_id}'] = '15:00'
+    return form
+
+
+def _prepare_import(ctx):
+    # Ponowny import grafiku bieżącego miesiąca: same aktualizacje istniejących zleceń
+    start, end = _month_range(date.today())
+    trips = Trip.query.filter(Trip.trip_date >= start, Trip.trip_date < end).all()
+    frame = pd.DataFrame([[trip.trip_date.isoformat(), trip.title, 'tak'] for trip in trips])
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        frame.to_excel(writer, index=False, header=False, sheet_name='Grafik')
+    ctx['import_file'] = output.getvalue()
+
+
+def _next(ctx, key):
+    """Kolejny element listy z kontekstu (kolejne iteracje trafiają w różne zlecenia)."""
+    values = ctx[key]
+    ctx[key + '_i'] = (ctx.get(key + '_i', -1) + 1) % len(values)
+    return values[ctx[key + '_i']]
+
+
+SCENARIOS = [
+    Scenario('api_events', 'worker', lambda client, ctx: client.get(
+        '/api/events?start={}&end={}'.format(*_month_range(date.today())))),
+    Scenario('api_events_all', 'worker', lambda client, ctx: client.get('/api/events')),
+    Scenario('events_all_gzip', 'worker', lambda client, ctx: client.get(
+        '/api/events', headers={'Accept-Encoding': 'gzip, br'})),
+    Scenario('trip_details', 'worker',
+             lambda client, ctx: client.get(f"/trip/{_next(ctx, 'busy_trip_ids')}"), _prepare_busy_trips),
+    Scenario('settlements_get', 'admin', lambda client, ctx: client.get('/admin/settlements')),
+    Scenario('settlements_gzip', 'admin', lambda client, ctx: client.get(
+        '/admin/settlements', headers={'Accept-Encoding': 'gzip, br'})),
+    Scenario('settlements_post', 'admin',
+             lambda client, ctx: client.post('/admin/settlements', data=_settlement_form(ctx)), _prepare_settlements),
+    Scenario('admin_users', 'admin', lambda client, ctx: client.get('/admin/users')),
+    Scenario('admin_archive', 'admin', lambda client, ctx: client.get('/admin/archive')),
+    Scenario('api_search', 'worker', lambda client, ctx: client.get('/api/search?q=biedronka')),
+    Scenario('settlements_search', 'admin', lambda client, ctx: client.get('/admin/settlements?search_text=dino')),
+    Scenario('admin_matrix', 'admin', lambda client, ctx: client.get('/admin/matrix')),
+    Scenario('settlement_summary', 'admin', lambda client, ctx: client.get('/admin/settlements/summary')),
+    Scenario('admin_roster', 'admin', lambda client, ctx: client.get(
+        '/admin/roster', query_string={'start': date.today().replace(day=1).isoformat()})),
+    Scenario('import_excel', 'admin', lambda client, ctx: client.post(
+        '/admin/import', data={'excel_file': (io.BytesIO(ctx['import_file']), 'grafik.xlsx')},
+        content_type='multipart/form-data'), _prepare_import),
+    Scenario('export_excel', 'admin', lambda client, ctx: client.get('/admin/export')),
+]
+
+
+def make_app(database_path):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{database_path}'
+        WTF_CSRF_ENABLED = False
+        THROTTLE_ENABLED = False
+        PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+        PASSWORD_HASH_WORKERS = 0
+        METRICS_SERVER_TIMING = False
+        SLOW_QUERY_THRESHOLD_MS = None
+        TESTING = True  # bez logowania do plików
+
+    return create_app(BenchConfig)
+
+
+def seed_scale(app, users, trips):
+    with app.app_context():
+        db.create_all()
+        generate(users=users, trips=trips, years=3, password=PASSWORD, seed=1)
+        # Stałe konta do logowania: pracownik z wieloma zapisami i admin agencji DPL (eksport)
+        worker = (User.query.join(Signup).filter(User.status == 'pracownik')
+                  .group_by(User.id).order_by(sqlalchemy.func.count().desc()).first())
+        admin = User.query.filter_by(status='admin').first() or User.query.filter_by(status='kierownik').first()
+        admin.agency = 'DPL'
+        # Eksport pobiera zapisy zalogowanego użytkownika - admin dostaje te same co pracownik
+        for signup in Signup.query.filter_by(user_id=worker.id).all():
+            db.session.add(Signup(trip_id=signup.trip_id, user_id=admin.id, status=signup.status))
+        db.session.commit()
+        return {'worker': worker.email, 'admin': admin.email}
+
+
+def login(app, email):
+    client = app.test_client()
+    response = client.post('/login', data={'email': email, 'password': PASSWORD})
+    if response.status_code != 302:
+        raise RuntimeError(f'Nie udało się zalogować jako {email}')
+    return client
+
+
+def run_scenario(app, scenario, client, ctx, iterations, warmup):
+    statements = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(1)
+
+    with app.app_context():
+        scenario.prepare(ctx)
+    for _ in range(warmup):
+        scenario.request(client, ctx)
+
+    latencies, errors = [], 0
+    engine = None
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _count)
+    try:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            response = scenario.request(client, ctx)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+    finally:
+        event.remove(engine, 'before_cursor_execute', _count)
+
+    total = sum(latencies)
+    return {
+        'iterations': iterations,
+        'ops_per_sec': round(iterations / total, 2) if total else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2),
+        'mean_ms': round(total / iterations * 1000, 2),
+        'queries_per_request': round(len(statements) / iterations, 1),
+        'errors': errors,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark widoków aplikacji na danych syntetycznych.')
+    parser.add_argument('--scales', default='small,medium', help=f"Skale danych: {', '.join(SCALES)}.")
+    parser.add_argument('--scenarios', default=None, help='Tylko wybrane scenariusze (po przecinku).')
+    parser.add_argument('--iterations', type=int, default=30, help='Pomiary na scenariusz.')
+    parser.add_argument('--warmup', type=int, default=3, help='Żądania rozgrzewające (bez pomiaru).')
+    parser.add_argument('--output', default='bench_output.json', help='Plik wynikowy JSON.')
+    args = parser.parse_args()
+
+    scenarios = SCENARIOS
+    if args.scenarios:
+        wanted = set(args.scenarios.split(','))
+        scenarios = [scenario for scenario in SCENARIOS if scenario.name in wanted]
+
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlalchemy': sqlalchemy.__version__,
+        'iterations': args.iterations,
+        'scales': {},
+    }
+    for scale in args.scales.split(','):
+        users, trips = SCALES[scale]
+        with tempfile.TemporaryDirectory() as tmp:
+            app = make_app(os.path.join(tmp, 'bench.db'))
+            start = time.perf_counter()
+            accounts = seed_scale(app, users, trips)
+            print(f"[{scale}] {users} użytkowników, {trips} zleceń - dane w {time.perf_counter() - start:.1f} s")
+            clients = {role: login(app, email) for role, email in accounts.items()}
+
+            results = {}
+            for scenario in scenarios:
+                ctx = {}
+                result = run_scenario(app, scenario, clients[scenario.role], ctx, args.iterations, args.warmup)
+                results[scenario.name] = result
+                print(f"  {scenario.name:18} {result['ops_per_sec']:>8} ops/s  p50 {result['p50_ms']:>8} ms  "
+                      f"p95 {result['p95_ms']:>8} ms  SQL/żądanie {result['queries_per_request']:>6}"
+                      f"{'  BŁĘDY: ' + str(result['errors']) if result['errors'] else ''}")
+            report['scales'][scale] = {'users': users, 'trips': trips, 'results': results}
+            with app.app_context():
+                db.engine.dispose()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Zapisano {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Mikro-benchmark haszowania haseł.
+Plik: benchmarks/bench_password_hashing.py
+
+Mierzy:
+- przepustowość haszowania (hashe/s) w jednym wątku,
+- opóźnienie "logowania" (weryfikacji hasła) przy równoległych żądaniach,
+  tak jak przy 'gunicorn --threads 8' na początku zmiany (p50/p95/max),
+- liczbę żądań odrzuconych przez ograniczoną kolejkę puli.
+
+Uruchomienie (z katalogu głównego projektu):
+    python benchmarks/bench_password_hashing.py --method scrypt:32768:8:1 --workers 2 --threads 8
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SECRET_KEY', 'benchmark-secret-key')
+
+from config import Config  # noqa: E402
+from app import create_app  # noqa: E402
+from extensions import password_hasher  # noqa: E402
+from hashing import HashingBusyError  # noqa: E402
+
+
+def percentile(values, pct):
+    """Percentyl metodą najbliższej pozycji (wystarczający dla benchmarku)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def bench_throughput(app, iterations):
+    with app.app_context():
+        start = time.perf_counter()
+        for i in range(iterations):
+            password_hasher.hash(f'haslo-{i}')
+        elapsed = time.perf_counter() - start
+    return iterations / elapsed if elapsed else 0.0
+
+
+def bench_concurrent_logins(app, threads, logins_per_thread):
+    with app.app_context():
+        stored_hash = password_hasher.hash('poprawne-haslo')
+
+    latencies = []
+    rejected = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker():
+        with app.app_context():
+            barrier.wait()  # Wszyscy startują naraz - jak fala logowań
+            for _ in range(logins_per_thread):
+                start = time.perf_counter()
+                try:
+                    password_hasher.verify(stored_hash, 'poprawne-haslo')
+                    ok = True
+                except HashingBusyError:
+                    ok = False
+                elapsed = time.perf_counter() - start
+                with lock:
+                    (latencies if ok else rejected).append(elapsed)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    wall = time.perf_counter() - start
+    return latencies, rejected, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark haszowania haseł.')
+    parser.add_argument('--method', default=Config.PASSWORD_HASH_METHOD)
+    parser.add_argument('--workers', type=int, default=Config.PASSWORD_HASH_WORKERS,
+                        help='Wątki puli haszującej (0 = w wątku żądania).')
+    parser.add_argument('--queue-limit', type=int, default=Config.PASSWORD_HASH_QUEUE_LIMIT)
+    parser.add_argument('--threads', type=int, default=8, help='Równoległe "wątki żądań".')
+    parser.add_argument('--logins', type=int, default=5, help='Logowania na wątek.')
+    parser.add_argument('--iterations', type=int, default=20, help='Hashe w teście przepustowości.')
+    args = parser.parse_args()
+
+    class BenchConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+        PASSWORD_HASH_METHOD = args.method
+        PASSWORD_HASH_WORKERS = args.workers
+        PASSWORD_HASH_QUEUE_LIMIT = args.queue_limit
+
+    app = create_app(BenchConfig)
+
+    print(f"Metoda: {args.method}, pula: {args.workers}, kolejka: {args.queue_limit}")
+    rate = bench_throughput(app, args.iterations)
+    print(f"Przepustowość (1 wątek): {rate:.1f} hashy/s")
+
+    latencies, rejected, wall = bench_concurrent_logins(app, args.threads, args.logins)
+    total = len(latencies) + len(rejected)
+    print(f"Logowania równoległe: {args.threads} wątków x {args.logins} = {total} w {wall:.2f} s "
+          f"({len(latencies) / wall if wall else 0:.1f} logowań/s)")
+    print(f"  p50: {percentile(latencies, 50) * 1000:.1f} ms, "
+          f"p95: {percentile(latencies, 95) * 1000:.1f} ms, "
+          f"max: {max(latencies, default=0) * 1000:.1f} ms")
+    print(f"  Odrzucone (pełna kolejka): {len(rejected)}")
+
+    with app.app_context():
+        password_hasher.shutdown()
+
+
+if __name__ == '__main__':
+    main()
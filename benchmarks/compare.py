@@ -0,0 +1,64 @@
+"""
+Porównanie dwóch wyników benchmarku widoków (bench_endpoints.py).
+Plik: benchmarks/compare.py
+
+Uruchomienie:
+    python benchmarks/compare.py bench_before.json bench_after.json [--threshold 10]
+
+Dla każdej skali i scenariusza wypisuje p50/p95 i liczbę zapytań SQL przed i po
+oraz zmianę p95 w procentach. Regresje powyżej progu są oznaczone, a kod wyjścia
+jest wtedy 1 (można użyć w CI).
+"""
+import argparse
+import json
+import sys
+
+
+def _change(before, after):
+    if not before:
+        return None
+    return (after - before) / before * 100
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Porównanie dwóch plików z bench_endpoints.py.')
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Próg regresji p95 w procentach.')
+    args = parser.parse_args()
+
+    with open(args.before, encoding='utf-8') as f:
+        before = json.load(f)
+    with open(args.after, encoding='utf-8') as f:
+        after = json.load(f)
+
+    print(f"Przed: {before.get('commit')} ({before.get('created_at')})")
+    print(f"Po:    {after.get('commit')} ({after.get('created_at')})")
+    regressions = 0
+    for scale, data in after['scales'].items():
+        if scale not in before['scales']:
+            continue
+        print(f"\n[{scale}]  {'scenariusz':18} {'p50 przed':>10} {'p50 po':>10} {'p95 przed':>10} {'p95 po':>10} "
+              f"{'zmiana p95':>11} {'SQL':>10}")
+        for name, new in data['results'].items():
+            old = before['scales'][scale]['results'].get(name)
+            if old is None:
+                continue
+            change = _change(old['p95_ms'], new['p95_ms'])
+            flag = ''
+            if change is not None and change > args.threshold:
+                flag = '  REGRESJA'
+                regressions += 1
+            if new['queries_per_request'] > old['queries_per_request']:
+                flag += '  WIĘCEJ SQL'
+            change_text = f"{change:+.1f}%" if change is not None else '-'
+            print(f"         {name:18} {old['p50_ms']:>10} {new['p50_ms']:>10} {old['p95_ms']:>10} {new['p95_ms']:>10} "
+                  f"{change_text:>11} {old['queries_per_request']:>4} -> {new['queries_per_request']:<4}{flag}")
+
+    if regressions:
+        print(f"\nRegresje p95 powyżej {args.threshold}%: {regressions}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
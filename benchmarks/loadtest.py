@@ -0,0 +1,390 @@
+"""
+Test obciążeniowy: nagły napływ zapisów na nowe zlecenie.
+Plik: benchmarks/loadtest.py
+
+Odtwarza najgorszy realny scenariusz: kierownik dodaje zlecenie (trips.add_trip),
+a w ciągu kilku sekund ~100 pracowników otwiera jego stronę i się zapisuje
+(trips.signup_trip), podczas gdy inni odpytują kalendarz (/api/events).
+Część pracowników klika "Zapisz się" dwa razy naraz (podwójne kliknięcie).
+
+Po teście sprawdzane są niezmienniki w bazie:
+- zapisy z napływu nie zajęły więcej miejsc niż Trip.spots,
+- żaden pracownik nie ma dwóch zapisów na to samo zlecenie.
+
+Uruchomienie (lokalny Gunicorn na świeżej bazie SQLite z danymi z seed.py):
+    python benchmarks/loadtest.py --start-server --workers 100 --pollers 30
+
+Istniejący serwer (konta z 'flask seed' w tej samej bazie, np. lokalny PostgreSQL):
+    python benchmarks/loadtest.py --url http://127.0.0.1:8000 --database-url postgresql://...
+
+Serwer uruchamiany przez skrypt ma wyłączone limity logowań (THROTTLE_ENABLED=0) -
+wszyscy wirtualni użytkownicy łączą się z jednego adresu IP. Powiadomienia o nowym
+zleceniu idą przez pulę wątków w procesie (TASKS_BACKEND=thread, bez Redisa) i nie
+są wysyłane (MAIL_SUPPRESS_SEND=1); obie zmienne można nadpisać w środowisku.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SECRET_KEY', 'loadtest-secret-key')
+
+from bench_password_hashing import percentile  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSRF_INPUT_RE = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+OCCUPYING = ('potwierdzony', 'wstępnie zapisany')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Przekierowania zwracamy jako odpowiedź (302 po zalogowaniu to sukces)."""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class Stats:
+    """Czasy i błędy żądań z podziałem na operacje (bezpieczne dla wątków)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def add(self, operation, seconds, ok):
+        with self._lock:
+            self.latencies.setdefault(operation, []).append(seconds)
+            if not ok:
+                self.errors[operation] = self.errors.get(operation, 0) + 1
+
+    def summary(self, duration):
+        result = {}
+        for operation, values in sorted(self.latencies.items()):
+            errors = self.errors.get(operation, 0)
+            result[operation] = {
+                'requests': len(values),
+                'throughput_rps': round(len(values) / duration, 2) if duration else None,
+                'p50_ms': round(percentile(values, 50) * 1000, 1),
+                'p95_ms': round(percentile(values, 95) * 1000, 1),
+                'p99_ms': round(percentile(values, 99) * 1000, 1),
+                'max_ms': round(max(values) * 1000, 1),
+                'errors': errors,
+                'error_rate': round(errors / len(values), 4),
+            }
+        return result
+
+
+class VirtualUser:
+    """Jedna przeglądarka: własne ciasteczka (sesja) i token CSRF."""
+
+    def __init__(self, base_url, stats, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.stats = stats
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect)
+        self.csrf_token = None
+
+    def request(self, operation, path, data=None, headers=None, ok_statuses=(200, 302)):
+        """Zwraca (status, nagłówki, treść); status None oznacza błąd połączenia lub timeout."""
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers or {})
+        start = time.perf_counter()
+        try:
+            with self.opener.open(req, timeout=self.timeout) as response:
+                status, response_headers, content = response.status, response.headers, response.read()
+        except urllib.error.HTTPError as e:
+            status, response_headers, content = e.code, e.headers, e.read()
+        except (urllib.error.URLError, OSError):
+            status, response_headers, content = None, {}, b''
+        self.stats.add(operation, time.perf_counter() - start, status in ok_statuses)
+        return status, response_headers, content.decode('utf-8', 'replace')
+
+    def login(self, email, password, attempts=3):
+        for attempt in range(attempts):
+            status, _, page = self.request('login_form', '/login')
+            match = CSRF_INPUT_RE.search(page)
+            if match:
+                status, _, _ = self.request('login', '/login', {
+                    'csrf_token': match.group(1), 'email': email, 'password': password,
+                }, ok_statuses=(302,))
+                if status == 302:
+                    return True
+            # 503 z puli haszowania haseł lub przeciążony serwer - krótka przerwa i ponowna próba
+            time.sleep(0.5 * (attempt + 1))
+        return False
+
+    def refresh_csrf(self):
+        status, _, content = self.request('csrf_token', '/api/csrf-token')
+        self.csrf_token = json.loads(content)['csrf_token'] if status == 200 else None
+        return self.csrf_token
+
+
+# --- SCENARIUSZ ---
+
+def add_trip(manager, spots):
+    """Kierownik dodaje zlecenie na jutro; zwraca id z przekierowania na stronę zlecenia."""
+    manager.refresh_csrf()
+    status, headers, _ = manager.request('add_trip', '/trip/add', {
+        'csrf_token': manager.csrf_token,
+        'title': f'Test obciążeniowy {time.strftime("%H:%M:%S")}',
+        'trip_date': (date.today() + timedelta(days=1)).isoformat(),
+        'spots': str(spots),
+        'is_confirmed': 'on',
+    }, ok_statuses=(302,))
+    match = re.search(r'/trip/(\d+)$', headers.get('Location', '') if status == 302 else '')
+    if not match:
+        raise RuntimeError(f'Dodanie zlecenia nie powiodło się (status {status}).')
+    return int(match.group(1))
+
+
+def signup(worker, trip_id, delay, double_click, outcomes, outcomes_lock):
+    """Pracownik otwiera stronę zlecenia i się zapisuje (czasem dwa razy naraz)."""
+    time.sleep(delay)
+    status, _, page = worker.request('trip_details', f'/trip/{trip_id}')
+    match = CSRF_INPUT_RE.search(page) if status == 200 else None
+    if not match:
+        return
+    form = {'csrf_token': match.group(1), 'action': 'signup'}
+    headers = {'X-Requested-With': 'XMLHttpRequest'}
+
+    def _post():
+        status, _, content = worker.request('signup', f'/trip/{trip_id}/signup', form, headers, ok_statuses=(200,))
+        result = json.loads(content).get('signup_status') if status == 200 else f'HTTP {status}'
+        with outcomes_lock:
+            outcomes[result] = outcomes.get(result, 0) + 1
+
+    if double_click:
+        second = threading.Thread(target=_post)
+        second.start()
+        _post()
+        second.join()
+    else:
+        _post()
+
+
+def poll_events(poller, stop, interval):
+    """Otwarty kalendarz: co 'interval' sekund pobiera wydarzenia bieżącego i przyszłego miesiąca."""
+    start = date.today().replace(day=1)
+    end = (start + timedelta(days=62)).replace(day=1)
+    while not stop.is_set():
+        poller.request('api_events', f'/api/events?start={start}&end={end}')
+        stop.wait(interval * random.uniform(0.5, 1.5))
+
+
+# --- BAZA: KONTA I NIEZMIENNIKI ---
+
+def make_app(database_url):
+    from config import Config
+    from app import create_app
+
+    class LoadTestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        TESTING = True  # bez logowania do plików w procesie testu
+
+    return create_app(LoadTestConfig)
+
+
+def prepare_accounts(app, needed_workers, seed_fresh):
+    """Konta z seed.py: zwykli pracownicy i jeden kierownik."""
+    from extensions import db
+    from models import User
+    from seed import generate
+
+    with app.app_context():
+        if seed_fresh:
+            db.create_all()
+            # Bez złotych pracowników - ich automatyczne zapisy zajęłyby wszystkie miejsca przed napływem
+            generate(users=int(needed_workers * 1.1) + 20, trips=300, years=1, seed=1,
+                     role_weights={'pracownik': 95, 'kierownik': 5})
+        seeded = User.query.filter(User.email.like('seed%@grafik.example'))
+        workers = [user.email for user in seeded.filter(User.status == 'pracownik').order_by(User.id)]
+        manager = seeded.filter(User.status.in_(['kierownik', 'admin'])).order_by(User.id).first()
+    if len(workers) < needed_workers or manager is None:
+        raise RuntimeError(f'Za mało kont seed (pracownicy: {len(workers)}, potrzeba {needed_workers}). '
+                           f'Uruchom najpierw: flask seed --users {int(needed_workers * 1.4) + 20}')
+    return manager.email, workers[:needed_workers]
+
+
+def occupied_spots(app, trip_id):
+    from models import Signup
+    with app.app_context():
+        return Signup.query.filter(Signup.trip_id == trip_id, Signup.status.in_(OCCUPYING)).count()
+
+
+def check_invariants(app, trip_id, occupied_before):
+    from sqlalchemy import func
+    from extensions import db
+    from models import Trip, Signup
+
+    with app.app_context():
+        trip = db.session.get(Trip, trip_id)
+        occupied = Signup.query.filter(Signup.trip_id == trip_id, Signup.status.in_(OCCUPYING)).count()
+        duplicates = db.session.query(Signup.user_id, func.count()).filter(Signup.trip_id == trip_id) \
+            .group_by(Signup.user_id).having(func.count() > 1).all()
+        by_status = dict(db.session.query(Signup.status, func.count()).filter(Signup.trip_id == trip_id)
+                         .group_by(Signup.status).all())
+    # Miejsca zajęte przed napływem (kierownik, złoci pracownicy) nie są winą zapisów
+    allowed = max(trip.spots or 0, occupied_before)
+    return {
+        'spots': trip.spots,
+        'occupied_before_burst': occupied_before,
+        'occupied_after_burst': occupied,
+        'overbooked_by': max(0, occupied - allowed),
+        'duplicate_signups': len(duplicates),
+        'signups_by_status': by_status,
+        'ok': occupied <= allowed and not duplicates,
+    }
+
+
+# --- SERWER ---
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(database_url, gunicorn_workers, threads, log_path):
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL=database_url, THROTTLE_ENABLED='0')
+    env.setdefault('TASKS_BACKEND', 'thread')
+    env.setdefault('MAIL_SUPPRESS_SEND', '1')
+    log = open(log_path, 'w')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', str(gunicorn_workers),
+         '--threads', str(threads), '--timeout', '60', 'app:create_app()'],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        if process.poll() is not None:
+            raise RuntimeError(f'Gunicorn zakończył się przy starcie - zobacz {log_path}')
+        try:
+            urllib.request.urlopen(url + '/login', timeout=1).close()
+            return process, url
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'Gunicorn nie odpowiada - zobacz {log_path}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Test obciążeniowy: napływ zapisów na nowe zlecenie.')
+    parser.add_argument('--url', help='Adres działającego serwera (bez --start-server).')
+    parser.add_argument('--database-url', help='Baza serwera - konta seed i sprawdzenie niezmienników.')
+    parser.add_argument('--start-server', action='store_true', help='Uruchom Gunicorn na świeżej bazie SQLite.')
+    parser.add_argument('--gunicorn-workers', type=int, default=2)
+    parser.add_argument('--gunicorn-threads', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=100, help='Pracownicy zapisujący się na zlecenie.')
+    parser.add_argument('--pollers', type=int, default=30, help='Użytkownicy z otwartym kalendarzem.')
+    parser.add_argument('--poll-interval', type=float, default=2.0, help='Co ile sekund kalendarz odpytuje API.')
+    parser.add_argument('--burst-seconds', type=float, default=5.0, help='W ciągu ilu sekund przychodzą zapisy.')
+    parser.add_argument('--double-click', type=float, default=0.1, help='Udział pracowników klikających dwa razy.')
+    parser.add_argument('--spots', type=int, default=7, help='Liczba miejsc w dodawanym zleceniu (1-7).')
+    parser.add_argument('--password', default='haslo123', help='Hasło kont seed.')
+    parser.add_argument('--concurrency', type=int, default=20, help='Równoległe logowania przed testem.')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Limit czasu jednego żądania (s).')
+    parser.add_argument('--output', help='Zapisz wynik jako JSON.')
+    args = parser.parse_args()
+
+    if not args.start_server and not (args.url and args.database_url):
+        parser.error('podaj --start-server albo --url razem z --database-url')
+
+    tmp = tempfile.mkdtemp(prefix='grafik-loadtest-') if args.start_server else None
+    database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'loadtest.db')}"
+    app = make_app(database_url)
+    manager_email, worker_emails = prepare_accounts(app, args.workers + args.pollers, args.start_server)
+
+    server = None
+    stop = threading.Event()
+    url = args.url
+    if args.start_server:
+        server, url = start_server(database_url, args.gunicorn_workers, args.gunicorn_threads,
+                                   os.path.join(tmp, 'gunicorn.log'))
+        print(f"Gunicorn: {url} ({args.gunicorn_workers} proc. x {args.gunicorn_threads} wątków), baza {database_url}")
+
+    try:
+        stats = Stats()
+        users = [VirtualUser(url, stats, args.timeout) for _ in worker_emails]
+        manager = VirtualUser(url, stats, args.timeout)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            logged_in = list(pool.map(lambda pair: pair[0].login(pair[1], args.password),
+                                      zip(users + [manager], worker_emails + [manager_email])))
+        print(f"Zalogowano {sum(logged_in)}/{len(logged_in)} kont w {time.perf_counter() - start:.1f} s")
+        if not logged_in[-1]:
+            raise RuntimeError('Kierownik nie mógł się zalogować')
+        workers = [user for user, ok in zip(users[:args.workers], logged_in) if ok]
+        pollers = [user for user, ok in zip(users[args.workers:], logged_in[args.workers:]) if ok]
+
+        poll_threads = [threading.Thread(target=poll_events, args=(poller, stop, args.poll_interval), daemon=True)
+                        for poller in pollers]
+        for thread in poll_threads:
+            thread.start()
+
+        burst_start = time.perf_counter()
+        trip_id = add_trip(manager, args.spots)
+        occupied_before = occupied_spots(app, trip_id)
+        outcomes, outcomes_lock = {}, threading.Lock()
+        burst = [threading.Thread(target=signup, args=(
+            worker, trip_id, random.uniform(0, args.burst_seconds), random.random() < args.double_click,
+            outcomes, outcomes_lock)) for worker in workers]
+        for thread in burst:
+            thread.start()
+        for thread in burst:
+            thread.join()
+        stop.set()
+        for thread in poll_threads:
+            thread.join()
+        duration = time.perf_counter() - burst_start
+    finally:
+        stop.set()
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    summary = stats.summary(duration)
+    burst_ops = [name for name in summary if not name.startswith('login') and name != 'csrf_token']
+    total = sum(summary[name]['requests'] for name in burst_ops)
+    errors = sum(summary[name]['errors'] for name in burst_ops)
+    invariants = check_invariants(app, trip_id, occupied_before)
+
+    print(f"\nZlecenie #{trip_id}: {len(workers)} pracowników w {args.burst_seconds:.0f} s, "
+          f"{len(pollers)} kalendarzy, czas {duration:.1f} s")
+    print(f"{'operacja':14} {'żądania':>8} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'błędy':>6}")
+    for name, row in summary.items():
+        print(f"{name:14} {row['requests']:>8} {row['throughput_rps']:>8} {row['p50_ms']:>8} {row['p95_ms']:>8} "
+              f"{row['p99_ms']:>8} {row['max_ms']:>8} {row['errors']:>6}")
+    print(f"Razem w trakcie napływu: {total} żądań, {total / duration:.1f} rps, błędy {errors / total:.2%}")
+    print(f"Wyniki zapisów: {outcomes}")
+    print(f"Miejsca: {invariants['occupied_after_burst']}/{invariants['spots']} "
+          f"(przed napływem {invariants['occupied_before_burst']}), nadmiar {invariants['overbooked_by']}, "
+          f"zdublowane zapisy {invariants['duplicate_signups']}")
+    print('NIEZMIENNIKI OK' if invariants['ok'] else 'NIEZMIENNIKI NARUSZONE')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'trip_id': trip_id, 'duration_s': round(duration, 2),
+                       'total_requests': total, 'error_rate': round(errors / total, 4) if total else None,
+                       'operations': summary, 'signup_outcomes': outcomes, 'invariants': invariants},
+                      f, indent=2, ensure_ascii=False)
+    sys.exit(0 if invariants['ok'] else 1)
+
+
+if __name__ == '__main__':
+    main()
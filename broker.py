@@ -0,0 +1,204 @@
+"""
+Broker powiadomień o zmianach dla strumienia SSE (/api/stream).
+Plik: broker.py
+
+Po zatwierdzeniu transakcji zmieniającej zlecenia lub zapisy (patrz journal.py)
+wysyłane jest krótkie powiadomienie 'changes'. Otwarte karty pobierają wtedy
+tylko zmiany (/api/events/changes) zamiast co minutę odpytywać serwer.
+
+Brokery:
+- 'memory' - w pamięci procesu (jeden proces / jeden węzeł),
+- 'redis'  - Redis pub/sub (RQ_REDIS_URL); każdy proces ma jeden wątek nasłuchujący
+             i rozsyła wiadomości do swoich klientów (wiele węzłów).
+
+Każdy klient ma bufor o ograniczonym rozmiarze. Wolny klient nie blokuje nadawcy:
+nadmiarowe powiadomienia są porzucane, a klient dostaje jedno zdarzenie 'resync'
+(pełna synchronizacja od swojego kursora).
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from flask import current_app
+
+BrokerMessage = namedtuple('BrokerMessage', ['event', 'data'])
+RESYNC = BrokerMessage('resync', {})
+
+logger = logging.getLogger(__name__)
+
+
+class BrokerFullError(Exception):
+    """Osiągnięto limit jednoczesnych połączeń SSE w tym procesie."""
+
+
+class Subscription:
+    """Bufor powiadomień jednego klienta SSE (ograniczonego rozmiaru)."""
+
+    def __init__(self, maxsize):
+        self._queue = queue.Queue(maxsize)
+        self.overflowed = False
+        self.dropped = 0
+
+    def put(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            self.overflowed = True
+            self.dropped += 1
+
+    def get(self, timeout):
+        """Zwraca kolejną wiadomość lub None po upływie 'timeout' (czas na heartbeat)."""
+        if self.overflowed:
+            # Zaległe powiadomienia są nieaktualne - wystarczy jedna pełna synchronizacja
+            self.overflowed = False
+            while not self._queue.empty():
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            return RESYNC
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class MemoryBroker:
+    """Broker w pamięci procesu."""
+
+    def __init__(self, buffer_size=32, max_subscribers=200):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self.published = 0
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise BrokerFullError()
+            subscription = Subscription(self.buffer_size)
+            self._subscribers.add(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event, data):
+        self._deliver(BrokerMessage(event, data))
+
+    def _deliver(self, message):
+        with self._lock:
+            self.published += 1
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.put(message)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'published': self.published,
+                'dropped': sum(s.dropped for s in self._subscribers),
+            }
+
+
+class RedisBroker(MemoryBroker):
+    """Broker przez Redis pub/sub - wiadomości docierają do klientów wszystkich procesów i węzłów."""
+
+    def __init__(self, url, channel='grafik:changes', **kwargs):
+        import redis  # Opcjonalna zależność - wymagana tylko dla tego brokera
+        super().__init__(**kwargs)
+        self.channel = channel
+        self._client = redis.Redis.from_url(url)
+        self._listener = None
+        self._listener_pid = None
+
+    def publish(self, event, data):
+        self._client.publish(self.channel, json.dumps({'event': event, 'data': data}))
+
+    def subscribe(self):
+        self._ensure_listener()
+        return super().subscribe()
+
+    def _ensure_listener(self):
+        # Wątek uruchamiany leniwie i osobno w każdym procesie (gunicorn forkuje workery)
+        with self._lock:
+            if self._listener_pid == os.getpid() and self._listener.is_alive():
+                return
+            self._listener_pid = os.getpid()
+            self._listener = threading.Thread(target=self._listen, name='grafik-broker', daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        reconnect = False
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                if reconnect:
+                    # Powiadomienia z czasu przerwy przepadły - klienci synchronizują się od kursora
+                    self._deliver(RESYNC)
+                for raw in pubsub.listen():
+                    payload = json.loads(raw['data'])
+                    self._deliver(BrokerMessage(payload['event'], payload['data']))
+            except Exception as e:
+                logger.error(f"Utracono połączenie brokera Redis: {e}")
+                reconnect = True
+                time.sleep(1)
+
+
+class EventBroker:
+    """
+    Rozszerzenie Flask udostępniające broker powiadomień.
+    EVENT_BROKER: 'memory' (domyślnie) lub 'redis' (adres z RQ_REDIS_URL).
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('EVENT_BROKER', 'memory')
+        app.config.setdefault('SSE_CLIENT_BUFFER', 32)
+        app.config.setdefault('SSE_MAX_CLIENTS', 200)
+        app.config.setdefault('SSE_HEARTBEAT', 15)
+        app.config.setdefault('SSE_MAX_DURATION', 300)
+        app.extensions['event_broker'] = self._create_broker(app)
+
+    @staticmethod
+    def _create_broker(app):
+        options = {
+            'buffer_size': app.config['SSE_CLIENT_BUFFER'],
+            'max_subscribers': app.config['SSE_MAX_CLIENTS'],
+        }
+        if app.config['EVENT_BROKER'] == 'redis':
+            try:
+                return RedisBroker(app.config['RQ_REDIS_URL'], **options)
+            except ImportError:
+                app.logger.warning("Brak pakietu 'redis' - powiadomienia SSE tylko w obrębie procesu.")
+        return MemoryBroker(**options)
+
+    @staticmethod
+    def _broker():
+        return current_app.extensions['event_broker']
+
+    def publish(self, event, data):
+        """Wysyła powiadomienie. Błąd brokera nie może cofnąć zapisanej już zmiany."""
+        try:
+            self._broker().publish(event, data)
+        except Exception as e:
+            current_app.logger.error(f"Nie udało się opublikować powiadomienia '{event}': {e}")
+
+    def subscribe(self):
+        return self._broker().subscribe()
+
+    def unsubscribe(self, subscription):
+        self._broker().unsubscribe(subscription)
+
+    def stats(self):
+        return self._broker().stats()
@@ -0,0 +1,159 @@
+"""
+Subskrypcja kalendarza (iCalendar / ICS) z zleceniami pracownika.
+Plik: calendar_feed.py
+
+Link /calendar/<token>.ics zawiera podpisany token z id użytkownika - kalendarz
+w telefonie pobiera go bez logowania. Podpis zależy od User.calendar_token_version,
+które zmienia każda zmiana hasła - stare linki przestają działać (token nie ma daty
+ważności). Przeliczenie hasha po zmianie PASSWORD_HASH_METHOD linków nie zmienia.
+
+Aplikacje kalendarza odpytują link co kilkanaście minut z każdego urządzenia,
+dlatego obsługa jest dwuetapowa:
+1. Jedno zapytanie agregujące (wersja tokenu, liczba i suma id zapisów, suma id
+   potwierdzonych, najnowsza zmiana zleceń) - z niego powstaje silny ETag.
+   Niezmienione zapisy to 304 bez generowania kalendarza.
+2. W przeciwnym razie jedno zapytanie projekcyjne Signup x Trip (same kolumny,
+   bez obiektów ORM), a plik jest generowany i wysyłany strumieniowo.
+"""
+import hashlib
+from datetime import date, datetime, timedelta, timezone
+from flask import current_app, url_for
+from itsdangerous import URLSafeSerializer
+from itsdangerous.exc import BadSignature
+from sqlalchemy import case, func, select
+
+FEED_STATUSES = ('potwierdzony', 'wstępnie zapisany')
+# Zmiana formatu generowanego pliku musi zmienić ETag
+FEED_FORMAT_VERSION = 1
+PRODID = '-//Grafik Firmowy//Grafik//PL'
+_LINE_OCTETS = 75
+
+
+def escape_text(value):
+    """Wartość tekstowa iCalendar (RFC 5545, 3.3.11)."""
+    return (value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n'))
+
+
+def fold_line(line):
+    """Linia zawinięta do 75 oktetów (bez dzielenia znaków UTF-8), zakończona CRLF."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= _LINE_OCTETS:
+        return line + '\r\n'
+    parts, current, size, limit = [], [], 0, _LINE_OCTETS
+    for char in line:
+        length = len(char.encode('utf-8'))
+        if size + length > limit:
+            parts.append(''.join(current))
+            current, size, limit = [], 0, _LINE_OCTETS - 1  # kolejne linie zaczynają się spacją
+        current.append(char)
+        size += length
+    parts.append(''.join(current))
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def window_start(today=None):
+    """Najstarsza data zleceń w kalendarzu (ICS_PAST_DAYS wstecz)."""
+    return (today or date.today()) - timedelta(days=current_app.config['ICS_PAST_DAYS'])
+
+
+def _user_id_from_token(token):
+    # Podpis sprawdzamy dopiero z wersją tokenu z bazy - tu tylko odczyt id
+    _, payload = URLSafeSerializer(current_app.config['SECRET_KEY']).loads_unsafe(token)
+    return payload if isinstance(payload, int) and not isinstance(payload, bool) else None
+
+
+def feed_state(token, start):
+    """
+    (user_id, etag) dla ważnego tokenu albo None. Jedno zapytanie: wersja tokenu
+    użytkownika (weryfikacja podpisu) i odcisk jego zapisów od daty 'start'.
+    """
+    from extensions import db
+    from models import User, Signup, Trip
+    user_id = _user_id_from_token(token)
+    if user_id is None:
+        return None
+    row = db.session.execute(
+        select(
+            select(func.coalesce(User.calendar_token_version, 0)).where(User.id == user_id)
+            .scalar_subquery().label('token_version'),
+            func.count(Signup.id).label('count'),
+            func.coalesce(func.sum(Signup.id), 0).label('id_sum'),
+            func.coalesce(func.sum(case((Signup.status == 'potwierdzony', Signup.id), else_=0)), 0).label('confirmed_sum'),
+            func.max(Trip.last_modified).label('last_modified'),
+        ).select_from(Signup).join(Trip, Trip.id == Signup.trip_id)
+        .where(Signup.user_id == user_id, Signup.status.in_(FEED_STATUSES), Trip.trip_date >= start)
+    ).one()
+    if row.token_version is None:
+        return None
+    try:
+        User.calendar_serializer(row.token_version).loads(token)
+    except BadSignature:
+        return None
+    fingerprint = (f'{FEED_FORMAT_VERSION}:{user_id}:{start.isoformat()}:{row.count}:{row.id_sum}:'
+                   f'{row.confirmed_sum}:{row.last_modified}')
+    return user_id, hashlib.sha256(fingerprint.encode()).hexdigest()[:32]
+
+
+def _stamp(value):
+    # Daty w bazie są w UTC (czasem bez strefy)
+    if value is None:
+        return datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime('%Y%m%dT%H%M%SZ')
+
+
+def _event_lines(row, host):
+    """Linie VEVENT dla wiersza projekcji. Godziny bez strefy - czas lokalny (X-WR-TIMEZONE)."""
+    start_time = row.departure_time or row.start_time or row.work_start_time
+    lines = ['BEGIN:VEVENT', f'UID:trip-{row.id}@{host}', f'DTSTAMP:{_stamp(row.last_modified)}']
+    if start_time is None:
+        lines += [f'DTSTART;VALUE=DATE:{row.trip_date:%Y%m%d}',
+                  f'DTEND;VALUE=DATE:{row.trip_date + timedelta(days=1):%Y%m%d}']
+    else:
+        start = datetime.combine(row.trip_date, start_time)
+        end = datetime.combine(row.trip_date, row.work_end_time) if row.work_end_time else None
+        if end is None or end <= start:
+            end = start + timedelta(hours=1)
+        lines += [f'DTSTART:{start:%Y%m%dT%H%M%S}', f'DTEND:{end:%Y%m%dT%H%M%S}']
+    confirmed = row.status == 'potwierdzony'
+    summary = row.title if confirmed else f'{row.title} (wstępnie zapisany)'
+    lines += [f'SUMMARY:{escape_text(summary)}', f"STATUS:{'CONFIRMED' if confirmed else 'TENTATIVE'}"]
+    if row.notes:
+        lines.append(f'DESCRIPTION:{escape_text(row.notes)}')
+    lines += [f"URL:{url_for('trips.trip_details', trip_id=row.id, _external=True)}", 'END:VEVENT']
+    return lines
+
+
+def iter_feed(user_id, start, calendar_name, host):
+    """Generator kolejnych fragmentów pliku ICS (wiersze z bazy pobierane partiami)."""
+    from extensions import db
+    from models import Signup, Trip
+    config = current_app.config
+    refresh = f"PT{config['ICS_REFRESH_MINUTES']}M"
+    yield ''.join(fold_line(line) for line in (
+        'BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}', 'CALSCALE:GREGORIAN', 'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(calendar_name)}', f"X-WR-TIMEZONE:{config['ICS_TIMEZONE']}",
+        f'REFRESH-INTERVAL;VALUE=DURATION:{refresh}', f'X-PUBLISHED-TTL:{refresh}'))
+    # Same kolumny - bez obiektów Trip i dołączanych list zapisów (lazy='joined')
+    rows = db.session.execute(
+        select(Trip.id, Trip.title, Trip.trip_date, Trip.departure_time, Trip.start_time,
+               Trip.work_start_time, Trip.work_end_time, Trip.notes, Trip.last_modified, Signup.status)
+        .join(Signup, Signup.trip_id == Trip.id)
+        .where(Signup.user_id == user_id, Signup.status.in_(FEED_STATUSES), Trip.trip_date >= start)
+        .order_by(Trip.trip_date, Trip.id)
+        .execution_options(yield_per=200)
+    )
+    seen = set()
+    chunk = []
+    for row in rows:
+        if row.id in seen:
+            continue  # zdublowany zapis - jedno wydarzenie
+        seen.add(row.id)
+        chunk.extend(fold_line(line) for line in _event_lines(row, host))
+        if len(chunk) >= 400:
+            yield ''.join(chunk)
+            chunk = []
+    chunk.append(fold_line('END:VCALENDAR'))
+    yield ''.join(chunk)
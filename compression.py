@@ -0,0 +1,183 @@
+"""
+Kompresja odpowiedzi HTML/JSON (gzip, Brotli) z pamięcią gotowych wyników.
+Plik: compression.py
+
+Użytkownicy korzystają głównie z internetu mobilnego, gdzie czas transferu
+przeważa nad czasem serwera - strony rozliczeń, archiwum czy /api/events
+po kompresji są kilka-kilkanaście razy mniejsze.
+
+- Kodowanie wybierane z nagłówka Accept-Encoding (Brotli, jeśli jest pakiet
+  'brotli' i klient go akceptuje, w przeciwnym razie gzip); odpowiedź dostaje
+  'Vary: Accept-Encoding'.
+- Kompresowane są tylko typy z COMPRESSION_MIMETYPES powyżej COMPRESSION_MIN_SIZE;
+  pomijane są odpowiedzi już zakodowane (np. pliki .br/.gz z 'flask assets'),
+  pliki (direct_passthrough), 'Cache-Control: no-transform' oraz SSE.
+- Odpowiedzi strumieniowe (np. kalendarz ICS) są kompresowane w locie - każda
+  porcja jest od razu opróżniana, więc klient dostaje dane bez czekania na koniec.
+- Wynik kompresji trafia do pamięci procesu (LRU, COMPRESSION_CACHE_BYTES) pod
+  skrótem treści: ta sama treść (np. miesiąc zleceń w /api/events pobierany przez
+  wielu pracowników) jest kompresowana raz, a kolejni klienci dostają gotowe bajty.
+- Silny ETag skompresowanej odpowiedzi staje się słaby (W/"...") - jak w nginx;
+  If-None-Match porównuje się słabo, więc 304 działa dla każdego kodowania.
+"""
+import gzip
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # Kompresja Brotli jest opcjonalna
+    brotli = None
+
+DEFAULT_MIMETYPES = (
+    'text/html', 'application/json', 'text/calendar', 'text/csv', 'text/plain',
+    'text/css', 'application/javascript', 'image/svg+xml',
+)
+
+
+def available_encodings():
+    """Obsługiwane kodowania w kolejności preferencji serwera."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def compress(body, encoding, config):
+    """Cała treść skompresowana wybranym kodowaniem (gzip bez daty - ten sam wynik dla tej samej treści)."""
+    if encoding == 'br':
+        return brotli.compress(body, quality=config['COMPRESSION_BROTLI_QUALITY'])
+    return gzip.compress(body, compresslevel=config['COMPRESSION_GZIP_LEVEL'], mtime=0)
+
+
+def _stream(chunks, encoding, config):
+    """Kompresja strumienia: każda porcja opróżniana od razu (Z_SYNC_FLUSH / BROTLI_FLUSH)."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=config['COMPRESSION_BROTLI_QUALITY'])
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(config['COMPRESSION_GZIP_LEVEL'], zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        process, finish = compressor.compress, compressor.flush
+        flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)  # noqa: E731
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = process(chunk) + flush()
+            if data:
+                yield data
+        yield finish()
+    finally:
+        # Zamknięcie oryginału kończy np. stream_with_context
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def _weaken_etag(response):
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+class CompressedCache:
+    """Skompresowane treści (LRU ograniczone łącznym rozmiarem), wspólne dla wątków procesu."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._items.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._items[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = self.hits = self.misses = 0
+
+
+class Compression:
+    """Rozszerzenie Flask: kompresja odpowiedzi (after_request)."""
+
+    def __init__(self, app=None):
+        self.cache = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESSION_ENABLED', True)
+        app.config.setdefault('COMPRESSION_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESSION_MIMETYPES', DEFAULT_MIMETYPES)
+        app.config.setdefault('COMPRESSION_GZIP_LEVEL', 6)
+        app.config.setdefault('COMPRESSION_BROTLI_QUALITY', 5)
+        app.config.setdefault('COMPRESSION_CACHE_BYTES', 16 * 1024 * 1024)
+        self.cache = CompressedCache(app.config['COMPRESSION_CACHE_BYTES'])
+        app.extensions['compression'] = self
+        if app.config['COMPRESSION_ENABLED']:
+            # Rejestrowane po metrykach - after_request działa w odwrotnej kolejności,
+            # więc metryki i logi widzą rozmiar po kompresji
+            app.after_request(self._compress_response)
+
+    def _compress_response(self, response):
+        config = current_app.config
+        if response.mimetype not in config['COMPRESSION_MIMETYPES']:
+            return response
+        response.vary.add('Accept-Encoding')
+        if ('Content-Encoding' in response.headers or response.direct_passthrough
+                or 'no-transform' in response.headers.get('Cache-Control', '')):
+            return response
+        encoding = request.accept_encodings.best_match(available_encodings())
+        if encoding is None:
+            return response
+        if response.status_code == 304:
+            _weaken_etag(response)  # ten sam ETag co w skompresowanej odpowiedzi 200
+            return response
+        if response.status_code != 200:
+            return response
+
+        if response.is_streamed:
+            response.response = _stream(response.response, encoding, config)
+            response.headers.pop('Content-Length', None)
+            result = 'stream'
+        else:
+            body = response.get_data()
+            if len(body) < config['COMPRESSION_MIN_SIZE']:
+                return response
+            key = (encoding, hashlib.blake2b(body, digest_size=20).digest())
+            compressed = self.cache.get(key)
+            result = 'hit'
+            if compressed is None:
+                compressed = compress(body, encoding, config)
+                self.cache.put(key, compressed)
+                result = 'miss'
+            response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        _weaken_etag(response)
+        registry = current_app.extensions.get('metrics')
+        if registry is not None:
+            registry.compressed.inc(encoding, result)
+        return response
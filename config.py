@@ -27,6 +27,13 @@ class Config:
     TESTING = os.environ.get('FLASK_TESTING') == '1'
     # Włączenie logowania do konsoli (dobre dla kontenerów/Gunicorn)
     LOG_TO_STDOUT = os.environ.get('LOG_TO_STDOUT') == '1'
+    # Plik logów (JSON, jedna linia na rekord) - zapisywany w osobnym wątku, rotacja po rozmiarze
+    LOG_FILE = os.environ.get('LOG_FILE', 'logs/grafik.log')
+    LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024))
+    LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', 10))
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    # Linia dziennika dostępu po każdym żądaniu (status, czas, liczba zapytań SQL)
+    LOG_REQUESTS = os.environ.get('LOG_REQUESTS', '1') == '1'
     
     # --- KONFIGURACJA SERWERA E-MAIL ---
     MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
@@ -35,6 +42,8 @@ class Config:
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = ('Grafik Firmowy', MAIL_USERNAME)
+    # MAIL_SUPPRESS_SEND=1 - wiadomości są przygotowywane, ale nie wysyłane (staging, testy obciążeniowe)
+    MAIL_SUPPRESS_SEND = os.environ.get('MAIL_SUPPRESS_SEND') == '1'
 
     if not MAIL_USERNAME or not MAIL_PASSWORD:
         print("OSTRZEŻENIE: Brak konfiguracji MAIL_USERNAME lub MAIL_PASSWORD w .env. Wysyłka e-maili nie będzie działać.")
@@ -42,10 +51,165 @@ class Config:
     # --- KONFIGURACJA REDIS QUEUE (RQ) ---
     # Używane do asynchronicznej wysyłki e-maili (AUDYT 2.2)
     RQ_REDIS_URL = os.environ.get('RQ_REDIS_URL', 'redis://localhost:6379/0')
+    # Kolejka zliczająca zakolejkowane zadania (metryka grafik_rq_enqueued_total)
+    RQ_QUEUE_CLASS = 'metrics.InstrumentedQueue'
+
+    # --- ZADANIA W TLE (tasks.py) ---
+    # 'rq' - Redis + 'flask rq worker'; 'thread' - pula wątków w procesie (bez Redisa); 'sync' - od razu (testy)
+    TASKS_BACKEND = os.environ.get('TASKS_BACKEND', 'rq')
+    TASKS_THREAD_WORKERS = int(os.environ.get('TASKS_THREAD_WORKERS', 2))
+    # Zadania oczekujące w puli; przy pełnej puli zadanie wykonuje się w wątku żądania
+    TASKS_QUEUE_LIMIT = int(os.environ.get('TASKS_QUEUE_LIMIT', 100))
+    # Ile sekund przy zamykaniu procesu czekać na dokończenie zadań z puli (mniej niż graceful_timeout Gunicorna)
+    TASKS_DRAIN_TIMEOUT = float(os.environ.get('TASKS_DRAIN_TIMEOUT', 20))
+
+    # --- SKRZYNKA NADAWCZA E-MAILI (outbox.py) ---
+    # Liczba wiadomości rezerwowanych i wysyłanych jednym połączeniem SMTP
+    OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 50))
+    # Po tylu sekundach rezerwacja przerwanego dispatchera wygasa i paczka jest wysyłana ponownie
+    OUTBOX_LEASE_SECONDS = int(os.environ.get('OUTBOX_LEASE_SECONDS', 300))
+    # Ponowienia: OUTBOX_RETRY_BASE * 2^(próba-1) s, najwyżej OUTBOX_RETRY_MAX; potem status 'dead'
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 8))
+    OUTBOX_RETRY_BASE = int(os.environ.get('OUTBOX_RETRY_BASE', 60))
+    OUTBOX_RETRY_MAX = int(os.environ.get('OUTBOX_RETRY_MAX', 3600))
+    # 'flask outbox dispatch --loop' - co ile sekund sprawdzać skrzynkę
+    OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', 10))
+    # Wysłane wiadomości starsze niż tyle dni usuwa 'flask outbox purge'
+    OUTBOX_RETENTION_DAYS = int(os.environ.get('OUTBOX_RETENTION_DAYS', 30))
+    # Po zatwierdzeniu transakcji z nową wiadomością zleć wysyłkę przez TASKS_BACKEND
+    OUTBOX_DISPATCH_ON_COMMIT = os.environ.get('OUTBOX_DISPATCH_ON_COMMIT', '1') == '1'
+
+    # --- ZADANIA OKRESOWE (scheduler.py, jobs.py) ---
+    # Wątek harmonogramu w każdym procesie WWW; zadanie wykonuje jeden proces (blokada w scheduled_job)
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', '1') == '1'
+    SCHEDULER_INTERVAL = float(os.environ.get('SCHEDULER_INTERVAL', 60))
+    # Godziny (czas serwera), od których zadanie dzienne jest należne
+    SCHEDULER_ARCHIVE_HOUR = int(os.environ.get('SCHEDULER_ARCHIVE_HOUR', 2))
+    SCHEDULER_PREWARM_HOUR = int(os.environ.get('SCHEDULER_PREWARM_HOUR', 3))
+    SCHEDULER_REMINDER_HOUR = int(os.environ.get('SCHEDULER_REMINDER_HOUR', 17))
+    SCHEDULER_SETTLEMENTS_HOUR = int(os.environ.get('SCHEDULER_SETTLEMENTS_HOUR', 5))
+    # Rezerwacja przerwanego zadania wygasa po tylu sekundach; po błędzie ponowienie po SCHEDULER_RETRY_SECONDS
+    SCHEDULER_LEASE_SECONDS = int(os.environ.get('SCHEDULER_LEASE_SECONDS', 3600))
+    SCHEDULER_RETRY_SECONDS = int(os.environ.get('SCHEDULER_RETRY_SECONDS', 900))
+    # Archiwizacja (nocna i przycisk w /admin/archive): zlecenia starsze niż tyle dni, paczkami
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 180))
+    ARCHIVE_CHUNK_SIZE = int(os.environ.get('ARCHIVE_CHUNK_SIZE', 500))
+
+    # --- SUBSKRYPCJA KALENDARZA ICS (calendar_feed.py) ---
+    # Zlecenia od tylu dni wstecz; godziny zleceń w strefie ICS_TIMEZONE
+    ICS_PAST_DAYS = int(os.environ.get('ICS_PAST_DAYS', 60))
+    ICS_TIMEZONE = os.environ.get('ICS_TIMEZONE', 'Europe/Warsaw')
+    # Sugerowany odstęp odświeżania dla aplikacji kalendarza
+    ICS_REFRESH_MINUTES = int(os.environ.get('ICS_REFRESH_MINUTES', 15))
+
+    # --- PODSUMOWANIE ROZLICZEŃ (settlement_summary.py) ---
+    # Po zatwierdzeniu zmiany zleceń/zapisów przelicz zmienione miesiące przez TASKS_BACKEND
+    SETTLEMENTS_REFRESH_ON_COMMIT = os.environ.get('SETTLEMENTS_REFRESH_ON_COMMIT', '1') == '1'
+
+    # --- MASOWE DODAWANIE ZLECEŃ (trip_batch.py) ---
+    # Najwięcej zleceń w jednym żądaniu /trip/batch lub w jednej serii /trip/series
+    TRIPS_BATCH_MAX_ROWS = int(os.environ.get('TRIPS_BATCH_MAX_ROWS', 500))
+
+    # --- AUTOMATYCZNY GRAFIK (roster.py) ---
+    # Najdłuższy zakres dat jednego planu obsady (dni)
+    ROSTER_MAX_DAYS = int(os.environ.get('ROSTER_MAX_DAYS', 62))
+    # Limity agencji jako 'Agencja=udział,...' (np. 'Adecco=0.5' lub 'Adecco=50%'): najwyżej taki
+    # udział w miejscach zakresu. Odczytywane przez roster.agency_quotas() - błędne wpisy są pomijane.
+    ROSTER_AGENCY_QUOTAS = os.environ.get('ROSTER_AGENCY_QUOTAS', '')
+
+    # --- HASZOWANIE HASEŁ ---
+    # Metoda i parametry werkzeug (np. 'scrypt:32768:8:1' lub 'pbkdf2:sha256:600000').
+    # Zmiana parametrów nie unieważnia starych hashy - są przeliczane przy logowaniu.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    # Liczba wątków haszujących na proces (0 = haszowanie w wątku żądania)
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    # Ile żądań może czekać w kolejce, zanim zaczniemy odrzucać logowania (503)
+    PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', 16))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+
+    # --- LIMITY ŻĄDAŃ (THROTTLING) ---
+    # Sprawdzane przed haszowaniem haseł i kolejkowaniem e-maili.
+    THROTTLE_ENABLED = os.environ.get('THROTTLE_ENABLED', '1') == '1'
+    # 'memory://' (w procesie) lub adres Redis wspólny dla wszystkich workerów
+    THROTTLE_STORAGE_URL = os.environ.get('THROTTLE_STORAGE_URL', 'memory://')
+    # Format: 'N/sekundy' (token bucket) lub 'N/sekundy window' (przesuwne okno)
+    THROTTLE_RULES = {
+        'login_ip': '30/300',
+        'login_email': '10/300',
+        'reset_ip': '10/3600',
+        'reset_email': '3/3600 window',
+    }
+    # Liczba zaufanych proxy przed aplikacją (nginx, Cloud Run). Limity per IP liczone
+    # są wtedy z X-Forwarded-For, a nie z adresu proxy. 0 = nagłówek jest ignorowany
+    # (bez proxy klient mógłby go podrobić).
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+    PROXY_FIX_X_PROTO = int(os.environ.get('PROXY_FIX_X_PROTO', 0))
+
+    # --- TRYB OFFLINE (PWA) ---
+    # Jak długo serwer pamięta klucze idempotencji akcji z kolejki offline (sekundy).
+    # Akcja powtórzona później zostanie wykonana ponownie.
+    IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 7 * 86400))
+    # Dziennik zmian dla /api/events/changes: jak długo trzymamy wpisy i ile zmian
+    # zwracamy naraz (przy większej liczbie klient pobiera zlecenia od nowa)
+    CHANGE_JOURNAL_RETENTION_DAYS = int(os.environ.get('CHANGE_JOURNAL_RETENTION_DAYS', 30))
+    CHANGE_JOURNAL_PAGE_LIMIT = 500
+    # Luka w numeracji młodsza niż tyle sekund to być może niezatwierdzona transakcja (PostgreSQL) -
+    # kursor klienta jej nie przeskakuje; powinno przekraczać najdłuższą transakcję aplikacji
+    CHANGE_JOURNAL_GAP_SECONDS = int(os.environ.get('CHANGE_JOURNAL_GAP_SECONDS', 60))
+    # Powiadomienia na żywo (SSE, /api/stream): 'memory' (jeden proces) lub 'redis' (RQ_REDIS_URL)
+    EVENT_BROKER = os.environ.get('EVENT_BROKER', 'memory')
+    SSE_HEARTBEAT = 15  # sekundy między komentarzami podtrzymującymi połączenie
+    SSE_CLIENT_BUFFER = 32  # powiadomienia w buforze klienta; nadmiar zastępuje 'resync'
+    # Strumienie na proces. Każdy zajmuje wątek workera (gthread), dlatego domyślnie
+    # mniej niż '--threads'; przy workerach gevent można ustawić setki.
+    # Odrzucony klient (503) wraca do odpytywania co minutę.
+    SSE_MAX_CLIENTS = int(os.environ.get('SSE_MAX_CLIENTS', 4))
+    # Po tym czasie strumień jest zamykany, a przeglądarka łączy się ponownie
+    # (połączenia rozkładają się równo między workery po restarcie/skalowaniu)
+    SSE_MAX_DURATION = 300
+
+    # --- METRYKI WYDAJNOŚCI ---
+    # Czas żądań, liczba i czas zapytań SQL, rozmiar odpowiedzi - /admin/metrics (format Prometheus)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+    # Nagłówek 'Server-Timing' (czasy widoczne w narzędziach deweloperskich przeglądarki)
+    METRICS_SERVER_TIMING = DEBUG
+    # Zapytania wolniejsze niż próg (ms) trafiają z planem wykonania do SLOW_QUERY_LOG
+    # i do podsumowania /admin/slow-queries
+    SLOW_QUERY_THRESHOLD_MS = int(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 200))
+    SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', '1') == '1'
+    SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', 'logs/slow_queries.log')
+    SLOW_QUERY_TOP = 20
+    # Profilowanie żądań (cProfile): raporty w PROFILER_DIR, lista w /admin/profiles.
+    # PROFILER_SAMPLE_RATE = N profiluje losowo 1 na N żądań (0 = tylko na żądanie admina)
+    PROFILER_DIR = os.environ.get('PROFILER_DIR', 'logs/profiles')
+    PROFILER_SAMPLE_RATE = int(os.environ.get('PROFILER_SAMPLE_RATE', 0))
+    PROFILER_KEEP = 50
+
+    # --- KOMPRESJA ODPOWIEDZI (compression.py) ---
+    # gzip/Brotli dla HTML, JSON i kalendarza ICS większych niż COMPRESSION_MIN_SIZE bajtów
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', '1') == '1'
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))
+    # Pamięć gotowych wyników kompresji na proces (bajty) - ta sama treść nie jest kompresowana ponownie
+    COMPRESSION_CACHE_BYTES = int(os.environ.get('COMPRESSION_CACHE_BYTES', 16 * 1024 * 1024))
+
+    # --- ZASOBY STATYCZNE ---
+    # Pliki z hashem w nazwie (static/dist/, 'flask assets build') są niezmienne,
+    # więc przeglądarka może je trzymać przez rok bez ponownego pytania serwera.
+    ASSETS_MAX_AGE = 31536000
+    # Zasoby krytyczne zapowiadane nagłówkiem 'Link: rel=preload' na każdej stronie HTML
+    # (tylko lokalne kopie - patrz 'flask assets vendor')
+    ASSETS_PRELOAD = [
+        ('css/style.css', 'style'),
+        ('vendor/fonts/fonts.css', 'style'),
+        ('vendor/fonts/inter-latin-wght-normal.woff2', 'font'),
+    ]
 
     # --- USTAWIENIA DEWELOPERSKIE ---
-    # Ustawione na 0 na produkcji (domyślnie, gdy DEBUG=False), ale dobre do dewelopmentu
-    SEND_FILE_MAX_AGE_DEFAULT = 0
+    # Pozostałe pliki statyczne (bez hasha): w debug bez cache, na produkcji
+    # None = brak max-age, przeglądarka rewaliduje plik (ETag/304)
+    SEND_FILE_MAX_AGE_DEFAULT = 0 if DEBUG else None
     TEMPLATES_AUTO_RELOAD = True
 # --- NOWA KLASA TESTOWA (AUDYT 3.1) ---
 # Dodaj tę klasę na dole pliku config.py
@@ -68,6 +232,17 @@ class TestConfig(Config):
     # Mówimy Flask-RQ2, aby wykonywał zadania synchronicznie (natychmiast).
     # Dzięki temu nie musimy uruchamiać serwera Redis ani workera RQ podczas testów.
     RQ_ASYNC = False
+    # Zadania w tle (e-maile) wykonywane od razu, w wątku testu
+    TASKS_BACKEND = 'sync'
+    # E-maile tylko rejestrowane (mail.record_messages), bez połączenia SMTP
+    MAIL_SUPPRESS_SEND = True
+
+    # Tanie haszowanie haseł w wątku testu (scrypt spowalniałby każdy fixture)
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    PASSWORD_HASH_WORKERS = 0
+
+    # Testy logują się wielokrotnie z tego samego adresu - limity włączamy w testach jawnie
+    THROTTLE_ENABLED = False
 
     # Wyłączamy logowanie do pliku podczas testów
     LOG_TO_STDOUT = None
\ No newline at end of file
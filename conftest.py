@@ -3,6 +3,8 @@ Plik konfiguracyjny Pytest (conftest.py)
 Zawiera fixtures (narzędzia) wielokrotnego użytku dla wszystkich testów.
 """
 import pytest
+from contextlib import contextmanager
+from sqlalchemy import event
 # Usunięto 'import warnings', ponieważ filtry są teraz w pytest.ini
 from datetime import date, timedelta, time
 from app import create_app
@@ -25,6 +27,11 @@ class TestConfig(Config):
     SECRET_KEY = 'test-secret-key' # Klucz testowy
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     RQ_ASYNC = False # Wyłącza Redis, zadania wykonują się synchronicznie
+    TASKS_BACKEND = 'sync' # Zadania w tle (e-maile) od razu, w wątku testu
+    MAIL_SUPPRESS_SEND = True # E-maile tylko rejestrowane (mail.record_messages), bez SMTP
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000' # Tanie haszowanie w testach
+    PASSWORD_HASH_WORKERS = 0 # Haszowanie w wątku testu (bez puli)
+    THROTTLE_ENABLED = False # Limity żądań włączane jawnie w testach throttlingu
 
 @pytest.fixture(scope='session')
 def app():
@@ -165,6 +172,49 @@ def logged_in_user(client, regular_user):
     yield client
     client.get('/logout', follow_redirects=True)
 
-# --- 4. FILTRY OSTRZEŻEŃ ---
+# --- 4. LICZENIE ZAPYTAŃ SQL (BUDŻETY ZAPYTAŃ) ---
+
+class QueryCounter:
+    """Zapytania SQL wykonane w bloku 'with count_queries()'."""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def report(self):
+        """Lista zapytań do komunikatu nieudanej asercji."""
+        return f"{self.count} zapytań SQL:\n" + "\n".join(
+            f"  {i}. {' '.join(statement.split())[:200]}" for i, statement in enumerate(self.statements, 1)
+        )
+
+@pytest.fixture(scope='function')
+def count_queries(db):
+    """
+    Liczy zapytania SQL (zdarzenie before_cursor_execute silnika).
+    Użycie:
+        with count_queries() as queries:
+            client.get('/api/events')
+        assert queries.count <= 3, queries.report()
+    Liczone jest każde zapytanie żądania - także wczytanie zalogowanego użytkownika.
+    """
+    @contextmanager
+    def _count():
+        counter = QueryCounter()
+
+        def _record(conn, cursor, statement, parameters, context, executemany):
+            counter.statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', _record)
+        try:
+            yield counter
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', _record)
+
+    return _count
+
+# --- 5. FILTRY OSTRZEŻEŃ ---
 # (Usunięto fixture 'suppress_warnings', ponieważ filtry są teraz w pytest.ini)
 
@@ -2,8 +2,23 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_mail import Mail
 from flask_wtf.csrf import CSRFProtect
-#from flask_rq2 import RQ
+from flask_rq2 import RQ
 from flask_migrate import Migrate
+from hashing import PasswordHasher
+from throttling import Throttle
+from assets import AssetManifest
+from journal import ChangeJournal
+from broker import EventBroker
+from metrics import Metrics
+from slow_queries import SlowQueries
+from profiler import RequestProfiler
+from request_logging import RequestLogging
+from tasks import TaskQueue
+from outbox import Outbox
+from scheduler import Scheduler
+from search import TripSearch
+from settlement_summary import SettlementSummary
+from compression import Compression
 
 # Tworzymy puste instancje rozszerzeń
 # Zostaną one połączone z aplikacją w app.py
@@ -11,6 +26,21 @@ db = SQLAlchemy()
 login_manager = LoginManager()
 mail = Mail()
 csrf = CSRFProtect()
-#rq = RQ()
+rq = RQ()
 migrate = Migrate()
+password_hasher = PasswordHasher()
+throttle = Throttle()
+assets = AssetManifest()
+journal = ChangeJournal()
+event_broker = EventBroker()
+metrics = Metrics()
+slow_queries = SlowQueries()
+profiler = RequestProfiler()
+request_logging = RequestLogging()
+tasks = TaskQueue()
+outbox = Outbox()
+scheduler = Scheduler()
+trip_search = TripSearch()
+settlement_summary = SettlementSummary()
+compression = Compression()
 
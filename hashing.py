@@ -0,0 +1,132 @@
+"""
+Serwis haszowania haseł (odciążenie wątków żądań).
+Plik: hashing.py
+
+scrypt jest celowo kosztowny (CPU + ok. 32 MB RAM na jedno wywołanie).
+Przy 'gunicorn --threads 8' fala logowań na początku zmiany potrafi zająć
+wszystkie wątki naraz. Ten moduł:
+- wykonuje haszowanie w ograniczonej puli wątków (PASSWORD_HASH_WORKERS),
+- odrzuca nadmiarowe żądania, gdy kolejka jest pełna (PASSWORD_HASH_QUEUE_LIMIT),
+- pozwala ustawić parametry haszowania per środowisko (tanie w TestConfig),
+- wykrywa hashe zapisane ze starymi parametrami (needs_rehash).
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HashingBusyError(RuntimeError):
+    """Pula haszująca jest przeciążona (pełna kolejka lub przekroczony czas)."""
+
+
+class _HasherState:
+    """Stan serwisu powiązany z konkretną aplikacją (app.extensions)."""
+
+    def __init__(self, method, workers, queue_limit, timeout):
+        self.method = method
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self._normalized_method = None
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        # Semafor ogranicza liczbę zadań w puli: wykonywane + oczekujące
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + queue_limit)
+
+    @property
+    def normalized_method(self):
+        """
+        Pełny identyfikator metody z parametrami, np. 'scrypt:32768:8:1'.
+        Werkzeug uzupełnia brakujące parametry, więc ustalamy je raz,
+        generując hash pustego hasła.
+        """
+        if self._normalized_method is None:
+            sample = generate_password_hash('', method=self.method)
+            self._normalized_method = sample.split('$', 1)[0]
+        return self._normalized_method
+
+    def executor(self):
+        # Pula tworzona leniwie i odtwarzana po fork() (workery Gunicorna)
+        pid = os.getpid()
+        if self._executor is None or self._executor_pid != pid:
+            with self._lock:
+                if self._executor is None or self._executor_pid != pid:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix='password-hash'
+                    )
+                    self._executor_pid = pid
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+class PasswordHasher:
+    """
+    Rozszerzenie Flask udostępniające ograniczoną pulę do haszowania haseł.
+    Przy PASSWORD_HASH_WORKERS = 0 haszowanie odbywa się w wątku żądania
+    (tryb testowy i skrypty).
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt')
+        app.config.setdefault('PASSWORD_HASH_WORKERS', 2)
+        app.config.setdefault('PASSWORD_HASH_QUEUE_LIMIT', 16)
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT', 10.0)
+        app.extensions['password_hasher'] = _HasherState(
+            method=app.config['PASSWORD_HASH_METHOD'],
+            workers=int(app.config['PASSWORD_HASH_WORKERS']),
+            queue_limit=int(app.config['PASSWORD_HASH_QUEUE_LIMIT']),
+            timeout=float(app.config['PASSWORD_HASH_TIMEOUT']),
+        )
+
+    @staticmethod
+    def _state():
+        return current_app.extensions['password_hasher']
+
+    def _run(self, func, *args):
+        state = self._state()
+        if state.workers <= 0:
+            return func(*args)
+
+        if not state._slots.acquire(blocking=False):
+            raise HashingBusyError('Kolejka haszowania haseł jest pełna.')
+        try:
+            future = state.executor().submit(func, *args)
+        except Exception:
+            state._slots.release()
+            raise
+        future.add_done_callback(lambda _: state._slots.release())
+        try:
+            return future.result(timeout=state.timeout)
+        except FutureTimeoutError:
+            raise HashingBusyError('Przekroczono czas oczekiwania na haszowanie hasła.')
+
+    def hash(self, password):
+        """Generuje hash hasła z parametrami skonfigurowanymi dla środowiska."""
+        return self._run(generate_password_hash, password, self._state().method)
+
+    def verify(self, pwhash, password):
+        """Sprawdza hasło względem zapisanego hasha (dowolnej obsługiwanej metody)."""
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """Zwraca True, jeśli hash został wygenerowany innymi parametrami niż obecne."""
+        if not pwhash or '$' not in pwhash:
+            return True
+        return pwhash.split('$', 1)[0] != self._state().normalized_method
+
+    def shutdown(self):
+        """Czeka na zakończenie zadań i zamyka pulę (np. przy wyłączaniu workera)."""
+        state = current_app.extensions.get('password_hasher')
+        if state is not None:
+            state.shutdown()
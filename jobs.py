@@ -0,0 +1,98 @@
+"""
+Zadania okresowe uruchamiane przez harmonogram (scheduler.py).
+Plik: jobs.py
+
+Każde zadanie jest idempotentne - ponowne wykonanie (np. po przerwaniu
+procesu w trakcie) nie dubluje efektów. Wynik (liczba) trafia do
+scheduled_job.last_result i do logu.
+"""
+from datetime import date, timedelta
+from flask import current_app
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import lazyload
+from extensions import db
+from models import Trip, Signup, User
+from utils import send_email_in_background
+
+
+def archive_old_trips(chunk_size=None):
+    """
+    Archiwizuje zlecenia starsze niż ARCHIVE_AFTER_DAYS paczkami po
+    ARCHIVE_CHUNK_SIZE - każda paczka to osobna, krótka transakcja, więc
+    zaległa archiwizacja nie blokuje zapisów. Zwraca liczbę zarchiwizowanych.
+    """
+    cutoff = date.today() - timedelta(days=current_app.config['ARCHIVE_AFTER_DAYS'])
+    chunk_size = chunk_size or current_app.config['ARCHIVE_CHUNK_SIZE']
+    total = 0
+    while True:
+        trip_ids = db.session.scalars(
+            select(Trip.id).where(Trip.trip_date < cutoff, Trip.is_archived == False)
+            .order_by(Trip.id).limit(chunk_size)
+        ).all()
+        if not trip_ids:
+            break
+        total += db.session.query(Trip).filter(
+            Trip.id.in_(trip_ids),
+            Trip.is_archived == False
+        ).update({'is_archived': True}, synchronize_session=False)
+        db.session.commit()
+        if len(trip_ids) < chunk_size:
+            break
+    return total
+
+
+def prewarm_next_month():
+    """
+    Przygotowuje bazę na ruch w następnym miesiącu. Aplikacja nie ma własnej
+    pamięci podręcznej, więc podgrzewamy bazę: po nocnej archiwizacji
+    odświeżamy statystyki planera zapytań i czytamy zlecenia oraz zapisy
+    następnego miesiąca (zapytania kalendarza), aby ich strony były w pamięci.
+    Zwraca liczbę wczytanych zleceń.
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        db.session.execute(text('ANALYZE trip'))
+        db.session.execute(text('ANALYZE signup'))
+    elif dialect == 'sqlite':
+        db.session.execute(text('PRAGMA optimize'))
+
+    today = date.today()
+    first = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+    after = (first + timedelta(days=32)).replace(day=1)
+    trip_ids = db.session.scalars(
+        select(Trip.id).where(Trip.is_archived == False, Trip.trip_date >= first, Trip.trip_date < after)
+        .order_by(Trip.trip_date, Trip.id)
+    ).all()
+    if trip_ids:
+        db.session.execute(
+            select(Signup.trip_id, Signup.status, func.count()).where(Signup.trip_id.in_(trip_ids))
+            .group_by(Signup.trip_id, Signup.status)
+        ).all()
+    return len(trip_ids)
+
+
+def send_trip_reminders(day=None):
+    """
+    Przypomina potwierdzonym uczestnikom o zleceniach z dnia 'day' (domyślnie
+    jutro). Jedno zapytanie pobiera wszystkie pary (pracownik, zlecenie) dnia;
+    wiadomości trafiają do skrzynki nadawczej bez zatwierdzania - harmonogram
+    zatwierdza je razem z oznaczeniem zadania jako wykonanego, więc
+    przypomnienia nie zostaną wysłane dwa razy. Zwraca liczbę przypomnień.
+    """
+    day = day or date.today() + timedelta(days=1)
+    rows = db.session.execute(
+        select(User, Trip)
+        .join(Signup, Signup.user_id == User.id)
+        .join(Trip, Trip.id == Signup.trip_id)
+        .where(Trip.trip_date == day, Trip.is_archived == False, Signup.status == 'potwierdzony')
+        .order_by(Trip.id, User.id)
+        .options(lazyload('*'))  # bez dołączania list zapisów (lazy='joined') - szablon ich nie używa
+    ).all()
+    reminded = set()
+    for user, trip in rows:
+        if (user.id, trip.id) in reminded:
+            continue  # zdublowany zapis - jedno przypomnienie
+        reminded.add((user.id, trip.id))
+        send_email_in_background(user.email, f'Przypomnienie: jutro {trip.title}', 'emaile/trip_reminder',
+                                 user=user, trip=trip)
+    return len(reminded)
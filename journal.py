@@ -0,0 +1,223 @@
+"""
+Dziennik zmian (change journal) dla przyrostowej synchronizacji kalendarza.
+Plik: journal.py
+
+Każdy INSERT/UPDATE/DELETE zleceń (Trip) i zapisów (Signup) dopisuje wiersz
+(seq, encja, id, operacja) w tej samej transakcji co sama zmiana. Klient
+pamięta ostatni numer 'seq' i pobiera tylko to, co zmieniło się od tego czasu
+(/api/events/changes?since=<seq>), zamiast przeładowywać cały miesiąc.
+
+Obsługiwane są:
+- zmiany przez ORM (session.add/delete, zmiana atrybutów) - zdarzenie after_flush,
+- masowe UPDATE/DELETE (query.update()/query.delete(), np. archiwizacja i czyszczenie
+  miesiąca) - zdarzenie do_orm_execute; identyfikatory są pobierane tuż przed
+  wykonaniem zapytania z tym samym warunkiem WHERE.
+Masowy INSERT (session.execute(insert(Trip), [...])) nie zwraca identyfikatorów -
+takie miejsca zapisują zmiany jawnie przez journal.record().
+
+Po zatwierdzeniu transakcji (after_commit) wysyłane jest powiadomienie 'changes'
+przez broker (broker.py) do otwartych strumieni SSE.
+
+Kursor nie przeskakuje luk w numeracji: PostgreSQL nadaje 'seq' przy INSERT,
+a nie przy COMMIT, więc transakcja z numerem N może zostać zatwierdzona po
+transakcji z N+1. Zwracany kursor zatrzymuje się przed luką młodszą niż
+CHANGE_JOURNAL_GAP_SECONDS (wpisy za nią są wysyłane, ale przy następnym
+odpytaniu trafią do klienta ponownie - klient nadpisuje zlecenia, więc to
+nieszkodliwe). Starsza luka to numer z wycofanej transakcji i jest pomijana.
+"""
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event, func, select
+from flask import current_app, has_app_context
+
+# Nazwa klasy modelu -> nazwa encji w dzienniku
+TRACKED_MODELS = {'Trip': 'trip', 'Signup': 'signup'}
+# Klucz w session.info: zlecenia zmienione w bieżącej transakcji (do powiadomienia)
+PENDING_KEY = 'journal_pending_trip_ids'
+# Powyżej tej liczby powiadomienie nie zawiera listy id (klient i tak pyta o zmiany)
+NOTIFY_MAX_IDS = 100
+
+
+def _entry(entity, entity_id, trip_id, op, now):
+    return {'entity': entity, 'entity_id': entity_id, 'trip_id': trip_id, 'op': op, 'created_at': now}
+
+
+def _as_utc(value):
+    # SQLite zwraca daty bez strefy (zapisywane są w UTC)
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def _trip_column(model, entity):
+    return model.id if entity == 'trip' else model.trip_id
+
+
+def _write(session, rows):
+    from models import ChangeJournalEntry
+    # Bezpośrednio przez połączenie - bez ponownego flush() sesji
+    session.connection().execute(ChangeJournalEntry.__table__.insert(), rows)
+    session.info.setdefault(PENDING_KEY, set()).update(row['trip_id'] for row in rows)
+
+
+def _after_commit(session):
+    """Powiadamia klientów SSE dopiero o zatwierdzonych zmianach."""
+    trip_ids = session.info.pop(PENDING_KEY, None)
+    if not trip_ids or not has_app_context():
+        return
+    from extensions import event_broker
+    trip_ids = sorted(trip_id for trip_id in trip_ids if trip_id is not None)
+    event_broker.publish('changes', {'trip_ids': trip_ids if len(trip_ids) <= NOTIFY_MAX_IDS else None})
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop(PENDING_KEY, None)
+
+
+def _after_flush(session, flush_context):
+    """Zapisuje zmiany wykonane przez ORM (stan sesji sprzed flush jest jeszcze dostępny)."""
+    now = datetime.now(timezone.utc)
+    rows = []
+    for op, objects in (('insert', session.new), ('update', session.dirty), ('delete', session.deleted)):
+        for obj in objects:
+            entity = TRACKED_MODELS.get(type(obj).__name__)
+            if entity is None:
+                continue
+            # 'dirty' zawiera też obiekty bez faktycznej zmiany kolumn
+            if op == 'update' and not session.is_modified(obj, include_collections=False):
+                continue
+            trip_id = obj.id if entity == 'trip' else obj.trip_id
+            rows.append(_entry(entity, obj.id, trip_id, op, now))
+    if rows:
+        _write(session, rows)
+
+
+def _on_orm_execute(orm_execute_state):
+    """Zapisuje zmiany z masowych UPDATE/DELETE (omijają one after_flush)."""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    entity = TRACKED_MODELS.get(mapper.class_.__name__) if mapper is not None else None
+    if entity is None:
+        return None
+
+    model = mapper.class_
+    session = orm_execute_state.session
+    query = select(model.id, _trip_column(model, entity))
+    parameters = orm_execute_state.parameters
+    if isinstance(parameters, list) and parameters and 'id' in parameters[0]:
+        # UPDATE po kluczu głównym z listą parametrów (executemany)
+        query = query.where(model.id.in_([p['id'] for p in parameters]))
+    elif orm_execute_state.statement.whereclause is not None:
+        query = query.where(orm_execute_state.statement.whereclause)
+    affected = session.execute(query).all()
+
+    result = orm_execute_state.invoke_statement()
+    if affected:
+        now = datetime.now(timezone.utc)
+        op = 'update' if orm_execute_state.is_update else 'delete'
+        _write(session, [_entry(entity, entity_id, trip_id, op, now) for entity_id, trip_id in affected])
+    return result
+
+
+class ChangeJournal:
+    """
+    Rozszerzenie Flask podpinające dziennik zmian pod sesję SQLAlchemy
+    oraz udostępniające odczyt zmian od podanego kursora.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CHANGE_JOURNAL_RETENTION_DAYS', 30)
+        app.config.setdefault('CHANGE_JOURNAL_PAGE_LIMIT', 500)
+        app.config.setdefault('CHANGE_JOURNAL_GAP_SECONDS', 60)
+        session = app.extensions['sqlalchemy'].session
+        # Zdarzenia są rejestrowane na klasie sesji - tylko raz na proces
+        if not event.contains(session, 'after_flush', _after_flush):
+            event.listen(session, 'after_flush', _after_flush)
+            event.listen(session, 'do_orm_execute', _on_orm_execute)
+            event.listen(session, 'after_commit', _after_commit)
+            event.listen(session, 'after_soft_rollback', _after_rollback)
+        app.extensions['change_journal'] = self
+
+    @staticmethod
+    def record(session, entity, items, op):
+        """Jawny zapis zmian: items to lista par (id, trip_id) - np. po masowym INSERT."""
+        now = datetime.now(timezone.utc)
+        rows = [_entry(entity, entity_id, trip_id, op, now) for entity_id, trip_id in items]
+        if rows:
+            _write(session, rows)
+
+    @staticmethod
+    def _contiguous(start, entries, now):
+        """
+        Ostatni numer, do którego dziennik jest ciągły od 'start' (entries: seq i created_at
+        rosnąco). Luka przed wpisem młodszym niż CHANGE_JOURNAL_GAP_SECONDS może być
+        jeszcze niezatwierdzoną transakcją - kursor zatrzymuje się przed nią.
+        """
+        recent = now - timedelta(seconds=current_app.config['CHANGE_JOURNAL_GAP_SECONDS'])
+        cursor = start
+        for entry in entries:
+            if entry.seq != cursor + 1 and _as_utc(entry.created_at) > recent:
+                break
+            cursor = entry.seq
+        return cursor
+
+    def cursor(self, now=None):
+        """Numer, od którego klient bezpiecznie pobiera zmiany (0 dla pustego dziennika)."""
+        from models import db, ChangeJournalEntry
+        now = now or datetime.now(timezone.utc)
+        recent = now - timedelta(seconds=current_app.config['CHANGE_JOURNAL_GAP_SECONDS'])
+        # Luki starsze niż okno są już rozstrzygnięte - sprawdzamy tylko ostatnie wpisy,
+        # od ostatniego starszego wpisu (albo od początku dziennika), jednym zapytaniem
+        seq = ChangeJournalEntry.seq
+        first = func.coalesce(
+            select(func.max(seq)).where(ChangeJournalEntry.created_at <= recent).scalar_subquery(),
+            select(func.min(seq)).scalar_subquery(),
+        )
+        entries = db.session.execute(
+            select(seq, ChangeJournalEntry.created_at).where(seq >= first).order_by(seq)
+        ).all()
+        if not entries:
+            return 0
+        if _as_utc(entries[0].created_at) <= recent:
+            return self._contiguous(entries[0].seq, entries[1:], now)
+        return self._contiguous(entries[0].seq - 1, entries, now)
+
+    def changes_since(self, since, now=None):
+        """
+        Zwraca (kursor, zbiór id zleceń zmienionych po 'since', reset).
+        reset=True oznacza, że klient musi pobrać zlecenia od nowa: zmian jest
+        więcej niż CHANGE_JOURNAL_PAGE_LIMIT albo część dziennika została już usunięta.
+        """
+        from models import db, ChangeJournalEntry
+        now = now or datetime.now(timezone.utc)
+        limit = current_app.config['CHANGE_JOURNAL_PAGE_LIMIT']
+        latest, oldest = db.session.execute(
+            select(func.max(ChangeJournalEntry.seq), func.min(ChangeJournalEntry.seq))
+        ).one()
+        # Kursor z przyszłości (np. baza odtworzona z kopii) też wymaga pełnego odświeżenia
+        if since > (latest or 0) or (oldest is not None and since < oldest - 1):
+            return self.cursor(now), set(), True
+
+        entries = db.session.execute(
+            select(ChangeJournalEntry.seq, ChangeJournalEntry.trip_id, ChangeJournalEntry.created_at)
+            .where(ChangeJournalEntry.seq > since)
+            .order_by(ChangeJournalEntry.seq)
+            .limit(limit + 1)
+        ).all()
+        if len(entries) > limit:
+            return self.cursor(now), set(), True
+        # Zmiany za luką też wysyłamy - wrócą jeszcze raz, gdy luka zostanie wypełniona
+        return (self._contiguous(since, entries, now),
+                {entry.trip_id for entry in entries if entry.trip_id is not None}, False)
+
+    @staticmethod
+    def prune(now=None):
+        """Usuwa wpisy starsze niż CHANGE_JOURNAL_RETENTION_DAYS. Zwraca liczbę usuniętych."""
+        from models import db, ChangeJournalEntry
+        now = now or datetime.now(timezone.utc)
+        cutoff = now - timedelta(days=current_app.config['CHANGE_JOURNAL_RETENTION_DAYS'])
+        deleted = ChangeJournalEntry.query.filter(ChangeJournalEntry.created_at < cutoff).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
@@ -0,0 +1,245 @@
+"""
+Metryki wydajności żądań w formacie Prometheus.
+Plik: metrics.py
+
+Dla każdego żądania (etykieta: endpoint Flask) zbierane są:
+- czas obsługi (histogram) i liczba odpowiedzi wg kodu statusu,
+- rozmiar odpowiedzi,
+- liczba zapytań SQL i łączny czas SQL (zdarzenia before/after_cursor_execute),
+oraz liczba zadań zakolejkowanych w RQ (klasa kolejki InstrumentedQueue).
+
+Eksport: /admin/metrics (tekst Prometheus). W trybie debug każda odpowiedź ma
+też nagłówek 'Server-Timing' widoczny w narzędziach deweloperskich przeglądarki.
+
+Metryki są trzymane w pamięci procesu - przy kilku workerach Gunicorn każdy
+raportuje własne wartości (grafik_process_start_time_seconds pozwala wykryć restart).
+"""
+import threading
+import time
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    from rq.queue import Queue as _RQQueue
+except ImportError:  # RQ jest opcjonalne dla samych metryk
+    _RQQueue = object
+
+# Domyślne przedziały Prometheus (sekundy)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labelvalues, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.labelnames, labelvalues)} {_format_number(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+        # etykiety -> [liczniki przedziałów (nieskumulowane)..., suma, liczba]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                state = self._values[labelvalues] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def count(self, *labelvalues):
+        state = self._values.get(labelvalues)
+        return state[-1] if state else 0
+
+    def sum(self, *labelvalues):
+        state = self._values.get(labelvalues)
+        return state[-2] if state else 0.0
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labelvalues, state in sorted(self._values.items()):
+                cumulative = 0
+                for i, bound in enumerate(self.buckets):
+                    cumulative += state[i]
+                    le = f'le="{_format_number(bound)}"'
+                    lines.append(f'{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {cumulative}')
+                labels = _labels(self.labelnames, labelvalues)
+                lines.append(f'{self.name}_sum{labels} {_format_number(state[-2])}')
+                lines.append(f'{self.name}_count{labels} {state[-1]}')
+        return lines
+
+
+class MetricsRegistry:
+    """Komplet metryk aplikacji (jeden na aplikację)."""
+
+    def __init__(self):
+        self.start_time = time.time()
+        self.requests = Counter(
+            'grafik_http_requests_total', 'Liczba odpowiedzi HTTP.', ('endpoint', 'method', 'status'))
+        self.latency = Histogram(
+            'grafik_http_request_duration_seconds', 'Czas obsługi żądania.', ('endpoint', 'method'))
+        self.response_size = Histogram(
+            'grafik_http_response_size_bytes', 'Rozmiar treści odpowiedzi.', ('endpoint',), SIZE_BUCKETS)
+        self.sql_count = Histogram(
+            'grafik_db_queries_per_request', 'Liczba zapytań SQL na żądanie.', ('endpoint',), QUERY_COUNT_BUCKETS)
+        self.sql_time = Histogram(
+            'grafik_db_time_per_request_seconds', 'Łączny czas zapytań SQL na żądanie.', ('endpoint',))
+        self.enqueued = Counter(
+            'grafik_rq_enqueued_total', 'Liczba zadań zakolejkowanych w RQ.', ('task',))
+        self.outbox = Counter(
+            'grafik_outbox_messages_total', 'Wiadomości obsłużone przez skrzynkę nadawczą (sent/retry/dead).', ('result',))
+        self.compressed = Counter(
+            'grafik_http_compressed_total', 'Skompresowane odpowiedzi (hit/miss pamięci kompresji, stream).',
+            ('encoding', 'result'))
+
+    def expose(self):
+        lines = [
+            '# HELP grafik_process_start_time_seconds Czas uruchomienia procesu (unix).',
+            '# TYPE grafik_process_start_time_seconds gauge',
+            f'grafik_process_start_time_seconds {_format_number(self.start_time)}',
+        ]
+        for metric in (self.requests, self.latency, self.response_size, self.sql_count, self.sql_time, self.enqueued,
+                       self.outbox, self.compressed):
+            lines.extend(metric.expose())
+        return '\n'.join(lines) + '\n'
+
+
+# --- ZAPYTANIA SQL ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('query_start_time')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    if has_request_context():
+        stats = g.get('_sql_stats')
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += elapsed
+
+
+# --- KOLEJKA RQ ---
+
+def count_enqueue(task_name):
+    """Zlicza zakolejkowane zadanie (bez kontekstu aplikacji, np. w workerze - pomijamy)."""
+    if has_app_context():
+        registry = current_app.extensions.get('metrics')
+        if registry is not None:
+            registry.enqueued.inc(task_name)
+
+
+class InstrumentedQueue(_RQQueue):
+    """Kolejka RQ zliczająca zadania (RQ_QUEUE_CLASS = 'metrics.InstrumentedQueue')."""
+
+    def enqueue_job(self, job, *args, **kwargs):
+        job = super().enqueue_job(job, *args, **kwargs)
+        count_enqueue(job.func_name)
+        return job
+
+
+class Metrics:
+    """Rozszerzenie Flask zbierające metryki żądań i zapytań SQL."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_SERVER_TIMING', app.debug)
+        app.extensions['metrics'] = MetricsRegistry()
+        if not app.config['METRICS_ENABLED']:
+            return
+        # Zdarzenia na klasie Engine - obejmują silnik tworzony leniwie przez Flask-SQLAlchemy
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    @staticmethod
+    def registry():
+        return current_app.extensions['metrics']
+
+    @staticmethod
+    def _start_request():
+        g._request_start = time.perf_counter()
+        g._sql_stats = [0, 0.0]
+
+    def _finish_request(self, response):
+        start = g.get('_request_start')
+        if start is None:
+            return response
+        duration = time.perf_counter() - start
+        sql_count, sql_time = g.get('_sql_stats', (0, 0.0))
+        # Nieznane adresy (404) pod wspólną etykietą - bez eksplozji liczby serii
+        endpoint = request.endpoint or 'unmatched'
+
+        registry = self.registry()
+        registry.requests.inc(endpoint, request.method, str(response.status_code))
+        registry.latency.observe(duration, endpoint, request.method)
+        registry.sql_count.observe(sql_count, endpoint)
+        registry.sql_time.observe(sql_time, endpoint)
+        if not response.is_streamed and response.content_length is not None:
+            registry.response_size.observe(response.content_length, endpoint)
+
+        if current_app.config['METRICS_SERVER_TIMING']:
+            response.headers.add(
+                'Server-Timing',
+                f'app;dur={duration * 1000:.1f}, db;dur={sql_time * 1000:.1f};desc="{sql_count} zapytań SQL"'
+            )
+        return response
+
+    def expose(self):
+        return self.registry().expose()
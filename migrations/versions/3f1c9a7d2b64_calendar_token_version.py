@@ -0,0 +1,40 @@
+"""Kolumna user.calendar_token_version (podpis linków subskrypcji kalendarza)
+
+Revision ID: 3f1c9a7d2b64
+Revises: 
+Create Date: 2026-10-19 10:00:00
+
+Pierwsza migracja w repozytorium - wcześniej tabele tworzył db.create_all().
+Baza utworzona już z tą kolumną (albo jeszcze bez tabeli user) jest pomijana,
+więc 'flask db upgrade' jest bezpieczne przy każdym wdrożeniu.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a7d2b64'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _columns(table):
+    inspector = sa.inspect(op.get_bind())
+    if table not in inspector.get_table_names():
+        return None
+    return {column['name'] for column in inspector.get_columns(table)}
+
+
+def upgrade():
+    columns = _columns('user')
+    if columns is None or 'calendar_token_version' in columns:
+        return
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.add_column(sa.Column('calendar_token_version', sa.Integer(), nullable=True, server_default='0'))
+
+
+def downgrade():
+    if 'calendar_token_version' in (_columns('user') or ()):
+        with op.batch_alter_table('user') as batch_op:
+            batch_op.drop_column('calendar_token_version')
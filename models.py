@@ -1,12 +1,12 @@
-from sqlalchemy import func # Upewnij się, że masz ten import
+from sqlalchemy import func, select, update # Upewnij się, że masz ten import
 from datetime import datetime, date, time, timezone # Dodano timezone
 
 # Importuj 'db' z extensions, nie definiuj go tutaj!
-from extensions import db
+from extensions import db, password_hasher
 
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 from itsdangerous import URLSafeTimedSerializer as Serializer
+from itsdangerous import URLSafeSerializer
 from itsdangerous.exc import SignatureExpired, BadTimeSignature
 from flask import current_app
 
@@ -24,14 +24,30 @@ class User(UserMixin, db.Model):
     # --- KONIEC POPRAWKI ---
     accepted_tos = db.Column(db.Boolean, nullable=False, default=False)
     theme = db.Column(db.String(50), nullable=False, default='default')
+    # Zmieniana przy każdej zmianie hasła - unieważnia linki subskrypcji kalendarza
+    # (kolumna dodawana migracją 'flask db upgrade'; NULL w starszych wierszach = 0)
+    calendar_token_version = db.Column(db.Integer, nullable=True, default=0, server_default='0')
 
     def set_password(self, password):
-        """Generuje hash hasła i zapisuje go w bazie."""
-        self.password_hash = generate_password_hash(password)
+        """Generuje hash hasła (w puli haszującej) i zapisuje go w bazie."""
+        self.password_hash = password_hasher.hash(password)
+        self.calendar_token_version = (self.calendar_token_version or 0) + 1
 
     def check_password(self, password):
         """Sprawdza, czy podane hasło pasuje do hasha w bazie."""
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    def rehash_password_if_needed(self, password):
+        """
+        Po udanym logowaniu przelicza hash, jeśli zapisano go innymi parametrami
+        niż obecnie skonfigurowane (np. po zmianie PASSWORD_HASH_METHOD).
+        Zwraca True, gdy hash został zaktualizowany (wymaga commit).
+        """
+        if password_hasher.needs_rehash(self.password_hash):
+            # To samo hasło - bez set_password, linki kalendarza pozostają ważne
+            self.password_hash = password_hasher.hash(password)
+            return True
+        return False
 
     def get_reset_token(self):
         """Generuje bezpieczny, czasowy token do resetowania hasła."""
@@ -50,11 +66,21 @@ class User(UserMixin, db.Model):
         # Zwracamy obiekt User zamiast tylko ID
         return db.session.get(User, user_id) # Użyj nowszej metody get
 
+    def get_calendar_token(self):
+        """Token do linku subskrypcji kalendarza (ICS) - bez daty ważności, unieważnia go zmiana hasła."""
+        return User.calendar_serializer(self.calendar_token_version or 0).dumps(self.id)
+
+    @staticmethod
+    def calendar_serializer(token_version):
+        """Podpis tokenu kalendarza zależy od calendar_token_version użytkownika (calendar_feed.py)."""
+        return URLSafeSerializer(current_app.config['SECRET_KEY'], salt=f'calendar-feed:{token_version}')
+
 class Trip(db.Model):
     __tablename__ = 'trip'
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
-    trip_date = db.Column(db.Date, nullable=False, index=True)
+    # active_history: przy zmianie daty znana jest też stara (przeliczenie obu miesięcy w settlement_summary.py)
+    trip_date = db.column_property(db.Column(db.Date, nullable=False, index=True), active_history=True)
     is_confirmed = db.Column(db.Boolean, default=False)
     spots = db.Column(db.Integer, nullable=True, default=1) # Zmieniono default na 1
     start_time = db.Column(db.Time, nullable=True)
@@ -72,10 +98,30 @@ class Trip(db.Model):
     manager_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True) # Można ustawić ondelete='SET NULL'
     manager = db.relationship('User', backref='managed_trips')
 
+    @staticmethod
+    def lock(*conditions):
+        """
+        Blokuje zlecenia spełniające warunki do końca bieżącej transakcji, aby
+        liczba zajętych miejsc sprawdzona po blokadzie nie zmieniła się przed
+        zapisem (trips.signup_trip, roster.apply_plan). PostgreSQL/MySQL: SELECT
+        ... FOR UPDATE. SQLite blokuje całą bazę - UPDATE bez zmian od razu otwiera
+        transakcję zapisu (jak BEGIN IMMEDIATE).
+        """
+        table = Trip.__table__
+        # Połączenie sesji, nie session.execute - blokada nie jest zmianą dla dziennika
+        # zmian ani podsumowania rozliczeń (zdarzenia do_orm_execute)
+        connection = db.session.connection()
+        if connection.dialect.name == 'sqlite':
+            # last_modified podany jawnie - inaczej onupdate zmieniłby datę zlecenia
+            connection.execute(update(table).where(*conditions)
+                               .values(spots=table.c.spots, last_modified=table.c.last_modified))
+        else:
+            connection.execute(select(table.c.id).where(*conditions).with_for_update())
+
 class Signup(db.Model):
     __tablename__ = 'signup'
     id = db.Column(db.Integer, primary_key=True)
-    trip_id = db.Column(db.Integer, db.ForeignKey('trip.id', ondelete='CASCADE'), nullable=False, index=True) # Dodano index
+    trip_id = db.column_property(db.Column(db.Integer, db.ForeignKey('trip.id', ondelete='CASCADE'), nullable=False, index=True), active_history=True) # Dodano index; stare zlecenie - patrz Trip.trip_date
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True) # Dodano index
     status = db.Column(db.String(50), nullable=False)
 
@@ -90,3 +136,102 @@ class Recipient(db.Model):
 
     user = db.relationship('User', backref=db.backref('recipients', cascade="all, delete-orphan"))
 
+
+class IdempotencyKey(db.Model):
+    """
+    Klucz idempotencji akcji wysłanej przez klienta (np. z kolejki offline PWA).
+    Ponowne wysłanie tego samego klucza zwraca zapisaną odpowiedź zamiast
+    powtarzać akcję (np. drugi zapis na zlecenie po utracie zasięgu).
+    """
+    __tablename__ = 'idempotency_key'
+    __table_args__ = (db.UniqueConstraint('user_id', 'key', name='uq_idempotency_key_user_key'),)
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(64), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    endpoint = db.Column(db.String(100), nullable=False)
+    # None = akcja jest właśnie wykonywana (klucz zarezerwowany)
+    status_code = db.Column(db.Integer, nullable=True)
+    content_type = db.Column(db.String(100), nullable=True)
+    location = db.Column(db.String(500), nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False, index=True)
+
+class ChangeJournalEntry(db.Model):
+    """
+    Wpis dziennika zmian zleceń i zapisów (wypełniany automatycznie - patrz journal.py).
+    'seq' rośnie monotonicznie i służy klientom jako kursor synchronizacji.
+    """
+    __tablename__ = 'change_journal'
+    # AUTOINCREMENT: numery nie mogą się powtórzyć po usunięciu starych wpisów
+    __table_args__ = {'sqlite_autoincrement': True}
+    seq = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)  # 'trip' lub 'signup'
+    entity_id = db.Column(db.Integer, nullable=False)
+    trip_id = db.Column(db.Integer, nullable=True)  # zlecenie, którego dotyczy zmiana
+    op = db.Column(db.String(10), nullable=False)  # 'insert', 'update', 'delete'
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False, index=True)
+
+class OutboxEmail(db.Model):
+    """
+    Wiadomość e-mail w skrzynce nadawczej (patrz outbox.py). Zapisywana w tej
+    samej transakcji co zmiana, której dotyczy; wysyła ją dispatcher.
+    """
+    __tablename__ = 'outbox'
+    __table_args__ = (db.Index('ix_outbox_status_next_attempt', 'status', 'next_attempt_at'),)
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.Text, nullable=False)
+    sender = db.Column(db.String(255), nullable=True)  # None = MAIL_DEFAULT_SENDER w chwili wysyłki
+    recipients = db.Column(db.JSON, nullable=False)  # lista adresów
+    body = db.Column(db.Text, nullable=False)
+    html = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String(10), nullable=False, default='pending')  # 'pending', 'sent', 'dead'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    # Rezerwacja paczki przez dispatcher (wygasa - wiadomość przerwanego procesu wraca do wysyłki)
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+class ScheduledJob(db.Model):
+    """
+    Stan zadania okresowego (patrz scheduler.py). Wiersz jest jednocześnie
+    blokadą: zadanie wykonuje ten proces, któremu warunkowy UPDATE ustawi locked_by.
+    """
+    __tablename__ = 'scheduled_job'
+    name = db.Column(db.String(50), primary_key=True)
+    last_period = db.Column(db.String(20), nullable=True)  # ostatni zakończony okres, np. '2026-10-19'
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    last_started_at = db.Column(db.DateTime, nullable=True)
+    last_finished_at = db.Column(db.DateTime, nullable=True)
+    last_result = db.Column(db.String(255), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+
+class MonthlySettlement(db.Model):
+    """
+    Podsumowanie miesiąca pracownika do rozliczeń (patrz settlement_summary.py):
+    potwierdzone zlecenia, godziny pracy, kilometry i przejazdy kierownika jako
+    pasażera. Tabela pochodna - przeliczana dla miesięcy z settlement_dirty_month.
+    """
+    __tablename__ = 'monthly_settlement'
+    # Klucz (month, user_id) - raport miesiąca to odczyt po indeksie klucza głównego
+    month = db.Column(db.String(7), primary_key=True)  # 'RRRR-MM'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    trips = db.Column(db.Integer, nullable=False, default=0)
+    hours = db.Column(db.Float, nullable=False, default=0.0)
+    kilometers = db.Column(db.Float, nullable=False, default=0.0)
+    passenger_trips = db.Column(db.Integer, nullable=False, default=0)
+    missing_hours = db.Column(db.Integer, nullable=False, default=0)  # zlecenia bez godzin pracy
+    computed_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+
+class SettlementDirtyMonth(db.Model):
+    """
+    Miesiąc do przeliczenia w monthly_settlement. Wiersz dopisywany w tej samej
+    transakcji co zmiana zlecenia lub zapisu; usuwa go przeliczenie.
+    """
+    __tablename__ = 'settlement_dirty_month'
+    id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.String(7), nullable=False)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
@@ -0,0 +1,314 @@
+"""
+Skrzynka nadawcza e-maili (transactional outbox).
+Plik: outbox.py
+
+send_email_in_background() (utils.py) nie wysyła wiadomości, tylko zapisuje
+ją w tabeli 'outbox' w tej samej transakcji co zmiana, której dotyczy:
+wiadomość istnieje wtedy i tylko wtedy, gdy zmiana została zatwierdzona,
+a awaria Redisa lub serwera SMTP jej nie gubi (treść jest już wyrenderowana).
+
+Po zatwierdzeniu transakcji (after_commit) zlecana jest wysyłka przez
+tasks.py; niezależnie od tego 'flask outbox dispatch --loop' działa jako
+osobny proces i wysyła wszystko, co zostało (np. po restarcie lub awarii kolejki).
+
+Dispatcher:
+- rezerwuje paczkę (OUTBOX_BATCH_SIZE) jednym UPDATE ustawiającym locked_by
+  i locked_until; na PostgreSQL kandydaci są wybierani z FOR UPDATE SKIP LOCKED,
+  więc kilka dispatcherów nie czeka na siebie, na SQLite wystarcza blokada zapisu.
+  Rezerwacja wygasa po OUTBOX_LEASE_SECONDS - wiadomości przerwanego procesu
+  zostaną wysłane ponownie (dostarczenie co najmniej raz),
+- wysyła całą paczkę jednym połączeniem SMTP,
+- po błędzie ponawia z wykładniczym odstępem (OUTBOX_RETRY_BASE * 2^(n-1),
+  najwyżej OUTBOX_RETRY_MAX); po OUTBOX_MAX_ATTEMPTS próbach lub po trwałym
+  błędzie (odpowiedź 5xx) wiadomość dostaje status 'dead'
+  ('flask outbox requeue' przywraca ją do wysyłki).
+"""
+import os
+import smtplib
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+import click
+from flask import current_app, has_app_context
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, event, func, or_, select, update
+
+# Klucz w session.info: transakcja dodała wiadomości do skrzynki
+PENDING_KEY = 'outbox_pending'
+ERROR_MAX_LENGTH = 1000
+
+
+def _table():
+    from models import OutboxEmail
+    return OutboxEmail.__table__
+
+
+def add_message(session, subject, sender, recipients, body, html=None):
+    """Dopisuje gotową wiadomość do sesji - zostanie zapisana razem z bieżącą transakcją."""
+    from models import OutboxEmail
+    if isinstance(sender, tuple):
+        sender = '%s <%s>' % sender  # tak jak flask_mail.Message
+    session.add(OutboxEmail(subject=subject, sender=sender, recipients=list(recipients), body=body, html=html))
+    session.info[PENDING_KEY] = True
+
+
+def _after_commit(session):
+    """Zleca wysyłkę dopiero po zatwierdzeniu transakcji, która dodała wiadomości."""
+    if not session.info.pop(PENDING_KEY, False) or not has_app_context():
+        return
+    if not current_app.config['OUTBOX_DISPATCH_ON_COMMIT']:
+        return
+    from extensions import tasks
+    try:
+        tasks.enqueue(dispatch_pending)
+    except Exception as e:
+        # Wiadomości są bezpieczne w bazie - wyśle je 'flask outbox dispatch'
+        current_app.logger.warning(f"Nie udało się zlecić wysyłki skrzynki nadawczej: {e}")
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop(PENDING_KEY, None)
+
+
+# --- DISPATCHER ---
+
+def retry_delay(attempts):
+    """Odstęp przed kolejną próbą po 'attempts' nieudanych."""
+    config = current_app.config
+    return timedelta(seconds=min(config['OUTBOX_RETRY_BASE'] * 2 ** (attempts - 1), config['OUTBOX_RETRY_MAX']))
+
+
+def _is_permanent(error):
+    """Odmowa serwera 5xx lub błąd samej wiadomości (np. zły nagłówek) - ponowienie nic nie da."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return not isinstance(error, OSError)  # smtplib.SMTPException dziedziczy po OSError
+
+
+def _connection_lost(error):
+    return isinstance(error, smtplib.SMTPServerDisconnected) or (
+        isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException))
+
+
+def claim_batch(connection, worker, now):
+    """Rezerwuje paczkę wiadomości gotowych do wysyłki i zwraca je (kolejność: najstarsze)."""
+    config = current_app.config
+    table = _table()
+    candidates = select(table.c.id).where(
+        table.c.status == 'pending',
+        table.c.next_attempt_at <= now,
+        or_(table.c.locked_until.is_(None), table.c.locked_until < now),
+    ).order_by(table.c.next_attempt_at, table.c.id).limit(config['OUTBOX_BATCH_SIZE'])
+    if connection.dialect.name == 'postgresql':
+        # Wiersze rezerwowane właśnie przez inny dispatcher są pomijane, a nie blokują
+        candidates = candidates.with_for_update(skip_locked=True)
+    connection.execute(
+        update(table).where(table.c.id.in_(candidates))
+        .values(locked_by=worker, locked_until=now + timedelta(seconds=config['OUTBOX_LEASE_SECONDS']))
+    )
+    return connection.execute(
+        select(table).where(table.c.locked_by == worker, table.c.status == 'pending').order_by(table.c.id)
+    ).all()
+
+
+def _message(row):
+    from flask_mail import Message
+    return Message(row.subject, sender=row.sender, recipients=row.recipients, body=row.body, html=row.html)
+
+
+def _send_batch(rows):
+    """Wysyła paczkę jednym połączeniem SMTP. Zwraca {id: None (wysłana) lub wyjątek}."""
+    from extensions import mail
+    results = {}
+    try:
+        with mail.connect() as connection:
+            for row in rows:
+                try:
+                    connection.send(_message(row))
+                except Exception as e:
+                    results[row.id] = e
+                    if _connection_lost(e):
+                        break  # pozostałe wiadomości wracają do skrzynki bez liczenia próby
+                else:
+                    results[row.id] = None
+    except Exception as e:
+        if not results:
+            # Brak połączenia z serwerem - cała paczka do ponowienia
+            results = {row.id: e for row in rows}
+        else:
+            current_app.logger.warning(f"Skrzynka nadawcza: błąd przy zamykaniu połączenia SMTP: {e}")
+    return results
+
+
+def _record_results(connection, worker, rows, results, now):
+    """Zapisuje wynik paczki. Warunek locked_by chroni przed nadpisaniem po wygaśnięciu rezerwacji."""
+    table = _table()
+    counts = {'sent': 0, 'retry': 0, 'dead': 0}
+    sent_ids = [row.id for row in rows if row.id in results and results[row.id] is None]
+    released_ids = [row.id for row in rows if row.id not in results]
+    failures = []
+    for row in rows:
+        error = results.get(row.id)
+        if error is None:
+            continue
+        attempts = row.attempts + 1
+        dead = attempts >= current_app.config['OUTBOX_MAX_ATTEMPTS'] or _is_permanent(error)
+        description = f'{type(error).__name__}: {error}'[:ERROR_MAX_LENGTH]
+        failures.append({
+            'row_id': row.id, 'row_status': 'dead' if dead else 'pending', 'row_attempts': attempts,
+            'row_next_attempt_at': now + retry_delay(attempts), 'row_error': description,
+        })
+        counts['dead' if dead else 'retry'] += 1
+        if dead:
+            current_app.logger.error(f"Skrzynka nadawcza: wiadomość {row.id} ('{row.subject}') porzucona po {attempts} próbach: {description}")
+
+    owned = table.c.locked_by == worker
+    if sent_ids:
+        connection.execute(
+            update(table).where(table.c.id.in_(sent_ids), owned)
+            .values(status='sent', sent_at=now, attempts=table.c.attempts + 1, last_error=None,
+                    locked_by=None, locked_until=None)
+        )
+        counts['sent'] = len(sent_ids)
+    if failures:
+        connection.execute(
+            update(table).where(table.c.id == bindparam('row_id'), owned)
+            .values(status=bindparam('row_status'), attempts=bindparam('row_attempts'),
+                    next_attempt_at=bindparam('row_next_attempt_at'), last_error=bindparam('row_error'),
+                    locked_by=None, locked_until=None),
+            failures,
+        )
+    if released_ids:
+        connection.execute(update(table).where(table.c.id.in_(released_ids), owned).values(locked_by=None, locked_until=None))
+    return counts, bool(released_ids)
+
+
+def _count(counts):
+    registry = current_app.extensions.get('metrics')
+    if registry is not None:
+        for result, amount in counts.items():
+            if amount:
+                registry.outbox.inc(result, amount=amount)
+
+
+def dispatch_pending(max_batches=None):
+    """
+    Zadanie w tle: wysyła zaległe wiadomości paczkami, aż w skrzynce nie zostanie
+    nic gotowego (lub po max_batches paczkach). Zwraca liczniki {'sent', 'retry', 'dead'}.
+    """
+    from extensions import db
+    totals = {'sent': 0, 'retry': 0, 'dead': 0}
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        worker = f'{socket.gethostname()[:60]}:{os.getpid()}:{uuid.uuid4().hex[:12]}'
+        with db.engine.begin() as connection:
+            rows = claim_batch(connection, worker, datetime.now(timezone.utc))
+        if not rows:
+            break
+        batches += 1
+        results = _send_batch(rows)
+        with db.engine.begin() as connection:
+            counts, connection_lost = _record_results(connection, worker, rows, results, datetime.now(timezone.utc))
+        _count(counts)
+        for key, value in counts.items():
+            totals[key] += value
+        # Niepełna paczka - skrzynka opróżniona; zerwane połączenie - spróbuje następne wywołanie
+        if len(rows) < current_app.config['OUTBOX_BATCH_SIZE'] or connection_lost:
+            break
+    return totals
+
+
+class Outbox:
+    """Rozszerzenie Flask: zlecanie wysyłki po zatwierdzeniu transakcji z nowymi wiadomościami."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('OUTBOX_BATCH_SIZE', 50)
+        app.config.setdefault('OUTBOX_LEASE_SECONDS', 300)
+        app.config.setdefault('OUTBOX_MAX_ATTEMPTS', 8)
+        app.config.setdefault('OUTBOX_RETRY_BASE', 60)
+        app.config.setdefault('OUTBOX_RETRY_MAX', 3600)
+        app.config.setdefault('OUTBOX_POLL_INTERVAL', 10.0)
+        app.config.setdefault('OUTBOX_RETENTION_DAYS', 30)
+        app.config.setdefault('OUTBOX_DISPATCH_ON_COMMIT', True)
+        session = app.extensions['sqlalchemy'].session
+        # Zdarzenia są rejestrowane na klasie sesji - tylko raz na proces
+        if not event.contains(session, 'after_commit', _after_commit):
+            event.listen(session, 'after_commit', _after_commit)
+            event.listen(session, 'after_soft_rollback', _after_rollback)
+        app.extensions['outbox'] = self
+
+
+# --- KOMENDY 'flask outbox ...' ---
+
+@click.group('outbox')
+def outbox_cli():
+    """Skrzynka nadawcza e-maili."""
+
+
+@outbox_cli.command('dispatch')
+@click.option('--loop', is_flag=True, help='Działaj stale, sprawdzając skrzynkę co OUTBOX_POLL_INTERVAL s.')
+@with_appcontext
+def dispatch_command(loop):
+    """Wysyła zaległe wiadomości."""
+    while True:
+        try:
+            totals = dispatch_pending()
+        except Exception:
+            if not loop:
+                raise
+            current_app.logger.exception("Skrzynka nadawcza: błąd dispatchera")
+            totals = None
+        if totals is not None and (any(totals.values()) or not loop):
+            click.echo(f"Wysłano: {totals['sent']}, do ponowienia: {totals['retry']}, porzucono: {totals['dead']}.")
+        if not loop:
+            return
+        time.sleep(current_app.config['OUTBOX_POLL_INTERVAL'])
+
+
+@outbox_cli.command('status')
+@with_appcontext
+def status_command():
+    """Liczba wiadomości wg statusu i wiek najstarszej oczekującej."""
+    from extensions import db
+    table = _table()
+    with db.engine.connect() as connection:
+        counts = dict(connection.execute(select(table.c.status, func.count()).group_by(table.c.status)).all())
+        oldest = connection.execute(select(func.min(table.c.created_at)).where(table.c.status == 'pending')).scalar()
+    click.echo(', '.join(f"{status}: {counts.get(status, 0)}" for status in ('pending', 'sent', 'dead')))
+    if oldest is not None:
+        click.echo(f"Najstarsza oczekująca z: {oldest:%Y-%m-%d %H:%M:%S} UTC")
+
+
+@outbox_cli.command('requeue')
+@click.option('--id', 'ids', type=int, multiple=True, help='Tylko wskazane wiadomości (domyślnie wszystkie porzucone).')
+@with_appcontext
+def requeue_command(ids):
+    """Przywraca porzucone wiadomości (status 'dead') do wysyłki."""
+    from extensions import db
+    table = _table()
+    statement = update(table).where(table.c.status == 'dead')
+    if ids:
+        statement = statement.where(table.c.id.in_(ids))
+    with db.engine.begin() as connection:
+        result = connection.execute(statement.values(
+            status='pending', attempts=0, next_attempt_at=datetime.now(timezone.utc), locked_by=None, locked_until=None))
+    click.echo(f"Przywrócono do wysyłki: {result.rowcount}.")
+
+
+@outbox_cli.command('purge')
+@with_appcontext
+def purge_command():
+    """Usuwa wysłane wiadomości starsze niż OUTBOX_RETENTION_DAYS."""
+    from extensions import db
+    table = _table()
+    cutoff = datetime.now(timezone.utc) - timedelta(days=current_app.config['OUTBOX_RETENTION_DAYS'])
+    with db.engine.begin() as connection:
+        result = connection.execute(table.delete().where(table.c.status == 'sent', table.c.sent_at < cutoff))
+    click.echo(f"Usunięto: {result.rowcount}.")
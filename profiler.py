@@ -0,0 +1,194 @@
+"""
+Profilowanie wybranych żądań na produkcji (cProfile), bez ponownego wdrażania.
+Plik: profiler.py
+
+Żądanie jest profilowane, gdy:
+- admin/kierownik doda '?_profile=1' lub nagłówek 'X-Profile: 1',
+- admin/kierownik włączy profilowanie swojej sesji na kilka minut w /admin/profiles
+  (obejmuje też zwykłe formularze POST, np. rozliczenia i import Excela),
+- żądanie zostanie wylosowane (1 na PROFILER_SAMPLE_RATE; 0 = wyłączone).
+
+Raport (posortowane czasy + drzewo wywołań) trafia do PROFILER_DIR jako .txt,
+a pełne dane jako .prof (do otwarcia np. w snakeviz). Naraz profilowane jest
+co najwyżej jedno żądanie w procesie - pozostałe wykonują się normalnie.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from flask import current_app, g, request, session
+from flask_login import current_user
+
+# Klucz sesji: do kiedy (unix) profilować żądania tego użytkownika
+SESSION_KEY = 'profile_until'
+REPORT_NAME_RE = re.compile(r'^[\w.-]+\.(txt|prof)$')
+UNSAFE_NAME_CHARS = re.compile(r'[^\w.-]')
+# Tych żądań nie profilujemy (pliki statyczne, sama lista raportów)
+SKIPPED_ENDPOINTS = {'static', 'static_dist', 'admin.profiles', 'admin.download_profile'}
+
+
+def _is_admin_or_manager():
+    # Ten sam warunek co w utils.admin_or_manager_required
+    return current_user.is_authenticated and current_user.status in ['admin', 'kierownik']
+
+
+class RequestProfiler:
+    """Rozszerzenie Flask profilujące pojedyncze żądania."""
+
+    def __init__(self, app=None):
+        self._busy = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PROFILER_DIR', 'logs/profiles')
+        app.config.setdefault('PROFILER_SAMPLE_RATE', 0)
+        app.config.setdefault('PROFILER_KEEP', 50)
+        app.config.setdefault('PROFILER_TOP', 60)
+        app.extensions['request_profiler'] = self
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._cleanup)
+
+    # --- WYBÓR ŻĄDAŃ ---
+
+    @staticmethod
+    def _reason():
+        """Powód profilowania tego żądania lub None."""
+        if request.endpoint is None or request.endpoint in SKIPPED_ENDPOINTS:
+            return None
+        requested = (
+            request.args.get('_profile') == '1'
+            or request.headers.get('X-Profile') == '1'
+            or session.get(SESSION_KEY, 0) > time.time()
+        )
+        if requested and _is_admin_or_manager():
+            return 'na żądanie'
+        rate = current_app.config['PROFILER_SAMPLE_RATE']
+        if rate and random.randrange(rate) == 0:
+            return 'próbka'
+        return None
+
+    def _start(self):
+        reason = self._reason()
+        if reason is None or not self._busy.acquire(blocking=False):
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # inne narzędzie profilujące jest już aktywne
+            self._busy.release()
+            return
+        g._profile = (profiler, reason, time.perf_counter())
+
+    def _stop(self):
+        state = g.pop('_profile', None)
+        if state is None:
+            return None
+        profiler, reason, start = state
+        profiler.disable()
+        self._busy.release()
+        return profiler, reason, time.perf_counter() - start
+
+    def _finish(self, response):
+        stopped = self._stop()
+        if stopped is None:
+            return response
+        profiler, reason, duration = stopped
+        try:
+            name = self._write_report(profiler, {
+                'endpoint': request.endpoint,
+                'method': request.method,
+                'path': request.full_path.rstrip('?'),
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 1),
+                'reason': reason,
+                'user': current_user.email if current_user.is_authenticated else None,
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+            })
+            response.headers['X-Profile-Report'] = name
+        except OSError as e:
+            current_app.logger.error(f"Nie udało się zapisać raportu profilowania: {e}")
+        return response
+
+    def _cleanup(self, exc):
+        # Wyjątek w widoku - after_request się nie wykona, ale blokadę trzeba zwolnić
+        self._stop()
+
+    # --- RAPORTY ---
+
+    @staticmethod
+    def directory():
+        return os.path.abspath(current_app.config['PROFILER_DIR'])
+
+    def _write_report(self, profiler, meta):
+        directory = self.directory()
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        base = os.path.join(directory, f"{stamp}_{UNSAFE_NAME_CHARS.sub('_', meta['endpoint'])}")
+        profiler.dump_stats(base + '.prof')
+
+        top = current_app.config['PROFILER_TOP']
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream).strip_dirs().sort_stats('cumulative')
+        stats.print_stats(top)
+        stream.write('\n--- Drzewo wywołań (funkcja -> wywoływane funkcje) ---\n')
+        stats.print_callees(top)
+        with open(base + '.txt', 'w', encoding='utf-8') as f:
+            f.write('# ' + json.dumps(meta, ensure_ascii=False) + '\n')
+            f.write(stream.getvalue())
+
+        self._prune(directory)
+        return os.path.basename(base) + '.txt'
+
+    @staticmethod
+    def _prune(directory):
+        """Zostawia PROFILER_KEEP najnowszych raportów."""
+        keep = current_app.config['PROFILER_KEEP']
+        reports = sorted(name for name in os.listdir(directory) if name.endswith('.txt'))
+        for name in reports[:-keep] if keep else []:
+            for suffix in ('.txt', '.prof'):
+                try:
+                    os.remove(os.path.join(directory, name[:-4] + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def recent(self, limit=50):
+        """Ostatnie raporty (najnowsze najpierw) z metadanymi z pierwszej linii pliku."""
+        directory = self.directory()
+        if not os.path.isdir(directory):
+            return []
+        reports = []
+        for name in sorted((n for n in os.listdir(directory) if n.endswith('.txt')), reverse=True)[:limit]:
+            try:
+                with open(os.path.join(directory, name), encoding='utf-8') as f:
+                    meta = json.loads(f.readline()[2:])
+            except (OSError, ValueError):
+                continue
+            meta['name'] = name
+            meta['has_prof'] = os.path.exists(os.path.join(directory, name[:-4] + '.prof'))
+            reports.append(meta)
+        return reports
+
+    @staticmethod
+    def is_report_name(name):
+        return bool(REPORT_NAME_RE.match(name))
+
+    @staticmethod
+    def enable_for_session(minutes):
+        """Profiluje żądania bieżącego użytkownika przez 'minutes' minut (0 wyłącza)."""
+        if minutes > 0:
+            session[SESSION_KEY] = time.time() + minutes * 60
+        else:
+            session.pop(SESSION_KEY, None)
+
+    @staticmethod
+    def session_active_until():
+        until = session.get(SESSION_KEY, 0)
+        return datetime.fromtimestamp(until) if until > time.time() else None
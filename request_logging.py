@@ -0,0 +1,214 @@
+"""
+Logowanie bez blokowania wątków żądań, w formacie JSON, z identyfikatorem żądania.
+Plik: request_logging.py
+
+Wątek żądania tylko wkłada rekord do kolejki (QueueHandler) - zapis do pliku
+i na stdout wykonuje osobny wątek (QueueListener), więc operacje dyskowe i
+rotacja plików nie wydłużają odpowiedzi.
+
+Każdy rekord z kontekstu żądania dostaje request_id (z nagłówka X-Request-ID
+lub nowy), id użytkownika, endpoint i czas od początku żądania. Po każdym
+żądaniu zapisywana jest linia dziennika dostępu (logger 'grafik.access')
+ze statusem, czasem i liczbą zapytań SQL.
+
+LOG_TO_STDOUT=1 (kontenery, kilka workerów Gunicorna) - logi na stdout zamiast
+do pliku LOG_FILE; plik rotowany po LOG_MAX_BYTES, LOG_BACKUP_COUNT kopii.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from flask import current_app, g, has_request_context, request
+from flask.logging import default_handler
+
+access_logger = logging.getLogger('grafik.access')
+REQUEST_ID_RE = re.compile(r'^[\w.-]{1,64}$')
+# Pola rekordu przepisywane do JSON (kontekst żądania i 'extra' z wywołań loggera)
+CONTEXT_FIELDS = ('request_id', 'user_id', 'endpoint', 'method', 'path',
+                  'status', 'duration_ms', 'sql_queries', 'response_size')
+SKIPPED_ENDPOINTS = {'static', 'static_dist'}
+_running_listeners = []
+
+
+def _request_context():
+    """Kontekst bieżącego żądania (bez zapytań do bazy - tylko już wczytany użytkownik)."""
+    if not has_request_context():
+        return {}
+    context = {
+        'request_id': g.get('request_id'),
+        'endpoint': request.endpoint,
+        'method': request.method,
+        'path': request.path,
+    }
+    user = g.get('_login_user')
+    if user is not None and user.is_authenticated:
+        context['user_id'] = user.get_id()
+    start = g.get('_log_start')
+    if start is not None:
+        context['duration_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    return context
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    Wkłada rekord do kolejki razem z kontekstem żądania - wątek zapisujący
+    nie ma już dostępu do 'request' ani 'g'. Treść i wyjątek są formatowane
+    tutaj, bo argumenty rekordu nie muszą być bezpieczne dla innych wątków.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        for key, value in _request_context().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Jeden rekord = jedna linia JSON."""
+
+    def format(self, record):
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process,
+        }
+        for key in CONTEXT_FIELDS:
+            value = getattr(record, key, None)
+            if value is not None:
+                data[key] = value
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def start_queue_listener(logger, *handlers):
+    """
+    Podpina do loggera kolejkę obsługiwaną przez osobny wątek z podanymi handlerami.
+    Zwraca (handler_kolejki, listener); listener jest zatrzymywany przy wyjściu z procesu.
+    """
+    log_queue = queue.SimpleQueue()
+    queue_handler = ContextQueueHandler(log_queue)
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _running_listeners.append(listener)
+    logger.addHandler(queue_handler)
+    atexit.register(stop_queue_listener, listener)
+    return queue_handler, listener
+
+
+def stop_queue_listener(listener):
+    """Zapisuje rekordy z kolejki i kończy wątek (można wywołać wielokrotnie)."""
+    if listener in _running_listeners:
+        _running_listeners.remove(listener)
+        listener.stop()
+
+
+def _restart_listeners_after_fork():
+    # Gunicorn --preload: wątek zapisujący nie przetrwa fork() - w workerze uruchamiamy go od nowa
+    for listener in _running_listeners:
+        listener._thread = None
+        listener.start()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_listeners_after_fork)
+
+
+class RequestLogging:
+    """Rozszerzenie Flask: identyfikator żądania, dziennik dostępu i asynchroniczne handlery."""
+
+    def __init__(self, app=None):
+        self._installed = []  # (logger, handler_kolejki, listener)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('LOG_TO_STDOUT', False)
+        app.config.setdefault('LOG_FILE', 'logs/grafik.log')
+        app.config.setdefault('LOG_MAX_BYTES', 10 * 1024 * 1024)
+        app.config.setdefault('LOG_BACKUP_COUNT', 10)
+        app.config.setdefault('LOG_LEVEL', 'INFO')
+        app.config.setdefault('LOG_REQUESTS', True)
+        app.extensions['request_logging'] = self
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+        # W trybie debug i w testach zostaje domyślny handler Flaska (stderr)
+        if app.debug or app.testing:
+            return
+        self._install(app)
+        app.logger.info('Grafik startup')
+
+    def _install(self, app):
+        self._uninstall()
+        if app.config['LOG_TO_STDOUT']:
+            handler = logging.StreamHandler(sys.stdout)
+        else:
+            path = os.path.abspath(app.config['LOG_FILE'])
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handler = RotatingFileHandler(path, maxBytes=app.config['LOG_MAX_BYTES'],
+                                          backupCount=app.config['LOG_BACKUP_COUNT'], encoding='utf-8', delay=True)
+        handler.setFormatter(JsonFormatter())
+
+        level = app.config['LOG_LEVEL']
+        grafik_logger = logging.getLogger('grafik')
+        for logger in (app.logger, grafik_logger):
+            logger.setLevel(level)
+        app.logger.removeHandler(default_handler)
+        # Jedna kolejka i jeden wątek dla logów aplikacji i dziennika dostępu
+        queue_handler, listener = start_queue_listener(app.logger, handler)
+        grafik_logger.addHandler(queue_handler)
+        self._installed = [(app.logger, queue_handler, listener), (grafik_logger, queue_handler, None)]
+
+    def _uninstall(self):
+        """Ponowne init_app (kilka aplikacji w procesie) nie dubluje handlerów."""
+        for logger, queue_handler, listener in self._installed:
+            logger.removeHandler(queue_handler)
+            if listener is not None:
+                stop_queue_listener(listener)
+        self._installed = []
+
+    # --- ŻĄDANIA ---
+
+    @staticmethod
+    def _start_request():
+        incoming = request.headers.get('X-Request-ID', '')
+        g.request_id = incoming if REQUEST_ID_RE.match(incoming) else uuid.uuid4().hex
+        g._log_start = time.perf_counter()
+
+    @staticmethod
+    def _finish_request(response):
+        request_id = g.get('request_id')
+        if request_id is None:
+            return response
+        response.headers['X-Request-ID'] = request_id
+        if current_app.config['LOG_REQUESTS'] and request.endpoint not in SKIPPED_ENDPOINTS \
+                and access_logger.isEnabledFor(logging.INFO):
+            sql_stats = g.get('_sql_stats')
+            access_logger.info(
+                '%s %s %s', request.method, request.path, response.status_code,
+                extra={
+                    'status': response.status_code,
+                    'sql_queries': sql_stats[0] if sql_stats else None,
+                    'response_size': None if response.is_streamed else response.content_length,
+                },
+            )
+        return response
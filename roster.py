@@ -0,0 +1,309 @@
+"""
+Automatyczne układanie grafiku: obsada wolnych miejsc zleceń z zakresu dat.
+Plik: roster.py
+
+Dane wejściowe pobierają trzy zapytania (same kolumny): zlecenia zakresu,
+aktywni pracownicy oraz zapisy z pełnych miesięcy zakresu. Plan:
+1. Rezerwowi danego zlecenia (w kolejności zapisu) dostają wolne miejsca jako pierwsi.
+2. Pozostałe miejsca - zachłannie z kopca (liczba zleceń pracownika w miesiącu,
+   złoty pracownik przed zwykłym, id); zlecenia z najmniejszym wyborem
+   pracowników na wolne miejsce obsadzane są najpierw.
+3. Naprawa: przydział przechodzi na pracownika z co najmniej dwoma zleceniami
+   mniej, jeśli ten może wziąć to zlecenie.
+
+Pracownik nie dostaje drugiego zlecenia tego samego dnia ani zlecenia w dniu,
+w którym zgłosił niedyspozycję. Limity agencji (ROSTER_AGENCY_QUOTAS) ograniczają
+udział agencji w obsadzie zakresu. Plan jest podglądem - zapis wykonuje
+apply_plan() jedną transakcją, tylko jeśli dane nie zmieniły się od podglądu.
+"""
+import hashlib
+import heapq
+import math
+from collections import defaultdict
+from datetime import date, timedelta
+from flask import current_app
+from sqlalchemy import insert, select, update
+from availability import OCCUPYING
+
+WORKER_STATUSES = ('pracownik', 'złoty pracownik')
+# Nowy przydział pracownik potwierdza sam (jak zapis złotych pracowników)
+ASSIGNED_STATUS = 'wstępnie zapisany'
+# Rezerwowy sam zgłosił chęć udziału - wolne miejsce od razu potwierdza
+PROMOTED_STATUS = 'potwierdzony'
+REPAIR_PASSES = 3
+
+
+def parse_range(start_value, end_value, today=None):
+    """(start, end) z dat 'RRRR-MM-DD'; domyślnie od dziś do końca miesiąca. Błędny zakres - None."""
+    today = today or date.today()
+    try:
+        start = date.fromisoformat(start_value) if start_value else today
+        if end_value:
+            end = date.fromisoformat(end_value)
+        else:
+            end = (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    except ValueError:
+        return None
+    if end < start or (end - start).days >= current_app.config['ROSTER_MAX_DAYS']:
+        return None
+    return start, end
+
+
+def agency_quotas(value):
+    """
+    Limity agencji {agencja: udział 0-1} z ROSTER_AGENCY_QUOTAS ('Adecco=0.5,Randstad=30%'
+    albo gotowy słownik). Błędne wpisy są pomijane z ostrzeżeniem w logu.
+    """
+    if isinstance(value, dict):
+        items = value.items()
+    else:
+        items = [(item.split('=', 1) + [''])[:2] for item in (value or '').split(',') if item.strip()]
+    quotas = {}
+    for name, raw in items:
+        name = str(name).strip()
+        text = str(raw).strip()
+        try:
+            share = float(text[:-1]) / 100 if text.endswith('%') else float(text)
+        except ValueError:
+            share = None
+        if not name or share is None or not 0 <= share <= 1:
+            current_app.logger.warning(f"ROSTER_AGENCY_QUOTAS: pominięto błędny limit '{name}={raw}' "
+                                       "(oczekiwano np. 'Adecco=0.5' lub 'Adecco=50%').")
+            continue
+        quotas[name] = share
+    return quotas
+
+
+def _month_bounds(start, end):
+    first = start.replace(day=1)
+    last = (end.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return first, last
+
+
+def _load_data(start, end):
+    from extensions import db
+    from models import User, Trip, Signup
+    first, last = _month_bounds(start, end)
+    trips = db.session.execute(
+        select(Trip.id, Trip.title, Trip.trip_date, Trip.spots)
+        .where(Trip.trip_date >= start, Trip.trip_date <= end, Trip.is_archived.is_(False), Trip.spots > 0)
+        .order_by(Trip.trip_date, Trip.id)
+    ).all()
+    workers = db.session.execute(
+        select(User.id, User.name, User.surname, User.agency, User.status)
+        .where(User.status.in_(WORKER_STATUSES))
+        .order_by(User.id)
+    ).all()
+    signups = db.session.execute(
+        select(Signup.id, Signup.trip_id, Signup.user_id, Signup.status, Trip.trip_date)
+        .join(Trip, Trip.id == Signup.trip_id)
+        .where(Trip.trip_date >= first, Trip.trip_date <= last)
+        .order_by(Signup.id)
+    ).all()
+    return trips, workers, signups
+
+
+class _State:
+    """Obciążenie pracowników, zajęte dni i limity agencji w trakcie układania planu."""
+
+    def __init__(self, trips, workers, signups, start, end, quotas):
+        self.workers = {worker.id: worker for worker in workers}
+        self.load = defaultdict(int)         # zlecenia w miesiącach zakresu
+        self.busy = set()                    # (pracownik, dzień): zajęty lub niedyspozycyjny
+        self.signed = defaultdict(set)       # zlecenie -> pracownicy z jakimkolwiek zapisem
+        self.taken = defaultdict(int)        # zlecenie -> zajęte miejsca
+        self.reserves = defaultdict(list)    # zlecenie -> (id zapisu, pracownik) rezerwowych
+        self.agency_used = defaultdict(int)
+        for signup in signups:
+            occupying = signup.status in OCCUPYING
+            if occupying:
+                self.load[signup.user_id] += 1
+            if not start <= signup.trip_date <= end:
+                continue
+            self.signed[signup.trip_id].add(signup.user_id)
+            if occupying or signup.status == 'niedyspozycyjny':
+                self.busy.add((signup.user_id, signup.trip_date))
+            if occupying:
+                self.taken[signup.trip_id] += 1
+                worker = self.workers.get(signup.user_id)
+                if worker is not None and worker.agency:
+                    self.agency_used[worker.agency] += 1
+            elif signup.status == 'rezerwowy':
+                self.reserves[signup.trip_id].append((signup.id, signup.user_id))
+        capacity = sum(trip.spots for trip in trips)
+        self.agency_cap = {agency: math.ceil(share * capacity) for agency, share in (quotas or {}).items()}
+
+    def can_take(self, user_id, trip, replacing=None):
+        """Czy pracownik może dostać zlecenie ('replacing' - pracownik, którego zastępuje)."""
+        if (user_id, trip.trip_date) in self.busy or user_id in self.signed[trip.id]:
+            return False
+        agency = self.workers[user_id].agency
+        if agency in self.agency_cap:
+            freed = replacing is not None and self.workers[replacing].agency == agency
+            return self.agency_used[agency] - freed < self.agency_cap[agency]
+        return True
+
+    def assign(self, user_id, trip):
+        self.load[user_id] += 1
+        self.busy.add((user_id, trip.trip_date))
+        self.signed[trip.id].add(user_id)
+        self.taken[trip.id] += 1
+        agency = self.workers[user_id].agency
+        if agency:
+            self.agency_used[agency] += 1
+
+    def release(self, user_id, trip):
+        self.load[user_id] -= 1
+        self.busy.discard((user_id, trip.trip_date))
+        self.signed[trip.id].discard(user_id)
+        self.taken[trip.id] -= 1
+        agency = self.workers[user_id].agency
+        if agency:
+            self.agency_used[agency] -= 1
+
+    def heap_key(self, user_id):
+        return (self.load[user_id], self.workers[user_id].status != 'złoty pracownik', user_id)
+
+
+def _fill(state, trips):
+    """Rezerwowi, a potem kopiec najmniej obciążonych; zwraca {zlecenie: [(pracownik, id zapisu)]}."""
+    assigned = defaultdict(list)
+    for trip in trips:
+        for signup_id, user_id in state.reserves[trip.id]:
+            if state.taken[trip.id] >= trip.spots or user_id not in state.workers:
+                continue
+            state.signed[trip.id].discard(user_id)  # zapis rezerwowego zmienia status
+            if state.can_take(user_id, trip):
+                state.assign(user_id, trip)
+                assigned[trip.id].append((user_id, signup_id))
+            else:
+                state.signed[trip.id].add(user_id)
+
+    # Najpierw zlecenia z najmniejszym wyborem: dostępni pracownicy dnia na wolne miejsce
+    available = defaultdict(int)
+    for day in {trip.trip_date for trip in trips}:
+        available[day] = sum((user_id, day) not in state.busy for user_id in state.workers)
+    order = sorted(
+        (trip for trip in trips if state.taken[trip.id] < trip.spots),
+        key=lambda trip: (available[trip.trip_date] / (trip.spots - state.taken[trip.id]), trip.trip_date, trip.id))
+
+    heap = [state.heap_key(user_id) for user_id in state.workers]
+    heapq.heapify(heap)
+    for trip in order:
+        skipped = []
+        while heap and state.taken[trip.id] < trip.spots:
+            key = heapq.heappop(heap)
+            user_id = key[2]
+            if key != state.heap_key(user_id):
+                continue  # nieaktualny wpis - aktualny jest w kopcu
+            if not state.can_take(user_id, trip):
+                skipped.append(key)
+                continue
+            state.assign(user_id, trip)
+            assigned[trip.id].append((user_id, None))
+            heapq.heappush(heap, state.heap_key(user_id))
+        for key in skipped:
+            heapq.heappush(heap, key)
+    return assigned
+
+
+def _repair(state, trips, assigned):
+    """Przenosi nowe przydziały z najbardziej na najmniej obciążonych pracowników."""
+    by_id = {trip.id: trip for trip in trips}
+    for _ in range(REPAIR_PASSES):
+        moved = False
+        moves = sorted(((trip_id, position) for trip_id, items in assigned.items()
+                        for position, (_, signup_id) in enumerate(items) if signup_id is None),
+                       key=lambda move: -state.load[assigned[move[0]][move[1]][0]])
+        for trip_id, position in moves:
+            trip = by_id[trip_id]
+            current = assigned[trip_id][position][0]
+            best = min((user_id for user_id in state.workers
+                        if state.load[user_id] + 1 < state.load[current] and state.can_take(user_id, trip, current)),
+                       key=state.heap_key, default=None)
+            if best is None:
+                continue
+            state.release(current, trip)
+            state.assign(best, trip)
+            assigned[trip_id][position] = (best, None)
+            moved = True
+        if not moved:
+            break
+
+
+def fingerprint(changes):
+    """Odcisk planu - apply_plan() porównuje go z planem z podglądu."""
+    payload = ';'.join(f"{change['trip_id']}:{change['user_id']}:{change['signup_id'] or ''}" for change in changes)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def build_plan(start, end, quotas=None):
+    """
+    Plan obsady zleceń od 'start' do 'end' (włącznie) jako słownik: changes
+    (lista przydziałów: zlecenie, pracownik, nowy status, id zapisu rezerwowego),
+    unfilled (zlecenia, których nie udało się obsadzić, z liczbą brakujących
+    miejsc), trips (liczba zleceń zakresu) i fingerprint.
+    """
+    if quotas is None:
+        quotas = agency_quotas(current_app.config['ROSTER_AGENCY_QUOTAS'])
+    trips, workers, signups = _load_data(start, end)
+    state = _State(trips, workers, signups, start, end, quotas)
+    assigned = _fill(state, trips)
+    _repair(state, trips, assigned)
+
+    changes = []
+    unfilled = []
+    for trip in trips:
+        for user_id, signup_id in sorted(assigned.get(trip.id, ()), key=lambda item: item[0]):
+            worker = state.workers[user_id]
+            changes.append({
+                'trip_id': trip.id, 'title': trip.title, 'trip_date': trip.trip_date,
+                'user_id': user_id, 'name': worker.name, 'surname': worker.surname, 'agency': worker.agency,
+                'status': PROMOTED_STATUS if signup_id else ASSIGNED_STATUS, 'signup_id': signup_id,
+                'month_trips': state.load[user_id],
+            })
+        missing = trip.spots - state.taken[trip.id]
+        if missing > 0:
+            unfilled.append({'trip_id': trip.id, 'title': trip.title, 'trip_date': trip.trip_date, 'missing': missing})
+    return {'start': start, 'end': end, 'changes': changes, 'unfilled': unfilled,
+            'trips': len(trips), 'fingerprint': fingerprint(changes)}
+
+
+def apply_plan(start, end, expected_fingerprint):
+    """
+    Przelicza plan i zapisuje go jedną transakcją (masowy INSERT nowych zapisów
+    i UPDATE rezerwowych) wraz z powiadomieniami e-mail - po jednym na pracownika.
+    Zlecenia zakresu są blokowane przed przeliczeniem, więc równoległy zapis
+    pracownika (signup_trip) czeka na koniec transakcji albo zmienia odcisk planu.
+    Zwraca plan albo None, gdy od podglądu zmieniły się zapisy lub zlecenia
+    (plan ma inny odcisk). Wywołujący zatwierdza (lub wycofuje) transakcję.
+    """
+    from extensions import db, journal
+    from models import Signup, Trip, User
+    from utils import send_email_in_background
+    Trip.lock(Trip.trip_date >= start, Trip.trip_date <= end)
+    plan = build_plan(start, end)
+    if plan['fingerprint'] != expected_fingerprint:
+        return None
+    changes = plan['changes']
+    new_rows = [{'trip_id': change['trip_id'], 'user_id': change['user_id'], 'status': change['status']}
+                for change in changes if change['signup_id'] is None]
+    if new_rows:
+        inserted = db.session.execute(
+            insert(Signup).returning(Signup.id, Signup.trip_id, sort_by_parameter_order=True), new_rows
+        ).all()
+        # Masowy INSERT omija zdarzenia ORM dziennika zmian
+        journal.record(db.session, 'signup', [(row.id, row.trip_id) for row in inserted], 'insert')
+    promoted = [{'id': change['signup_id'], 'status': change['status']} for change in changes if change['signup_id']]
+    if promoted:
+        db.session.execute(update(Signup), promoted)
+
+    by_user = defaultdict(list)
+    for change in changes:
+        by_user[change['user_id']].append(change)
+    if by_user:
+        emails = dict(db.session.execute(select(User.id, User.email).where(User.id.in_(by_user))).all())
+        for user_id, items in by_user.items():
+            send_email_in_background(emails[user_id], 'Nowe zlecenia w grafiku', 'emaile/roster_assignment',
+                                     name=items[0]['name'], changes=items)
+    return plan
@@ -1,21 +1,24 @@
 import io
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, Response, current_app
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, Response, current_app, abort, send_from_directory
 from flask_login import login_required, current_user
 # Poprawka: Dodano 'asc' do importów sqlalchemy
 from sqlalchemy import func, extract, or_, asc
 # --- POPRAWKA 3.1: Importujemy 'joinedload' i 'subqueryload' ---
-from sqlalchemy.orm import joinedload, subqueryload
+from sqlalchemy.orm import joinedload, subqueryload, lazyload
 from datetime import datetime, date, timedelta, time 
 import pandas as pd
 
 from models import db, User, Trip, Signup
+from extensions import throttle, metrics, slow_queries, profiler
 from utils import admin_or_manager_required, send_email_in_background
-# --- POPRAWKA 3.1: Usunięto import, który mógł powodować cykliczną zależność ---
-# Usunięto: from .trips import auto_signup_golden_workers
-# Logika auto_signup_golden_workers powinna być przeniesiona do 'utils.py', 
-# aby uniknąć importowania jednego modułu 'routes' z drugiego.
-# Na razie zakładam, że ta funkcja jest dostępna globalnie lub w 'utils'.
-# Jeśli nie, przenieś 'auto_signup_golden_workers' do 'utils.py'.
+from jobs import archive_old_trips
+from search import trip_filter
+from availability import STATUSES, build_matrix, parse_month
+from settlement_summary import monthly_report
+from roster import apply_plan, build_plan, parse_range
+# Import z routes.trips nie tworzy cyklu - trips nie importuje modułu admin
+# (wcześniejszy import z 'utils' kończył każdy import Excela z nowymi zleceniami błędem)
+from routes.trips import auto_signup_golden_workers
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -28,7 +31,7 @@ def settlements():
     if request.method == 'POST':
         # ... (Logika POST bez zmian) ...
         try:
-            trips_to_update = {}
+            form_fields = []
             
             for key, value in request.form.items():
                 if '-' not in key:
@@ -40,10 +43,18 @@ def settlements():
                 except ValueError:
                     continue 
 
-                if trip_id not in trips_to_update:
-                    trips_to_update[trip_id] = db.session.get(Trip, trip_id)
-                
-                trip = trips_to_update[trip_id]
+                form_fields.append((field, trip_id, value))
+
+            # Wszystkie zlecenia z formularza jednym zapytaniem. db.session.get() w pętli
+            # to osobny SELECT (i autoflush poprzednich zmian) dla każdego zlecenia.
+            trip_ids = {trip_id for _, trip_id, _ in form_fields}
+            trips_to_update = {
+                trip.id: trip
+                for trip in Trip.query.filter(Trip.id.in_(trip_ids)).options(lazyload(Trip.signups))
+            } if trip_ids else {}
+
+            for field, trip_id, value in form_fields:
+                trip = trips_to_update.get(trip_id)
                 if not trip:
                     continue
                 
@@ -97,7 +108,8 @@ def settlements():
     )
 
     if search_text:
-        query = query.filter(Trip.title.ilike(f'%{search_text}%'))
+        # Indeks pełnotekstowy (search.py) zamiast ILIKE '%...%' skanującego całą tabelę
+        query = query.filter(trip_filter(search_text))
     
     current_year = date.today().year
     query = query.filter(extract('year', Trip.trip_date) == current_year)
@@ -110,12 +122,12 @@ def settlements():
 
     today = date.today()
     
+    # Jedno zapytanie (plus jedno dla zapisów) zamiast osobnych dla przyszłych i przeszłych zleceń
+    trips = query.order_by(Trip.trip_date.asc()).all()
     # Zlecenia przyszłe: od dzisiaj włącznie, posortowane rosnąco
-    # Zapytanie .filter() odziedziczy 'options' z 'query'
-    future_trips = query.filter(Trip.trip_date >= today).order_by(Trip.trip_date.asc()).all()
-    
+    future_trips = [trip for trip in trips if trip.trip_date >= today]
     # Zlecenia przeszłe: do wczoraj włącznie, posortowane rosnąco
-    past_trips = query.filter(Trip.trip_date < today).order_by(Trip.trip_date.asc()).all()
+    past_trips = [trip for trip in trips if trip.trip_date < today]
     
     filter_values = {
         'search_text': search_text,
@@ -131,6 +143,200 @@ def settlements():
     )
 
 
+# --- Podsumowanie rozliczeń miesiąca ---
+@admin_bp.route('/settlements/summary')
+@login_required
+@admin_or_manager_required
+def settlement_report():
+    """
+    Godziny, kilometry i przejazdy jako pasażer na pracownika w miesiącu ('month' = RRRR-MM),
+    odczytane z monthly_settlement (settlement_summary.py). 'format=xlsx' - plik Excel.
+    """
+    parsed = parse_month(request.args.get('month'))
+    if parsed is None:
+        abort(400)
+    year, month = parsed
+    month_key = f'{year:04d}-{month:02d}'
+    rows = monthly_report(month_key)
+    # Pasażer dotyczy kierowników (jak w eksporcie grafiku)
+    report = [{
+        'surname': row.surname, 'name': row.name, 'agency': row.agency, 'trips': row.trips,
+        'hours': row.hours, 'kilometers': row.kilometers, 'missing_hours': row.missing_hours,
+        'passenger_trips': row.passenger_trips if row.status in ['admin', 'kierownik'] else None,
+    } for row in rows]
+
+    if request.args.get('format') == 'xlsx':
+        df = pd.DataFrame(report, columns=['surname', 'name', 'agency', 'trips', 'hours', 'kilometers',
+                                           'passenger_trips', 'missing_hours'])
+        df.columns = ['nazwisko', 'imie', 'agencja', 'zlecenia', 'godziny', 'ilosc_km', 'pasażer', 'bez_godzin']
+        output = io.BytesIO()
+        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            df.to_excel(writer, index=False, sheet_name=month_key)
+        output.seek(0)
+        return Response(
+            output,
+            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            headers={"Content-Disposition": f"attachment;filename=rozliczenie_{month_key}.xlsx"}
+        )
+
+    first = date(year, month, 1)
+    return render_template(
+        'admin_settlement_summary.html',
+        month=month_key,
+        report=report,
+        totals={key: sum(item[key] or 0 for item in report) for key in ('trips', 'hours', 'kilometers', 'passenger_trips', 'missing_hours')},
+        previous_month=(first - timedelta(days=1)).strftime('%Y-%m'),
+        next_month=(first + timedelta(days=32)).strftime('%Y-%m')
+    )
+
+
+# --- Macierz dostępności ---
+@admin_bp.route('/matrix')
+@login_required
+@admin_or_manager_required
+def matrix():
+    """
+    Pracownicy x dni miesiąca ('month' = RRRR-MM) ze statusami zapisów i wolnymi
+    miejscami dnia (availability.py). 'format=json' zwraca te same dane jako JSON.
+    """
+    parsed = parse_month(request.args.get('month'))
+    if parsed is None:
+        abort(400)
+    year, month = parsed
+    data = build_matrix(year, month)
+    if request.args.get('format') == 'json':
+        response = jsonify({**data, 'days': [day.isoformat() for day in data['days']]})
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    first = date(year, month, 1)
+    previous_month = (first - timedelta(days=1)).strftime('%Y-%m')
+    next_month = (first + timedelta(days=32)).strftime('%Y-%m')
+    return render_template(
+        'admin_matrix.html',
+        matrix=data,
+        rows=zip(data['users'], data['cells']),
+        statuses=STATUSES[1:],
+        previous_month=previous_month,
+        next_month=next_month,
+        today=date.today()
+    )
+
+
+# --- Automatyczna obsada zleceń ---
+@admin_bp.route('/roster', methods=['GET', 'POST'])
+@login_required
+@admin_or_manager_required
+def roster():
+    """
+    Podgląd planu obsady wolnych miejsc zleceń od 'start' do 'end' (RRRR-MM-DD,
+    roster.py). POST zapisuje plan jedną transakcją, jeśli od podglądu nie
+    zmieniły się zapisy (pole 'fingerprint' z podglądu).
+    """
+    values = request.form if request.method == 'POST' else request.args
+    parsed = parse_range(values.get('start'), values.get('end'))
+    if parsed is None:
+        abort(400)
+    start, end = parsed
+
+    if request.method == 'POST':
+        try:
+            plan = apply_plan(start, end, request.form.get('fingerprint', ''))
+            if plan is None:
+                db.session.rollback() # Zwalnia blokadę zleceń
+                flash('Zapisy zmieniły się od przygotowania planu. Sprawdź nowy plan i zatwierdź go ponownie.', 'warning')
+            else:
+                db.session.commit()
+                flash(f"Zapisano plan: {len(plan['changes'])} przydziałów.", 'success')
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Błąd zapisu planu obsady {start} - {end}: {e}")
+            flash('Nie udało się zapisać planu obsady.', 'error')
+        return redirect(url_for('admin.roster', start=start.isoformat(), end=end.isoformat()))
+
+    plan = build_plan(start, end)
+    if request.args.get('format') == 'json':
+        response = jsonify({
+            **plan, 'start': start.isoformat(), 'end': end.isoformat(),
+            'changes': [{**change, 'trip_date': change['trip_date'].isoformat()} for change in plan['changes']],
+            'unfilled': [{**item, 'trip_date': item['trip_date'].isoformat()} for item in plan['unfilled']],
+        })
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    return render_template('admin_roster.html', plan=plan)
+
+
+# --- Liczniki limitów żądań ---
+@admin_bp.route('/throttle-stats')
+@login_required
+@admin_or_manager_required
+def throttle_stats():
+    """Zwraca liczniki dozwolonych/zablokowanych prób dla każdej reguły throttlingu."""
+    return jsonify(throttle.stats())
+
+
+# --- Metryki wydajności ---
+@admin_bp.route('/metrics')
+@login_required
+@admin_or_manager_required
+def metrics_export():
+    """Metryki żądań, zapytań SQL i kolejki RQ w formacie tekstowym Prometheus (dane tego procesu)."""
+    return Response(metrics.expose(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@admin_bp.route('/slow-queries')
+@login_required
+@admin_or_manager_required
+def slow_queries_report():
+    """Najwolniejsze zapytania SQL tego procesu (wg łącznego czasu) wraz z planem wykonania."""
+    return render_template(
+        'admin_slow_queries.html',
+        entries=slow_queries.top(),
+        threshold=current_app.config['SLOW_QUERY_THRESHOLD_MS'],
+        skipped_plans=slow_queries.skipped_plans()
+    )
+
+
+@admin_bp.route('/slow-queries/reset', methods=['POST'])
+@login_required
+@admin_or_manager_required
+def reset_slow_queries():
+    slow_queries.reset()
+    flash('Wyczyszczono podsumowanie wolnych zapytań.', 'success')
+    return redirect(url_for('admin.slow_queries_report'))
+
+
+# --- Profilowanie żądań ---
+@admin_bp.route('/profiles', methods=['GET', 'POST'])
+@login_required
+@admin_or_manager_required
+def profiles():
+    """Lista ostatnich raportów profilowania i włączanie profilowania własnej sesji."""
+    if request.method == 'POST':
+        minutes = request.form.get('minutes', type=int) or 0
+        profiler.enable_for_session(min(minutes, 60))
+        if minutes > 0:
+            flash(f'Twoje żądania będą profilowane przez {min(minutes, 60)} min.', 'success')
+        else:
+            flash('Wyłączono profilowanie sesji.', 'info')
+        return redirect(url_for('admin.profiles'))
+    return render_template(
+        'admin_profiles.html',
+        reports=profiler.recent(),
+        active_until=profiler.session_active_until(),
+        sample_rate=current_app.config['PROFILER_SAMPLE_RATE']
+    )
+
+
+@admin_bp.route('/profiles/<name>')
+@login_required
+@admin_or_manager_required
+def download_profile(name):
+    if not profiler.is_report_name(name):
+        abort(404)
+    return send_from_directory(profiler.directory(), name, as_attachment=name.endswith('.prof'))
+
+
 # --- Zarządzanie Użytkownikami ---
 @admin_bp.route('/users')
 @login_required
@@ -210,25 +416,23 @@ def set_user_agency(user_id):
 def archive():
     # --- POPRAWKA 3.1: Dodajemy 'options' do zapytania o archiwum ---
     # Podobnie jak w 'settlements', ładujemy 'manager' od razu.
-    archived_trips = Trip.query.filter_by(is_archived=True).order_by(Trip.trip_date.desc()).options(
+    query = Trip.query.filter_by(is_archived=True)
+    search_text = request.args.get('q', '').strip()
+    if search_text:
+        query = query.filter(trip_filter(search_text))
+    archived_trips = query.order_by(Trip.trip_date.desc()).options(
         joinedload(Trip.manager)
     ).all()
-    return render_template('archive.html', trips=archived_trips)
+    return render_template('archive.html', trips=archived_trips, search_text=search_text)
 
 
 @admin_bp.route('/archive/run', methods=['POST'])
 @login_required
 @admin_or_manager_required
 def run_archive():
-    # ... (Logika bez zmian, to jest UPDATE, nie generuje N+1) ...
+    # Ta sama archiwizacja co nocne zadanie harmonogramu (paczkami, ARCHIVE_AFTER_DAYS)
     try:
-        six_months_ago = date.today() - timedelta(days=180)
-        updated_count = db.session.query(Trip).filter(
-            Trip.trip_date < six_months_ago, 
-            Trip.is_archived == False
-        ).update({'is_archived': True}, synchronize_session=False) 
-            
-        db.session.commit()
+        updated_count = archive_old_trips()
         flash(f'Pomyślnie zarchiwizowano {updated_count} zleceń.', 'success')
     except Exception as e:
         db.session.rollback()
@@ -365,18 +569,13 @@ def import_excel():
             # Ten 'all()' jest OK, to pojedyncze zapytanie
             users_to_notify = User.query.filter(User.status.in_(['pracownik', 'złoty pracownik'])).all()
             
-            # --- UWAGA ---
-            # Tutaj występuje problem N+1 (N to liczba nowych zleceń)
-            # Rozwiązanie (Audyt 2.2) już masz - wysyłka e-maili przez RQ.
-            # To jest "problem N+1 operacji", a nie "N+1 zapytań".
-            from utils import auto_signup_golden_workers # Tymczasowy import, przenieś do utils.py
-            
+            # Wiadomości trafiają do skrzynki nadawczej (outbox.py) w tej samej
+            # transakcji co zapisy - wysyła je dispatcher po zatwierdzeniu.
             for trip in newly_created_trips:
                 db.session.add(Signup(trip_id=trip.id, user_id=current_user.id, status='potwierdzony'))
                 auto_signup_golden_workers(trip)
                 for user in users_to_notify:
-                    # Zakładamy, że ta funkcja jest już asynchroniczna (zgodnie z Priorytetem 1)
-                    send_email_in_background(user.email, f'Nowe zlecenie: {trip.title}', 'email/new_trip', trip=trip, user=user)
+                    send_email_in_background(user.email, f'Nowe zlecenie: {trip.title}', 'emaile/new_trip', trip=trip, user=user)
 
             db.session.commit()
 
@@ -1,13 +1,13 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app # <-- Dodano import current_app
+from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, make_response # <-- Dodano import current_app
 # --- POPRAWKA ---
 # Dodano 'login_required' do importu, co naprawia błąd 'NameError'
 from flask_login import login_user, logout_user, current_user, login_required
 from datetime import datetime
 
 # Importujemy obiekty z głównych plików aplikacji
-# --- POPRAWKA: Importujemy 'rq' z extensions ---
-from extensions import db, rq
+from extensions import db, throttle
 from models import User
+from hashing import HashingBusyError
 from utils import send_email_in_background
 # Importujemy klasy formularzy z forms.py
 from forms import LoginForm, RegisterForm, ResetRequestForm, ResetPasswordForm
@@ -15,6 +15,15 @@ from forms import LoginForm, RegisterForm, ResetRequestForm, ResetPasswordForm
 # Tworzymy Blueprint o nazwie 'auth'
 auth_bp = Blueprint('auth', __name__)
 
+
+def _too_many_requests(result, template, **context):
+    """Odpowiedź 429 z nagłówkiem Retry-After (bez haszowania i bez wysyłki e-maili)."""
+    flash(f'Zbyt wiele prób. Spróbuj ponownie za {result.retry_after} s.', 'error')
+    response = make_response(render_template(template, **context), 429)
+    response.headers['Retry-After'] = str(result.retry_after)
+    return response
+
+
 # --- Trasy Związane z Uwierzytelnianiem ---
 
 @auth_bp.route('/register', methods=['GET', 'POST'])
@@ -34,27 +43,23 @@ def register():
             agency=form.agency.data,
             accepted_tos=form.accept_tos.data
         )
-        new_user.set_password(form.password.data)
+        try:
+            new_user.set_password(form.password.data)
+        except HashingBusyError as e:
+            current_app.logger.warning(f"Odrzucono rejestrację (przeciążenie haszowania): {e}")
+            flash('Serwer jest chwilowo przeciążony. Spróbuj zarejestrować się ponownie za chwilę.', 'error')
+            return render_template('register.html', form=form), 503
 
         if User.query.count() == 0:
             new_user.status = 'admin'
 
         try:
             db.session.add(new_user)
+            # E-mail powitalny trafia do skrzynki nadawczej w tej samej transakcji co konto
+            email_ok = send_email_in_background(new_user.email, 'Witaj w Grafiku!', 'emaile/welcome', user=new_user)
             db.session.commit()
 
-            # --- POPRAWKA: Używamy rq.get_queue().enqueue ---
-            try:
-                rq.get_queue().enqueue(
-                    send_email_in_background,
-                    new_user.email,
-                    'Witaj w Grafiku!',
-                    'email/welcome',
-                    user=new_user
-                )
-            except Exception as e:
-                # Logowanie błędu kolejki, ale kontynuacja rejestracji
-                current_app.logger.error(f"Nie udało się zakolejkować e-maila powitalnego: {e}")
+            if not email_ok:
                 flash('Rejestracja pomyślna, ale wystąpił problem z wysyłką e-maila powitalnego.', 'warning')
                 return redirect(url_for('auth.login'))
 
@@ -78,10 +83,28 @@ def login():
 
     form = LoginForm() # Używamy klasy formularza
 
+    # Limit per IP sprawdzamy przed walidacją i haszowaniem hasła
+    if request.method == 'POST':
+        limited = throttle.check(('login_ip', request.remote_addr))
+        if not limited.allowed:
+            return _too_many_requests(limited, 'login.html', form=form)
+
     if form.validate_on_submit():
+        limited = throttle.check(('login_email', form.email.data.strip().lower()))
+        if not limited.allowed:
+            return _too_many_requests(limited, 'login.html', form=form)
+
         user = User.query.filter_by(email=form.email.data).first()
 
-        if not user or not user.check_password(form.password.data):
+        try:
+            password_ok = user is not None and user.check_password(form.password.data)
+        except HashingBusyError as e:
+            # Pula haszująca jest pełna - odrzucamy szybko zamiast blokować wątek
+            current_app.logger.warning(f"Odrzucono logowanie (przeciążenie haszowania): {e}")
+            flash('Serwer jest chwilowo przeciążony. Spróbuj zalogować się ponownie za chwilę.', 'error')
+            return render_template('login.html', form=form), 503
+
+        if not password_ok:
             # Flash będzie wyświetlony po przekierowaniu, ale musimy użyć redirect dla Flask-WTF
             flash('Nieprawidłowy e-mail lub hasło.', 'error')
             return redirect(url_for('auth.login'))
@@ -90,6 +113,16 @@ def login():
             flash('Twoje konto jest zablokowane. Skontaktuj się z administratorem.', 'error')
             return redirect(url_for('auth.login'))
 
+        # Przeliczenie hasha, jeśli zapisano go starymi parametrami (np. po zmianie metody)
+        try:
+            if user.rehash_password_if_needed(form.password.data):
+                db.session.commit()
+        except HashingBusyError:
+            pass # Spróbujemy przy następnym logowaniu
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Nie udało się przeliczyć hasha hasła dla {user.email}: {e}")
+
         login_user(user, remember=form.remember.data) # Odczytanie stanu checkboxa "zapamiętaj mnie"
 
         next_page = request.args.get('next')
@@ -113,24 +146,27 @@ def reset_request():
 
     form = ResetRequestForm() # Używamy klasy formularza
 
+    if request.method == 'POST':
+        limited = throttle.check(('reset_ip', request.remote_addr))
+        if not limited.allowed:
+            return _too_many_requests(limited, 'reset_request.html', form=form)
+
     if form.validate_on_submit():
+        # Limit per e-mail chroni przed zasypaniem skrzynki (i kolejki) linkami resetu
+        limited = throttle.check(('reset_email', form.email.data.strip().lower()))
+        if not limited.allowed:
+            return _too_many_requests(limited, 'reset_request.html', form=form)
+
         user = User.query.filter_by(email=form.email.data).first()
         if user:
             token = user.get_reset_token()
             reset_url = url_for('auth.reset_token', token=token, _external=True)
 
-            # --- POPRAWKA: Używamy rq.get_queue().enqueue ---
-            try:
-                rq.get_queue().enqueue(
-                    send_email_in_background,
-                    user.email,
-                    'Resetowanie hasła - Grafik',
-                    'email/reset_password',
-                    user=user,
-                    reset_url=reset_url
-                )
-            except Exception as e:
-                current_app.logger.error(f"Nie udało się zakolejkować e-maila resetującego hasło: {e}")
+            # E-mail z linkiem przez skrzynkę nadawczą (outbox.py)
+            email_ok = send_email_in_background(user.email, 'Resetowanie hasła - Grafik', 'emaile/reset_password',
+                                                user=user, token=token, reset_url=reset_url)
+            db.session.commit()
+            if not email_ok:
                 # Nadal pokazujemy komunikat sukcesu, aby nie ujawniać istnienia konta
                 flash('Jeśli konto istnieje, wysłano instrukcję resetowania hasła (problem z wysyłką).', 'warning')
                 return redirect(url_for('auth.login'))
@@ -159,6 +195,11 @@ def reset_token(token):
             db.session.commit()
             flash('Twoje hasło zostało zaktualizowane! Możesz się teraz zalogować.', 'success')
             return redirect(url_for('auth.login'))
+        except HashingBusyError as e:
+            db.session.rollback()
+            current_app.logger.warning(f"Odrzucono zmianę hasła po resecie (przeciążenie haszowania): {e}")
+            flash('Serwer jest chwilowo przeciążony. Spróbuj ponownie za chwilę.', 'error')
+            return render_template('reset_token.html', form=form, token=token), 503
         except Exception as e:
             db.session.rollback()
             current_app.logger.error(f"Błąd podczas zmiany hasła po resecie: {e}") # <-- Poprawiono NameError
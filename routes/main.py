@@ -3,10 +3,18 @@ Trasy (routes) dla głównych funkcji aplikacji (dashboard, profil)
 Plik: routes/main.py
 """
 import re
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, current_app
+import json
+import time
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, current_app, make_response, Response, abort, stream_with_context
 from flask_login import login_required, current_user
 from datetime import datetime, date
+from flask_wtf.csrf import generate_csrf
 from models import db, User, Recipient, Trip
+from assets import VENDOR_SOURCES
+from broker import BrokerFullError
+from hashing import HashingBusyError
+from search import search_trips
+from calendar_feed import feed_state, iter_feed, window_start
 # Importujemy formularze z pliku forms.py
 from forms import ChangePasswordForm, ChangeDetailsForm, ThemeForm, RecipientForm
 
@@ -20,10 +28,29 @@ main_bp = Blueprint('main', __name__)
 @login_required
 def dashboard():
     """Wyświetla główny panel (dashboard) po zalogowaniu."""
-    return render_template(
+    fullcalendar_js = VENDOR_SOURCES['fullcalendar']['path']
+    response = make_response(render_template(
         'dashboard.html',
-        title="Panel Główny"
-    )
+        title="Panel Główny",
+        fullcalendar_js=fullcalendar_js
+    ))
+    # Kalendarz jest największym skryptem strony - przeglądarka zacznie go pobierać od razu
+    return current_app.extensions['assets'].preload(response, fullcalendar_js, 'script')
+
+@main_bp.route('/service-worker.js')
+def service_worker():
+    """
+    Zwraca service workera wygenerowanego z manifestu zasobów.
+    Serwowany z katalogu głównego, aby obejmował całą aplikację (scope '/').
+    """
+    body, version = current_app.extensions['assets'].service_worker()
+    response = make_response(body)
+    response.mimetype = 'application/javascript'
+    # Przeglądarka musi zawsze sprawdzić, czy jest nowa wersja (wystarczy 304)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Service-Worker-Allowed'] = '/'
+    response.set_etag(version)
+    return response.make_conditional(request)
 
 @main_bp.route('/privacy-policy')
 def privacy_policy():
@@ -68,14 +95,21 @@ def profile_change_password():
     recipient_form = RecipientForm()
     recipients = Recipient.query.filter_by(user_id=current_user.id).all()
 
+    status = 200
     if password_form.validate_on_submit():
-        if current_user.check_password(password_form.old_password.data):
-            current_user.set_password(password_form.new_password.data)
-            db.session.commit()
-            flash('Hasło zostało pomyślnie zaktualizowane.', 'success')
-            return redirect(url_for('main.profile'))
-        else:
-            flash('Nieprawidłowe stare hasło.', 'error')
+        try:
+            if current_user.check_password(password_form.old_password.data):
+                current_user.set_password(password_form.new_password.data)
+                db.session.commit()
+                flash('Hasło zostało pomyślnie zaktualizowane.', 'success')
+                return redirect(url_for('main.profile'))
+            else:
+                flash('Nieprawidłowe stare hasło.', 'error')
+        except HashingBusyError as e:
+            db.session.rollback()
+            current_app.logger.warning(f"Odrzucono zmianę hasła (przeciążenie haszowania): {e}")
+            flash('Serwer jest chwilowo przeciążony. Spróbuj zmienić hasło ponownie za chwilę.', 'error')
+            status = 503
     else:
         # Przechwyć błędy walidacji (np. niezgodne hasła)
         for field, errors in password_form.errors.items():
@@ -91,7 +125,7 @@ def profile_change_password():
         theme_form=theme_form,
         recipient_form=recipient_form,
         recipients=recipients
-    )
+    ), status
 
 # === POPRAWKA: Dodajemy jawny 'endpoint', aby pasował do szablonów ===
 @main_bp.route('/profile/update-details', methods=['POST'], endpoint='update_details')
@@ -192,22 +226,170 @@ def profile_delete_recipient(recipient_id):
 def api_events():
     """
     Zwraca listę zleceń w formacie JSON dla kalendarza (FullCalendar).
+    Opcjonalne parametry 'start'/'end' (wysyłane przez FullCalendar) zawężają
+    wynik do widocznego zakresu. Odpowiedź ma ETag - niezmienione dane to 304.
     """
     try:
-        trips = Trip.query.filter_by(is_archived=False).all()
+        # Kursor sprzed odczytu - zmiana w trakcie zapytania zostanie po prostu pobrana ponownie
+        cursor = current_app.extensions['change_journal'].cursor()
+        query = Trip.query.filter_by(is_archived=False)
+        start = _parse_calendar_date(request.args.get('start'))
+        end = _parse_calendar_date(request.args.get('end'))
+        if start:
+            query = query.filter(Trip.trip_date >= start)
+        if end:
+            query = query.filter(Trip.trip_date < end)
+        trips = query.order_by(Trip.trip_date, Trip.id).all()
         
-        events = []
-        for trip in trips:
-            events.append({
-                'id': trip.id,
-                'title': trip.title,
-                'start': trip.trip_date.isoformat(), # Wymagany format YYYY-MM-DD
-            })
-        return jsonify(events)
+        events = [_trip_event(trip) for trip in trips]
+        response = jsonify(events)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        # Punkt startowy dla /api/events/changes (poza treścią, aby nie psuć ETag)
+        response.headers['X-Change-Cursor'] = str(cursor)
+        response.add_etag()
+        return response.make_conditional(request)
     except Exception as e:
         current_app.logger.error(f"Błąd w api_events: {e}")
         return jsonify({"error": "Błąd serwera"}), 500
 
+@main_bp.route('/api/events/changes')
+@login_required
+def api_events_changes():
+    """
+    Zwraca tylko zlecenia zmienione od kursora 'since' (z dziennika zmian):
+    'changed' - aktualne dane zleceń, 'deleted' - id usuniętych lub zarchiwizowanych.
+    'reset': true oznacza, że klient powinien pobrać zlecenia od nowa.
+    """
+    since = request.args.get('since', type=int)
+    if since is None or since < 0:
+        return jsonify({'error': "Brak lub niepoprawny parametr 'since'."}), 400
+
+    cursor, trip_ids, reset = current_app.extensions['change_journal'].changes_since(since)
+    changed, deleted = [], []
+    if trip_ids:
+        trips = {trip.id: trip for trip in Trip.query.filter(Trip.id.in_(trip_ids))}
+        for trip_id in sorted(trip_ids):
+            trip = trips.get(trip_id)
+            if trip is None or trip.is_archived:
+                deleted.append(trip_id)
+            else:
+                changed.append(_trip_event(trip))
+
+    response = jsonify({'cursor': cursor, 'reset': reset, 'changed': changed, 'deleted': deleted})
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@main_bp.route('/api/search')
+@login_required
+def api_search():
+    """
+    Wyszukiwanie zleceń po tytule i uwagach (indeks pełnotekstowy, search.py).
+    'q' - tekst, 'scope' - 'active' (domyślnie), 'archived' lub 'all';
+    archiwum przeszukują tylko admin i kierownik. Wyniki od najlepiej dopasowanych.
+    """
+    query = request.args.get('q', '').strip()
+    scope = request.args.get('scope', 'active')
+    archived = {'active': False, 'archived': True, 'all': None}.get(scope, 'invalid')
+    if archived == 'invalid':
+        return jsonify({'error': "Niepoprawny parametr 'scope'."}), 400
+    if archived is not False and current_user.status not in ['admin', 'kierownik']:
+        return jsonify({'error': 'Brak uprawnień do przeszukiwania archiwum.'}), 403
+    limit = min(request.args.get('limit', current_app.config['SEARCH_RESULTS_LIMIT'], type=int) or 1, 100)
+
+    results = search_trips(query, archived=archived, limit=limit)
+    for result in results:
+        result['url'] = url_for('trips.trip_details', trip_id=result['id'])
+    response = jsonify({'query': query, 'results': results})
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@main_bp.route('/calendar/<token>.ics')
+def calendar_feed(token):
+    """
+    Subskrypcja kalendarza ICS z zleceniami użytkownika (calendar_feed.py) -
+    bez logowania, dostęp daje podpisany token z linku. Niezmienione zapisy
+    to 304 po jednym zapytaniu; w przeciwnym razie plik jest wysyłany strumieniowo.
+    """
+    start = window_start()
+    state = feed_state(token, start)
+    if state is None:
+        abort(404)
+    user_id, etag = state
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(stream_with_context(iter_feed(user_id, start, 'Grafik - moje zlecenia', request.host)),
+                            mimetype='text/calendar')
+        response.headers['Content-Disposition'] = 'inline; filename="grafik.ics"'
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@main_bp.route('/api/stream')
+@login_required
+def api_stream():
+    """
+    Strumień Server-Sent Events z powiadomieniami o zmianach zleceń.
+    Powiadomienie nie zawiera danych - klient pobiera je z /api/events/changes.
+    """
+    broker = current_app.extensions['event_broker']
+    try:
+        subscription = broker.subscribe()
+    except BrokerFullError:
+        response = jsonify({'error': 'Zbyt wiele połączeń na żywo - spróbuj później.'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+
+    heartbeat = current_app.config['SSE_HEARTBEAT']
+    deadline = time.monotonic() + current_app.config['SSE_MAX_DURATION']
+
+    # Generator działa bez kontekstu żądania - nie trzyma połączenia z bazą
+    def stream():
+        try:
+            yield 'retry: 5000\n\n'
+            while time.monotonic() < deadline:
+                message = subscription.get(timeout=heartbeat)
+                if message is None:
+                    yield ': ping\n\n'  # komentarz podtrzymujący połączenie (proxy, NAT)
+                    continue
+                yield f'event: {message.event}\ndata: {json.dumps(message.data)}\n\n'
+        finally:
+            broker.unsubscribe(subscription)
+
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # nginx: bez buforowania odpowiedzi
+    })
+
+def _trip_event(trip):
+    """Zlecenie w formacie zdarzenia FullCalendar."""
+    return {
+        'id': trip.id,
+        'title': trip.title,
+        'start': trip.trip_date.isoformat(), # Wymagany format YYYY-MM-DD
+    }
+
+def _parse_calendar_date(value):
+    """Zamienia datę z FullCalendar (np. '2025-11-01T00:00:00+01:00') na date lub None."""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        return None
+
+@main_bp.route('/api/csrf-token')
+@login_required
+def api_csrf_token():
+    """
+    Zwraca świeży token CSRF dla akcji wysyłanych z kolejki offline
+    (token zapisany w stronie mógł wygasnąć, zanim wróciło połączenie).
+    """
+    response = jsonify({'csrf_token': generate_csrf()})
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
 @main_bp.route('/api/trip-details-fragment/<int:trip_id>')
 @login_required
 def api_trip_details_fragment(trip_id):
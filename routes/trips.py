@@ -6,14 +6,15 @@ from sqlalchemy.orm import joinedload, subqueryload
 from datetime import datetime, date, time
 
 # Importy z głównych plików aplikacji
-from extensions import db, rq # RQ jest potrzebne do ewentualnych powiadomień
+from extensions import db
 from models import Trip, Signup, User, Recipient
 
 # --- POPRAWKA (BŁĄD IMPORTU Z TESTÓW) ---
 # Usunięto import 'from forms import TripForm, SignupForm', który powodował błąd,
 # ponieważ ten plik nie używa klas Flask-WTF do definiowania formularzy.
 
-from utils import admin_or_manager_required, send_email_in_background
+from utils import admin_or_manager_required, send_email_in_background, idempotent
+from trip_batch import WEEKDAY_NAMES, create_trips, enqueue_notification, series_dates, validate_rows
 
 trips_bp = Blueprint('trips', __name__)
 
@@ -83,22 +84,20 @@ def add_trip():
         
         # Automatyczny zapis "złotych pracowników"
         auto_signup_golden_workers(new_trip)
-        
-        db.session.commit() # Commit dla zapisów
 
-        # Powiadomienie e-mail (asynchronicznie)
+        # Powiadomienie e-mail - skrzynka nadawcza (outbox.py), zapisywane razem z zapisami
         users_to_notify = User.query.filter(User.status.in_(['pracownik', 'złoty pracownik'])).all()
         for user in users_to_notify:
-            # Używamy rq.enqueue importowanego z extensions
-            rq.enqueue(
-                send_email_in_background, 
-                user.email, 
-                f'Nowe zlecenie w grafiku: {new_trip.title}', 
-                'email/new_trip', 
-                trip=new_trip, 
+            send_email_in_background(
+                user.email,
+                f'Nowe zlecenie w grafiku: {new_trip.title}',
+                'emaile/new_trip',
+                trip=new_trip,
                 user=user
             )
 
+        db.session.commit() # Commit dla zapisów i powiadomień
+
         flash('Nowe zlecenie zostało dodane.', 'success')
         # Po utworzeniu zlecenia, przejdź do jego szczegółów
         return redirect(url_for('trips.trip_details', trip_id=new_trip.id))
@@ -106,6 +105,76 @@ def add_trip():
     return render_template('add_trip.html', form_data={})
 
 
+@trips_bp.route('/batch', methods=['POST'])
+@login_required
+@admin_or_manager_required
+def add_trips_batch():
+    """
+    Masowe dodawanie zleceń z JSON: {"trips": [{"title", "trip_date", "spots", ...}]}
+    (trip_batch.py). Błąd w dowolnym wierszu odrzuca całą paczkę - odpowiedź 400
+    z listą błędów; po zapisie 201 z id nowych zleceń.
+    """
+    payload = request.get_json(silent=True)
+    rows, errors = validate_rows(payload.get('trips') if isinstance(payload, dict) else None)
+    if errors:
+        return jsonify({'status': 'error', 'errors': errors}), 400
+    try:
+        trip_ids = create_trips(rows, current_user.id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Błąd w add_trips_batch ({len(rows)} zleceń): {e}")
+        return jsonify({'status': 'error', 'message': 'Wystąpił nieoczekiwany błąd serwera.'}), 500
+    enqueue_notification(trip_ids)
+    return jsonify({'status': 'success', 'created': len(trip_ids), 'ids': trip_ids}), 201
+
+
+@trips_bp.route('/series', methods=['GET', 'POST'])
+@login_required
+@admin_or_manager_required
+def add_trip_series():
+    """
+    Seria zleceń w wybrane dni tygodnia (np. wtorki i czwartki przez trzy miesiące)
+    dodawana jednym zapisem - jak /trip/batch, ale z formularza.
+    """
+    if request.method == 'POST':
+        form = request.form
+        weekdays = sorted({int(day) for day in form.getlist('weekdays') if day.isdigit() and int(day) < 7})
+        try:
+            start = date.fromisoformat(form.get('start_date', ''))
+            end = date.fromisoformat(form.get('end_date', ''))
+        except ValueError:
+            flash('Podaj poprawne daty początku i końca serii.', 'error')
+            return render_template('add_trip_series.html', form_data=form, weekday_names=WEEKDAY_NAMES)
+        dates = series_dates(start, end, weekdays) if weekdays and start <= end else []
+        if not dates:
+            flash('W wybranym okresie nie ma żadnego z wybranych dni tygodnia.', 'error')
+            return render_template('add_trip_series.html', form_data=form, weekday_names=WEEKDAY_NAMES)
+
+        template = {field: form.get(field) for field in ('title', 'spots', 'departure_time', 'start_time', 'notes')}
+        template['is_confirmed'] = 'is_confirmed' in form
+        rows, errors = validate_rows([{**template, 'trip_date': day.isoformat()} for day in dates])
+        if errors:
+            # Wiersze serii różnią się tylko datą - każdy komunikat raz
+            for message in dict.fromkeys(error['message'] for error in errors):
+                flash(message, 'error')
+            return render_template('add_trip_series.html', form_data=form, weekday_names=WEEKDAY_NAMES)
+
+        try:
+            trip_ids = create_trips(rows, current_user.id)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Błąd w add_trip_series ({len(rows)} zleceń): {e}")
+            flash('Wystąpił błąd podczas dodawania serii zleceń. Spróbuj ponownie.', 'error')
+            return render_template('add_trip_series.html', form_data=form, weekday_names=WEEKDAY_NAMES)
+        enqueue_notification(trip_ids)
+        flash(f"Dodano {len(trip_ids)} zleceń ({dates[0].strftime('%d.%m.%Y')} - {dates[-1].strftime('%d.%m.%Y')}).", 'success')
+        return redirect(url_for('main.dashboard'))
+
+    return render_template('add_trip_series.html', form_data={}, weekday_names=WEEKDAY_NAMES)
+
+
 @trips_bp.route('/<int:trip_id>')
 @login_required
 def trip_details(trip_id):
@@ -214,21 +283,27 @@ def edit_trip(trip_id):
 
 @trips_bp.route('/<int:trip_id>/signup', methods=['POST'])
 @login_required
+@idempotent
 def signup_trip(trip_id):
     """
     Logika zapisów dla pracowników (zgodna z nowymi założeniami).
+    Akcje z kolejki offline (PWA) przychodzą jako XHR z nagłówkiem 'Idempotency-Key'
+    i dostają odpowiedź JSON zamiast przekierowania.
     """
     trip = Trip.query.get_or_404(trip_id)
     action = request.form.get('action')
     user_signup = Signup.query.filter_by(trip_id=trip.id, user_id=current_user.id).first()
+    signup_status = user_signup.status if user_signup else None
+    message = None
 
     if user_signup:
         if action == 'confirm' and user_signup.status == 'wstępnie zapisany':
-            user_signup.status = 'potwierdzony'
-            flash('Twój udział w zleceniu został potwierdzony.', 'success')
+            user_signup.status = signup_status = 'potwierdzony'
+            message = ('Twój udział w zleceniu został potwierdzony.', 'success')
         elif action == 'cancel': 
             db.session.delete(user_signup)
-            flash('Zrezygnowałeś/aś z udziału w zleceniu (lub niedyspozycji).', 'success')
+            signup_status = None
+            message = ('Zrezygnowałeś/aś z udziału w zleceniu (lub niedyspozycji).', 'success')
     
     else:
         if action == 'signup': 
@@ -236,6 +311,9 @@ def signup_trip(trip_id):
             # Aby uniknąć dodatkowego zapytania do bazy, pobieramy dane z relacji
             # (Chociaż tutaj jest to trudniejsze, bo musimy sprawdzić *przed* zapisem)
             # Dla uproszczenia i uniknięcia "race condition" zostawiamy to zapytanie.
+            # Blokada zlecenia: równoległy zapis lub zatwierdzenie obsady (roster.py)
+            # czeka, więc policzone wolne miejsca nie zmienią się przed INSERT
+            Trip.lock(Trip.id == trip.id)
             occupied_spots = Signup.query.filter(
                 Signup.trip_id == trip.id, 
                 Signup.status.in_(['potwierdzony', 'wstępnie zapisany'])
@@ -243,17 +321,30 @@ def signup_trip(trip_id):
             
             if (trip.spots or 0) - occupied_spots > 0:
                 new_status = 'potwierdzony'
-                flash('Zostałeś zapisany/a na zlecenie.', 'success')
+                message = ('Zostałeś zapisany/a na zlecenie.', 'success')
             else:
                 new_status = 'rezerwowy'
-                flash('Brak wolnych miejsc. Zostałeś zapisany/a na listę rezerwową.', 'info')
+                message = ('Brak wolnych miejsc. Zostałeś zapisany/a na listę rezerwową.', 'info')
             db.session.add(Signup(trip_id=trip.id, user_id=current_user.id, status=new_status))
+            signup_status = new_status
         
         elif action == 'decline': 
             db.session.add(Signup(trip_id=trip.id, user_id=current_user.id, status='niedyspozycyjny'))
-            flash('Zgłoszono niedyspozycję dla tego zlecenia.', 'info')
+            signup_status = 'niedyspozycyjny'
+            message = ('Zgłoszono niedyspozycję dla tego zlecenia.', 'info')
 
     db.session.commit()
+
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        # 'noop' - akcja nieaktualna (np. zapis wykonany wcześniej z innego urządzenia)
+        return jsonify({
+            'status': 'success' if message else 'noop',
+            'message': message[0] if message else 'Brak zmian - status zapisu jest już aktualny.',
+            'trip_id': trip.id,
+            'signup_status': signup_status,
+        })
+    if message:
+        flash(*message)
     return redirect(url_for('trips.trip_details', trip_id=trip.id))
 
 
@@ -291,16 +382,12 @@ def send_to_office(trip_id):
     else:
         subject = f"Lista Uczestników: {trip.title} - {trip.trip_date.strftime('%d.%m.%Y')}"
         
-        # Używamy rq.enqueue importowanego z extensions
-        rq.enqueue(
-            send_email_in_background,
-            recipient_emails, 
-            subject, 
-            'email/trip_participants', 
-            trip=trip, 
-            signups=signups
-        )
-        flash('Lista uczestników została wysłana do biura.', 'success')
+        # Skrzynka nadawcza (outbox.py) - szablon renderowany tutaj, z wczytanymi zapisami
+        if send_email_in_background(recipient_emails, subject, 'emaile/trip_participants', trip=trip, signups=signups):
+            db.session.commit()
+            flash('Lista uczestników została wysłana do biura.', 'success')
+        else:
+            flash('Nie udało się wysłać listy uczestników. Spróbuj ponownie później.', 'error')
 
     return redirect(url_for('trips.trip_details', trip_id=trip.id))
 
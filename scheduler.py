@@ -0,0 +1,246 @@
+"""
+Wbudowany harmonogram zadań okresowych (archiwizacja, podgrzewanie bazy, przypomnienia, rozliczenia).
+Plik: scheduler.py
+
+Każdy proces aplikacji (worker Gunicorna) po pierwszym żądaniu uruchamia
+wątek, który co SCHEDULER_INTERVAL sekund sprawdza, czy któreś zadanie
+dzienne (jobs.py) jest należne: minęła jego godzina (czas serwera), a
+dzisiejszy okres nie został jeszcze wykonany.
+
+O tym, który proces wykona zadanie, decyduje wiersz tabeli scheduled_job:
+warunkowy UPDATE (okres niewykonany, brak aktywnej rezerwacji) ustawia
+locked_by tylko w jednym procesie, również gdy kilka workerów sprawdza
+zadanie w tej samej chwili. Rezerwacja wygasa po SCHEDULER_LEASE_SECONDS
+(przerwany proces), a po błędzie zadanie jest ponawiane po SCHEDULER_RETRY_SECONDS.
+Oznaczenie okresu jako wykonanego jest zatwierdzane razem z niezatwierdzonymi
+zmianami zadania (np. przypomnieniami w skrzynce nadawczej).
+
+Bez procesów WWW (lub z SCHEDULER_ENABLED=0): 'flask scheduler run' jako
+osobny proces albo jednorazowo 'flask scheduler run-job archive'.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+from werkzeug.utils import import_string
+
+# Zadanie dzienne: nazwa (klucz w scheduled_job), ustawienie z godziną uruchomienia, funkcja
+Job = namedtuple('Job', 'name hour_setting func_path')
+JOBS = (
+    Job('archive', 'SCHEDULER_ARCHIVE_HOUR', 'jobs.archive_old_trips'),
+    Job('prewarm', 'SCHEDULER_PREWARM_HOUR', 'jobs.prewarm_next_month'),
+    Job('reminders', 'SCHEDULER_REMINDER_HOUR', 'jobs.send_trip_reminders'),
+    # Zaległe przeliczenia rozliczeń (gdyby zlecenie w tle po zmianie przepadło)
+    Job('settlements', 'SCHEDULER_SETTLEMENTS_HOUR', 'settlement_summary.refresh_dirty_months'),
+)
+ERROR_MAX_LENGTH = 1000
+
+
+def get_job(name):
+    for job in JOBS:
+        if job.name == name:
+            return job
+    raise KeyError(name)
+
+
+def _worker_id():
+    return f'{socket.gethostname()[:60]}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+def _job_row(name):
+    """Wiersz zadania (tworzony przy pierwszym użyciu; wyścig kilku procesów jest nieszkodliwy)."""
+    from extensions import db
+    from models import ScheduledJob
+    row = db.session.get(ScheduledJob, name)
+    if row is None:
+        try:
+            db.session.add(ScheduledJob(name=name))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+        row = db.session.get(ScheduledJob, name)
+    return row
+
+
+def _update():
+    # Bez synchronizacji obiektów w sesji (porównanie dat w Pythonie) - sesja i tak jest zatwierdzana
+    from models import ScheduledJob
+    return update(ScheduledJob).execution_options(synchronize_session=False)
+
+
+def run_job(job, period, force=False):
+    """
+    Wykonuje zadanie dla okresu 'period', jeśli uda się je zarezerwować.
+    force=True pomija sprawdzenie, czy okres był już wykonany (nie pomija
+    aktywnej rezerwacji). Zwraca (czy_wykonano, wynik); błąd zadania jest
+    zapisywany w scheduled_job i zgłaszany dalej.
+    """
+    from extensions import db
+    from models import ScheduledJob
+    config = current_app.config
+    row = _job_row(job.name)
+    # Zwykły odczyt - bez blokady zapisu, gdy okres jest już wykonany (najczęstszy przypadek)
+    if not force and row.last_period is not None and row.last_period >= period:
+        db.session.rollback()
+        return False, None
+
+    worker = _worker_id()
+    now = datetime.now(timezone.utc)
+    conditions = [ScheduledJob.name == job.name,
+                  or_(ScheduledJob.locked_until.is_(None), ScheduledJob.locked_until < now)]
+    if not force:
+        conditions.append(or_(ScheduledJob.last_period.is_(None), ScheduledJob.last_period < period))
+    claimed = db.session.execute(
+        _update().where(*conditions).values(
+            locked_by=worker, locked_until=now + timedelta(seconds=config['SCHEDULER_LEASE_SECONDS']),
+            last_started_at=now)
+    ).rowcount
+    db.session.commit()
+    if not claimed:
+        return False, None
+
+    owned = (ScheduledJob.name == job.name, ScheduledJob.locked_by == worker)
+    started = time.perf_counter()
+    try:
+        result = import_string(job.func_path)()
+    except Exception as e:
+        db.session.rollback()
+        db.session.execute(_update().where(*owned).values(
+            locked_by=None, locked_until=datetime.now(timezone.utc) + timedelta(seconds=config['SCHEDULER_RETRY_SECONDS']),
+            last_error=f'{type(e).__name__}: {e}'[:ERROR_MAX_LENGTH]))
+        db.session.commit()
+        raise
+    db.session.execute(_update().where(*owned).values(
+        last_period=period, locked_by=None, locked_until=None, last_finished_at=datetime.now(timezone.utc),
+        last_result=str(result)[:255], last_error=None))
+    db.session.commit()
+    current_app.logger.info(f"Harmonogram: zadanie '{job.name}' ({period}) zakończone w "
+                            f"{time.perf_counter() - started:.1f} s, wynik: {result}")
+    return True, result
+
+
+def run_pending(now=None):
+    """Wykonuje należne zadania (now - lokalny czas serwera). Zwraca nazwy wykonanych."""
+    now = now or datetime.now()
+    period = now.date().isoformat()
+    done = []
+    for job in JOBS:
+        if now.hour < current_app.config[job.hour_setting]:
+            continue
+        try:
+            ran, _ = run_job(job, period)
+        except Exception:
+            current_app.logger.exception(f"Harmonogram: zadanie '{job.name}' ({period}) zakończyło się błędem")
+            continue
+        if ran:
+            done.append(job.name)
+    return done
+
+
+class Scheduler:
+    """Rozszerzenie Flask: wątek harmonogramu w każdym procesie obsługującym żądania."""
+
+    def __init__(self, app=None):
+        self._thread = None
+        self._thread_pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SCHEDULER_ENABLED', True)
+        app.config.setdefault('SCHEDULER_INTERVAL', 60.0)
+        app.config.setdefault('SCHEDULER_ARCHIVE_HOUR', 2)
+        app.config.setdefault('SCHEDULER_PREWARM_HOUR', 3)
+        app.config.setdefault('SCHEDULER_REMINDER_HOUR', 17)
+        app.config.setdefault('SCHEDULER_SETTLEMENTS_HOUR', 5)
+        app.config.setdefault('SCHEDULER_LEASE_SECONDS', 3600)
+        app.config.setdefault('SCHEDULER_RETRY_SECONDS', 900)
+        app.config.setdefault('ARCHIVE_AFTER_DAYS', 180)
+        app.config.setdefault('ARCHIVE_CHUNK_SIZE', 500)
+        app.extensions['scheduler'] = self
+        # Wątek startuje przy pierwszym żądaniu procesu - komendy CLI (flask seed, rq worker) go nie uruchamiają,
+        # a przy Gunicorn --preload każdy worker po fork() ma własny
+        if app.config['SCHEDULER_ENABLED'] and not app.testing:
+            app.before_request(self._ensure_started)
+
+    def _ensure_started(self):
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._loop, args=(current_app._get_current_object(),),
+                                            name='scheduler', daemon=True)
+            self._thread.start()
+            self._thread_pid = os.getpid()
+
+    @staticmethod
+    def _loop(app):
+        interval = float(app.config['SCHEDULER_INTERVAL'])
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    run_pending()
+                except Exception:
+                    # Np. chwilowy brak bazy - kolejna próba za SCHEDULER_INTERVAL
+                    app.logger.exception("Harmonogram: błąd sprawdzania zadań")
+
+
+# --- KOMENDY 'flask scheduler ...' ---
+
+@click.group('scheduler')
+def scheduler_cli():
+    """Zadania okresowe (archiwizacja, podgrzewanie bazy, przypomnienia, rozliczenia)."""
+
+
+@scheduler_cli.command('run')
+@with_appcontext
+def run_command():
+    """Działa stale jako osobny proces harmonogramu."""
+    interval = float(current_app.config['SCHEDULER_INTERVAL'])
+    while True:
+        for name in run_pending():
+            click.echo(f"Wykonano zadanie: {name}")
+        time.sleep(interval)
+
+
+@scheduler_cli.command('run-job')
+@click.argument('name', type=click.Choice([job.name for job in JOBS]))
+@with_appcontext
+def run_job_command(name):
+    """Wykonuje zadanie od razu (także gdy dzisiejszy okres był już wykonany)."""
+    ran, result = run_job(get_job(name), datetime.now().date().isoformat(), force=True)
+    if not ran:
+        raise click.ClickException(f"Zadanie '{name}' jest właśnie wykonywane przez inny proces.")
+    click.echo(f"Zadanie '{name}' zakończone, wynik: {result}")
+
+
+@scheduler_cli.command('status')
+@with_appcontext
+def status_command():
+    """Ostatnie wykonania zadań."""
+    from extensions import db
+    from models import ScheduledJob
+    rows = {row.name: row for row in db.session.query(ScheduledJob)}
+    for job in JOBS:
+        row = rows.get(job.name)
+        hour = current_app.config[job.hour_setting]
+        if row is None:
+            click.echo(f"{job.name} (od {hour}:00): jeszcze nie wykonywane")
+            continue
+        line = f"{job.name} (od {hour}:00): okres {row.last_period or '-'}, wynik {row.last_result or '-'}"
+        if row.locked_by:
+            line += f", w toku: {row.locked_by}"
+        if row.last_error:
+            line += f", ostatni błąd: {row.last_error}"
+        click.echo(line)
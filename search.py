@@ -0,0 +1,238 @@
+"""
+Wyszukiwanie pełnotekstowe zleceń (tytuł i uwagi) z indeksem w bazie.
+Plik: search.py
+
+SQLite: tabela FTS5 'trip_fts' z zawartością zewnętrzną (content='trip'),
+aktualizowana triggerami na tabeli trip - także przy masowych UPDATE/DELETE.
+Tokenizer unicode61 (remove_diacritics 2) pomija wielkość liter i znaki
+diakrytyczne (ą, ę, ó, ś, ż...); 'ł' nie ma w Unicode rozkładu, więc triggery
+i zapytanie zamieniają ją na 'l'.
+
+PostgreSQL: indeks GIN na wyrażeniu tsvector (konfiguracja 'simple', tytuł
+z wagą A, uwagi z wagą B) po zwinięciu tekstu funkcją grafik_fold()
+(lower + unaccent, który obejmuje też 'ł').
+
+Każde słowo zapytania dopasowuje początek słowa w tytule lub uwagach
+(wszystkie słowa muszą wystąpić): 'biedr kal' znajdzie 'Biedronka Kalisz',
+'lodz' - 'Łódź'. Wyniki są sortowane wg trafności (bm25 / ts_rank_cd).
+Inne bazy nie mają indeksu: słowa są wyszukiwane przez ILIKE (bez zwijania znaków).
+
+Indeks powstaje razem z tabelą trip (db.create_all()); w istniejącej bazie:
+'flask search rebuild'. Dopóki go nie ma, wyszukiwanie też używa ILIKE
+(z ostrzeżeniem w logu) zamiast kończyć się błędem.
+"""
+import re
+import unicodedata
+import weakref
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import and_, case, event, false, func, literal_column, or_, select, text
+
+MAX_TERMS = 8
+# Zwinięcie 'ł' w SQLite (reszta znaków diakrytycznych - tokenizer FTS5)
+_SQLITE_FOLD = "replace(replace({0}, 'ł', 'l'), 'Ł', 'L')"
+
+SQLITE_CREATE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS trip_fts USING fts5("
+    "title, notes, content='trip', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS trip_fts_insert AFTER INSERT ON trip BEGIN "
+    "INSERT INTO trip_fts(rowid, title, notes) VALUES "
+    f"(new.id, {_SQLITE_FOLD.format('new.title')}, {_SQLITE_FOLD.format('new.notes')}); END",
+    "CREATE TRIGGER IF NOT EXISTS trip_fts_delete AFTER DELETE ON trip BEGIN "
+    "INSERT INTO trip_fts(trip_fts, rowid, title, notes) VALUES "
+    f"('delete', old.id, {_SQLITE_FOLD.format('old.title')}, {_SQLITE_FOLD.format('old.notes')}); END",
+    "CREATE TRIGGER IF NOT EXISTS trip_fts_update AFTER UPDATE OF title, notes ON trip BEGIN "
+    "INSERT INTO trip_fts(trip_fts, rowid, title, notes) VALUES "
+    f"('delete', old.id, {_SQLITE_FOLD.format('old.title')}, {_SQLITE_FOLD.format('old.notes')}); "
+    "INSERT INTO trip_fts(rowid, title, notes) VALUES "
+    f"(new.id, {_SQLITE_FOLD.format('new.title')}, {_SQLITE_FOLD.format('new.notes')}); END",
+)
+SQLITE_REBUILD = (
+    "INSERT INTO trip_fts(trip_fts) VALUES ('delete-all')",
+    "INSERT INTO trip_fts(rowid, title, notes) SELECT id, "
+    f"{_SQLITE_FOLD.format('title')}, {_SQLITE_FOLD.format('notes')} FROM trip",
+)
+SQLITE_DROP = "DROP TABLE IF EXISTS trip_fts"
+SQLITE_EXISTS = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'trip_fts'"
+
+# To samo wyrażenie w indeksie i w zapytaniu - inaczej planer nie użyje indeksu
+PG_VECTOR = ("(setweight(to_tsvector('simple'::regconfig, grafik_fold(trip.title)), 'A') || "
+             "setweight(to_tsvector('simple'::regconfig, grafik_fold(coalesce(trip.notes, ''))), 'B'))")
+PG_CREATE = (
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE OR REPLACE FUNCTION grafik_fold(text) RETURNS text AS "
+    "$$ SELECT lower(public.unaccent('public.unaccent'::regdictionary, $1)) $$ "
+    "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT",
+    f"CREATE INDEX IF NOT EXISTS ix_trip_search ON trip USING GIN ({PG_VECTOR.replace('trip.', '')})",
+)
+PG_EXISTS = "SELECT to_regclass('ix_trip_search') IS NOT NULL AND to_regprocedure('grafik_fold(text)') IS NOT NULL"
+
+# Silniki, w których indeks już istnieje (sprawdzany do skutku, potem zapamiętany)
+_indexed_engines = weakref.WeakSet()
+_missing_index_logged = False
+
+
+def fold(value):
+    """Tekst bez wielkich liter i znaków diakrytycznych ('Łódź' -> 'lodz')."""
+    value = value.lower().replace('ł', 'l')
+    return ''.join(char for char in unicodedata.normalize('NFKD', value) if not unicodedata.combining(char))
+
+
+def query_terms(value):
+    """Słowa zapytania po zwinięciu (tylko litery i cyfry - bezpieczne w składni FTS5/tsquery)."""
+    return [term for term in re.split(r'[\W_]+', fold(value or '')) if term][:MAX_TERMS]
+
+
+def index_available(connection):
+    """
+    Czy baza ma obiekty indeksu (trip_fts / grafik_fold i ix_trip_search).
+    Baza sprzed wdrożenia indeksu nie ma ich, dopóki nie uruchomi się
+    'flask search rebuild' - wtedy wyszukiwanie przechodzi na ILIKE.
+    """
+    global _missing_index_logged
+    engine = connection.engine
+    if engine in _indexed_engines:
+        return True
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        available = connection.exec_driver_sql(SQLITE_EXISTS).first() is not None
+    elif dialect == 'postgresql':
+        available = bool(connection.exec_driver_sql(PG_EXISTS).scalar())
+    else:
+        return False
+    if available:
+        _indexed_engines.add(engine)
+    elif not _missing_index_logged:
+        _missing_index_logged = True
+        current_app.logger.warning(
+            "Brak indeksu wyszukiwania zleceń - wyszukiwanie przez ILIKE. Uruchom 'flask search rebuild'.")
+    return available
+
+
+def search_subquery(value):
+    """
+    Podzapytanie (trip_id, rank) zleceń pasujących do tekstu - niższy rank
+    oznacza lepsze dopasowanie. None, gdy tekst nie zawiera żadnego słowa.
+    """
+    from extensions import db
+    terms = query_terms(value)
+    if not terms:
+        return None
+    dialect = db.engine.dialect.name
+    if dialect in ('sqlite', 'postgresql') and not index_available(db.session.connection()):
+        dialect = None
+    if dialect == 'sqlite':
+        # Tytuł waży 10 razy więcej niż uwagi
+        return select(
+            literal_column('trip_fts.rowid').label('trip_id'),
+            literal_column('bm25(trip_fts, 10.0, 1.0)').label('rank'),
+        ).select_from(text('trip_fts')).where(
+            text('trip_fts MATCH :search_query').bindparams(search_query=' '.join(f'"{term}"*' for term in terms))
+        ).subquery('search')
+    if dialect == 'postgresql':
+        from models import Trip
+        tsquery = func.to_tsquery(literal_column("'simple'::regconfig"), ' & '.join(f'{term}:*' for term in terms))
+        vector = literal_column(PG_VECTOR)
+        return select(
+            Trip.id.label('trip_id'),
+            (-func.ts_rank_cd(vector, tsquery)).label('rank'),
+        ).where(vector.op('@@')(tsquery)).subquery('search')
+    # Inne bazy (np. MySQL) lub baza bez indeksu - jak dawniej ILIKE po tytule i uwagach
+    # (każde słowo musi wystąpić; bez zwijania znaków diakrytycznych, tytuł przed uwagami)
+    from models import Trip
+    words = [word for word in re.split(r'[\W_]+', value) if word][:MAX_TERMS]
+    in_title = and_(*(Trip.title.icontains(word, autoescape=True) for word in words))
+    return select(
+        Trip.id.label('trip_id'),
+        case((in_title, 0), else_=1).label('rank'),
+    ).where(*(or_(Trip.title.icontains(word, autoescape=True), Trip.notes.icontains(word, autoescape=True))
+              for word in words)).subquery('search')
+
+
+def trip_filter(value):
+    """Warunek dla zapytań o zlecenia (Trip.query.filter(...)); tekst bez słów nic nie dopasowuje."""
+    from models import Trip
+    subquery = search_subquery(value)
+    if subquery is None:
+        return false()
+    return Trip.id.in_(select(subquery.c.trip_id))
+
+
+def search_trips(value, archived=False, limit=20):
+    """
+    Najlepiej dopasowane zlecenia jako lista słowników (id, title, date, is_archived).
+    archived: False - tylko bieżące, True - tylko archiwum, None - wszystkie.
+    """
+    from extensions import db
+    from models import Trip
+    subquery = search_subquery(value)
+    if subquery is None:
+        return []
+    # Same kolumny - bez dołączania list zapisów (lazy='joined')
+    query = select(Trip.id, Trip.title, Trip.trip_date, Trip.is_archived).join(
+        subquery, subquery.c.trip_id == Trip.id)
+    if archived is not None:
+        query = query.where(Trip.is_archived == archived)
+    rows = db.session.execute(query.order_by(subquery.c.rank, Trip.trip_date.desc()).limit(limit)).all()
+    return [{'id': row.id, 'title': row.title, 'date': row.trip_date.isoformat(), 'is_archived': row.is_archived}
+            for row in rows]
+
+
+def _execute_all(connection, statements):
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+
+
+def _after_create(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        _execute_all(connection, SQLITE_CREATE)
+    elif connection.dialect.name == 'postgresql':
+        _execute_all(connection, PG_CREATE)
+
+
+def _before_drop(target, connection, **kw):
+    _indexed_engines.discard(connection.engine)
+    # Tabela FTS5 nie znika razem z trip - bez tego nowa tabela trip dostałaby stary indeks
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql(SQLITE_DROP)
+
+
+class TripSearch:
+    """Rozszerzenie Flask: tworzenie indeksu wyszukiwania razem z tabelą trip."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SEARCH_RESULTS_LIMIT', 20)
+        from models import Trip
+        table = Trip.__table__
+        if not event.contains(table, 'after_create', _after_create):
+            event.listen(table, 'after_create', _after_create)
+            event.listen(table, 'before_drop', _before_drop)
+        app.extensions['search'] = self
+
+    @staticmethod
+    def rebuild():
+        """Tworzy brakujące obiekty indeksu i (SQLite) wypełnia go od nowa."""
+        from extensions import db
+        with db.engine.begin() as connection:
+            if connection.dialect.name == 'sqlite':
+                _execute_all(connection, SQLITE_CREATE + SQLITE_REBUILD)
+            elif connection.dialect.name == 'postgresql':
+                _execute_all(connection, PG_CREATE)
+
+
+@click.group('search')
+def search_cli():
+    """Indeks wyszukiwania zleceń."""
+
+
+@search_cli.command('rebuild')
+@with_appcontext
+def rebuild_command():
+    """Tworzy indeks w istniejącej bazie i indeksuje wszystkie zlecenia."""
+    current_app.extensions['search'].rebuild()
+    click.echo("Indeks wyszukiwania zleceń został przebudowany.")
@@ -0,0 +1,159 @@
+"""
+Generator danych syntetycznych (flask seed).
+Plik: seed.py
+
+Tworzy realistyczny zbiór danych do testów wydajności i pracy lokalnej:
+użytkownicy wszystkich agencji i ról, zlecenia z kilku lat (starsze niż
+6 miesięcy - zarchiwizowane, przeszłe - z godzinami pracy i kilometrami)
+oraz zapisy we wszystkich statusach.
+
+Wiersze są wstawiane masowo (executemany przez insert() z listą parametrów),
+a nie pojedynczo przez ORM - 100 tys. zapisów to sekundy, nie minuty.
+Wszyscy wygenerowani użytkownicy mają to samo hasło (hash liczony raz).
+
+Użycie:
+    flask seed --users 300 --trips 5000 --years 3
+    flask seed --reset --yes        # najpierw usuwa i tworzy tabele od nowa
+"""
+import random
+from datetime import date, time, timedelta
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, insert
+
+AGENCIES = ['DPL', 'JMG', 'SJ', 'WP']
+# Udział ról wśród użytkowników (reszta to zwykli pracownicy)
+ROLE_WEIGHTS = {'pracownik': 80, 'złoty pracownik': 10, 'kierownik': 8, 'admin': 2}
+SIGNUP_STATUSES = ['potwierdzony', 'wstępnie zapisany', 'rezerwowy', 'niedyspozycyjny']
+FIRST_NAMES = ['Jan', 'Anna', 'Piotr', 'Katarzyna', 'Tomasz', 'Magdalena', 'Paweł', 'Agnieszka',
+               'Michał', 'Joanna', 'Krzysztof', 'Ewa', 'Marcin', 'Monika', 'Łukasz', 'Zofia']
+SURNAMES = ['Nowak', 'Kowalski', 'Wiśniewski', 'Wójcik', 'Kowalczyk', 'Kamiński', 'Lewandowski',
+            'Zieliński', 'Szymański', 'Woźniak', 'Dąbrowski', 'Kozłowski', 'Jankowski', 'Mazur']
+PLACES = ['Dino Poznań', 'Dino Września', 'Lidl Gniezno', 'Biedronka Konin', 'Netto Piła',
+          'Kaufland Leszno', 'Dino Kalisz', 'Stokrotka Kościan', 'Auchan Swadzim', 'Dino Jarocin']
+# Zlecenia starsze niż tyle dni są zarchiwizowane (jak po 'Uruchom Archiwizację')
+ARCHIVE_AFTER_DAYS = 180
+
+
+def _user_rows(count, password_hash, rng, first_number, role_weights):
+    roles = rng.choices(list(role_weights), weights=list(role_weights.values()), k=count)
+    rows = []
+    for i, role in enumerate(roles, start=first_number):
+        name, surname = rng.choice(FIRST_NAMES), rng.choice(SURNAMES)
+        rows.append({
+            'name': name,
+            'surname': surname,
+            'email': f'seed{i}@grafik.example',
+            'agency': AGENCIES[i % len(AGENCIES)],
+            'password_hash': password_hash,
+            'status': role,
+            'accepted_tos': True,
+            'theme': 'default',
+        })
+    return rows
+
+
+def _trip_rows(count, years, manager_ids, rng, today):
+    # Od 1 stycznia sprzed 'years - 1' lat do końca przyszłego miesiąca
+    first_day = date(today.year - years + 1, 1, 1)
+    last_day = (today.replace(day=1) + timedelta(days=62)).replace(day=1) - timedelta(days=1)
+    span = (last_day - first_day).days
+    rows = []
+    for _ in range(count):
+        trip_date = first_day + timedelta(days=rng.randint(0, span))
+        title = f'{rng.choice(PLACES)} #{rng.randint(1, 99)}'
+        is_past = trip_date < today
+        start_hour = rng.choice([5, 6, 7, 8])
+        rows.append({
+            'title': title,
+            'trip_date': trip_date,
+            'is_confirmed': is_past or rng.random() < 0.6,
+            'spots': 7 if 'dino' in title.lower() else 2,
+            'start_time': time(start_hour, 0),
+            'departure_time': time(start_hour - 1, 30),
+            'notes': None,
+            'work_start_time': time(start_hour, 0) if is_past else None,
+            'work_end_time': time(start_hour + rng.randint(6, 10), 0) if is_past else None,
+            'kilometers': round(rng.uniform(20, 400), 1) if is_past else None,
+            'manager_was_passenger': is_past and rng.random() < 0.3,
+            'is_archived': (today - trip_date).days > ARCHIVE_AFTER_DAYS,
+            'manager_id': rng.choice(manager_ids) if manager_ids and rng.random() < 0.7 else None,
+        })
+    return rows
+
+
+def _signup_rows(trips, worker_ids, max_per_trip, rng, today):
+    rows = []
+    for trip_id, trip in trips:
+        count = min(len(worker_ids), rng.randint(0, max_per_trip))
+        for user_id in rng.sample(worker_ids, count):
+            if trip['trip_date'] < today:
+                status = rng.choices(SIGNUP_STATUSES, weights=[85, 0, 10, 5])[0]
+            else:
+                status = rng.choices(SIGNUP_STATUSES, weights=[45, 30, 15, 10])[0]
+            rows.append({'trip_id': trip_id, 'user_id': user_id, 'status': status})
+    return rows
+
+
+def generate(users=300, trips=5000, years=3, signups_per_trip=8, password='haslo123', seed=None, today=None,
+             role_weights=None):
+    """
+    Wstawia dane syntetyczne do bieżącej bazy (wymaga kontekstu aplikacji).
+    Zwraca liczby wstawionych wierszy i zakres numerów kont ('first_user'/'last_user':
+    seed<N>@grafik.example) - kolejne wywołania dokładają dane z nowymi adresami.
+    'role_weights' zastępuje domyślny udział ról (ROLE_WEIGHTS).
+    """
+    from extensions import db, journal, password_hasher
+    from models import User, Trip, Signup
+
+    rng = random.Random(seed)
+    today = today or date.today()
+
+    first_user = (db.session.query(func.max(User.id)).scalar() or 0) + 1
+    user_rows = _user_rows(users, password_hasher.hash(password), rng, first_user, role_weights or ROLE_WEIGHTS)
+    user_ids = db.session.execute(
+        insert(User).returning(User.id, User.status, sort_by_parameter_order=True), user_rows
+    ).all()
+    manager_ids = [user_id for user_id, status in user_ids if status in ('kierownik', 'admin')]
+    worker_ids = [user_id for user_id, status in user_ids if status in ('pracownik', 'złoty pracownik')]
+
+    trip_rows = _trip_rows(trips, years, manager_ids, rng, today)
+    trip_ids = db.session.execute(
+        insert(Trip).returning(Trip.id, sort_by_parameter_order=True), trip_rows
+    ).scalars().all()
+    # Masowy INSERT omija zdarzenia ORM - dziennik zmian trzeba uzupełnić jawnie
+    # (nowe zlecenia wystarczą: klient i tak pobiera je razem z zapisami)
+    journal.record(db.session, 'trip', [(trip_id, trip_id) for trip_id in trip_ids], 'insert')
+
+    signup_rows = _signup_rows(list(zip(trip_ids, trip_rows)), worker_ids, signups_per_trip, rng, today)
+    if signup_rows:
+        db.session.execute(insert(Signup), signup_rows)
+
+    db.session.commit()
+    return {
+        'users': len(user_rows), 'trips': len(trip_rows), 'signups': len(signup_rows),
+        'first_user': first_user, 'last_user': first_user + users - 1,
+    }
+
+
+@click.command('seed')
+@click.option('--users', default=300, show_default=True, help='Liczba użytkowników.')
+@click.option('--trips', default=5000, show_default=True, help='Liczba zleceń.')
+@click.option('--years', default=3, show_default=True, help='Z ilu lat (wstecz) generować zlecenia.')
+@click.option('--signups-per-trip', default=8, show_default=True, help='Maksymalna liczba zapisów na zlecenie.')
+@click.option('--password', default='haslo123', show_default=True, help='Hasło wszystkich wygenerowanych kont.')
+@click.option('--random-seed', type=int, default=None, help='Ziarno losowania (powtarzalne dane).')
+@click.option('--reset', is_flag=True, help='Usuń wszystkie tabele i utwórz je od nowa.')
+@click.option('--yes', is_flag=True, help='Nie pytaj o potwierdzenie przy --reset.')
+@with_appcontext
+def seed_command(users, trips, years, signups_per_trip, password, random_seed, reset, yes):
+    """Wypełnia bazę realistycznymi danymi syntetycznymi."""
+    from extensions import db
+    if reset:
+        if not yes:
+            click.confirm(f"Usunąć WSZYSTKIE dane z {db.engine.url.render_as_string()}?", abort=True)
+        db.drop_all()
+        db.create_all()
+    counts = generate(users, trips, years, signups_per_trip, password, random_seed)
+    click.echo(f"Utworzono: {counts['users']} użytkowników, {counts['trips']} zleceń, {counts['signups']} zapisów.")
+    click.echo(f"Loginy: seed{counts['first_user']}@grafik.example ... seed{counts['last_user']}@grafik.example, hasło: {password}")
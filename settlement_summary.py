@@ -0,0 +1,343 @@
+"""
+Zmaterializowane podsumowanie rozliczeń: pracownik x miesiąc (monthly_settlement).
+Plik: settlement_summary.py
+
+Raport miesiąca (/admin/settlements/summary) czyta gotowe wiersze zamiast
+liczyć godziny z wszystkich zleceń. Tabela jest utrzymywana przyrostowo:
+
+- każda zmiana zlecenia (data, godziny pracy, kilometry, pasażer) lub zapisu
+  (status, pracownik) dopisuje w tej samej transakcji wiersz do
+  settlement_dirty_month z miesiącem, którego dotyczy - także stary miesiąc
+  przy zmianie daty. Obsługiwane są zmiany przez ORM (after_flush) i masowe
+  INSERT/UPDATE/DELETE (do_orm_execute; nowa data po masowym UPDATE - before_commit);
+- po zatwierdzeniu transakcji przeliczenie zlecane jest w tle (tasks.py);
+  przelicza tylko brudne miesiące, każdy we własnej krótkiej transakcji.
+  Zaległe miesiące przelicza też raport przed odczytem oraz zadanie
+  harmonogramu 'settlements' (gdyby zlecenie w tle przepadło).
+
+Liczone są tylko zapisy 'potwierdzony'. Godziny to work_end_time -
+work_start_time (przez północ: +24 h); zlecenia bez godzin trafiają do
+missing_hours. W istniejącej bazie: 'flask settlements rebuild'.
+"""
+from datetime import date, datetime, timezone
+import click
+import pandas as pd
+from flask import current_app, has_app_context
+from flask.cli import with_appcontext
+from sqlalchemy import delete, event, func, inspect, select
+from sqlalchemy.exc import IntegrityError
+
+# Kolumny wpływające na podsumowanie
+TRIP_FIELDS = ('trip_date', 'work_start_time', 'work_end_time', 'kilometers', 'manager_was_passenger')
+SIGNUP_FIELDS = ('status', 'user_id', 'trip_id')
+SETTLED_STATUS = 'potwierdzony'
+# Klucz w session.info: miesiące oznaczone w bieżącej transakcji
+PENDING_KEY = 'settlement_dirty_months'
+# Klucz w session.info: zlecenia z masowego UPDATE (nowa data po wykonaniu)
+BULK_TRIPS_KEY = 'settlement_bulk_trip_ids'
+TRIP_IDS_CHUNK = 500
+
+
+def month_key(day):
+    return f'{day.year:04d}-{day.month:02d}'
+
+
+def month_range(month):
+    """Pierwszy i ostatni dzień miesiąca 'RRRR-MM'."""
+    year, number = (int(part) for part in month.split('-'))
+    first = date(year, number, 1)
+    after = date(year + number // 12, number % 12 + 1, 1)
+    return first, date.fromordinal(after.toordinal() - 1)
+
+
+# --- OZNACZANIE BRUDNYCH MIESIĘCY ---
+
+def _mark(session, days):
+    """Dopisuje miesiące dat 'days' do settlement_dirty_month (raz na transakcję)."""
+    from models import SettlementDirtyMonth
+    marked = session.info.setdefault(PENDING_KEY, set())
+    months = {month_key(day) for day in days if day is not None} - marked
+    if not months:
+        return
+    now = datetime.now(timezone.utc)
+    # Bezpośrednio przez połączenie - bez ponownego flush() sesji
+    session.connection().execute(SettlementDirtyMonth.__table__.insert(),
+                                 [{'month': month, 'created_at': now} for month in sorted(months)])
+    marked.update(months)
+
+
+def _trip_dates(session, trip_ids):
+    from models import Trip
+    trip_ids = sorted(trip_ids)
+    days = set()
+    # Paczkami - masowy INSERT zapisów może dotyczyć tysięcy zleceń (limit parametrów SQLite)
+    for start in range(0, len(trip_ids), TRIP_IDS_CHUNK):
+        days.update(session.connection().execute(
+            select(Trip.trip_date).where(Trip.id.in_(trip_ids[start:start + TRIP_IDS_CHUNK])).distinct()
+        ).scalars())
+    return days
+
+
+def _changed(obj, fields):
+    state = inspect(obj)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+def _old_values(obj, field):
+    return [value for value in inspect(obj).attrs[field].history.deleted if value is not None]
+
+
+def _after_flush(session, flush_context):
+    """Miesiące zmian wykonanych przez ORM (stan sprzed flush jest jeszcze dostępny)."""
+    days, trip_ids = [], set()
+    for op, objects in (('insert', session.new), ('update', session.dirty), ('delete', session.deleted)):
+        for obj in objects:
+            name = type(obj).__name__
+            if name == 'Trip':
+                if op == 'update' and not _changed(obj, TRIP_FIELDS):
+                    continue
+                days.append(obj.trip_date)
+                days.extend(_old_values(obj, 'trip_date'))
+            elif name == 'Signup':
+                if op == 'update' and not _changed(obj, SIGNUP_FIELDS):
+                    continue
+                trip_ids.add(obj.trip_id)
+                trip_ids.update(_old_values(obj, 'trip_id'))
+    trip_ids.discard(None)
+    days.extend(_trip_dates(session, trip_ids))
+    if days:
+        _mark(session, days)
+
+
+def _on_orm_execute(orm_execute_state):
+    """
+    Miesiące masowych INSERT/UPDATE/DELETE - odczytane przed wykonaniem
+    (usunięte wiersze znikną). Samej instrukcji nie wykonuje - robi to
+    dziennik zmian (journal.py), którego obsługa kończy łańcuch zdarzeń.
+    """
+    from models import Trip, Signup
+    mapper = orm_execute_state.bind_mapper
+    model = mapper.class_ if mapper is not None else None
+    if model not in (Trip, Signup):
+        return None
+    session = orm_execute_state.session
+    statement = orm_execute_state.statement
+    parameters = orm_execute_state.parameters
+    if orm_execute_state.is_insert:
+        rows = parameters if isinstance(parameters, list) else [parameters or {}]
+        if model is Trip:
+            _mark(session, [row.get('trip_date') for row in rows])
+        else:
+            _mark(session, _trip_dates(session, {row.get('trip_id') for row in rows} - {None}))
+        return None
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+
+    trip_id = Trip.id if model is Trip else Signup.trip_id
+    query = select(trip_id, Trip.trip_date)
+    if model is Signup:
+        query = query.select_from(Signup).join(Trip, Trip.id == Signup.trip_id)
+    if isinstance(parameters, list) and parameters and 'id' in parameters[0]:
+        query = query.where(model.id.in_([p['id'] for p in parameters]))
+    elif statement.whereclause is not None:
+        query = query.where(statement.whereclause)
+    affected = session.connection().execute(query).all()
+    _mark(session, [day for _, day in affected])
+    if model is Trip and orm_execute_state.is_update and affected:
+        # Nowa data zlecenia jest znana dopiero po wykonaniu - odczyt przed zatwierdzeniem
+        session.info.setdefault(BULK_TRIPS_KEY, set()).update(trip_id for trip_id, _ in affected)
+    return None
+
+
+def _before_commit(session):
+    trip_ids = session.info.pop(BULK_TRIPS_KEY, None)
+    if trip_ids:
+        _mark(session, _trip_dates(session, trip_ids))
+
+
+def _after_commit(session):
+    """Zleca przeliczenie po zatwierdzeniu transakcji, która oznaczyła miesiące."""
+    if not session.info.pop(PENDING_KEY, None) or not has_app_context():
+        return
+    if not current_app.config['SETTLEMENTS_REFRESH_ON_COMMIT']:
+        return
+    from extensions import tasks
+    try:
+        tasks.enqueue(refresh_dirty_months)
+    except Exception as e:
+        # Miesiące zostają oznaczone - przeliczy je raport albo harmonogram
+        current_app.logger.warning(f"Nie udało się zlecić przeliczenia rozliczeń: {e}")
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop(PENDING_KEY, None)
+    session.info.pop(BULK_TRIPS_KEY, None)
+
+
+# --- PRZELICZANIE ---
+
+def _seconds(value):
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def compute_month(connection, month):
+    """Wiersze monthly_settlement dla miesiąca (jedno zapytanie, agregacja w pandas)."""
+    from models import Trip, Signup
+    first, last = month_range(month)
+    rows = connection.execute(
+        select(Signup.user_id, Trip.id, Trip.work_start_time, Trip.work_end_time,
+               Trip.kilometers, Trip.manager_was_passenger)
+        .join(Trip, Trip.id == Signup.trip_id)
+        .where(Signup.status == SETTLED_STATUS, Trip.trip_date >= first, Trip.trip_date <= last)
+    ).all()
+    if not rows:
+        return []
+    frame = pd.DataFrame(rows, columns=['user_id', 'trip_id', 'start', 'end', 'kilometers', 'passenger'])
+    # Zdublowany zapis na to samo zlecenie liczy się raz
+    frame = frame.drop_duplicates(['user_id', 'trip_id'])
+    start = frame['start'].map(_seconds, na_action='ignore').astype('float64')
+    end = frame['end'].map(_seconds, na_action='ignore').astype('float64')
+    frame['hours'] = ((end - start) % 86400) / 3600  # przez północ: +24 h; brak godzin: NaN
+    frame['missing_hours'] = frame['hours'].isna()
+    frame['kilometers'] = frame['kilometers'].astype('float64')
+    frame['passenger'] = frame['passenger'].astype(bool)
+    summary = frame.groupby('user_id').agg(
+        trips=('trip_id', 'size'),
+        hours=('hours', 'sum'),
+        kilometers=('kilometers', 'sum'),
+        passenger_trips=('passenger', 'sum'),
+        missing_hours=('missing_hours', 'sum'),
+    )
+    now = datetime.now(timezone.utc)
+    return [{
+        'month': month, 'user_id': int(user_id), 'trips': int(row.trips), 'hours': round(float(row.hours), 2),
+        'kilometers': round(float(row.kilometers), 1), 'passenger_trips': int(row.passenger_trips),
+        'missing_hours': int(row.missing_hours), 'computed_at': now,
+    } for user_id, row in summary.iterrows()]
+
+
+def _refresh(month, dirty_ids):
+    """Przelicza miesiąc i usuwa jego (odczytane wcześniej) oznaczenia - jedna transakcja."""
+    from extensions import db
+    from models import MonthlySettlement, SettlementDirtyMonth
+    table = MonthlySettlement.__table__
+    try:
+        with db.engine.begin() as connection:
+            rows = compute_month(connection, month)
+            connection.execute(delete(table).where(table.c.month == month))
+            if rows:
+                connection.execute(table.insert(), rows)
+            if dirty_ids:
+                dirty = SettlementDirtyMonth.__table__
+                connection.execute(delete(dirty).where(dirty.c.id.in_(dirty_ids)))
+    except IntegrityError:
+        # Ten sam miesiąc przelicza równolegle inny proces - oznaczenia zostają do następnego razu
+        current_app.logger.info(f"Rozliczenia: miesiąc {month} przeliczany równolegle, pominięto")
+        return False
+    return True
+
+
+def refresh_dirty_months(months=None):
+    """
+    Zadanie w tle: przelicza oznaczone miesiące (wszystkie albo tylko z listy
+    'months'). Zmiana zatwierdzona w trakcie przeliczenia zostawia nowe
+    oznaczenie, więc nic nie ginie. Zwraca liczbę przeliczonych miesięcy.
+    """
+    from extensions import db
+    from models import SettlementDirtyMonth
+    dirty = SettlementDirtyMonth.__table__
+    query = select(dirty.c.id, dirty.c.month).order_by(dirty.c.id)
+    if months is not None:
+        query = query.where(dirty.c.month.in_(list(months)))
+    with db.engine.connect() as connection:
+        entries = connection.execute(query).all()
+    by_month = {}
+    for entry_id, month in entries:
+        by_month.setdefault(month, []).append(entry_id)
+    return sum(1 for month, ids in sorted(by_month.items()) if _refresh(month, ids))
+
+
+def rebuild_all():
+    """Przelicza wszystkie miesiące ze zleceniami (np. po utworzeniu tabeli w istniejącej bazie)."""
+    from extensions import db
+    from models import Trip, MonthlySettlement
+    with db.engine.connect() as connection:
+        days = connection.execute(select(func.min(Trip.trip_date), func.max(Trip.trip_date))).one()
+    if days[0] is None:
+        with db.engine.begin() as connection:
+            connection.execute(delete(MonthlySettlement.__table__))
+        return 0
+    months = []
+    year, number = days[0].year, days[0].month
+    while (year, number) <= (days[1].year, days[1].month):
+        months.append(f'{year:04d}-{number:02d}')
+        year, number = (year + 1, 1) if number == 12 else (year, number + 1)
+    with db.engine.begin() as connection:
+        # Miesiące spoza zakresu zleceń (np. po usunięciu) nie mają już czego podsumowywać
+        connection.execute(delete(MonthlySettlement.__table__).where(MonthlySettlement.month.not_in(months)))
+    return sum(1 for month in months if _refresh(month, None))
+
+
+def monthly_report(month):
+    """
+    Wiersze raportu miesiąca z danymi pracowników. Zaległe oznaczenia tego
+    miesiąca są najpierw przeliczane (zwykle nie ma żadnych - jeden odczyt).
+    """
+    from extensions import db
+    from models import MonthlySettlement, SettlementDirtyMonth, User
+    pending = db.session.execute(
+        select(SettlementDirtyMonth.id).where(SettlementDirtyMonth.month == month).limit(1)
+    ).first()
+    if pending is not None:
+        db.session.commit()  # zamyka transakcję odczytu przed przeliczeniem na osobnym połączeniu
+        refresh_dirty_months([month])
+    return db.session.execute(
+        select(User.id, User.name, User.surname, User.agency, User.status, MonthlySettlement.trips,
+               MonthlySettlement.hours, MonthlySettlement.kilometers, MonthlySettlement.passenger_trips,
+               MonthlySettlement.missing_hours)
+        .join(User, User.id == MonthlySettlement.user_id)
+        .where(MonthlySettlement.month == month)
+        .order_by(User.surname, User.name, User.id)
+    ).all()
+
+
+class SettlementSummary:
+    """Rozszerzenie Flask: oznaczanie brudnych miesięcy i przeliczanie po zatwierdzeniu."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SETTLEMENTS_REFRESH_ON_COMMIT', True)
+        session = app.extensions['sqlalchemy'].session
+        # Zdarzenia są rejestrowane na klasie sesji - tylko raz na proces
+        if not event.contains(session, 'after_flush', _after_flush):
+            event.listen(session, 'after_flush', _after_flush)
+            # Przed dziennikiem zmian - jego obsługa wykonuje zapytanie i kończy łańcuch zdarzeń
+            event.listen(session, 'do_orm_execute', _on_orm_execute, insert=True)
+            event.listen(session, 'before_commit', _before_commit)
+            event.listen(session, 'after_commit', _after_commit)
+            event.listen(session, 'after_soft_rollback', _after_rollback)
+        app.extensions['settlement_summary'] = self
+
+
+# --- KOMENDY 'flask settlements ...' ---
+
+@click.group('settlements')
+def settlements_cli():
+    """Podsumowanie rozliczeń pracowników (monthly_settlement)."""
+
+
+@settlements_cli.command('refresh')
+@with_appcontext
+def refresh_command():
+    """Przelicza miesiące oznaczone jako zmienione."""
+    click.echo(f"Przeliczono miesięcy: {refresh_dirty_months()}")
+
+
+@settlements_cli.command('rebuild')
+@with_appcontext
+def rebuild_command():
+    """Przelicza wszystkie miesiące od nowa."""
+    click.echo(f"Przeliczono miesięcy: {rebuild_all()}")
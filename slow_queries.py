@@ -0,0 +1,226 @@
+"""
+Dziennik wolnych zapytań SQL z automatycznym planem wykonania.
+Plik: slow_queries.py
+
+Zapytanie trwające dłużej niż SLOW_QUERY_THRESHOLD_MS jest zapisywane (treść,
+parametry, endpoint) do osobnego pliku z rotacją (SLOW_QUERY_LOG) i do
+podsumowania w pamięci procesu (/admin/slow-queries, top-N wg łącznego czasu).
+
+Plan (EXPLAIN QUERY PLAN w SQLite, EXPLAIN w PostgreSQL/MySQL) jest pobierany
+w osobnym wątku na nowym połączeniu - żądanie, które wykonało wolne zapytanie,
+nie czeka na niego. Gdy kolejka planów jest pełna (lub baza działa w pamięci,
+z jednym wspólnym połączeniem), wpis trafia do dziennika bez planu.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from flask import current_app, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import SingletonThreadPool, StaticPool
+from request_logging import start_queue_listener
+
+logger = logging.getLogger('grafik.slow_queries')
+_file_logs = set()  # pliki dziennika już podpięte w tym procesie
+
+EXPLAIN_PREFIXES = {'sqlite': 'EXPLAIN QUERY PLAN ', 'postgresql': 'EXPLAIN ', 'mysql': 'EXPLAIN ', 'mariadb': 'EXPLAIN '}
+# Tylko takie zapytania mają plan (EXPLAIN bez ANALYZE niczego nie wykonuje)
+EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+# Parametry zapytań o hasła nie trafiają do dziennika
+SENSITIVE_MARKERS = ('password',)
+MAX_PARAMS_LENGTH = 500
+
+
+def _format_params(statement, parameters):
+    if any(marker in statement.lower() for marker in SENSITIVE_MARKERS):
+        return '<ukryte>'
+    text = repr(parameters)
+    return text if len(text) <= MAX_PARAMS_LENGTH else text[:MAX_PARAMS_LENGTH] + '...'
+
+
+def _current_endpoint():
+    if has_request_context():
+        return request.endpoint or request.path
+    return 'poza żądaniem'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('slow_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('slow_query_start')
+    if not starts:
+        return
+    elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+    if not has_app_context():
+        return
+    log = current_app.extensions.get('slow_query_log')
+    if log is None or elapsed_ms < log.threshold_ms or statement.lstrip().upper().startswith('EXPLAIN'):
+        return
+    log.submit(conn.engine, statement, parameters, executemany, elapsed_ms, _current_endpoint())
+
+
+class SlowQueryLog:
+    """Zbiór wolnych zapytań jednej aplikacji (podsumowanie + wątek pobierający plany)."""
+
+    def __init__(self, threshold_ms, explain=True, max_statements=500, max_pending=50):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.max_statements = max_statements
+        self.max_pending = max_pending
+        self.skipped_plans = 0
+        self._stats = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+
+    def _get_executor(self):
+        # Osobny wątek w każdym procesie (gunicorn forkuje workery)
+        if self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='grafik-explain')
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def submit(self, engine, statement, parameters, executemany, elapsed_ms, endpoint):
+        params = _format_params(statement, parameters)
+        explainable = (
+            self.explain and not executemany
+            and engine.dialect.name in EXPLAIN_PREFIXES
+            # Baza w pamięci ma jedno wspólne połączenie - zwrot do puli cofnąłby transakcję żądania
+            and not isinstance(engine.pool, (StaticPool, SingletonThreadPool))
+            and statement.lstrip().upper().startswith(EXPLAINABLE)
+        )
+        with self._lock:
+            if explainable and len(self._pending) >= self.max_pending:
+                self.skipped_plans += 1
+                explainable = False
+            if explainable:
+                future = self._get_executor().submit(
+                    self._explain_and_record, engine, statement, parameters, params, elapsed_ms, endpoint)
+                self._pending.add(future)
+                future.add_done_callback(self._pending.discard)
+                return
+        self._record(statement, params, elapsed_ms, endpoint, plan=None)
+
+    def _explain_and_record(self, engine, statement, parameters, params, elapsed_ms, endpoint):
+        try:
+            with engine.connect() as conn:
+                rows = conn.exec_driver_sql(EXPLAIN_PREFIXES[engine.dialect.name] + statement, parameters).all()
+            if engine.dialect.name == 'sqlite':
+                # (id, parent, notused, detail) - istotny jest tylko opis kroku
+                plan = '\n'.join(str(row[-1]) for row in rows)
+            else:
+                plan = '\n'.join(' | '.join(str(value) for value in row) for row in rows)
+        except Exception as e:
+            plan = f'(nie udało się pobrać planu: {e})'
+        self._record(statement, params, elapsed_ms, endpoint, plan)
+
+    def _record(self, statement, params, elapsed_ms, endpoint, plan):
+        logger.warning(
+            '%.1f ms [%s] %s | parametry: %s%s',
+            elapsed_ms, endpoint, ' '.join(statement.split()), params,
+            f'\n{plan}' if plan else ''
+        )
+        key = ' '.join(statement.split())
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                if len(self._stats) >= self.max_statements:
+                    return
+                entry = self._stats[key] = {
+                    'statement': key, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'endpoints': {},
+                }
+            entry['count'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            entry['endpoints'][endpoint] = entry['endpoints'].get(endpoint, 0) + 1
+            entry['last_params'] = params
+            entry['last_seen'] = datetime.now(timezone.utc)
+            if plan is not None:
+                entry['plan'] = plan
+
+    def top(self, limit):
+        """Najwolniejsze zapytania wg łącznego czasu (kopie wpisów)."""
+        with self._lock:
+            entries = [dict(entry, endpoints=dict(entry['endpoints'])) for entry in self._stats.values()]
+        entries.sort(key=lambda entry: entry['total_ms'], reverse=True)
+        return entries[:limit]
+
+    def flush(self, timeout=None):
+        """Czeka na pobranie zaległych planów (testy, zamykanie procesu)."""
+        with self._lock:
+            pending = list(self._pending)
+        wait(pending, timeout=timeout)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.skipped_plans = 0
+
+
+class SlowQueries:
+    """Rozszerzenie Flask rejestrujące wolne zapytania SQL."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SLOW_QUERY_THRESHOLD_MS', 200)
+        app.config.setdefault('SLOW_QUERY_EXPLAIN', True)
+        app.config.setdefault('SLOW_QUERY_LOG', 'logs/slow_queries.log')
+        app.config.setdefault('SLOW_QUERY_TOP', 20)
+        threshold = app.config['SLOW_QUERY_THRESHOLD_MS']
+        if threshold is None:
+            return
+        app.extensions['slow_query_log'] = SlowQueryLog(threshold, explain=app.config['SLOW_QUERY_EXPLAIN'])
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        if app.config['SLOW_QUERY_LOG'] and not app.testing:
+            self._add_file_handler(app.config['SLOW_QUERY_LOG'])
+
+    @staticmethod
+    def _add_file_handler(path):
+        path = os.path.abspath(path)
+        if path in _file_logs:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=1024 * 1024, backupCount=5, encoding='utf-8', delay=True)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        # Zapis do pliku w wątku logowania - wpis bez planu powstaje w wątku żądania
+        start_queue_listener(logger, handler)
+        _file_logs.add(path)
+        logger.setLevel(logging.WARNING)
+        # Wolne zapytania tylko w swoim pliku - bez dublowania w logs/grafik.log
+        logger.propagate = False
+
+    @staticmethod
+    def _log():
+        return current_app.extensions.get('slow_query_log')
+
+    def top(self, limit=None):
+        log = self._log()
+        if log is None:
+            return []
+        return log.top(limit or current_app.config['SLOW_QUERY_TOP'])
+
+    def flush(self, timeout=None):
+        log = self._log()
+        if log is not None:
+            log.flush(timeout)
+
+    def reset(self):
+        log = self._log()
+        if log is not None:
+            log.reset()
+
+    def skipped_plans(self):
+        log = self._log()
+        return log.skipped_plans if log is not None else 0
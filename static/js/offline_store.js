@@ -0,0 +1,245 @@
+/*
+ * Magazyn offline aplikacji Grafik (IndexedDB).
+ * Plik: static/js/offline_store.js
+ *
+ * Ładowany przez strony (window.GrafikOffline) i przez service workera (importScripts):
+ * - 'events' - ostatnio pobrane zlecenia kalendarza (kalendarz rysuje się bez sieci),
+ * - 'outbox' - akcje zapisów wykonane bez zasięgu; wysyłane ponownie z tym samym
+ *              kluczem idempotencji, więc serwer nie wykona ich dwa razy.
+ */
+(function (global) {
+    'use strict';
+
+    const DB_NAME = 'grafik-offline';
+    const DB_VERSION = 1;
+    const SYNC_TAG = 'grafik-outbox';
+    const REPLAYED_EVENT = 'grafik:outbox-replayed';
+
+    let dbPromise = null;
+    let replaying = null;
+
+    function openDb() {
+        if (!dbPromise) {
+            dbPromise = new Promise((resolve, reject) => {
+                if (!global.indexedDB) {
+                    reject(new Error('IndexedDB jest niedostępne (np. tryb prywatny).'));
+                    return;
+                }
+                const request = global.indexedDB.open(DB_NAME, DB_VERSION);
+                request.onupgradeneeded = () => {
+                    const db = request.result;
+                    const events = db.createObjectStore('events', { keyPath: 'id' });
+                    events.createIndex('start', 'start');
+                    db.createObjectStore('outbox', { keyPath: 'key' });
+                };
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = () => reject(request.error);
+            });
+            // Po błędzie pozwalamy spróbować ponownie przy następnym wywołaniu
+            dbPromise.catch(() => { dbPromise = null; });
+        }
+        return dbPromise;
+    }
+
+    // Wykonuje fn(store) w jednej transakcji; wynik to wartość zwróconego IDBRequest
+    function withStore(name, mode, fn) {
+        return openDb().then(db => new Promise((resolve, reject) => {
+            const tx = db.transaction(name, mode);
+            const request = fn(tx.objectStore(name));
+            tx.oncomplete = () => resolve(request ? request.result : undefined);
+            tx.onerror = tx.onabort = () => reject(tx.error);
+        }));
+    }
+
+    // Zakres dat 'YYYY-MM-DD' (koniec wyłączny, jak w FullCalendar)
+    function dateRange(start, end) {
+        return IDBKeyRange.bound(start.slice(0, 10), end.slice(0, 10), false, true);
+    }
+
+    function signature(events) {
+        return JSON.stringify(events.map(event => JSON.stringify(event)).sort());
+    }
+
+    function getEvents(start, end) {
+        return withStore('events', 'readonly', store => store.index('start').getAll(dateRange(start, end)));
+    }
+
+    /**
+     * Zastępuje zapisane zlecenia z zakresu nową listą z serwera.
+     * Zwraca Promise<boolean> - czy dane się zmieniły (trzeba przerysować kalendarz).
+     */
+    function replaceEvents(start, end, events) {
+        return openDb().then(db => new Promise((resolve, reject) => {
+            const tx = db.transaction('events', 'readwrite');
+            const store = tx.objectStore('events');
+            const previous = [];
+            store.index('start').openCursor(dateRange(start, end)).onsuccess = e => {
+                const cursor = e.target.result;
+                if (cursor) {
+                    previous.push(cursor.value);
+                    cursor.delete();
+                    cursor.continue();
+                    return;
+                }
+                events.forEach(event => store.put(event));
+            };
+            tx.oncomplete = () => resolve(signature(previous) !== signature(events));
+            tx.onerror = tx.onabort = () => reject(tx.error);
+        }));
+    }
+
+    // Zmiany przyrostowe z /api/events/changes: nadpisuje zmienione i usuwa skasowane zlecenia
+    function applyChanges(changed, deletedIds) {
+        return openDb().then(db => new Promise((resolve, reject) => {
+            const tx = db.transaction('events', 'readwrite');
+            const store = tx.objectStore('events');
+            changed.forEach(event => store.put(event));
+            deletedIds.forEach(id => store.delete(id));
+            tx.oncomplete = () => resolve();
+            tx.onerror = tx.onabort = () => reject(tx.error);
+        }));
+    }
+
+    function newKey() {
+        if (global.crypto && global.crypto.randomUUID) return global.crypto.randomUUID();
+        return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2, 12);
+    }
+
+    function pendingActions() {
+        return withStore('outbox', 'readonly', store => store.getAll())
+            .then(actions => actions.sort((a, b) => a.createdAt - b.createdAt));
+    }
+
+    // Background Sync (Chrome/Edge); pozostałe przeglądarki - ponowienie przy 'online' i starcie strony
+    function requestSync() {
+        const container = global.navigator && global.navigator.serviceWorker;
+        if (!container || !('SyncManager' in global)) return Promise.resolve();
+        return container.ready.then(reg => reg.sync.register(SYNC_TAG)).catch(() => undefined);
+    }
+
+    /**
+     * Zapisuje akcję w kolejce: { url, body (urlencoded), label }.
+     * Klucz idempotencji musi być ten sam, co przy pierwszej (nieudanej) próbie.
+     */
+    function queueAction(action) {
+        const entry = Object.assign({ key: newKey(), createdAt: Date.now() }, action);
+        // Token CSRF z formularza mógł wygasnąć - przy wysyłce pobieramy świeży
+        const body = new URLSearchParams(entry.body);
+        body.delete('csrf_token');
+        entry.body = body.toString();
+        return withStore('outbox', 'readwrite', store => store.put(entry))
+            .then(() => requestSync())
+            .then(() => entry);
+    }
+
+    function sendAction(action, csrfToken, extraHeaders) {
+        return fetch(action.url, {
+            method: 'POST',
+            credentials: 'same-origin',
+            headers: Object.assign({
+                'Content-Type': 'application/x-www-form-urlencoded',
+                'Idempotency-Key': action.key,
+                'X-CSRFToken': csrfToken || ''
+            }, extraHeaders || {}),
+            body: action.body
+        });
+    }
+
+    /**
+     * Wysyła akcję od razu, a bez sieci odkłada ją do kolejki.
+     * Zwraca Promise<{ queued: boolean, response?: Response }>.
+     */
+    function submitAction(action, csrfToken) {
+        const entry = Object.assign({ key: newKey(), createdAt: Date.now() }, action);
+        return sendAction(entry, csrfToken)
+            .then(response => {
+                // Błąd serwera lub utracone połączenie w trakcie - ponowimy z tym samym kluczem
+                if (response.status >= 500 || response.status === 409) throw new TypeError('retry');
+                return { queued: false, response: response };
+            })
+            .catch(error => {
+                if (!(error instanceof TypeError)) throw error;
+                return queueAction(entry).then(() => ({ queued: true }));
+            });
+    }
+
+    function notifyReplayed(result) {
+        if (global.clients && global.clients.matchAll) {
+            // Service worker - powiadamiamy otwarte karty
+            return global.clients.matchAll({ type: 'window' }).then(list => {
+                list.forEach(client => client.postMessage({ type: REPLAYED_EVENT, result: result }));
+            });
+        }
+        if (global.dispatchEvent && global.CustomEvent) {
+            global.dispatchEvent(new CustomEvent(REPLAYED_EVENT, { detail: result }));
+        }
+        return Promise.resolve();
+    }
+
+    function sendSequentially(actions, csrfToken) {
+        const result = { sent: 0, dropped: 0, pending: actions.length };
+        // Kolejność ma znaczenie (np. zapis, a potem rezygnacja) - wysyłamy po kolei
+        return actions.reduce((chain, action) => chain.then(stop => {
+            if (stop) return true;
+            return sendAction(action, csrfToken, { 'X-Requested-With': 'XMLHttpRequest' }).then(response => {
+                const isJson = (response.headers.get('Content-Type') || '').includes('application/json');
+                // Wygasła sesja (przekierowanie do logowania), konflikt lub błąd serwera - spróbujemy później
+                if (response.redirected || response.status === 409 || response.status >= 500 || !isJson) return true;
+                if (!response.ok) result.dropped += 1; // np. zlecenie usunięte - ponawianie nic nie da
+                else result.sent += 1;
+                result.pending -= 1;
+                return withStore('outbox', 'readwrite', store => store.delete(action.key)).then(() => false);
+            });
+        }), Promise.resolve(false)).then(() => result, () => result);
+    }
+
+    /**
+     * Wysyła zaległe akcje z kolejki. Zwraca Promise<{ sent, dropped, pending }>.
+     * csrfUrl - adres trasy main.api_csrf_token.
+     */
+    function replayQueue(csrfUrl) {
+        if (replaying) return replaying;
+        replaying = pendingActions()
+            .then(actions => {
+                if (!actions.length) return { sent: 0, dropped: 0, pending: 0 };
+                return fetch(csrfUrl, { credentials: 'same-origin', headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+                    .then(response => {
+                        if (!response.ok || response.redirected) throw new Error('Brak sesji - akcje poczekają na zalogowanie.');
+                        return response.json();
+                    })
+                    .then(data => sendSequentially(actions, data.csrf_token))
+                    .catch(() => ({ sent: 0, dropped: 0, pending: actions.length }));
+            })
+            .then(result => {
+                const done = result.sent || result.dropped ? notifyReplayed(result) : Promise.resolve();
+                return done.then(() => result);
+            })
+            .finally(() => { replaying = null; });
+        return replaying;
+    }
+
+    // Wylogowanie - dane mogą należeć do innego użytkownika tego urządzenia
+    function clear() {
+        return openDb().then(db => new Promise((resolve, reject) => {
+            const tx = db.transaction(['events', 'outbox'], 'readwrite');
+            tx.objectStore('events').clear();
+            tx.objectStore('outbox').clear();
+            tx.oncomplete = () => resolve();
+            tx.onerror = tx.onabort = () => reject(tx.error);
+        })).catch(() => undefined);
+    }
+
+    global.GrafikOffline = {
+        SYNC_TAG: SYNC_TAG,
+        REPLAYED_EVENT: REPLAYED_EVENT,
+        getEvents: getEvents,
+        replaceEvents: replaceEvents,
+        applyChanges: applyChanges,
+        newKey: newKey,
+        pendingActions: pendingActions,
+        queueAction: queueAction,
+        submitAction: submitAction,
+        replayQueue: replayQueue,
+        clear: clear
+    };
+})(self);
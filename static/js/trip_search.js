@@ -0,0 +1,89 @@
+/*
+ * Wyszukiwarka zleceń na panelu głównym (/api/search).
+ * Plik: static/js/trip_search.js
+ *
+ * Zapytanie wysyłane jest po krótkiej przerwie w pisaniu; odpowiedź na
+ * starsze zapytanie, która przyjdzie później, jest pomijana.
+ */
+(function () {
+    'use strict';
+
+    const DEBOUNCE_MS = 200;
+    const MIN_LENGTH = 2;
+
+    document.addEventListener('DOMContentLoaded', function () {
+        const input = document.getElementById('trip-search-input');
+        const list = document.getElementById('trip-search-results');
+        if (!input || !list) return;
+
+        let timer = null;
+        let latest = 0;
+
+        function formatDate(isoDate) {
+            const [year, month, day] = isoDate.split('-');
+            return `${day}.${month}.${year}`;
+        }
+
+        function render(results) {
+            list.replaceChildren();
+            if (!results.length) {
+                const empty = document.createElement('li');
+                empty.className = 'trip-search-empty';
+                empty.textContent = 'Brak pasujących zleceń.';
+                list.appendChild(empty);
+            }
+            results.forEach((result) => {
+                const item = document.createElement('li');
+                const link = document.createElement('a');
+                link.href = result.url;
+                const title = document.createElement('span');
+                title.textContent = result.is_archived ? `${result.title} (archiwum)` : result.title;
+                const date = document.createElement('span');
+                date.className = 'trip-search-date';
+                date.textContent = formatDate(result.date);
+                link.append(title, date);
+                item.appendChild(link);
+                list.appendChild(item);
+            });
+            list.hidden = false;
+        }
+
+        async function search(query) {
+            const requestId = ++latest;
+            const url = new URL(input.dataset.searchUrl, window.location.origin);
+            url.searchParams.set('q', query);
+            if (input.dataset.searchScope) url.searchParams.set('scope', input.dataset.searchScope);
+            try {
+                const response = await fetch(url, { headers: { 'Accept': 'application/json' } });
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                const data = await response.json();
+                if (requestId === latest) render(data.results);
+            } catch (error) {
+                console.error('Błąd wyszukiwania zleceń:', error);
+            }
+        }
+
+        input.addEventListener('input', function () {
+            clearTimeout(timer);
+            const query = input.value.trim();
+            if (query.length < MIN_LENGTH) {
+                latest++;
+                list.hidden = true;
+                return;
+            }
+            timer = setTimeout(() => search(query), DEBOUNCE_MS);
+        });
+
+        input.addEventListener('keydown', function (event) {
+            if (event.key === 'Escape') {
+                list.hidden = true;
+            }
+        });
+
+        document.addEventListener('click', function (event) {
+            if (!input.contains(event.target) && !list.contains(event.target)) {
+                list.hidden = true;
+            }
+        });
+    });
+})();
@@ -0,0 +1,170 @@
+"""
+Zadania w tle z wymiennym wykonawcą (e-maile i inne operacje poza żądaniem).
+Plik: tasks.py
+
+TASKS_BACKEND wybiera sposób wykonania:
+- 'rq'     - kolejka Redis (Flask-RQ2), wykonuje osobny proces 'flask rq worker',
+- 'thread' - ograniczona pula wątków w procesie aplikacji (małe wdrożenia bez Redisa);
+             przy zamykaniu procesu zadania z kolejki są dokańczane (TASKS_DRAIN_TIMEOUT),
+- 'sync'   - od razu w wątku wywołującym (testy, skrypty).
+
+Zadanie to funkcja na poziomie modułu z argumentami, które da się zapisać
+w kolejce (napisy, liczby, listy) - nie obiekty ORM ani kontekst żądania.
+"""
+import atexit
+import os
+import queue
+import threading
+from concurrent.futures import Future, wait
+from flask import current_app
+from metrics import count_enqueue
+
+BACKENDS = ('rq', 'thread', 'sync')
+
+
+def task_name(func):
+    """Nazwa zadania w formacie RQ ('moduł.funkcja') - etykieta metryk i logów."""
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+class _ThreadBackend:
+    """
+    Pula wątków powiązana z aplikacją; odtwarzana po fork() (workery Gunicorna).
+    Wątki są demonami - nie blokują wyjścia z interpretera, a zadania z kolejki
+    dokańcza drain() zarejestrowany w atexit (z limitem TASKS_DRAIN_TIMEOUT).
+    """
+
+    def __init__(self, app, workers, queue_limit, drain_timeout):
+        self.app = app
+        self.workers = workers
+        self.drain_timeout = drain_timeout
+        self._queue = None
+        self._threads = []
+        self._queue_pid = None
+        self._pending = set()
+        self._lock = threading.Lock()
+        # Wykonywane + oczekujące; przy pełnej puli zadanie wykonuje się w wątku wywołującym
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+
+    def work_queue(self):
+        pid = os.getpid()
+        if self._queue is None or self._queue_pid != pid:
+            with self._lock:
+                if self._queue is None or self._queue_pid != pid:
+                    self._queue = queue.SimpleQueue()
+                    self._threads = [
+                        threading.Thread(target=self._worker, args=(self._queue,), name=f'tasks_{i}', daemon=True)
+                        for i in range(self.workers)
+                    ]
+                    for thread in self._threads:
+                        thread.start()
+                    self._queue_pid = pid
+                    self._pending = set()
+                    # Publiczne atexit wystarcza: wątki-demony nie są dołączane przed nim
+                    atexit.register(self.drain)
+        return self._queue
+
+    def _worker(self, work):
+        while True:
+            item = work.get()
+            if item is None:
+                return
+            future, func, args, kwargs = item
+            if future.set_running_or_notify_cancel():
+                self._run(func, args, kwargs)
+                future.set_result(None)
+
+    def _run(self, func, args, kwargs):
+        with self.app.app_context():
+            try:
+                func(*args, **kwargs)
+            except Exception:
+                self.app.logger.exception(f"Zadanie w tle {task_name(func)} zakończyło się błędem")
+
+    def submit(self, func, args, kwargs):
+        if not self._slots.acquire(blocking=False):
+            # Nie gubimy zadania - żądanie poczeka, ale wiadomość zostanie wysłana
+            self.app.logger.warning(f"Pula zadań jest pełna - {task_name(func)} wykonane w wątku żądania")
+            self._run(func, args, kwargs)
+            return
+        try:
+            work = self.work_queue()
+        except Exception:
+            self._slots.release()
+            raise
+        future = Future()
+        self._pending.add(future)
+        future.add_done_callback(self._done)
+        work.put((future, func, args, kwargs))
+
+    def _done(self, future):
+        self._pending.discard(future)
+        self._slots.release()
+
+    def drain(self):
+        """Czeka (najwyżej TASKS_DRAIN_TIMEOUT s) na zadania z kolejki, resztę porzuca z wpisem w logu."""
+        work = self._queue
+        if work is None or self._queue_pid != os.getpid():
+            return
+        _, not_done = wait(list(self._pending), timeout=self.drain_timeout)
+        if not_done:
+            self.app.logger.error(f"Zamykanie procesu: porzucono {len(not_done)} niewykonanych zadań w tle")
+        for future in not_done:
+            future.cancel()  # Oczekujące nie wystartują; wykonywane kończą się razem z procesem
+        for _ in self._threads:
+            work.put(None)
+        self._queue = None
+        self._threads = []
+
+
+class TaskQueue:
+    """Rozszerzenie Flask: jedno miejsce zlecania zadań w tle."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('TASKS_BACKEND', 'rq')
+        app.config.setdefault('TASKS_THREAD_WORKERS', 2)
+        app.config.setdefault('TASKS_QUEUE_LIMIT', 100)
+        app.config.setdefault('TASKS_DRAIN_TIMEOUT', 20.0)
+        backend = app.config['TASKS_BACKEND']
+        if backend not in BACKENDS:
+            raise ValueError(f"Nieznany TASKS_BACKEND '{backend}' (dozwolone: {', '.join(BACKENDS)})")
+        state = None
+        if backend == 'thread':
+            state = _ThreadBackend(
+                app,
+                workers=max(int(app.config['TASKS_THREAD_WORKERS']), 1),
+                queue_limit=int(app.config['TASKS_QUEUE_LIMIT']),
+                drain_timeout=float(app.config['TASKS_DRAIN_TIMEOUT']),
+            )
+        app.extensions['tasks'] = (backend, state)
+
+    def enqueue(self, func, *args, **kwargs):
+        """
+        Zleca wykonanie func(*args, **kwargs) poza żądaniem. Błąd kolejki
+        (np. brak połączenia z Redisem) jest zgłaszany wywołującemu; błędy
+        samego zadania trafiają do logu (thread/sync) lub do rejestru RQ.
+        """
+        backend, state = current_app.extensions['tasks']
+        if backend == 'rq':
+            from extensions import rq
+            # Liczenie w metrykach robi InstrumentedQueue (RQ_QUEUE_CLASS)
+            return rq.get_queue().enqueue(func, *args, **kwargs)
+        count_enqueue(task_name(func))
+        if backend == 'thread':
+            state.submit(func, args, kwargs)
+            return None
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            current_app.logger.exception(f"Zadanie {task_name(func)} zakończyło się błędem")
+        return None
+
+    def drain(self):
+        """Dokańcza zadania puli wątków (np. w hooku worker_exit Gunicorna)."""
+        backend, state = current_app.extensions['tasks']
+        if state is not None:
+            state.drain()
@@ -0,0 +1,112 @@
+// Service worker aplikacji Grafik Firmowy.
+// Plik jest GENEROWANY przez trasę main.service_worker na podstawie manifestu zasobów
+// ('flask assets build') - wersja zmienia się automatycznie razem z plikami statycznymi.
+
+const CACHE_VERSION = {{ version | tojson }};
+const STATIC_CACHE = 'grafik-static-' + CACHE_VERSION;
+const PAGES_CACHE = 'grafik-pages-' + CACHE_VERSION;
+const API_CACHE = 'grafik-api-' + CACHE_VERSION;
+
+// Pliki z hashem w nazwie - niezmienne, więc można je pobrać z góry przy instalacji
+const PRECACHE_URLS = {{ precache_urls | tojson }};
+
+// Zapytania API obsługiwane strategią stale-while-revalidate
+const API_PREFIXES = {{ api_prefixes | tojson }};
+
+// Magazyn IndexedDB wspólny ze stronami (zlecenia i kolejka akcji offline)
+importScripts({{ offline_store_url | tojson }});
+const CSRF_URL = {{ csrf_url | tojson }};
+
+self.addEventListener('install', event => {
+  event.waitUntil(
+    caches.open(STATIC_CACHE)
+      .then(cache => cache.addAll(PRECACHE_URLS))
+      .then(() => self.skipWaiting())
+  );
+});
+
+// Aktywacja: usuwamy pamięć podręczną poprzednich wersji
+self.addEventListener('activate', event => {
+  const current = [STATIC_CACHE, PAGES_CACHE, API_CACHE];
+  event.waitUntil(
+    caches.keys()
+      .then(names => Promise.all(
+        names.filter(name => name.startsWith('grafik-') && !current.includes(name))
+             .map(name => caches.delete(name))
+      ))
+      .then(() => self.clients.claim())
+  );
+});
+
+// Stale-while-revalidate: natychmiast zwracamy kopię z cache'u, a w tle ją odświeżamy
+function staleWhileRevalidate(event, cacheName) {
+  const request = event.request;
+  const network = fetch(request).then(response => {
+    if (response && response.ok) {
+      const copy = response.clone();
+      caches.open(cacheName).then(cache => cache.put(request, copy));
+    }
+    return response;
+  });
+  event.waitUntil(network.catch(() => undefined));
+  return caches.match(request).then(cached => cached || network);
+}
+
+// Network-first: zawsze świeży HTML, a kopia z cache'u tylko bez sieci
+function networkFirst(request, cacheName) {
+  return fetch(request)
+    .then(response => {
+      if (response && response.ok && !response.redirected) {
+        const copy = response.clone();
+        caches.open(cacheName).then(cache => cache.put(request, copy));
+      }
+      return response;
+    })
+    .catch(() => caches.match(request).then(cached => cached || Response.error()));
+}
+
+// Cache-first: pliki z hashem w nazwie nigdy się nie zmieniają
+function cacheFirst(request, cacheName) {
+  return caches.match(request).then(cached => cached || fetch(request).then(response => {
+    if (response && response.ok) {
+      const copy = response.clone();
+      caches.open(cacheName).then(cache => cache.put(request, copy));
+    }
+    return response;
+  }));
+}
+
+self.addEventListener('fetch', event => {
+  const request = event.request;
+  const url = new URL(request.url);
+
+  // Tylko GET z naszej domeny - formularze i zapytania zewnętrzne idą prosto do sieci
+  if (request.method !== 'GET' || url.origin !== self.location.origin) {
+    return;
+  }
+
+  // Po wylogowaniu usuwamy zapisane strony i dane (mogą zawierać dane użytkownika)
+  if (url.pathname === {{ logout_path | tojson }}) {
+    event.waitUntil(Promise.all([caches.delete(PAGES_CACHE), caches.delete(API_CACHE), GrafikOffline.clear()]));
+    return;
+  }
+
+  if (url.pathname.startsWith({{ dist_prefix | tojson }})) {
+    event.respondWith(cacheFirst(request, STATIC_CACHE));
+  } else if (API_PREFIXES.some(prefix => url.pathname === prefix)) {
+    event.respondWith(staleWhileRevalidate(event, API_CACHE));
+  } else if (request.mode === 'navigate') {
+    event.respondWith(networkFirst(request, PAGES_CACHE));
+  } else if (url.pathname.startsWith({{ static_prefix | tojson }})) {
+    event.respondWith(staleWhileRevalidate(event, STATIC_CACHE));
+  }
+});
+
+// Background Sync: przeglądarka budzi workera po odzyskaniu połączenia.
+// Odrzucona obietnica (zostały akcje w kolejce) oznacza ponowienie później.
+self.addEventListener('sync', event => {
+  if (event.tag !== GrafikOffline.SYNC_TAG) return;
+  event.waitUntil(GrafikOffline.replayQueue(CSRF_URL).then(result => {
+    if (result.pending) throw new Error('Zostały niewysłane akcje: ' + result.pending);
+  }));
+});
@@ -0,0 +1,217 @@
+"""
+Testy potoku zasobów statycznych
+Plik: tests/test_assets.py
+
+WAŻNE: Wszystkie fixtures importowane z conftest.py
+"""
+import io
+import json
+import os
+import shutil
+import click
+import pytest
+from assets import build_assets, minify_css, minify_js, vendor_assets, DIST_DIR, VENDOR_SOURCES
+from utils import url_for_static_bust
+
+
+@pytest.fixture(scope='function')
+def built_static(app, tmp_path):
+    """Kopia katalogu static/ ze zbudowanym manifestem, podpięta pod aplikację."""
+    static_copy = tmp_path / 'static'
+    shutil.copytree(app.static_folder, static_copy, ignore=shutil.ignore_patterns(DIST_DIR))
+    manifest = build_assets(str(static_copy))
+
+    original_folder = app.static_folder
+    extension = app.extensions['assets']
+    original_manifest = extension.manifest
+    app.static_folder = str(static_copy)
+    extension.manifest = manifest
+    yield manifest
+    app.static_folder = original_folder
+    extension.manifest = original_manifest
+
+
+def test_minifiers_keep_semantics():
+    """Minifikacja usuwa komentarze i wcięcia, ale nie zmienia selektorów i kodu"""
+    css = "/* komentarz */\na :hover ,\nb > c {\n  color : red;\n  margin: 0 auto;\n}\n"
+    assert minify_css(css) == "a :hover,b>c{color :red;margin:0 auto}"
+
+    js = "// komentarz\nfunction f() {\n    return 1\n}\n\n"
+    assert minify_js(js) == "function f() {\nreturn 1\n}\n"
+
+
+def test_minifiers_keep_strings_and_templates():
+    """Treść napisów, szablonów `...` i wyrażeń regularnych zostaje bez zmian"""
+    css = 'a::before { content: " > " ; }  /* c */\nb { font-family: "A  B" }'
+    assert minify_css(css) == 'a::before{content:" > "}b{font-family:"A  B"}'
+
+    js = ("const html = `<ul>\n    // to nie komentarz\n  ${items.map(i => `<li>${i}</li>`).join('')}\n</ul>`;\n"
+          "    const url = '//cdn.example.com'; // komentarz\n"
+          "    const re = /\\/\\/[a-z/]+/g; /* blok */ return a / b / c\n")
+    assert minify_js(js) == (
+        "const html = `<ul>\n    // to nie komentarz\n  ${items.map(i => `<li>${i}</li>`).join('')}\n</ul>`;\n"
+        "const url = '//cdn.example.com';\n"
+        "const re = /\\/\\/[a-z/]+/g;   return a / b / c\n")
+    # Kod, którego skaner nie rozumie (np. niezamknięty napis), zostaje bez zmian
+    assert minify_js("var s = 'abc\n") == "var s = 'abc\n"
+
+
+def test_build_fingerprints_and_compresses(built_static, app):
+    """Build tworzy pliki z hashem treści, wersje .gz i pomija plik manifest.json PWA"""
+    hashed = built_static['files']['css/style.css']
+    assert hashed.startswith('css/style.') and hashed.endswith('.css')
+    assert 'manifest.json' not in built_static['files']
+
+    target = os.path.join(app.static_folder, DIST_DIR, hashed)
+    assert os.path.exists(target)
+    assert os.path.exists(target + '.gz')
+    assert 'gzip' in built_static['encodings'][hashed]
+
+
+def test_url_for_static_bust_uses_manifest(built_static, app):
+    """url_for_static_bust zwraca adres z hashem z manifestu"""
+    with app.test_request_context():
+        url = url_for_static_bust('css/style.css')
+    assert url == f"/static/dist/{built_static['files']['css/style.css']}"
+
+
+def test_hashed_asset_served_immutable_and_precompressed(built_static, client):
+    """Plik z hashem ma nagłówek immutable i jest serwowany w wersji gzip"""
+    hashed = built_static['files']['css/style.css']
+    response = client.get(f'/static/dist/{hashed}', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.mimetype == 'text/css'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'max-age=31536000' in response.headers['Cache-Control']
+
+    plain = client.get(f'/static/dist/{hashed}')
+    assert 'Content-Encoding' not in plain.headers
+    assert b'{' in plain.data
+
+
+# ==================== BIBLIOTEKI ZEWNĘTRZNE (VENDOR) ====================
+
+def _build_sample_font():
+    """Buduje w pamięci prostą czcionkę TTF z ~400 znakami (do sprawdzenia przycinania)."""
+    from fontTools.fontBuilder import FontBuilder
+    from fontTools.pens.ttGlyphPen import TTGlyphPen
+
+    chars = [chr(c) for c in range(0x20, 0x7f)] + [chr(c) for c in range(0x100, 0x250)]
+    names = ['.notdef'] + [f'uni{ord(c):04X}' for c in chars]
+    glyphs = {}
+    for name in names:
+        pen = TTGlyphPen(None)
+        pen.moveTo((0, 0))
+        pen.lineTo((0, 500))
+        pen.lineTo((500, 500))
+        pen.closePath()
+        glyphs[name] = pen.glyph()
+
+    builder = FontBuilder(1000, isTTF=True)
+    builder.setupGlyphOrder(names)
+    builder.setupCharacterMap({ord(c): f'uni{ord(c):04X}' for c in chars})
+    builder.setupGlyf(glyphs)
+    builder.setupHorizontalMetrics({name: (600, 0) for name in names})
+    builder.setupHorizontalHeader(ascent=800, descent=-200)
+    builder.setupNameTable({'familyName': 'Probna', 'styleName': 'Regular'})
+    builder.setupOS2()
+    builder.setupPost()
+    output = io.BytesIO()
+    builder.save(output)
+    return output.getvalue()
+
+
+def test_vendor_downloads_subsets_and_locks(tmp_path):
+    """'assets vendor' zapisuje pliki, przycina czcionki, tworzy fonts.css i vendor-lock.json"""
+    pytest.importorskip('fontTools.subset')
+    font_data = _build_sample_font()
+
+    def fake_fetch(url):
+        # Zastępuje pobieranie z CDN: skrypt dla FullCalendar, przykładowa czcionka dla fontów
+        return b'var FullCalendar = {};\n' if url.endswith('.js') else font_data
+
+    # Bez zatwierdzonego locka nic nie jest pobierane (build nie pada, zostają adresy CDN)
+    def no_fetch(url):
+        raise AssertionError(f'pobrano {url} bez locka')
+    assert vendor_assets(str(tmp_path), fetch=no_fetch, echo=lambda *_: None) is None
+    assert not (tmp_path / 'vendor').exists()
+
+    lock = vendor_assets(str(tmp_path), fetch=fake_fetch, echo=lambda *_: None, update_lock=True)
+
+    assert set(lock) == set(VENDOR_SOURCES)
+    font_path = tmp_path / VENDOR_SOURCES['font-frijole']['path']
+    assert font_path.stat().st_size < len(font_data)
+    assert (tmp_path / 'vendor' / 'fonts' / 'fonts.css').read_text().count('@font-face') == 3
+
+    # Zgodne sumy przechodzą, a ta sama wersja z inną treścią (podmiana na CDN) jest odrzucana
+    assert vendor_assets(str(tmp_path), fetch=fake_fetch, echo=lambda *_: None) == lock
+    with pytest.raises(click.ClickException):
+        vendor_assets(str(tmp_path), fetch=lambda url: b'podmieniony plik', echo=lambda *_: None)
+
+    # Lock bez wpisu dla przypiętej wersji (np. po zmianie VENDOR_SOURCES) przerywa pobieranie
+    lock_path = tmp_path / 'vendor' / 'vendor-lock.json'
+    lock_path.write_text(json.dumps({name: entry for name, entry in lock.items() if name != 'fullcalendar'}))
+    with pytest.raises(click.ClickException):
+        vendor_assets(str(tmp_path), fetch=fake_fetch, echo=lambda *_: None)
+
+
+def test_vendor_url_falls_back_to_cdn(app):
+    """Bez lokalnej kopii szablony używają dotychczasowego adresu CDN"""
+    extension = app.extensions['assets']
+    original = extension._vendored
+    extension._vendored = set()
+    try:
+        with app.test_request_context():
+            url = extension.vendor_url('vendor/fullcalendar/6.1.13/index.global.min.js')
+        assert url.startswith('https://cdn.jsdelivr.net/')
+    finally:
+        extension._vendored = original
+
+
+def test_local_vendor_assets_are_preloaded(app, built_static, logged_in_user):
+    """Gdy zasoby są lokalne, strony HTML zapowiadają je nagłówkiem Link: rel=preload"""
+    extension = app.extensions['assets']
+    original = extension._vendored
+    extension._vendored = {'vendor/fullcalendar/6.1.13/index.global.min.js'}
+    extension._preload_header = None
+    try:
+        response = logged_in_user.get('/dashboard')
+        links = response.headers.getlist('Link')
+        assert any('css/style.' in link and 'as=style' in link for link in links)
+        assert any('fullcalendar' in link and 'as=script' in link for link in links)
+        assert 'cdn.jsdelivr.net' not in response.data.decode('utf-8')
+    finally:
+        extension._vendored = original
+        extension._preload_header = None
+
+
+# ==================== SERVICE WORKER ====================
+
+def test_service_worker_generated_from_manifest(app, built_static, client):
+    """Service worker zawiera adresy z hashem do precache i wersję zależną od treści"""
+    extension = app.extensions['assets']
+    extension._service_worker = None
+    try:
+        response = client.get('/service-worker.js')
+        assert response.status_code == 200
+        assert response.mimetype == 'application/javascript'
+        assert response.headers['Cache-Control'] == 'no-cache'
+        assert response.headers['Service-Worker-Allowed'] == '/'
+
+        body = response.data.decode('utf-8')
+        assert f"/static/dist/{built_static['files']['css/style.css']}" in body
+        assert '/api/events' in body
+        version = response.headers['ETag'].strip('"')
+        assert f'const CACHE_VERSION = "{version}";' in body
+
+        # Bez zmian przeglądarka dostaje 304 zamiast całego pliku
+        cached = client.get('/service-worker.js', headers={'If-None-Match': f'"{version}"'})
+        assert cached.status_code == 304
+
+        # Zmiana pliku statycznego zmienia wersję (i nazwy cache)
+        extension.manifest = dict(built_static, files={**built_static['files'], 'css/style.css': 'css/style.zmiana.css'})
+        extension._service_worker = None
+        assert client.get('/service-worker.js').headers['ETag'].strip('"') != version
+    finally:
+        extension._service_worker = None
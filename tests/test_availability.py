@@ -0,0 +1,65 @@
+"""
+Testy macierzy dostępności pracowników (availability.py, /admin/matrix)
+Plik: tests/test_availability.py
+
+WAŻNE: Wszystkie fixtures importowane z conftest.py
+"""
+from datetime import date
+from models import Trip, Signup
+from availability import build_matrix, parse_month
+
+
+def test_matrix_cells_and_free_spots(db, regular_user, kierownik_user):
+    """Najważniejszy status dnia wygrywa; wolne miejsca sumują się po zleceniach dnia (nie mniej niż 0)"""
+    first, second = Trip(title='A', trip_date=date(2026, 2, 3), spots=3), Trip(title='B', trip_date=date(2026, 2, 3), spots=1)
+    full = Trip(title='C', trip_date=date(2026, 2, 10), spots=1)
+    empty = Trip(title='D', trip_date=date(2026, 2, 28), spots=4)
+    other_month = Trip(title='E', trip_date=date(2026, 3, 1), spots=2)
+    db.session.add_all([first, second, full, empty, other_month])
+    db.session.flush()
+    db.session.add_all([
+        Signup(trip_id=first.id, user_id=regular_user.id, status='rezerwowy'),
+        Signup(trip_id=second.id, user_id=regular_user.id, status='potwierdzony'),
+        Signup(trip_id=first.id, user_id=kierownik_user.id, status='wstępnie zapisany'),
+        Signup(trip_id=full.id, user_id=regular_user.id, status='potwierdzony'),
+        Signup(trip_id=full.id, user_id=kierownik_user.id, status='wstępnie zapisany'),
+        Signup(trip_id=other_month.id, user_id=kierownik_user.id, status='niedyspozycyjny'),
+    ])
+    db.session.commit()
+
+    matrix = build_matrix(2026, 2)
+    assert len(matrix['days']) == 28 and matrix['month'] == '2026-02'
+    cells = {user['id']: row for user, row in zip(matrix['users'], matrix['cells'])}
+    assert cells[regular_user.id][2] == 'potwierdzony' and cells[regular_user.id][9] == 'potwierdzony'
+    assert cells[kierownik_user.id][2] == 'wstępnie zapisany' and cells[kierownik_user.id][9] == 'wstępnie zapisany'
+    assert cells[regular_user.id].count(None) == 26
+    assert matrix['trips'][2] == 2 and matrix['spots'][2] == 4 and matrix['free_spots'][2] == 2
+    assert matrix['free_spots'][9] == 0 and matrix['free_spots'][27] == 4
+
+    assert build_matrix(2026, 4)['free_spots'] == [0] * 30
+    assert parse_month('2026-13') is None and parse_month('x') is None
+    assert parse_month('', today=date(2026, 10, 19)) == (2026, 10)
+
+
+def test_matrix_view_and_json(logged_in_user, regular_user, kierownik_user, db):
+    """Pracownik nie ma dostępu; kierownik widzi tabelę i JSON; błędny miesiąc to 400"""
+    trip = Trip(title='Lidl', trip_date=date(2026, 5, 4), spots=2)
+    db.session.add(trip)
+    db.session.flush()
+    db.session.add(Signup(trip_id=trip.id, user_id=regular_user.id, status='niedyspozycyjny'))
+    db.session.commit()
+    client = logged_in_user
+    assert client.get('/admin/matrix').status_code == 403
+
+    client.get('/logout')
+    client.post('/login', data={'email': kierownik_user.email, 'password': 'password'})
+
+    page = client.get('/admin/matrix?month=2026-05')
+    assert page.status_code == 200
+    assert 'Kowalski Jan' in page.get_data(as_text=True)
+
+    data = client.get('/admin/matrix?month=2026-05&format=json').get_json()
+    row = data['cells'][[user['id'] for user in data['users']].index(regular_user.id)]
+    assert data['days'][3] == '2026-05-04' and row[3] == 'niedyspozycyjny'
+    assert data['free_spots'][3] == 2
+    assert client.get('/admin/matrix?month=2026-5x').status_code == 400
@@ -0,0 +1,67 @@
+"""
+Testy brokera powiadomień i strumienia SSE
+Plik: tests/test_broker.py
+
+WAŻNE: Wszystkie fixtures importowane z conftest.py
+"""
+import pytest
+from datetime import date
+from broker import MemoryBroker, RESYNC
+from models import Trip
+
+
+@pytest.fixture(scope='function')
+def broker(app):
+    """Świeży broker w pamięci na czas jednego testu."""
+    original = app.extensions['event_broker']
+    app.extensions['event_broker'] = MemoryBroker(buffer_size=2, max_subscribers=1)
+    yield app.extensions['event_broker']
+    app.extensions['event_broker'] = original
+
+
+def test_slow_subscriber_gets_resync_instead_of_blocking():
+    """Pełny bufor klienta nie blokuje nadawcy - klient dostaje jedno 'resync'"""
+    broker = MemoryBroker(buffer_size=2)
+    subscription = broker.subscribe()
+    for i in range(5):
+        broker.publish('changes', {'n': i})
+
+    assert subscription.dropped == 3
+    assert subscription.get(timeout=0) == RESYNC
+    assert subscription.get(timeout=0) is None
+    assert broker.stats()['published'] == 5
+
+
+def test_commit_publishes_changes_rollback_does_not(db, broker):
+    """Powiadomienie wychodzi dopiero po zatwierdzeniu transakcji"""
+    subscription = broker.subscribe()
+    db.session.add(Trip(title='Wycofane', trip_date=date.today()))
+    db.session.flush()
+    db.session.rollback()
+    assert subscription.get(timeout=0) is None
+
+    trip = Trip(title='Zapisane', trip_date=date.today())
+    db.session.add(trip)
+    db.session.commit()
+    message = subscription.get(timeout=0)
+    assert message.event == 'changes'
+    assert message.data == {'trip_ids': [trip.id]}
+
+
+def test_stream_delivers_events_and_limits_clients(logged_in_user, broker):
+    """/api/stream przesyła powiadomienia jako SSE i odrzuca połączenia ponad limit"""
+    response = logged_in_user.get('/api/stream')
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b'retry:')
+
+    # Limit jednego klienta na proces - kolejne połączenie dostaje 503
+    rejected = logged_in_user.get('/api/stream')
+    assert rejected.status_code == 503
+    assert 'Retry-After' in rejected.headers
+
+    broker.publish('changes', {'trip_ids': [7]})
+    assert next(chunks) == b'event: changes\ndata: {"trip_ids": [7]}\n\n'
+
+    response.close()
+    assert broker.stats()['subscribers'] == 0
@@ -0,0 +1,127 @@
+"""
+Testy subskrypcji kalendarza ICS (calendar_feed.py, /calendar/<token>.ics)
+Plik: tests/test_calendar_feed.py
+
+WAŻNE: Wszystkie fixtures importowane z conftest.py
+"""
+from datetime import date, time, timedelta
+from werkzeug.security import generate_password_hash
+from calendar_feed import fold_line
+from models import Trip, Signup, User
+
+
+def _feed_url(user):
+    return f'/calendar/{user.get_calendar_token()}.ics'
+
+
+def _add_signups(db, user, *trips_with_status):
+    signups = []
+    for trip, status in trips_with_status:
+        db.session.add(trip)
+        db.session.flush()
+        signups.append(Signup(trip_id=trip.id, user_id=user.id, status=status))
+    db.session.add_all(signups)
+    db.session.commit()
+    return signups
+
+
+def test_feed_lists_own_signups_without_login(client, db, regular_user, kierownik_user):
+    """Potwierdzone i wstępne zapisy użytkownika (bez rezygnacji, cudzych i starych); poprawny format ICS"""
+    today = date.today()
+    _add_signups(
+        db, regular_user,
+        (Trip(title='Żabka; Łódź, hala', trip_date=today, spots=2, departure_time=time(6, 30),
+              work_end_time=time(15, 0), notes='Zbiórka\npod biurem'), 'potwierdzony'),
+        (Trip(title='Lidl Poznań', trip_date=today + timedelta(days=3), spots=2), 'wstępnie zapisany'),
+        (Trip(title='Rezygnacja', trip_date=today, spots=2), 'zrezygnował'),
+        (Trip(title='Stare', trip_date=today - timedelta(days=200), spots=2), 'potwierdzony'),
+    )
+    _add_signups(db, kierownik_user, (Trip(title='Cudze', trip_date=today, spots=2), 'potwierdzony'))
+
+    response = client.get(_feed_url(regular_user))
+    assert response.status_code == 200
+    assert response.mimetype == 'text/calendar' and response.headers['ETag']
+    body = response.get_data(as_text=True)
+    assert body.startswith('BEGIN:VCALENDAR\r\n') and body.endswith('END:VCALENDAR\r\n')
+    assert body.count('BEGIN:VEVENT') == 2
+    assert 'SUMMARY:Żabka\\; Łódź\\, hala' in body and 'DESCRIPTION:Zbiórka\\npod biurem' in body
+    assert f'DTSTART:{today:%Y%m%d}T063000' in body and f'DTEND:{today:%Y%m%d}T150000' in body
+    assert 'SUMMARY:Lidl Poznań (wstępnie zapisany)' in body and 'STATUS:TENTATIVE' in body
+    assert f'DTSTART;VALUE=DATE:{today + timedelta(days=3):%Y%m%d}' in body
+    assert 'Rezygnacja' not in body and 'Stare' not in body and 'Cudze' not in body
+
+    folded = fold_line('DESCRIPTION:' + 'ż' * 60)
+    assert all(len(line.encode()) <= 75 for line in folded.split('\r\n'))
+    assert folded.replace('\r\n ', '') == 'DESCRIPTION:' + 'ż' * 60 + '\r\n'
+
+
+def test_unchanged_feed_is_304_until_signup_changes(client, db, regular_user):
+    """Ten sam ETag to 304 bez treści; potwierdzenie zapisu i edycja zlecenia zmieniają ETag"""
+    (signup,) = _add_signups(db, regular_user, (Trip(title='Netto Konin', trip_date=date.today(), spots=1),
+                                                'wstępnie zapisany'))
+    url = _feed_url(regular_user)
+    response = client.get(url)
+    etag = response.headers['ETag']
+    response.close()
+
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 304 and response.get_data() == b''
+
+    signup.status = 'potwierdzony'
+    db.session.commit()
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200 and 'STATUS:CONFIRMED' in response.get_data(as_text=True)
+    confirmed_etag = response.headers['ETag']
+    assert confirmed_etag != etag
+
+    signup.trip.title = 'Netto Koło'
+    db.session.commit()
+    response = client.get(url, headers={'If-None-Match': confirmed_etag})
+    assert response.status_code == 200 and 'Netto Koło' in response.get_data(as_text=True)
+
+
+def test_invalid_or_revoked_token_is_404(client, db, regular_user):
+    """Zmieniony podpis, obcy token i token sprzed zmiany hasła nie dają dostępu"""
+    url = _feed_url(regular_user)
+    response = client.get(url)
+    assert response.status_code == 200
+    response.close()  # strumień trzyma kontekst żądania do zamknięcia odpowiedzi
+    assert client.get(url.replace('.ics', 'x.ics')).status_code == 404
+    assert client.get('/calendar/nie-token.ics').status_code == 404
+
+    regular_user.set_password('nowe-haslo-123')
+    db.session.commit()
+    assert client.get(url).status_code == 404
+    response = client.get(_feed_url(regular_user))
+    assert response.status_code == 200
+    response.close()
+
+
+def test_rehash_after_method_change_keeps_token(client, db, regular_user):
+    """Przeliczenie hasha przy logowaniu (nowe PASSWORD_HASH_METHOD) nie unieważnia subskrypcji"""
+    regular_user.password_hash = generate_password_hash('password', method='pbkdf2:sha256:2000')
+    db.session.commit()
+    url = _feed_url(regular_user)
+
+    assert client.post('/login', data={'email': regular_user.email, 'password': 'password'}).status_code == 302
+    assert db.session.get(User, regular_user.id).password_hash.startswith('pbkdf2:sha256:1000$')
+    response = client.get(url)
+    assert response.status_code == 200
+    response.close()
+
+
+def test_rows_from_before_migration_use_version_zero(client, db, regular_user):
+    """Wiersze sprzed migracji (calendar_token_version = NULL) mają działający link, a zmiana hasła go unieważnia"""
+    db.session.execute(db.update(User).where(User.id == regular_user.id).values(calendar_token_version=None))
+    db.session.commit()
+    db.session.expire_all()
+    url = _feed_url(regular_user)
+    assert regular_user.calendar_token_version is None
+    response = client.get(url)
+    assert response.status_code == 200
+    response.close()
+
+    regular_user.set_password('nowe-haslo-123')
+    db.session.commit()
+    assert regular_user.calendar_token_version == 1
+    assert client.get(url).status_code == 404
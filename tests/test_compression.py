@@ -0,0 +1,64 @@
+"""
+Testy kompresji odpowiedzi (compression.py)
+Plik: tests/test_compression.py
+
+WAŻNE: Wszystkie fixtures importowane z conftest.py
+"""
+import gzip
+import json
+from datetime import date, timedelta
+import compression
+from models import Trip, Signup
+
+
+def _add_trips(db, count):
+    today = date.today()
+    db.session.add_all(Trip(title=f'Inwentaryzacja sklepu nr {i}', trip_date=today + timedelta(days=i % 20), spots=3,
+                            notes='Zbiórka pod biurem 30 minut przed wyjazdem') for i in range(count))
+    db.session.commit()
+
+
+def test_json_compressed_once_and_revalidated(logged_in_user, app, db):
+    """gzip/br wg Accept-Encoding; ta sama treść kompresowana raz; słaby ETag daje 304; bez nagłówka - bez kompresji"""
+    _add_trips(db, 40)
+    cache = app.extensions['compression'].cache
+    cache.clear()
+    plain = logged_in_user.get('/api/events')
+    assert 'Content-Encoding' not in plain.headers and 'Accept-Encoding' in plain.headers['Vary']
+
+    first = logged_in_user.get('/api/events', headers={'Accept-Encoding': 'gzip'})
+    second = logged_in_user.get('/api/events', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert first.headers['Content-Encoding'] == 'gzip' and len(first.data) < len(plain.data) / 4
+    assert gzip.decompress(first.data) == plain.data and second.data == first.data
+    assert (cache.misses, cache.hits) == (1, 1)
+
+    etag = first.headers['ETag']
+    assert etag.startswith('W/') and etag[2:] == plain.headers['ETag']
+    assert logged_in_user.get('/api/events', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag}).status_code == 304
+
+    if compression.brotli is not None:
+        response = logged_in_user.get('/api/events', headers={'Accept-Encoding': 'gzip, br'})
+        assert response.headers['Content-Encoding'] == 'br'
+        assert json.loads(compression.brotli.decompress(response.data)) == plain.get_json()
+    assert 'Content-Encoding' not in logged_in_user.get(
+        '/api/events', headers={'Accept-Encoding': 'gzip;q=0, identity'}).headers
+
+
+def test_small_and_streamed_responses(logged_in_user, db, regular_user):
+    """Małe odpowiedzi bez kompresji; strumień (kalendarz ICS) kompresowany w locie"""
+    client = logged_in_user
+    small = client.get('/api/csrf-token', headers={'Accept-Encoding': 'gzip'})
+    assert small.status_code == 200 and 'Content-Encoding' not in small.headers
+
+    today = date.today()
+    for i in range(30):
+        trip = Trip(title=f'Dino Kalisz {i}', trip_date=today + timedelta(days=i), spots=2)
+        db.session.add(trip)
+        db.session.flush()
+        db.session.add(Signup(trip_id=trip.id, user_id=regular_user.id, status='potwierdzony'))
+    db.session.commit()
+    url = f'/calendar/{regular_user.get_calendar_token()}.ics'
+    plain = client.get(url).get_data()
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip' and 'Content-Length' not in response.headers
+    assert gzip.decompress(response.get_data()) == plain
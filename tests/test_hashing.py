@@ -0,0 +1,85 @@
+"""
+Testy serwisu haszowania haseł
+Plik: tests/test_hashing.py
+
+WAŻNE: Wszystkie fixtures importowane z conftest.py
+"""
+import threading
+import pytest
+from werkzeug.security import generate_password_hash
+from models import User, db
+from extensions import password_hasher
+from hashing import HashingBusyError, _HasherState
+
+
+def test_hash_uses_configured_method(app, regular_user):
+    """Hash hasła powstaje z parametrami z konfiguracji (tanie w testach)"""
+    assert regular_user.password_hash.startswith('pbkdf2:sha256:1000$')
+    assert regular_user.check_password('password') is True
+    assert regular_user.check_password('zle-haslo') is False
+
+
+def test_login_rehashes_outdated_hash(client, db):
+    """Udane logowanie przelicza hash zapisany innymi parametrami"""
+    user = User(name='Stary', surname='Hash', email='stary@test.com', agency='TEST', accepted_tos=True)
+    user.password_hash = generate_password_hash('password', method='pbkdf2:sha256:2000')
+    db.session.add(user)
+    db.session.commit()
+    assert password_hasher.needs_rehash(user.password_hash) is True
+
+    response = client.post('/login', data={'email': 'stary@test.com', 'password': 'password'})
+    assert response.status_code == 302
+
+    user = db.session.get(User, user.id)
+    assert user.password_hash.startswith('pbkdf2:sha256:1000$')
+    assert password_hasher.needs_rehash(user.password_hash) is False
+
+
+def test_full_queue_rejects_hashing(app):
+    """Przy pełnej kolejce puli haszowanie jest odrzucane, a nie blokuje wątku"""
+    original_state = app.extensions['password_hasher']
+    state = _HasherState(method='pbkdf2:sha256:1000', workers=1, queue_limit=0, timeout=5)
+    app.extensions['password_hasher'] = state
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocking_job():
+        started.set()
+        release.wait(5)
+
+    try:
+        # Zajmujemy jedyne miejsce w puli
+        state._slots.acquire()
+        state.executor().submit(blocking_job)
+        started.wait(5)
+        with pytest.raises(HashingBusyError):
+            password_hasher.hash('password')
+    finally:
+        release.set()
+        state._slots.release()
+        state.shutdown()
+        app.extensions['password_hasher'] = original_state
+
+
+def _busy(*args, **kwargs):
+    raise HashingBusyError('Kolejka haszowania haseł jest pełna.')
+
+
+def test_register_and_password_change_report_busy_pool(client, logged_in_user, regular_user, monkeypatch):
+    """Przy pełnej puli rejestracja i zmiana hasła zwracają 503 z komunikatem, a nie błąd 500"""
+    monkeypatch.setattr(password_hasher, 'hash', _busy)
+    monkeypatch.setattr(password_hasher, 'verify', _busy)
+
+    response = logged_in_user.post('/profile/change-password', data={
+        'old_password': 'password', 'new_password': 'nowe-haslo', 'confirm_password': 'nowe-haslo',
+    })
+    assert response.status_code == 503
+    assert 'chwilowo przeciążony' in response.get_data(as_text=True)
+
+    logged_in_user.get('/logout')
+    response = client.post('/register', data={
+        'name': 'Nowy', 'surname': 'Pracownik', 'email': 'nowy@test.com', 'agency': 'TEST',
+        'password': 'haslo123', 'confirm_password': 'haslo123', 'accept_tos': 'y',
+    })
+    assert response.status_code == 503
+    assert User.query.filter_by(email='nowy@test.com').first() is None
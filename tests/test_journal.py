@@ -0,0 +1,118 @@
+"""
+Testy dziennika zmian i synchronizacji przyrostowej kalendarza
+Plik: tests/test_journal.py
+
+WAŻNE: Wszystkie fixtures importowane z conftest.py
+"""
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import update
+from models import ChangeJournalEntry, Signup, Trip
+
+
+def _journal():
+    return [(e.entity, e.entity_id, e.trip_id, e.op) for e in ChangeJournalEntry.query.order_by(ChangeJournalEntry.seq)]
+
+
+def test_orm_changes_are_journaled(db, sample_trip, regular_user):
+    """INSERT/UPDATE/DELETE przez ORM trafiają do dziennika w tej samej transakcji"""
+    signup = Signup(trip_id=sample_trip.id, user_id=regular_user.id, status='potwierdzony')
+    db.session.add(signup)
+    db.session.commit()
+    sample_trip.title = 'Nowy tytuł'
+    db.session.commit()
+    # Zapis bez faktycznej zmiany nie tworzy wpisu
+    assert sample_trip.title == 'Nowy tytuł'
+    sample_trip.title = 'Nowy tytuł'
+    db.session.commit()
+    db.session.delete(signup)
+    db.session.commit()
+
+    assert _journal() == [
+        ('trip', sample_trip.id, sample_trip.id, 'insert'),
+        ('signup', signup.id, sample_trip.id, 'insert'),
+        ('trip', sample_trip.id, sample_trip.id, 'update'),
+        ('signup', signup.id, sample_trip.id, 'delete'),
+    ]
+
+
+def test_bulk_update_and_delete_are_journaled(logged_in_admin, db):
+    """Masowe UPDATE (archiwizacja) i DELETE (czyszczenie miesiąca) też trafiają do dziennika"""
+    old_trip = Trip(title='Stare', trip_date=date(2020, 1, 1))
+    next_year = date.today().year + 1
+    future_trips = [Trip(title=f'Przyszłe {day}', trip_date=date(next_year, 3, day)) for day in (1, 2)]
+    db.session.add_all([old_trip] + future_trips)
+    db.session.commit()
+    start = ChangeJournalEntry.query.count()
+    future_ids = sorted(t.id for t in future_trips)
+
+    logged_in_admin.post('/admin/archive/run')
+    logged_in_admin.post('/admin/clear-month', json={'year': next_year, 'month': 3})
+    # UPDATE po kluczu głównym z listą parametrów (executemany)
+    db.session.execute(update(Trip), [{'id': old_trip.id, 'title': 'Stare (zmienione)'}])
+    db.session.commit()
+
+    entries = _journal()[start:]
+    assert entries[0] == ('trip', old_trip.id, old_trip.id, 'update')
+    assert sorted(e[1] for e in entries if e[3] == 'delete') == future_ids
+    assert entries[-1] == ('trip', old_trip.id, old_trip.id, 'update')
+
+
+def test_changes_endpoint_returns_delta_and_tombstones(logged_in_user, sample_trips, db):
+    """/api/events/changes zwraca tylko zmienione zlecenia i identyfikatory usuniętych"""
+    response = logged_in_user.get('/api/events')
+    cursor = int(response.headers['X-Change-Cursor'])
+
+    trip_a, trip_b = sample_trips
+    trip_a.title = 'Zmieniony A'
+    db.session.delete(trip_b)
+    db.session.commit()
+
+    data = logged_in_user.get(f'/api/events/changes?since={cursor}').json
+    assert data['reset'] is False
+    assert [event['title'] for event in data['changed']] == ['Zmieniony A']
+    assert data['deleted'] == [trip_b.id]
+
+    # Od nowego kursora nie ma już zmian
+    again = logged_in_user.get(f"/api/events/changes?since={data['cursor']}").json
+    assert again == {'cursor': data['cursor'], 'reset': False, 'changed': [], 'deleted': []}
+
+
+def test_changes_endpoint_requests_reset(logged_in_user, app, sample_trips, db):
+    """Zbyt wiele zmian lub nieznany kursor - klient dostaje polecenie pełnego odświeżenia"""
+    assert logged_in_user.get('/api/events/changes').status_code == 400
+    assert logged_in_user.get('/api/events/changes?since=999999').json['reset'] is True
+
+    app.config['CHANGE_JOURNAL_PAGE_LIMIT'] = 1
+    try:
+        assert logged_in_user.get('/api/events/changes?since=0').json['reset'] is True
+    finally:
+        app.config['CHANGE_JOURNAL_PAGE_LIMIT'] = 500
+
+
+def test_cursor_does_not_skip_uncommitted_gap(app, sample_trips, db):
+    """Wpis zatwierdzony później niż wpis z wyższym seq (PostgreSQL) nie zostaje pominięty"""
+    journal = app.extensions['change_journal']
+    trip_a, trip_b = sample_trips
+    start = journal.cursor()
+    now = datetime.now(timezone.utc)
+
+    def add(seq, trip):
+        db.session.add(ChangeJournalEntry(seq=seq, entity='trip', entity_id=trip.id, trip_id=trip.id,
+                                          op='update', created_at=now))
+        db.session.commit()
+
+    # start + 1 należy do transakcji, która jeszcze trwa - kursor nie może go przeskoczyć
+    add(start + 2, trip_b)
+    cursor, trip_ids, reset = journal.changes_since(start, now=now)
+    assert (cursor, trip_ids, reset) == (start, {trip_b.id}, False)
+    assert journal.cursor(now=now) == start
+
+    add(start + 1, trip_a)
+    assert journal.changes_since(start, now=now) == (start + 2, {trip_a.id, trip_b.id}, False)
+
+    # Luka starsza niż CHANGE_JOURNAL_GAP_SECONDS to wycofana transakcja - kursor ją pomija
+    add(start + 4, trip_a)
+    later = now + timedelta(seconds=app.config['CHANGE_JOURNAL_GAP_SECONDS'] + 1)
+    assert journal.changes_since(start + 2, now=now)[0] == start + 2
+    assert journal.changes_since(start + 2, now=later) == (start + 4, {trip_a.id}, False)
+    assert journal.cursor(now=later) == start + 4
@@ -0,0 +1,66 @@
+"""
+Testy metryk wydajności i eksportu /admin/metrics
+Plik: tests/test_metrics.py
+
+WAŻNE: Wszystkie fixtures importowane z conftest.py
+"""
+from metrics import Histogram, count_enqueue
+
+
+def test_histogram_exposition_is_cumulative():
+    """Przedziały histogramu są skumulowane, z przedziałem +Inf, sumą i liczbą"""
+    histogram = Histogram('test_seconds', 'Opis.', ('endpoint',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, 'main.index')
+
+    lines = histogram.expose()
+    assert 'test_seconds_bucket{endpoint="main.index",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{endpoint="main.index",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{endpoint="main.index",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{endpoint="main.index"} 3' in lines
+
+
+def test_request_records_latency_and_sql(app, logged_in_user):
+    """Każde żądanie zapisuje czas, status i liczbę zapytań SQL pod nazwą endpointu"""
+    registry = app.extensions['metrics']
+    requests_before = registry.requests.value('main.api_events', 'GET', '200')
+    queries_before = registry.sql_count.sum('main.api_events')
+
+    response = logged_in_user.get('/api/events')
+    assert response.status_code == 200
+    assert registry.requests.value('main.api_events', 'GET', '200') == requests_before + 1
+    assert registry.latency.count('main.api_events', 'GET') >= 1
+    # Co najmniej wczytanie użytkownika z sesji i pobranie zleceń
+    assert registry.sql_count.sum('main.api_events') >= queries_before + 2
+
+    logged_in_user.get('/nie-ma-takiej-strony')
+    assert registry.requests.value('unmatched', 'GET', '404') >= 1
+
+
+def test_server_timing_header_only_when_enabled(app, logged_in_user):
+    """Nagłówek Server-Timing pojawia się tylko przy METRICS_SERVER_TIMING"""
+    assert 'Server-Timing' not in logged_in_user.get('/api/events').headers
+
+    app.config['METRICS_SERVER_TIMING'] = True
+    try:
+        header = logged_in_user.get('/api/events').headers['Server-Timing']
+    finally:
+        app.config['METRICS_SERVER_TIMING'] = False
+    assert header.startswith('app;dur=')
+    assert 'db;dur=' in header
+
+
+def test_metrics_endpoint_requires_admin(app, client, logged_in_admin):
+    """/admin/metrics zwraca format Prometheus tylko adminowi lub kierownikowi"""
+    with app.app_context():
+        count_enqueue('utils._send_email_task')
+
+    response = logged_in_admin.get('/admin/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    body = response.get_data(as_text=True)
+    assert '# TYPE grafik_http_request_duration_seconds histogram' in body
+    assert 'grafik_rq_enqueued_total{task="utils._send_email_task"}' in body
+
+    logged_in_admin.get('/logout')
+    assert client.get('/admin/metrics').status_code in (302, 401)
@@ -0,0 +1,65 @@
+"""
+Testy trybu offline (PWA): klucze idempotencji i API kalendarza
+Plik: tests/test_offline_sync.py
+
+WAŻNE: Wszystkie fixtures importowane z conftest.py
+"""
+from datetime import date
+from models import IdempotencyKey, Signup, Trip
+
+
+XHR = {'X-Requested-With': 'XMLHttpRequest'}
+
+
+def test_replayed_signup_is_applied_once(logged_in_user, sample_trip, db):
+    """Powtórzona akcja z tym samym kluczem zwraca zapisaną odpowiedź i nie tworzy drugiego zapisu"""
+    headers = dict(XHR, **{'Idempotency-Key': 'klucz-offline-0001'})
+    first = logged_in_user.post(f'/trip/{sample_trip.id}/signup', data={'action': 'signup'}, headers=headers)
+    assert first.status_code == 200
+    assert first.json['signup_status'] == 'potwierdzony'
+
+    # Rezygnacja z innym kluczem, potem spóźniona powtórka pierwszej akcji
+    logged_in_user.post(f'/trip/{sample_trip.id}/signup', data={'action': 'cancel'},
+                        headers=dict(XHR, **{'Idempotency-Key': 'klucz-offline-0002'}))
+    replay = logged_in_user.post(f'/trip/{sample_trip.id}/signup', data={'action': 'signup'}, headers=headers)
+
+    assert replay.headers['Idempotent-Replayed'] == 'true'
+    assert replay.json == first.json
+    assert Signup.query.filter_by(trip_id=sample_trip.id).count() == 0
+
+
+def test_form_submit_without_key_unchanged(logged_in_user, sample_trip, db):
+    """Zwykły formularz (bez klucza) nadal przekierowuje i nie zapisuje kluczy"""
+    response = logged_in_user.post(f'/trip/{sample_trip.id}/signup', data={'action': 'decline'})
+    assert response.status_code == 302
+    assert Signup.query.filter_by(trip_id=sample_trip.id).one().status == 'niedyspozycyjny'
+    assert IdempotencyKey.query.count() == 0
+
+
+def test_invalid_and_in_progress_keys(logged_in_user, regular_user, sample_trip, db):
+    """Niepoprawny klucz to 400, a klucz wciąż wykonywanej akcji to 409 z Retry-After"""
+    url = f'/trip/{sample_trip.id}/signup'
+    assert logged_in_user.post(url, data={'action': 'signup'}, headers={'Idempotency-Key': 'zły klucz!'}).status_code == 400
+
+    db.session.add(IdempotencyKey(key='klucz-w-trakcie', user_id=regular_user.id, endpoint='trips.signup_trip'))
+    db.session.commit()
+    response = logged_in_user.post(url, data={'action': 'signup'}, headers=dict(XHR, **{'Idempotency-Key': 'klucz-w-trakcie'}))
+    assert response.status_code == 409
+    assert response.headers['Retry-After'] == '1'
+    assert Signup.query.filter_by(trip_id=sample_trip.id).count() == 0
+
+
+def test_api_events_range_and_etag(logged_in_user, db):
+    """API kalendarza filtruje po zakresie i zwraca 304 dla niezmienionych danych"""
+    db.session.add_all([
+        Trip(title='Listopad', trip_date=date(2025, 11, 10)),
+        Trip(title='Grudzień', trip_date=date(2025, 12, 5)),
+    ])
+    db.session.commit()
+
+    response = logged_in_user.get('/api/events?start=2025-11-01T00:00:00+01:00&end=2025-12-01T00:00:00+01:00')
+    assert [event['title'] for event in response.json] == ['Listopad']
+    etag = response.headers['ETag']
+
+    cached = logged_in_user.get('/api/events?start=2025-11-01&end=2025-12-01', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
@@ -0,0 +1,91 @@
+"""
+Testy skrzynki nadawczej e-maili (outbox.py)
+Plik: tests/test_outbox.py
+
+WAŻNE: Wszystkie fixtures importowane z conftest.py
+"""
+import smtplib
+from datetime import datetime, timedelta
+import pytest
+from flask_mail import Connection
+from extensions import mail
+from models import OutboxEmail
+from outbox import dispatch_pending
+from utils import send_email_in_background
+
+
+@pytest.fixture
+def manual_dispatch(app, db):
+    """Wiadomości zostają w skrzynce po commit - dispatcher wywoływany jawnie przez test."""
+    app.config['OUTBOX_DISPATCH_ON_COMMIT'] = False
+    yield
+    app.config.update(OUTBOX_DISPATCH_ON_COMMIT=True, OUTBOX_BATCH_SIZE=50, OUTBOX_MAX_ATTEMPTS=8)
+
+
+def _queue(db, count=1, subject='Nowe zlecenie'):
+    for number in range(count):
+        assert send_email_in_background(f'pracownik{number}@grafik.example', f'{subject} {number}',
+                                        'emaile/welcome', user={'name': 'Jan'})
+    db.session.commit()
+
+
+def test_message_is_part_of_the_transaction(db, regular_user):
+    """Wycofana transakcja nie zostawia wiadomości; zatwierdzona jest wysyłana zaraz po commit"""
+    with mail.record_messages() as sent:
+        send_email_in_background(regular_user.email, 'Wycofane', 'emaile/welcome', user=regular_user)
+        db.session.rollback()
+        assert OutboxEmail.query.count() == 0
+
+        send_email_in_background(regular_user.email, 'Zatwierdzone', 'emaile/welcome', user=regular_user)
+        db.session.commit()
+
+    assert [m.subject for m in sent] == ['Zatwierdzone']
+    message = OutboxEmail.query.one()
+    assert message.status == 'sent' and message.attempts == 1 and message.locked_by is None
+
+
+def test_batches_share_one_smtp_connection(manual_dispatch, app, db, monkeypatch):
+    """Paczka = jedno połączenie SMTP; wiadomość z aktywną rezerwacją innego procesu jest pomijana"""
+    app.config['OUTBOX_BATCH_SIZE'] = 2
+    _queue(db, count=4)
+    busy = OutboxEmail.query.order_by(OutboxEmail.id.desc()).first()
+    busy.locked_by, busy.locked_until = 'inny-proces', datetime.utcnow() + timedelta(minutes=5)
+    db.session.commit()
+
+    connections = []
+    original_connect = mail.connect
+    monkeypatch.setattr(mail, 'connect', lambda: connections.append(1) or original_connect())
+    with mail.record_messages() as sent:
+        totals = dispatch_pending()
+
+    assert totals == {'sent': 3, 'retry': 0, 'dead': 0}
+    assert len(sent) == 3 and len(connections) == 2
+    db.session.expire_all()
+    assert busy.status == 'pending' and busy.locked_by == 'inny-proces'
+
+
+def test_failures_back_off_and_end_in_dead_letter(manual_dispatch, app, db, monkeypatch):
+    """Błąd tymczasowy (4xx) - ponowienie z rosnącym odstępem; trwały (5xx) lub limit prób - status 'dead'"""
+    app.config['OUTBOX_MAX_ATTEMPTS'] = 2
+    _queue(db, count=2)
+    temporary, permanent = OutboxEmail.query.order_by(OutboxEmail.id).all()
+
+    def refuse(connection, message):
+        code = 550 if message.subject == permanent.subject else 451
+        raise smtplib.SMTPDataError(code, b'odmowa')
+    monkeypatch.setattr(Connection, 'send', refuse)
+
+    assert dispatch_pending() == {'sent': 0, 'retry': 1, 'dead': 1}
+    db.session.expire_all()
+    assert permanent.status == 'dead' and '550' in permanent.last_error
+    assert temporary.status == 'pending' and temporary.attempts == 1 and temporary.locked_by is None
+    delay = temporary.next_attempt_at - datetime.utcnow()
+    assert timedelta(seconds=50) < delay <= timedelta(seconds=60)
+
+    # Przed upływem odstępu wiadomość nie jest ponawiana
+    assert dispatch_pending() == {'sent': 0, 'retry': 0, 'dead': 0}
+    temporary.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    assert dispatch_pending() == {'sent': 0, 'retry': 0, 'dead': 1}
+    db.session.expire_all()
+    assert temporary.status == 'dead' and temporary.attempts == 2
@@ -0,0 +1,51 @@
+"""
+Testy profilowania żądań
+Plik: tests/test_profiler.py
+
+WAŻNE: Wszystkie fixtures importowane z conftest.py
+"""
+import pytest
+
+
+@pytest.fixture(scope='function')
+def profile_dir(app, tmp_path):
+    """Raporty profilowania w katalogu tymczasowym."""
+    original = app.config['PROFILER_DIR']
+    app.config['PROFILER_DIR'] = str(tmp_path)
+    yield tmp_path
+    app.config['PROFILER_DIR'] = original
+    app.config['PROFILER_SAMPLE_RATE'] = 0
+
+
+def test_admin_can_profile_single_request(logged_in_admin, profile_dir):
+    """'?_profile=1' od admina zapisuje raport z drzewem wywołań i pokazuje go na liście"""
+    response = logged_in_admin.get('/admin/settlements?_profile=1')
+    name = response.headers['X-Profile-Report']
+    report = (profile_dir / name).read_text(encoding='utf-8')
+    assert '"endpoint": "admin.settlements"' in report.splitlines()[0]
+    assert 'Drzewo wywołań' in report
+    assert (profile_dir / name.replace('.txt', '.prof')).exists()
+
+    listing = logged_in_admin.get('/admin/profiles').get_data(as_text=True)
+    assert name in listing
+    assert logged_in_admin.get(f'/admin/profiles/{name}').status_code == 200
+    assert logged_in_admin.get('/admin/profiles/..%2Fconftest.py').status_code == 404
+
+
+def test_profile_flag_ignored_for_regular_user(logged_in_user, profile_dir):
+    """Zwykły pracownik nie może włączyć profilowania"""
+    response = logged_in_user.get('/api/events?_profile=1', headers={'X-Profile': '1'})
+    assert 'X-Profile-Report' not in response.headers
+    assert list(profile_dir.iterdir()) == []
+
+
+def test_session_profiling_and_sampling(app, logged_in_admin, client, profile_dir):
+    """Profilowanie sesji obejmuje zwykłe żądania; próbkowanie działa bez logowania"""
+    logged_in_admin.post('/admin/profiles', data={'minutes': '5'})
+    assert 'X-Profile-Report' in logged_in_admin.get('/dashboard').headers
+    logged_in_admin.post('/admin/profiles', data={'minutes': '0'})
+    assert 'X-Profile-Report' not in logged_in_admin.get('/dashboard').headers
+
+    logged_in_admin.get('/logout')
+    app.config['PROFILER_SAMPLE_RATE'] = 1
+    assert 'X-Profile-Report' in client.get('/login').headers
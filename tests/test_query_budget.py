@@ -0,0 +1,159 @@
+"""
+Budżety zapytań SQL dla najczęściej używanych widoków
+Plik: tests/test_query_budget.py
+
+Każdy test mierzy liczbę zapytań dla małego i dużego zbioru danych:
+liczba musi być taka sama (brak N+1) i nie większa niż budżet.
+Budżet obejmuje wczytanie zalogowanego użytkownika z sesji (1 zapytanie).
+
+WAŻNE: Wszystkie fixtures importowane z conftest.py
+"""
+import pytest
+from datetime import date
+from models import User, Trip, Signup
+
+SMALL, LARGE = 2, 25
+
+
+def _this_month(i):
+    """Naprzemiennie dzisiaj i pierwszy dzień miesiąca - rozliczenia mają zlecenia przyszłe i przeszłe."""
+    today = date.today()
+    return today if i % 2 else today.replace(day=1)
+
+
+@pytest.fixture(scope='function')
+def seed(db):
+    """Dokłada 'count' zleceń z zapisami trzech pracowników (dane rosną między pomiarami)."""
+    workers = []
+    for i in range(3):
+        worker = User(name=f'Pracownik{i}', surname='Budżetowy', email=f'budzet{i}@test.com',
+                      agency='TEST', status='pracownik', accepted_tos=True, password_hash='x')
+        workers.append(worker)
+    db.session.add_all(workers)
+    db.session.commit()
+    worker_ids = [worker.id for worker in workers]
+
+    def _seed(count):
+        trips = []
+        for i in range(count):
+            trip = Trip(title=f'Zlecenie {i}', trip_date=_this_month(i), spots=5)
+            trip.signups = [Signup(user_id=worker_id, status='potwierdzony') for worker_id in worker_ids]
+            trips.append(trip)
+        db.session.add_all(trips)
+        db.session.commit()
+        return [trip.id for trip in trips]
+
+    return _seed
+
+
+@pytest.fixture(scope='function')
+def measure(app, count_queries):
+    """
+    Liczy zapytania jednego żądania. Żądanie dostaje własny kontekst aplikacji
+    (pusta sesja SQLAlchemy i 'g'), tak jak każde nowe żądanie na produkcji.
+    """
+    def _measure(request):
+        with app.app_context(), count_queries() as queries:
+            response = request()
+        assert response.status_code in (200, 201, 302), response.status_code
+        return queries
+
+    return _measure
+
+
+def _assert_constant_within_budget(small, large, budget):
+    assert small.count == large.count, f"Liczba zapytań rośnie z danymi:\n{small.report()}\n{large.report()}"
+    assert large.count <= budget, large.report()
+
+
+def test_api_events_budget(logged_in_user, seed, measure):
+    """/api/events: użytkownik + kursor dziennika + zlecenia"""
+    seed(SMALL)
+    small = measure(lambda: logged_in_user.get('/api/events'))
+    seed(LARGE)
+    large = measure(lambda: logged_in_user.get('/api/events'))
+    _assert_constant_within_budget(small, large, 3)
+
+
+def test_trip_details_budget(logged_in_user, db, seed, measure):
+    """Szczegóły zlecenia: użytkownik + zlecenie + zapisy z ich użytkownikami"""
+    trip_id = seed(1)[0]
+    small = measure(lambda: logged_in_user.get(f'/trip/{trip_id}'))
+    for i in range(LARGE):
+        extra = User(name=f'Dodatkowy{i}', surname='Zapisany', email=f'dodatkowy{i}@test.com',
+                     agency='TEST', status='pracownik', accepted_tos=True, password_hash='x')
+        db.session.add(Signup(trip_id=trip_id, user=extra, status='wstępnie zapisany'))
+    db.session.commit()
+    large = measure(lambda: logged_in_user.get(f'/trip/{trip_id}'))
+    _assert_constant_within_budget(small, large, 3)
+
+
+def test_admin_users_budget(logged_in_admin, seed, measure):
+    """Lista użytkowników: użytkownik + lista (z zapisami)"""
+    seed(SMALL)
+    small = measure(lambda: logged_in_admin.get('/admin/users'))
+    seed(LARGE)
+    large = measure(lambda: logged_in_admin.get('/admin/users'))
+    _assert_constant_within_budget(small, large, 3)
+
+
+@pytest.fixture
+def settlements_refresh_in_background(app):
+    """Przeliczenie podsumowania rozliczeń po zatwierdzeniu nie należy do żądania (w testach wykonuje się od razu)."""
+    app.config['SETTLEMENTS_REFRESH_ON_COMMIT'] = False
+    yield
+    app.config['SETTLEMENTS_REFRESH_ON_COMMIT'] = True
+
+
+def test_settlements_budget(logged_in_admin, db, seed, measure, settlements_refresh_in_background):
+    """
+    Rozliczenia: widok (zlecenia + zapisy) i zbiorczy zapis (zlecenia + UPDATE + dziennik
+    + oznaczenie miesiąca do przeliczenia podsumowania) nie zależą od liczby zleceń
+    """
+    def form(trip_ids):
+        return {f'km-{trip_id}': '12,5' for trip_id in trip_ids} | {f'spots-{trip_id}': '4' for trip_id in trip_ids}
+
+    trip_ids = seed(SMALL)
+    small_get = measure(lambda: logged_in_admin.get('/admin/settlements'))
+    small_post = measure(lambda: logged_in_admin.post('/admin/settlements', data=form(trip_ids)))
+    trip_ids = seed(LARGE)
+    large_get = measure(lambda: logged_in_admin.get('/admin/settlements'))
+    large_post = measure(lambda: logged_in_admin.post('/admin/settlements', data=form(trip_ids)))
+
+    _assert_constant_within_budget(small_get, large_get, 3)
+    _assert_constant_within_budget(small_post, large_post, 5)
+    assert {trip.kilometers for trip in Trip.query.filter(Trip.id.in_(trip_ids))} == {12.5}
+
+
+def test_matrix_budget(logged_in_admin, seed, measure):
+    """Macierz dostępności: użytkownik + lista pracowników + zapisy miesiąca (jedno zapytanie)"""
+    seed(SMALL)
+    small = measure(lambda: logged_in_admin.get('/admin/matrix'))
+    seed(LARGE)
+    large = measure(lambda: logged_in_admin.get('/admin/matrix'))
+    _assert_constant_within_budget(small, large, 3)
+
+
+def test_roster_budget(logged_in_admin, seed, measure):
+    """Podgląd obsady: użytkownik + zlecenia zakresu + pracownicy + zapisy miesięcy (bez N+1)"""
+    seed(SMALL)
+    small = measure(lambda: logged_in_admin.get('/admin/roster'))
+    seed(LARGE)
+    large = measure(lambda: logged_in_admin.get('/admin/roster'))
+    _assert_constant_within_budget(small, large, 4)
+
+
+def test_trip_batch_budget(logged_in_admin, seed, measure, settlements_refresh_in_background):
+    """
+    Masowe dodanie zleceń: liczba zapytań nie zależy od liczby wierszy (INSERT wielowierszowy,
+    zapisy zbiorczo). W testach zadanie powiadomień i wysyłka wykonują się w żądaniu -
+    wiadomości w skrzynce zależą od liczby pracowników (3), nie zleceń.
+    """
+    def _batch(count):
+        rows = [{'title': f'Seria {i}', 'trip_date': _this_month(i).isoformat(), 'spots': 2} for i in range(count)]
+        return lambda: logged_in_admin.post('/trip/batch', json={'trips': rows})
+
+    seed(SMALL)
+    small = measure(_batch(SMALL))
+    large = measure(_batch(LARGE))
+    _assert_constant_within_budget(small, large, 15)
@@ -0,0 +1,80 @@
+"""
+Testy logowania strukturalnego (request_logging.py)
+Plik: tests/test_request_logging.py
+
+WAŻNE: Wszystkie fixtures importowane z conftest.py
+"""
+import json
+import logging
+import re
+import pytest
+from request_logging import JsonFormatter, access_logger, start_queue_listener, stop_queue_listener
+
+
+class ListHandler(logging.Handler):
+    """Zbiera sformatowane rekordy (wywoływany w wątku listenera)."""
+
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+        self.setFormatter(JsonFormatter())
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+@pytest.fixture
+def captured_access_log():
+    handler = ListHandler()
+    queue_handler, listener = start_queue_listener(access_logger, handler)
+    previous_level = access_logger.level
+    access_logger.setLevel(logging.INFO)
+    yield handler, listener
+    access_logger.setLevel(previous_level)
+    access_logger.removeHandler(queue_handler)
+    stop_queue_listener(listener)
+
+
+def test_request_id_is_generated_or_propagated(client):
+    """Brak nagłówka - nowy identyfikator; poprawny X-Request-ID z proxy - ten sam; niepoprawny - zastąpiony"""
+    generated = client.get('/login').headers['X-Request-ID']
+    assert re.fullmatch(r'[0-9a-f]{32}', generated)
+    assert client.get('/login', headers={'X-Request-ID': 'lb-42.a'}).headers['X-Request-ID'] == 'lb-42.a'
+    assert client.get('/login', headers={'X-Request-ID': 'zły identyfikator'}).headers['X-Request-ID'] != 'zły identyfikator'
+
+
+def test_access_log_record_carries_request_context(logged_in_user, regular_user, captured_access_log):
+    """Linia dziennika dostępu (JSON) zawiera id żądania i użytkownika, endpoint, status, czas i liczbę zapytań"""
+    handler, listener = captured_access_log
+    response = logged_in_user.get('/api/events')
+    stop_queue_listener(listener)  # opróżnia kolejkę
+
+    record = json.loads(handler.lines[-1])
+    assert record['request_id'] == response.headers['X-Request-ID']
+    assert record['user_id'] == str(regular_user.id)
+    assert record['endpoint'] == 'main.api_events'
+    assert record['status'] == 200
+    assert record['duration_ms'] >= 0
+    assert record['sql_queries'] >= 1
+    assert record['message'] == 'GET /api/events 200'
+
+
+def test_exception_is_formatted_before_leaving_the_thread():
+    """Wyjątek trafia do JSON jako tekst (rekord w kolejce nie trzyma obiektu traceback)"""
+    logger = logging.getLogger('grafik.test_request_logging')
+    handler = ListHandler()
+    queue_handler, listener = start_queue_listener(logger, handler)
+    try:
+        try:
+            {}['brak']
+        except KeyError:
+            logger.exception('Błąd %s', 'importu')
+    finally:
+        stop_queue_listener(listener)
+        logger.removeHandler(queue_handler)
+
+    record = json.loads(handler.lines[0])
+    assert record['level'] == 'ERROR'
+    assert record['message'] == 'Błąd importu'
+    assert 'KeyError' in record['exc']
+    assert 'request_id' not in record
@@ -0,0 +1,124 @@
+"""
+Testy automatycznej obsady zleceń (roster.py, /admin/roster)
+Plik: tests/test_roster.py
+
+WAŻNE: Wszystkie fixtures importowane z conftest.py
+"""
+from datetime import date
+from extensions import mail
+from models import User, Trip, Signup
+from availability import OCCUPYING
+from roster import agency_quotas, build_plan
+
+DAY_ONE, DAY_TWO = date(2026, 6, 10), date(2026, 6, 11)
+
+
+def _workers(db, count, **overrides):
+    workers = [User(name=f'Pracownik{i}', surname='Grafikowy', email=f'grafik{i}@test.com', agency='TEST',
+                    status='pracownik', accepted_tos=True, password_hash='x', **overrides) for i in range(count)]
+    db.session.add_all(workers)
+    db.session.commit()
+    return workers
+
+
+def test_plan_respects_availability_and_balances_load(db, kierownik_user):
+    """Rezerwowy pierwszy; bez niedyspozycyjnych i dwóch zleceń dnia; najbardziej obciążony czeka; limit agencji"""
+    first, reserve, unavailable, busy, fifth = _workers(db, 5)
+    morning = Trip(title='Rano', trip_date=DAY_ONE, spots=2)
+    evening = Trip(title='Wieczór', trip_date=DAY_ONE, spots=1)
+    next_day = Trip(title='Jutro', trip_date=DAY_TWO, spots=2)
+    earlier = [Trip(title=f'Wcześniej {i}', trip_date=date(2026, 6, 1 + i), spots=1) for i in range(2)]
+    db.session.add_all([morning, evening, next_day, *earlier])
+    db.session.flush()
+    reserve_signup = Signup(trip_id=morning.id, user_id=reserve.id, status='rezerwowy')
+    db.session.add_all([
+        reserve_signup,
+        Signup(trip_id=next_day.id, user_id=unavailable.id, status='niedyspozycyjny'),
+        *(Signup(trip_id=trip.id, user_id=busy.id, status='potwierdzony') for trip in earlier),
+        Signup(trip_id=morning.id, user_id=kierownik_user.id, status='niedyspozycyjny'),
+    ])
+    db.session.commit()
+
+    plan = build_plan(DAY_ONE, DAY_TWO, quotas={})
+    assigned = [(change['trip_id'], change['user_id']) for change in plan['changes']]
+    assert len(assigned) == 5 and plan['unfilled'] == []
+    assert plan['changes'][0]['signup_id'] == reserve_signup.id and plan['changes'][0]['status'] == 'potwierdzony'
+    assert (next_day.id, unavailable.id) not in assigned
+    assert busy.id not in {user_id for _, user_id in assigned}
+    day_one = [user_id for trip_id, user_id in assigned if trip_id != next_day.id]
+    assert len(day_one) == len(set(day_one)) == 3
+    assert {change['status'] for change in plan['changes'][1:]} == {'wstępnie zapisany'}
+
+    # Agencja z limitem 20% z 5 miejsc dostaje najwyżej jedno
+    for worker in (first, fifth):
+        worker.agency = 'LIMIT'
+    db.session.commit()
+    limited = build_plan(DAY_ONE, DAY_TWO, quotas={'LIMIT': 0.2})
+    assert sum(change['agency'] == 'LIMIT' for change in limited['changes']) == 1
+    assert limited['fingerprint'] != plan['fingerprint']
+
+
+def test_preview_and_apply_in_one_transaction(logged_in_user, regular_user, kierownik_user, db):
+    """Pracownik nie ma dostępu; nieaktualny odcisk nic nie zapisuje; zatwierdzenie zapisuje plan i e-maile"""
+    workers = _workers(db, 3)
+    trip = Trip(title='Biedronka Opole', trip_date=DAY_ONE, spots=2)
+    db.session.add(trip)
+    db.session.commit()
+    client = logged_in_user
+    assert client.get('/admin/roster').status_code == 403
+
+    client.get('/logout')
+    client.post('/login', data={'email': kierownik_user.email, 'password': 'password'})
+    page = client.get('/admin/roster?start=2026-06-01&end=2026-06-30')
+    assert page.status_code == 200 and 'Biedronka Opole' in page.get_data(as_text=True)
+    plan = client.get('/admin/roster?start=2026-06-01&end=2026-06-30&format=json').get_json()
+    # Równe obciążenie - kolejność id (pracownik z fixture jest pierwszy)
+    assert [change['user_id'] for change in plan['changes']] == [regular_user.id, workers[0].id]
+    assert client.get('/admin/roster?start=2026-06-30&end=2026-06-01').status_code == 400
+
+    form = {'start': '2026-06-01', 'end': '2026-06-30', 'fingerprint': 'nieaktualny'}
+    client.post('/admin/roster', data=form)
+    assert Signup.query.count() == 0
+
+    with mail.record_messages() as sent:
+        client.post('/admin/roster', data={**form, 'fingerprint': plan['fingerprint']})
+    signups = db.session.query(Signup.user_id, Signup.status).filter_by(trip_id=trip.id).order_by(Signup.user_id).all()
+    assert signups == [(regular_user.id, 'wstępnie zapisany'), (workers[0].id, 'wstępnie zapisany')]
+    assert sorted(message.recipients[0] for message in sent) == sorted([regular_user.email, workers[0].email])
+    assert 'Biedronka Opole' in sent[0].body
+
+
+def test_signup_between_preview_and_apply_does_not_overbook(client, kierownik_user, db, count_queries):
+    """Zapis pracownika po podglądzie zmienia odcisk planu; zatwierdzenie najpierw blokuje zlecenia"""
+    worker, other = _workers(db, 2)
+    trip = Trip(title='Lidl Gniezno', trip_date=DAY_ONE, spots=1)
+    db.session.add(trip)
+    db.session.commit()
+    client.post('/login', data={'email': kierownik_user.email, 'password': 'password'})
+    form = {'start': '2026-06-01', 'end': '2026-06-30'}
+    plan = client.get('/admin/roster', query_string={**form, 'format': 'json'}).get_json()
+    assert len(plan['changes']) == 1
+
+    # Ostatnie miejsce zajmuje pracownik, zanim kierownik zatwierdzi podgląd
+    client.get('/logout')
+    worker.set_password('password')
+    db.session.commit()
+    client.post('/login', data={'email': worker.email, 'password': 'password'})
+    client.post(f'/trip/{trip.id}/signup', data={'action': 'signup'})
+    client.get('/logout')
+    client.post('/login', data={'email': kierownik_user.email, 'password': 'password'})
+
+    with count_queries() as queries:
+        client.post('/admin/roster', data={**form, 'fingerprint': plan['fingerprint']})
+    occupied = Signup.query.filter(Signup.trip_id == trip.id, Signup.status.in_(OCCUPYING)).count()
+    assert occupied == 1 and Signup.query.filter_by(user_id=other.id).count() == 0
+    # Blokada przed odczytem danych planu (SQLite: UPDATE otwierający transakcję zapisu)
+    planning = [statement for statement in queries.statements if 'trip' in statement.lower()]
+    assert planning[0].lstrip().upper().startswith('UPDATE TRIP'), queries.report()
+
+
+def test_agency_quotas_skip_malformed_entries(app, caplog):
+    """Błędny wpis w ROSTER_AGENCY_QUOTAS jest pomijany z ostrzeżeniem, a nie blokuje startu aplikacji"""
+    quotas = agency_quotas(' Adecco=50% , Randstad=0.3, Manpower=pół, Kelly=1.5, =0.2')
+    assert quotas == {'Adecco': 0.5, 'Randstad': 0.3}
+    assert sum('ROSTER_AGENCY_QUOTAS' in record.getMessage() for record in caplog.records) == 3
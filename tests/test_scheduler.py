@@ -0,0 +1,77 @@
+"""
+Testy harmonogramu zadań okresowych (scheduler.py, jobs.py)
+Plik: tests/test_scheduler.py
+
+WAŻNE: Wszystkie fixtures importowane z conftest.py
+"""
+from datetime import date, datetime, timedelta
+import pytest
+from extensions import mail
+from models import Trip, Signup, User, ScheduledJob, ChangeJournalEntry
+from scheduler import get_job, run_job, run_pending
+
+
+@pytest.fixture
+def archive_in_chunks_of_two(app):
+    app.config['ARCHIVE_CHUNK_SIZE'] = 2
+    yield
+    app.config['ARCHIVE_CHUNK_SIZE'] = 500
+
+
+def test_nightly_archive_runs_once_per_day_in_chunks(db, archive_in_chunks_of_two):
+    """Przed godziną nic; po niej archiwizacja paczkami (z wpisami w dzienniku zmian); drugi raz tego dnia - nic"""
+    old_date = date.today() - timedelta(days=200)
+    db.session.add_all([Trip(title=f'Stare {n}', trip_date=old_date, spots=1) for n in range(5)])
+    db.session.add(Trip(title='Bieżące', trip_date=date.today(), spots=1))
+    db.session.commit()
+    today = datetime.combine(date.today(), datetime.min.time())
+
+    assert run_pending(today.replace(hour=1)) == []
+    assert run_pending(today.replace(hour=2, minute=30)) == ['archive']
+    assert Trip.query.filter_by(is_archived=True).count() == 5
+    assert ChangeJournalEntry.query.filter_by(entity='trip', op='update').count() == 5
+    job = db.session.get(ScheduledJob, 'archive')
+    assert job.last_period == date.today().isoformat() and job.last_result == '5' and job.locked_by is None
+
+    assert run_pending(today.replace(hour=4)) == ['prewarm']
+
+
+def test_job_locked_elsewhere_or_failing_is_not_marked_done(app, db, monkeypatch):
+    """Aktywna rezerwacja innego procesu blokuje wykonanie; błąd zostawia okres niewykonany i odracza ponowienie"""
+    period = date.today().isoformat()
+    db.session.add(ScheduledJob(name='archive', locked_by='inny-worker', locked_until=datetime.utcnow() + timedelta(minutes=5)))
+    db.session.commit()
+    assert run_job(get_job('archive'), period) == (False, None)
+
+    job = db.session.get(ScheduledJob, 'archive')
+    job.locked_by, job.locked_until = None, None
+    db.session.commit()
+    monkeypatch.setattr('jobs.archive_old_trips', lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        run_job(get_job('archive'), period)
+    db.session.expire_all()
+    assert job.last_period is None and 'ZeroDivisionError' in job.last_error
+    assert job.locked_by is None and job.locked_until > datetime.utcnow() + timedelta(minutes=10)
+    assert run_job(get_job('archive'), period) == (False, None)  # przed upływem SCHEDULER_RETRY_SECONDS
+
+
+def test_reminders_go_to_confirmed_participants_once(db, regular_user, kierownik_user):
+    """Przypomnienie tylko dla potwierdzonych na jutrzejsze zlecenie; ponowne sprawdzenie tego dnia nie wysyła drugi raz"""
+    tomorrow = Trip(title='Biedronka Kalisz', trip_date=date.today() + timedelta(days=1), spots=3)
+    later = Trip(title='Later', trip_date=date.today() + timedelta(days=2), spots=3)
+    db.session.add_all([tomorrow, later])
+    db.session.flush()
+    db.session.add_all([
+        Signup(trip_id=tomorrow.id, user_id=regular_user.id, status='potwierdzony'),
+        Signup(trip_id=tomorrow.id, user_id=kierownik_user.id, status='wstępnie zapisany'),
+        Signup(trip_id=later.id, user_id=kierownik_user.id, status='potwierdzony'),
+    ])
+    db.session.commit()
+    evening = datetime.combine(date.today(), datetime.min.time()).replace(hour=18)
+
+    with mail.record_messages() as sent:
+        assert 'reminders' in run_pending(evening)
+        assert 'reminders' not in run_pending(evening + timedelta(minutes=1))
+    assert [m.recipients for m in sent] == [[regular_user.email]]
+    assert 'Biedronka Kalisz' in sent[0].body
+    assert db.session.get(ScheduledJob, 'reminders').last_result == '1'
@@ -0,0 +1,124 @@
+"""
+Testy wyszukiwania pełnotekstowego zleceń (search.py, /api/search)
+Plik: tests/test_search.py
+
+WAŻNE: Wszystkie fixtures importowane z conftest.py
+"""
+from datetime import date, timedelta
+from models import Trip
+from search import query_terms
+
+
+def _add_trips(db, *trips):
+    db.session.add_all(trips)
+    db.session.commit()
+    return trips
+
+
+def _titles(client, query, **params):
+    response = client.get('/api/search', query_string={'q': query, **params})
+    assert response.status_code == 200
+    return [result['title'] for result in response.get_json()['results']]
+
+
+def test_search_folds_polish_characters_and_ranks_titles_first(logged_in_user, db):
+    """Bez polskich znaków i wielkości liter, początki słów; tytuł ważniejszy niż uwagi; triggery aktualizują indeks"""
+    today = date.today()
+    _, in_notes, _ = _add_trips(
+        db,
+        Trip(title='Żabka Łódź Śródmieście', trip_date=today, spots=2),
+        Trip(title='Inwentaryzacja', trip_date=today, spots=2, notes='Zbiórka pod Żabką w Łodzi'),
+        Trip(title='Biedronka Kalisz', trip_date=today, spots=2),
+    )
+    assert query_terms('  ŻABKA, łódź!') == ['zabka', 'lodz']
+
+    assert _titles(logged_in_user, 'zab') == ['Żabka Łódź Śródmieście', 'Inwentaryzacja']
+    assert _titles(logged_in_user, 'LODZ srodm') == ['Żabka Łódź Śródmieście']
+    assert _titles(logged_in_user, 'kalisz biedr') == ['Biedronka Kalisz']
+    assert _titles(logged_in_user, '%%') == []
+
+    in_notes.notes = 'Zbiórka na parkingu'
+    db.session.commit()
+    Trip.query.filter_by(title='Biedronka Kalisz').delete()
+    db.session.commit()
+    assert _titles(logged_in_user, 'zabka') == ['Żabka Łódź Śródmieście']
+    assert _titles(logged_in_user, 'kalisz') == []
+
+
+def test_archive_scope_requires_manager(logged_in_user, admin_user, db):
+    """Pracownik przeszukuje tylko bieżące zlecenia; admin także archiwum"""
+    _add_trips(
+        db,
+        Trip(title='Lidl Poznań', trip_date=date.today(), spots=1),
+        Trip(title='Lidl Gniezno', trip_date=date.today() - timedelta(days=300), spots=1, is_archived=True),
+    )
+    assert logged_in_user.get('/api/search?q=lidl&scope=archived').status_code == 403
+    assert _titles(logged_in_user, 'lidl') == ['Lidl Poznań']
+
+    client = logged_in_user
+    client.get('/logout')
+    client.post('/login', data={'email': admin_user.email, 'password': 'password'})
+    assert _titles(client, 'lidl', scope='archived') == ['Lidl Gniezno']
+    assert sorted(_titles(client, 'lidl', scope='all')) == ['Lidl Gniezno', 'Lidl Poznań']
+
+
+def test_settlements_and_archive_filter_through_index(logged_in_admin, db):
+    """Filtr rozliczeń i wyszukiwarka archiwum korzystają z tego samego indeksu"""
+    today = date.today()
+    _add_trips(
+        db,
+        Trip(title='Stokrotka Łomża', trip_date=today, spots=1),
+        Trip(title='Netto Konin', trip_date=today, spots=1),
+        Trip(title='Stokrotka Ełk', trip_date=today - timedelta(days=300), spots=1, is_archived=True),
+        Trip(title='Netto Koło', trip_date=today - timedelta(days=300), spots=1, is_archived=True),
+    )
+    page = logged_in_admin.get(f'/admin/settlements?search_text=lomza&search_month={today.month}').get_data(as_text=True)
+    assert 'Stokrotka Łomża' in page and 'Netto Konin' not in page
+
+    page = logged_in_admin.get('/admin/archive?q=elk').get_data(as_text=True)
+    assert 'Stokrotka Ełk' in page and 'Netto Koło' not in page
+
+
+def test_other_databases_fall_back_to_ilike(logged_in_admin, db, monkeypatch):
+    """Bez indeksu (np. MySQL) filtr rozliczeń działa przez ILIKE zamiast zwracać błąd"""
+    today = date.today()
+    _add_trips(
+        db,
+        Trip(title='Stokrotka Łomża', trip_date=today, spots=1),
+        Trip(title='Netto Konin', trip_date=today, spots=1, notes='Dojazd z Łomży'),
+    )
+    monkeypatch.setattr(db.engine.dialect, 'name', 'mysql')
+
+    response = logged_in_admin.get(f'/admin/settlements?search_text=stokrotka&search_month={today.month}')
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    assert 'Stokrotka Łomża' in page and 'Netto Konin' not in page
+
+    response = logged_in_admin.get('/api/search', query_string={'q': 'Łomż'})
+    assert [result['title'] for result in response.get_json()['results']] == ['Stokrotka Łomża', 'Netto Konin']
+
+
+def test_database_without_index_falls_back_to_ilike(logged_in_admin, db):
+    """Baza sprzed indeksu (bez trip_fts, przed 'flask search rebuild') wyszukuje przez ILIKE zamiast zwracać 500"""
+    import search
+    with db.engine.begin() as connection:
+        for name in ('trip_fts_insert', 'trip_fts_delete', 'trip_fts_update'):
+            connection.exec_driver_sql(f'DROP TRIGGER {name}')
+        connection.exec_driver_sql(search.SQLITE_DROP)
+    search._indexed_engines.discard(db.engine)
+    today = date.today()
+    _add_trips(
+        db,
+        Trip(title='Stokrotka Łomża', trip_date=today, spots=1),
+        Trip(title='Netto Konin', trip_date=today, spots=1),
+    )
+
+    response = logged_in_admin.get(f'/admin/settlements?search_text=stokrotka&search_month={today.month}')
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    assert 'Stokrotka Łomża' in page and 'Netto Konin' not in page
+    assert _titles(logged_in_admin, 'netto') == ['Netto Konin']
+
+    # Po 'flask search rebuild' wyszukiwanie wraca do indeksu (ze zwijaniem polskich znaków)
+    search.TripSearch.rebuild()
+    assert _titles(logged_in_admin, 'lomza') == ['Stokrotka Łomża']
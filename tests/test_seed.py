@@ -0,0 +1,34 @@
+"""
+Testy generatora danych syntetycznych (flask seed)
+Plik: tests/test_seed.py
+
+WAŻNE: Wszystkie fixtures importowane z conftest.py
+"""
+from datetime import date
+from models import User, Trip, Signup
+from seed import generate, seed_command
+
+
+def test_generate_inserts_consistent_data(db):
+    """Liczby wierszy się zgadzają, stare zlecenia są zarchiwizowane, zapisy tylko dla pracowników"""
+    counts = generate(users=20, trips=200, years=2, signups_per_trip=4, seed=7, today=date(2026, 6, 15))
+
+    assert User.query.count() == counts['users'] == 20
+    assert Trip.query.count() == counts['trips'] == 200
+    assert Signup.query.count() == counts['signups']
+    assert Trip.query.filter(Trip.trip_date < date(2025, 12, 1), Trip.is_archived == False).count() == 0  # noqa: E712
+    assert Trip.query.filter(Trip.trip_date > date(2026, 6, 15), Trip.is_archived == True).count() == 0  # noqa: E712
+    statuses = {signup.user.status for signup in Signup.query.all()}
+    assert statuses <= {'pracownik', 'złoty pracownik'}
+
+
+def test_seed_command_appends_and_accounts_can_log_in(app, db, client):
+    """Drugie wywołanie dokłada konta z nowymi numerami; wygenerowane konta mogą się zalogować"""
+    runner = app.test_cli_runner()
+    result = runner.invoke(seed_command, ['--users', '5', '--trips', '10', '--random-seed', '1'])
+    assert result.exit_code == 0, result.output
+    result = runner.invoke(seed_command, ['--users', '5', '--trips', '10', '--password', 'inne-haslo'])
+    assert 'seed6@grafik.example ... seed10@grafik.example' in result.output
+
+    response = client.post('/login', data={'email': 'seed7@grafik.example', 'password': 'inne-haslo'})
+    assert response.status_code == 302
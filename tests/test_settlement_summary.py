@@ -0,0 +1,109 @@
+"""
+Testy podsumowania rozliczeń (settlement_summary.py, /admin/settlements/summary)
+Plik: tests/test_settlement_summary.py
+
+WAŻNE: Wszystkie fixtures importowane z conftest.py
+"""
+import io
+from datetime import date, time
+import pandas as pd
+import pytest
+from models import Trip, Signup, MonthlySettlement, SettlementDirtyMonth
+from settlement_summary import refresh_dirty_months
+
+
+def _summary(db, month):
+    db.session.expire_all()
+    return {row.user_id: row for row in MonthlySettlement.query.filter_by(month=month)}
+
+
+def _dirty_months(db):
+    return sorted(month for (month,) in db.session.query(SettlementDirtyMonth.month))
+
+
+@pytest.fixture
+def no_refresh_on_commit(app):
+    app.config['SETTLEMENTS_REFRESH_ON_COMMIT'] = False
+    yield
+    app.config['SETTLEMENTS_REFRESH_ON_COMMIT'] = True
+
+
+def test_summary_follows_trip_and_signup_changes(db, regular_user, kierownik_user):
+    """Tylko potwierdzone zapisy; godziny przez północ; zmiana daty przelicza stary i nowy miesiąc"""
+    day = Trip(title='Dzień', trip_date=date(2026, 3, 2), spots=3, work_start_time=time(8, 0),
+               work_end_time=time(16, 30), kilometers=120.0, manager_was_passenger=True)
+    night = Trip(title='Noc', trip_date=date(2026, 3, 20), spots=3, work_start_time=time(22, 0), work_end_time=time(6, 0))
+    no_hours = Trip(title='Bez godzin', trip_date=date(2026, 3, 25), spots=3, kilometers=30.0)
+    db.session.add_all([day, night, no_hours])
+    db.session.flush()
+    db.session.add_all([
+        Signup(trip_id=day.id, user_id=regular_user.id, status='potwierdzony'),
+        Signup(trip_id=night.id, user_id=regular_user.id, status='potwierdzony'),
+        Signup(trip_id=no_hours.id, user_id=regular_user.id, status='potwierdzony'),
+        Signup(trip_id=day.id, user_id=kierownik_user.id, status='potwierdzony'),
+        Signup(trip_id=night.id, user_id=kierownik_user.id, status='wstępnie zapisany'),
+    ])
+    db.session.commit()
+
+    summary = _summary(db, '2026-03')
+    worker = summary[regular_user.id]
+    assert (worker.trips, worker.hours, worker.kilometers, worker.missing_hours) == (3, 16.5, 150.0, 1)
+    assert worker.passenger_trips == 1
+    assert (summary[kierownik_user.id].trips, summary[kierownik_user.id].hours) == (1, 8.5)
+    assert _dirty_months(db) == []
+
+    night.trip_date = date(2026, 4, 1)
+    db.session.commit()
+    assert _summary(db, '2026-03')[regular_user.id].hours == 8.5
+    assert _summary(db, '2026-04')[regular_user.id].hours == 8.0
+
+    Signup.query.filter_by(user_id=kierownik_user.id, trip_id=night.id).update({'status': 'potwierdzony'})
+    db.session.commit()
+    assert _summary(db, '2026-04')[kierownik_user.id].trips == 1
+
+    db.session.delete(db.session.get(Trip, day.id))
+    db.session.commit()
+    assert kierownik_user.id not in _summary(db, '2026-03')
+
+
+def test_pending_months_are_refreshed_before_report(logged_in_admin, db, regular_user, no_refresh_on_commit):
+    """Bez przeliczenia po zatwierdzeniu miesiąc zostaje oznaczony; raport przelicza go przed odczytem"""
+    trips = [Trip(title=f'Zlecenie {n}', trip_date=date(2026, 5, 10 + n), spots=1, work_start_time=time(7, 0),
+                  work_end_time=time(15, 0)) for n in range(2)]
+    db.session.add_all(trips)
+    db.session.flush()
+    db.session.add_all([Signup(trip_id=trip.id, user_id=regular_user.id, status='potwierdzony') for trip in trips])
+    db.session.commit()
+    assert _dirty_months(db) == ['2026-05'] and _summary(db, '2026-05') == {}
+
+    page = logged_in_admin.get('/admin/settlements/summary?month=2026-05').get_data(as_text=True)
+    assert 'Kowalski Jan' in page and '16.00' in page
+    assert _dirty_months(db) == []
+
+    response = logged_in_admin.post('/admin/clear-month', json={'year': 2026, 'month': 5})
+    assert response.get_json()['status'] == 'success'
+    assert _dirty_months(db) == ['2026-05']
+    assert refresh_dirty_months() == 1 and _summary(db, '2026-05') == {}
+
+
+def test_report_export_and_access(logged_in_user, admin_user, regular_user, db):
+    """Pracownik nie ma dostępu; admin pobiera ten sam raport jako Excel"""
+    trip = Trip(title='Lidl', trip_date=date(2026, 6, 3), spots=1, work_start_time=time(6, 0),
+                work_end_time=time(14, 15), kilometers=42.5)
+    db.session.add(trip)
+    db.session.flush()
+    db.session.add(Signup(trip_id=trip.id, user_id=regular_user.id, status='potwierdzony'))
+    db.session.commit()
+    client = logged_in_user
+    assert client.get('/admin/settlements/summary?month=2026-06').status_code == 403
+
+    client.get('/logout')
+    client.post('/login', data={'email': admin_user.email, 'password': 'password'})
+    response = client.get('/admin/settlements/summary?month=2026-06&format=xlsx')
+    assert response.status_code == 200
+    sheet = pd.read_excel(io.BytesIO(response.data))
+    (row,) = sheet.to_dict('records')
+    assert pd.isna(row.pop('pasażer'))  # tylko dla kierowników
+    assert row == {'nazwisko': 'Kowalski', 'imie': 'Jan', 'agencja': 'TEST', 'zlecenia': 1,
+                   'godziny': 8.25, 'ilosc_km': 42.5, 'bez_godzin': 0}
+    assert client.get('/admin/settlements/summary?month=2026-99').status_code == 400
@@ -0,0 +1,60 @@
+"""
+Testy dziennika wolnych zapytań SQL
+Plik: tests/test_slow_queries.py
+
+WAŻNE: Wszystkie fixtures importowane z conftest.py
+"""
+import pytest
+from sqlalchemy import create_engine
+from slow_queries import SlowQueryLog
+
+
+@pytest.fixture(scope='function')
+def slow_log(app):
+    """Każde zapytanie traktowane jako wolne (próg 0 ms) na czas jednego testu."""
+    log = app.extensions['slow_query_log']
+    original = log.threshold_ms
+    log.threshold_ms = 0
+    log.reset()
+    yield log
+    log.threshold_ms = original
+    log.reset()
+
+
+def test_plan_is_captured_in_background(tmp_path):
+    """Plan wykonania pobierany jest w osobnym wątku na nowym połączeniu"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'plan.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE trip (id INTEGER PRIMARY KEY, trip_date DATE)')
+
+    log = SlowQueryLog(threshold_ms=100)
+    statement = "SELECT id FROM trip WHERE strftime('%m', trip_date) = ?"
+    log.submit(engine, statement, ('03',), False, 250.0, 'admin.settlements')
+    log.submit(engine, 'UPDATE "user" SET password_hash = ? WHERE id = ?', ('tajne', 1), False, 150.0, 'auth.login')
+    log.flush(timeout=5)
+
+    slowest, second = log.top(10)
+    assert slowest['endpoints'] == {'admin.settlements': 1}
+    # Funkcja na kolumnie wyklucza indeks - pełny skan tabeli
+    assert 'SCAN' in slowest['plan']
+    assert second['last_params'] == '<ukryte>'
+
+
+def test_request_queries_are_summarised(logged_in_admin, slow_log):
+    """Wolne zapytania żądania trafiają do podsumowania z nazwą endpointu"""
+    assert logged_in_admin.get('/admin/settlements').status_code == 200
+    slow_log.flush(timeout=5)
+
+    entries = slow_log.top(100)
+    assert any('admin.settlements' in entry['endpoints'] for entry in entries)
+    # Baza testowa działa w pamięci (jedno połączenie) - bez planów
+    assert all('plan' not in entry for entry in entries)
+
+    page = logged_in_admin.get('/admin/slow-queries')
+    assert page.status_code == 200
+    assert 'admin.settlements' in page.get_data(as_text=True)
+
+
+def test_slow_queries_page_requires_admin(logged_in_user):
+    """Zwykły pracownik nie ma dostępu do podsumowania"""
+    assert logged_in_user.get('/admin/slow-queries').status_code == 403
@@ -0,0 +1,66 @@
+"""
+Testy zadań w tle (tasks.py) i wysyłki e-maili przez kolejkę zadań
+Plik: tests/test_tasks.py
+
+WAŻNE: Wszystkie fixtures importowane z conftest.py
+"""
+import io
+import threading
+from datetime import date, timedelta
+import pandas as pd
+from flask import Flask, current_app
+from extensions import mail
+from models import Trip, Signup
+from tasks import TaskQueue
+
+
+def test_add_trip_notifies_workers(logged_in_admin, regular_user):
+    """Nowe zlecenie: wiadomość do pracownika wyrenderowana z emaile/new_trip.txt (tryb 'sync')"""
+    with mail.record_messages() as outbox:
+        response = logged_in_admin.post('/trip/add', data={
+            'title': 'Dino Września', 'trip_date': (date.today() + timedelta(days=3)).isoformat(), 'spots': '5',
+        })
+    assert response.status_code == 302
+    message = next(m for m in outbox if m.recipients == [regular_user.email])
+    assert 'Dino Września' in message.subject
+    assert 'Dino Września' in message.body
+    assert regular_user.name in message.body
+
+
+def test_import_excel_creates_trips_and_notifies(logged_in_admin, admin_user, regular_user):
+    """Import z nowymi datami tworzy zlecenia, zapisuje importującego i powiadamia pracowników"""
+    trip_date = date.today() + timedelta(days=10)
+    output = io.BytesIO()
+    pd.DataFrame([[trip_date.isoformat(), 'Lidl Gniezno', 'tak']]).to_excel(output, index=False, header=False)
+
+    with mail.record_messages() as outbox:
+        response = logged_in_admin.post('/admin/import', data={'excel_file': (io.BytesIO(output.getvalue()), 'grafik.xlsx')},
+                                        content_type='multipart/form-data')
+    assert response.status_code == 302
+    trip = Trip.query.filter_by(trip_date=trip_date).one()
+    assert trip.title == 'Lidl Gniezno' and trip.is_confirmed
+    assert Signup.query.filter_by(trip_id=trip.id, user_id=admin_user.id, status='potwierdzony').count() == 1
+    assert [m.recipients for m in outbox] == [[regular_user.email]]
+
+
+def test_thread_backend_runs_in_app_context_and_falls_back_when_full():
+    """Pula wątków: zadanie ma kontekst aplikacji; przy pełnej puli wykonuje się w wątku wywołującym; drain czeka na resztę"""
+    app = Flask('tasks_test')
+    app.config.update(TASKS_BACKEND='thread', TASKS_THREAD_WORKERS=1, TASKS_QUEUE_LIMIT=0)
+    tasks = TaskQueue(app)
+    release = threading.Event()
+    runs = []
+
+    def task(label):
+        if label == 'pierwsze':
+            release.wait(5)
+        runs.append((label, current_app.name, threading.current_thread() is main_thread))
+
+    main_thread = threading.current_thread()
+    with app.app_context():
+        tasks.enqueue(task, 'pierwsze')
+        tasks.enqueue(task, 'drugie')  # jedyny wątek puli jest zajęty
+        assert runs == [('drugie', 'tasks_test', True)]
+        release.set()
+        tasks.drain()
+    assert runs[1] == ('pierwsze', 'tasks_test', False)
@@ -0,0 +1,93 @@
+"""
+Testy ograniczania częstotliwości żądań (throttling)
+Plik: tests/test_throttling.py
+
+WAŻNE: Wszystkie fixtures importowane z conftest.py
+"""
+import pytest
+from werkzeug.middleware.proxy_fix import ProxyFix
+from extensions import throttle
+from throttling import MemoryStore, ThrottleRule
+
+
+@pytest.fixture(scope='function')
+def strict_throttle(app):
+    """Włącza throttling z bardzo niskimi limitami na czas jednego testu."""
+    state = app.extensions['throttle']
+    original_rules = dict(state.rules)
+    app.config['THROTTLE_ENABLED'] = True
+    state.rules.update({
+        'login_ip': ThrottleRule.parse('100/60'),
+        'login_email': ThrottleRule.parse('2/60'),
+        'reset_ip': ThrottleRule.parse('100/60'),
+        'reset_email': ThrottleRule.parse('1/3600 window'),
+    })
+    for name in state.rules:
+        state.counters.setdefault(name, {'allowed': 0, 'blocked': 0})
+    throttle.reset()
+    yield state
+    app.config['THROTTLE_ENABLED'] = False
+    state.rules.clear()
+    state.rules.update(original_rules)
+    throttle.reset()
+
+
+def test_token_bucket_refills_over_time():
+    """Token bucket przepuszcza N prób, a potem uzupełnia żetony w czasie"""
+    store = MemoryStore()
+    rule = ThrottleRule.parse('2/10')
+    assert store.hit('k', rule, now=0).allowed
+    assert store.hit('k', rule, now=0).allowed
+    blocked = store.hit('k', rule, now=0)
+    assert not blocked.allowed
+    assert blocked.retry_after == 5
+    assert store.hit('k', rule, now=5).allowed
+
+
+def test_sliding_window_limits_events():
+    """Przesuwne okno blokuje do czasu wypadnięcia najstarszego zdarzenia"""
+    store = MemoryStore()
+    rule = ThrottleRule.parse('1/100 window')
+    assert store.hit('k', rule, now=0).allowed
+    blocked = store.hit('k', rule, now=40)
+    assert not blocked.allowed
+    assert blocked.retry_after == 60
+    assert store.hit('k', rule, now=100).allowed
+
+
+def test_login_throttled_per_email(client, regular_user, strict_throttle):
+    """Po przekroczeniu limitu per e-mail logowanie zwraca 429 z Retry-After"""
+    for _ in range(2):
+        response = client.post('/login', data={'email': regular_user.email, 'password': 'zle'})
+        assert response.status_code == 302
+
+    response = client.post('/login', data={'email': regular_user.email, 'password': 'password'})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+    assert throttle.stats()['login_email'] == {'allowed': 2, 'blocked': 1}
+
+
+def test_reset_request_throttled_before_enqueue(client, regular_user, strict_throttle):
+    """Drugie żądanie resetu hasła w oknie jest odrzucane przed wysyłką e-maila"""
+    response = client.post('/reset_password', data={'email': regular_user.email})
+    assert response.status_code == 302
+
+    response = client.post('/reset_password', data={'email': regular_user.email})
+    assert response.status_code == 429
+    assert 'Retry-After' in response.headers
+
+
+def test_login_ip_limit_uses_forwarded_client_address(app, client, strict_throttle, monkeypatch):
+    """Za proxy (PROXY_FIX_X_FOR) limit per IP liczony jest dla klienta z X-Forwarded-For, a nie dla proxy"""
+    strict_throttle.rules['login_ip'] = ThrottleRule.parse('2/60')
+    monkeypatch.setattr(app, 'wsgi_app', ProxyFix(app.wsgi_app, x_for=1))
+
+    for _ in range(2):
+        response = client.post('/login', data={}, headers={'X-Forwarded-For': '203.0.113.1'})
+        assert response.status_code == 200
+    response = client.post('/login', data={}, headers={'X-Forwarded-For': '203.0.113.1'})
+    assert response.status_code == 429
+
+    # Inny pracownik za tym samym proxy ma własny limit
+    response = client.post('/login', data={}, headers={'X-Forwarded-For': '203.0.113.2'})
+    assert response.status_code == 200
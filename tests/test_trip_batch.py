@@ -0,0 +1,82 @@
+"""
+Testy masowego dodawania zleceń (trip_batch.py, /trip/batch, /trip/series)
+Plik: tests/test_trip_batch.py
+
+WAŻNE: Wszystkie fixtures importowane z conftest.py
+"""
+from datetime import date
+from extensions import mail
+from models import User, Trip, Signup
+
+
+def _golden_user(db):
+    user = User(name='Zofia', surname='Złota', email='zlota@test.com', agency='TEST',
+                status='złoty pracownik', accepted_tos=True, password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def test_json_batch_validates_all_rows_and_notifies_once(logged_in_kierownik, kierownik_user, regular_user, db):
+    """Jeden błędny wiersz odrzuca paczkę; zapisy twórcy i złotych pracowników; jeden e-mail na pracownika"""
+    golden = _golden_user(db)
+    client = logged_in_kierownik
+    rows = [{'title': f'Dino {day}', 'trip_date': f'2026-04-{day:02d}', 'spots': 3, 'departure_time': '06:30'}
+            for day in (7, 9, 14)]
+
+    response = client.post('/trip/batch', json={'trips': rows + [{'title': ' ', 'trip_date': '2026-04-31', 'spots': 9}]})
+    assert response.status_code == 400
+    assert {(error['row'], error['field']) for error in response.get_json()['errors']} == {
+        (3, 'title'), (3, 'trip_date'), (3, 'spots')}
+    assert Trip.query.count() == 0
+    assert client.post('/trip/batch', json={'trips': []}).status_code == 400
+
+    with mail.record_messages() as sent:
+        response = client.post('/trip/batch', json={'trips': rows})
+    assert response.status_code == 201
+    trip_ids = response.get_json()['ids']
+    assert [trip.title for trip in Trip.query.filter(Trip.id.in_(trip_ids)).order_by(Trip.trip_date)] == [
+        'Dino 7', 'Dino 9', 'Dino 14']
+    signups = {(signup.user_id, signup.status) for signup in Signup.query.all()}
+    assert signups == {(kierownik_user.id, 'potwierdzony'), (golden.id, 'wstępnie zapisany')}
+    assert Signup.query.count() == 6
+
+    assert sorted(message.recipients[0] for message in sent) == sorted([regular_user.email, golden.email])
+    assert sent[0].subject == 'Nowe zlecenia w grafiku (3)'
+    assert '07.04.2026: Dino 7' in sent[0].body and '14.04.2026: Dino 14' in sent[0].body
+
+
+def test_recurring_series_form(logged_in_user, kierownik_user, db, monkeypatch):
+    """Pracownik nie ma dostępu; seria wtorków i czwartków; błędy formularza i bazy niczego nie zapisują"""
+    client = logged_in_user
+    assert client.get('/trip/series').status_code == 403
+    client.get('/logout')
+    client.post('/login', data={'email': kierownik_user.email, 'password': 'password'})
+    assert client.get('/trip/series').status_code == 200
+
+    form = {'title': 'Lidl Kalisz', 'start_date': '2026-03-01', 'end_date': '2026-03-31', 'spots': '2',
+            'weekdays': ['1', '3'], 'departure_time': '07:00', 'is_confirmed': 'on'}
+    page = client.post('/trip/series', data={**form, 'spots': '9'}).get_data(as_text=True)
+    assert 'Liczba miejsc musi być w zakresie od 1 do 7.' in page
+    page = client.post('/trip/series', data={**form, 'weekdays': []}).get_data(as_text=True)
+    assert 'nie ma żadnego z wybranych dni' in page
+    assert Trip.query.count() == 0
+
+    def failing_create(rows, creator_id):
+        db.session.add(Trip(title='Częściowy zapis', trip_date=date(2026, 3, 3), spots=1))
+        db.session.flush()
+        raise RuntimeError('database is locked')
+
+    with monkeypatch.context() as patch:
+        patch.setattr('routes.trips.create_trips', failing_create)
+        response = client.post('/trip/series', data=form)
+    assert response.status_code == 200
+    assert 'Wystąpił błąd podczas dodawania serii zleceń' in response.get_data(as_text=True)
+    assert Trip.query.count() == 0
+
+    response = client.post('/trip/series', data=form)
+    assert response.status_code == 302
+    trips = Trip.query.order_by(Trip.trip_date).all()
+    assert [trip.trip_date.day for trip in trips] == [3, 5, 10, 12, 17, 19, 24, 26, 31]
+    assert all(trip.is_confirmed and trip.spots == 2 and trip.departure_time.hour == 7 for trip in trips)
+    assert {trip.trip_date.weekday() for trip in trips} == {1, 3} and trips[0].trip_date == date(2026, 3, 3)
@@ -0,0 +1,256 @@
+"""
+Ograniczanie częstotliwości żądań (throttling) dla logowania i resetu hasła.
+Plik: throttling.py
+
+Fala prób logowania (credential stuffing) wymusza kosztowne haszowanie haseł,
+a żądania resetu hasła kolejkują e-maile bez ograniczeń. Ten moduł sprawdza
+limity PRZED haszowaniem i kolejkowaniem, dzięki czemu chroni moc CPU
+dla prawdziwych użytkowników.
+
+Algorytmy (wybierane w regule):
+- 'bucket' - token bucket: pojemność N żetonów, uzupełnianych równomiernie w oknie,
+- 'window' - przesuwne okno: najwyżej N zdarzeń w ostatnich X sekundach.
+
+Magazyny stanu:
+- 'memory://'  - w pamięci procesu (jeden worker / mała instalacja),
+- 'redis://...' - wspólny dla wszystkich workerów (opcjonalny pakiet 'redis').
+"""
+import math
+import threading
+import time
+from collections import deque, namedtuple
+from flask import current_app
+
+ThrottleResult = namedtuple('ThrottleResult', ['allowed', 'retry_after'])
+
+
+class ThrottleRule:
+    """Reguła limitu w formacie 'N/sekundy' oraz algorytm ('bucket' lub 'window')."""
+
+    def __init__(self, limit, window, algorithm='bucket'):
+        if limit < 1 or window <= 0:
+            raise ValueError('Limit i okno muszą być dodatnie.')
+        if algorithm not in ('bucket', 'window'):
+            raise ValueError(f'Nieznany algorytm limitu: {algorithm}')
+        self.limit = int(limit)
+        self.window = float(window)
+        self.algorithm = algorithm
+
+    @classmethod
+    def parse(cls, spec):
+        """
+        Tworzy regułę z zapisu tekstowego, np. '10/300' (token bucket)
+        lub '3/3600 window' (przesuwne okno).
+        """
+        if isinstance(spec, cls):
+            return spec
+        parts = spec.split()
+        limit, window = parts[0].split('/', 1)
+        algorithm = parts[1] if len(parts) > 1 else 'bucket'
+        return cls(int(limit), float(window), algorithm)
+
+
+class MemoryStore:
+    """Stan limitów w pamięci procesu (chroniony blokadą, z czyszczeniem starych kluczy)."""
+
+    def __init__(self, max_keys=50000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key, rule, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._prune(now)
+            if rule.algorithm == 'bucket':
+                return self._hit_bucket(key, rule, now)
+            return self._hit_window(key, rule, now)
+
+    def _hit_bucket(self, key, rule, now):
+        rate = rule.limit / rule.window  # żetony na sekundę
+        tokens, updated = self._buckets.get(key, (float(rule.limit), now))
+        tokens = min(float(rule.limit), tokens + (now - updated) * rate)
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now)
+            return ThrottleResult(True, 0)
+        self._buckets[key] = (tokens, now)
+        return ThrottleResult(False, math.ceil((1 - tokens) / rate))
+
+    def _hit_window(self, key, rule, now):
+        events = self._windows.setdefault(key, deque())
+        while events and events[0] <= now - rule.window:
+            events.popleft()
+        if len(events) < rule.limit:
+            events.append(now)
+            return ThrottleResult(True, 0)
+        return ThrottleResult(False, math.ceil(events[0] + rule.window - now))
+
+    def _prune(self, now):
+        # Czyścimy tylko przy przekroczeniu limitu kluczy, aby nie płacić O(n) za każde żądanie
+        if len(self._buckets) + len(self._windows) <= self.max_keys:
+            return
+        for key, events in list(self._windows.items()):
+            if not events or events[-1] < now - 86400:
+                del self._windows[key]
+        # Pełne wiadra można bezpiecznie zapomnieć - odtworzą się w tym samym stanie
+        self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < 3600}
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+            self._windows.clear()
+
+
+class RedisStore:
+    """Stan limitów w Redis (wspólny dla wszystkich workerów i węzłów)."""
+
+    # Token bucket wykonywany atomowo po stronie Redis
+    _BUCKET_SCRIPT = """
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local rate = limit / window
+local state = redis.call('HMGET', key, 'tokens', 'ts')
+local tokens = tonumber(state[1]) or limit
+local ts = tonumber(state[2]) or now
+tokens = math.min(limit, tokens + (now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+end
+redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', key, math.ceil(window) + 1)
+if allowed == 1 then return {1, 0} end
+return {0, math.ceil((1 - tokens) / rate)}
+"""
+
+    # Przesuwne okno oparte na posortowanym zbiorze znaczników czasu
+    _WINDOW_SCRIPT = """
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local member = ARGV[4]
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+if redis.call('ZCARD', key) < limit then
+  redis.call('ZADD', key, now, member)
+  redis.call('EXPIRE', key, math.ceil(window) + 1)
+  return {1, 0}
+end
+local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+return {0, math.ceil(tonumber(oldest[2]) + window - now)}
+"""
+
+    def __init__(self, url, prefix='throttle:'):
+        import redis  # Opcjonalna zależność - wymagana tylko dla tego magazynu
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._bucket = self._client.register_script(self._BUCKET_SCRIPT)
+        self._window = self._client.register_script(self._WINDOW_SCRIPT)
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def hit(self, key, rule, now=None):
+        now = time.time() if now is None else now
+        redis_key = f'{self.prefix}{rule.algorithm}:{key}'
+        if rule.algorithm == 'bucket':
+            allowed, retry_after = self._bucket(keys=[redis_key], args=[rule.limit, rule.window, now])
+        else:
+            with self._lock:
+                self._counter += 1
+                member = f'{now}:{self._counter}'
+            allowed, retry_after = self._window(keys=[redis_key], args=[rule.limit, rule.window, now, member])
+        return ThrottleResult(bool(allowed), int(retry_after))
+
+    def reset(self):
+        for key in self._client.scan_iter(f'{self.prefix}*'):
+            self._client.delete(key)
+
+
+class _ThrottleState:
+    def __init__(self, store, rules):
+        self.store = store
+        self.rules = rules
+        self.counters = {name: {'allowed': 0, 'blocked': 0} for name in rules}
+        self.lock = threading.Lock()
+
+
+class Throttle:
+    """
+    Rozszerzenie Flask sprawdzające limity żądań.
+    Reguły definiuje słownik THROTTLE_RULES: nazwa -> 'N/sekundy [bucket|window]'.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('THROTTLE_ENABLED', True)
+        app.config.setdefault('THROTTLE_STORAGE_URL', 'memory://')
+        app.config.setdefault('THROTTLE_RULES', {})
+        rules = {name: ThrottleRule.parse(spec) for name, spec in app.config['THROTTLE_RULES'].items()}
+        app.extensions['throttle'] = _ThrottleState(self._create_store(app), rules)
+
+    @staticmethod
+    def _create_store(app):
+        url = app.config['THROTTLE_STORAGE_URL']
+        if url.startswith('redis://') or url.startswith('rediss://'):
+            try:
+                return RedisStore(url)
+            except ImportError:
+                app.logger.warning("Brak pakietu 'redis' - limity żądań przechowywane w pamięci procesu.")
+        return MemoryStore()
+
+    @staticmethod
+    def _state():
+        return current_app.extensions['throttle']
+
+    def hit(self, rule_name, key):
+        """
+        Rejestruje próbę dla (reguła, klucz) i zwraca ThrottleResult.
+        Nieznana reguła, wyłączony throttling lub awaria magazynu - żądanie przepuszczamy.
+        """
+        state = self._state()
+        rule = state.rules.get(rule_name)
+        if rule is None or not key or not current_app.config.get('THROTTLE_ENABLED', True):
+            return ThrottleResult(True, 0)
+
+        try:
+            result = state.store.hit(f'{rule_name}:{key}', rule)
+        except Exception as e:
+            # Awaria Redis nie może blokować logowania
+            current_app.logger.error(f"Błąd magazynu limitów żądań ({rule_name}): {e}")
+            return ThrottleResult(True, 0)
+
+        with state.lock:
+            state.counters[rule_name]['allowed' if result.allowed else 'blocked'] += 1
+        return result
+
+    def check(self, *checks):
+        """
+        Sprawdza kolejno pary (reguła, klucz). Zwraca pierwszy wynik blokujący
+        albo wynik pozytywny, jeśli wszystkie limity pozwalają na żądanie.
+        """
+        for rule_name, key in checks:
+            result = self.hit(rule_name, key)
+            if not result.allowed:
+                return result
+        return ThrottleResult(True, 0)
+
+    def stats(self):
+        """Zwraca kopię liczników (dozwolone/zablokowane) dla każdej reguły."""
+        state = self._state()
+        with state.lock:
+            return {name: dict(values) for name, values in state.counters.items()}
+
+    def reset(self):
+        """Czyści stan limitów i liczniki (np. w testach)."""
+        state = self._state()
+        state.store.reset()
+        with state.lock:
+            for values in state.counters.values():
+                values['allowed'] = values['blocked'] = 0
@@ -0,0 +1,156 @@
+"""
+Masowe dodawanie zleceń: lista z JSON (/trip/batch) i seria cykliczna (/trip/series).
+Plik: trip_batch.py
+
+Wszystkie wiersze są sprawdzane przed zapisem - jeden błędny wiersz odrzuca
+całą paczkę. Zapis to jedna transakcja: zlecenia jednym INSERT (executemany),
+zapis twórcy i złotych pracowników jednym INSERT do signup. Powiadomienia nie
+są wysyłane osobno dla każdego zlecenia: po zatwierdzeniu transakcji jedno
+zadanie w tle (notify_new_trips) przygotowuje każdemu pracownikowi jeden
+e-mail z listą nowych zleceń.
+"""
+from datetime import date, time, timedelta
+from flask import current_app
+from sqlalchemy import insert, select
+
+MAX_TITLE_LENGTH = 200
+# Jak w formularzu trips.add_trip
+MIN_SPOTS, MAX_SPOTS = 1, 7
+TIME_FIELDS = ('departure_time', 'start_time', 'work_start_time', 'work_end_time')
+WEEKDAY_NAMES = ('poniedziałek', 'wtorek', 'środa', 'czwartek', 'piątek', 'sobota', 'niedziela')
+
+
+def _parse_row(item):
+    """Wiersz gotowy do INSERT albo słownik błędów {pole: komunikat}."""
+    if not isinstance(item, dict):
+        return None, {'row': 'Wiersz musi być obiektem JSON.'}
+    row, errors = {}, {}
+    title = item.get('title')
+    title = title.strip() if isinstance(title, str) else ''
+    if not title:
+        errors['title'] = 'Nazwa jest wymagana.'
+    elif len(title) > MAX_TITLE_LENGTH:
+        errors['title'] = f'Nazwa może mieć najwyżej {MAX_TITLE_LENGTH} znaków.'
+    row['title'] = title
+
+    try:
+        row['trip_date'] = date.fromisoformat(item.get('trip_date'))
+    except (TypeError, ValueError):
+        errors['trip_date'] = 'Data musi mieć format RRRR-MM-DD.'
+
+    spots = item.get('spots', MIN_SPOTS)
+    if isinstance(spots, bool) or not isinstance(spots, (int, str)):
+        spots = None
+    try:
+        row['spots'] = int(spots)
+        if not MIN_SPOTS <= row['spots'] <= MAX_SPOTS:
+            errors['spots'] = f'Liczba miejsc musi być w zakresie od {MIN_SPOTS} do {MAX_SPOTS}.'
+    except (TypeError, ValueError):
+        errors['spots'] = 'Liczba miejsc musi być liczbą całkowitą.'
+
+    for field in TIME_FIELDS:
+        value = item.get(field)
+        try:
+            row[field] = time.fromisoformat(value) if value else None
+        except (TypeError, ValueError):
+            errors[field] = 'Godzina musi mieć format GG:MM.'
+
+    kilometers = item.get('kilometers')
+    try:
+        row['kilometers'] = float(str(kilometers).replace(',', '.')) if kilometers not in (None, '') else None
+    except ValueError:
+        errors['kilometers'] = 'Kilometry muszą być liczbą.'
+
+    notes = item.get('notes')
+    row['notes'] = notes if isinstance(notes, str) and notes.strip() else None
+    row['is_confirmed'] = bool(item.get('is_confirmed', False))
+    return row, errors
+
+
+def validate_rows(items):
+    """
+    (wiersze, błędy) dla listy zleceń. Błędy to lista słowników
+    {'row': numer od 0, 'field': pole, 'message': komunikat}; zapisywać
+    można tylko wtedy, gdy lista błędów jest pusta.
+    """
+    limit = current_app.config['TRIPS_BATCH_MAX_ROWS']
+    if not isinstance(items, list) or not items:
+        return [], [{'row': None, 'field': 'trips', 'message': 'Lista zleceń jest pusta.'}]
+    if len(items) > limit:
+        return [], [{'row': None, 'field': 'trips', 'message': f'Najwyżej {limit} zleceń naraz.'}]
+    rows, errors = [], []
+    for number, item in enumerate(items):
+        row, row_errors = _parse_row(item)
+        rows.append(row)
+        errors.extend({'row': number, 'field': field, 'message': message} for field, message in row_errors.items())
+    return rows, errors
+
+
+def series_dates(start, end, weekdays):
+    """Daty od 'start' do 'end' (włącznie) w wybrane dni tygodnia (0 = poniedziałek)."""
+    weekdays = set(weekdays)
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)
+            if (start + timedelta(days=offset)).weekday() in weekdays]
+
+
+def create_trips(rows, creator_id):
+    """
+    Wstawia sprawdzone wiersze (validate_rows) w bieżącej transakcji i zapisuje
+    twórcę (potwierdzony) oraz złotych pracowników (wstępnie zapisany) na każde
+    zlecenie. Zwraca rosnącą listę id nowych zleceń; wywołujący zatwierdza transakcję
+    i zleca powiadomienie (notify_new_trips).
+    """
+    from extensions import db, journal
+    from models import Trip, Signup, User
+    # Bez sort_by_parameter_order: w SQLite wymusza on INSERT po jednym wierszu,
+    # a id potrzebne są tu tylko jako zbiór (kolejność RETURNING nie jest gwarantowana)
+    trip_ids = sorted(db.session.execute(insert(Trip).returning(Trip.id), rows).scalars().all())
+    # Masowy INSERT omija zdarzenia ORM - dziennik zmian trzeba uzupełnić jawnie
+    # (nowe zlecenia wystarczą: klient i tak pobiera je razem z zapisami)
+    journal.record(db.session, 'trip', [(trip_id, trip_id) for trip_id in trip_ids], 'insert')
+
+    golden_ids = db.session.scalars(
+        select(User.id).where(User.status == 'złoty pracownik', User.id != creator_id)
+    ).all()
+    signup_rows = []
+    for trip_id in trip_ids:
+        signup_rows.append({'trip_id': trip_id, 'user_id': creator_id, 'status': 'potwierdzony'})
+        signup_rows.extend({'trip_id': trip_id, 'user_id': user_id, 'status': 'wstępnie zapisany'}
+                           for user_id in golden_ids)
+    db.session.execute(insert(Signup), signup_rows)
+    return trip_ids
+
+
+def notify_new_trips(trip_ids):
+    """
+    Zadanie w tle: jeden e-mail na pracownika z listą nowych zleceń, zapisany
+    w skrzynce nadawczej jedną transakcją. Zwraca liczbę wiadomości.
+    """
+    from extensions import db
+    from models import Trip, User
+    from utils import send_email_in_background
+    trips = db.session.execute(
+        select(Trip.title, Trip.trip_date).where(Trip.id.in_(trip_ids)).order_by(Trip.trip_date, Trip.id)
+    ).all()
+    if not trips:
+        return 0
+    workers = db.session.execute(
+        select(User.name, User.email).where(User.status.in_(['pracownik', 'złoty pracownik']))
+    ).all()
+    subject = (f'Nowe zlecenie w grafiku: {trips[0].title}' if len(trips) == 1
+               else f'Nowe zlecenia w grafiku ({len(trips)})')
+    for worker in workers:
+        send_email_in_background(worker.email, subject, 'emaile/new_trips', user=worker, trips=trips)
+    db.session.commit()
+    return len(workers)
+
+
+def enqueue_notification(trip_ids):
+    """Zleca notify_new_trips po zatwierdzeniu zleceń; błąd kolejki trafia tylko do logu."""
+    from extensions import tasks
+    if not trip_ids:
+        return
+    try:
+        tasks.enqueue(notify_new_trips, list(trip_ids))
+    except Exception as e:
+        current_app.logger.warning(f"Nie udało się zlecić powiadomień o nowych zleceniach: {e}")
@@ -4,7 +4,7 @@ from datetime import datetime, timezone # Dodano timezone
 # Importy dla e-maili (jeśli są tu)
 # from threading import Thread
 # from flask_mail import Message
-# from extensions import mail, rq # Upewnij się, że importujesz poprawnie
+# from extensions import mail, tasks # Upewnij się, że importujesz poprawnie
 
 def nl2br_filter(value):
     """Konwertuje znaki nowej linii na znaczniki <br>."""
@@ -22,101 +22,161 @@ def admin_or_manager_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Klucz generowany przez klienta (np. crypto.randomUUID())
+IDEMPOTENCY_KEY_RE = re.compile(r'[A-Za-z0-9_-]{8,64}')
+
+def idempotent(f):
+    """
+    Dekorator akcji POST powtarzanych przez klienta (kolejka offline PWA).
+    Klucz z nagłówka 'Idempotency-Key' (lub pola formularza 'idempotency_key')
+    jest najpierw rezerwowany w bazie, a po wykonaniu akcji zapisywana jest jej
+    odpowiedź. Ponowne wysłanie tego samego klucza zwraca zapisaną odpowiedź
+    bez powtarzania akcji. Żądania bez klucza działają jak dotychczas.
+    """
+    from functools import wraps
+    from flask_login import current_user
+    from flask import request, abort, make_response
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key') or request.form.get('idempotency_key')
+        if not key:
+            return f(*args, **kwargs)
+        if not IDEMPOTENCY_KEY_RE.fullmatch(key):
+            abort(400)
+
+        from extensions import db
+        from models import IdempotencyKey
+        from sqlalchemy.exc import IntegrityError
+
+        # Rezerwacja klucza - unikalny indeks rozstrzyga wyścig dwóch powtórek
+        _prune_idempotency_keys(current_user.id)
+        record = IdempotencyKey(key=key, user_id=current_user.id, endpoint=request.endpoint)
+        db.session.add(record)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return _replay_idempotent_response(key)
+
+        try:
+            response = make_response(f(*args, **kwargs))
+        except Exception:
+            # Akcja się nie udała - zwalniamy klucz, aby klient mógł ją ponowić
+            db.session.rollback()
+            db.session.delete(record)
+            db.session.commit()
+            raise
+
+        if response.status_code >= 500 or response.is_streamed:
+            db.session.delete(record)
+        else:
+            record.status_code = response.status_code
+            record.content_type = response.content_type
+            record.location = response.headers.get('Location')
+            record.response_body = response.get_data(as_text=True)
+        db.session.commit()
+        return response
+    return decorated_function
+
+def _replay_idempotent_response(key):
+    """Zwraca zapisaną odpowiedź dla klucza, który został już użyty."""
+    from flask_login import current_user
+    from flask import request, jsonify, Response
+    from models import IdempotencyKey
+
+    record = IdempotencyKey.query.filter_by(user_id=current_user.id, key=key).first()
+    if record is None or record.endpoint != request.endpoint:
+        return jsonify({'status': 'error', 'message': 'Klucz idempotencji użyty dla innej akcji.'}), 422
+    if record.status_code is None:
+        # Pierwsze żądanie z tym kluczem wciąż trwa
+        response = jsonify({'status': 'error', 'message': 'Akcja jest w trakcie wykonywania.'})
+        response.status_code = 409
+        response.headers['Retry-After'] = '1'
+        return response
+
+    response = Response(record.response_body, status=record.status_code, content_type=record.content_type)
+    if record.location:
+        response.headers['Location'] = record.location
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def _prune_idempotency_keys(user_id):
+    """Usuwa klucze użytkownika starsze niż IDEMPOTENCY_KEY_TTL (tanie - jeden DELETE po indeksie)."""
+    from datetime import timedelta
+    from extensions import db
+    from models import IdempotencyKey
+
+    ttl = current_app.config.get('IDEMPOTENCY_KEY_TTL', 7 * 86400)
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=ttl)
+    IdempotencyKey.query.filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.created_at < cutoff
+    ).delete(synchronize_session=False)
+
 # --- POPRAWKA UTC ---
 def inject_current_year():
     """Wstrzykuje aktualny rok (świadomy UTC) do kontekstu szablonu."""
     return {'current_year': datetime.now(timezone.utc).year}
 # --- KONIEC POPRAWKI ---
 
-# Funkcja do wysyłania e-maili (asynchroniczna lub synchroniczna w testach)
+# Funkcja do wysyłania e-maili (w tle, przez tasks.enqueue)
 def send_email_in_background(recipients, subject, template, **context):
     """
-    Wysyła e-mail w tle (używając RQ) lub synchronicznie (w trybie testowym).
-    Akceptuje listę odbiorców lub pojedynczy adres.
+    Renderuje wiadomość w bieżącym żądaniu i dopisuje ją do skrzynki nadawczej
+    (outbox.py) w bieżącej transakcji - wywołujący musi ją zatwierdzić
+    (db.session.commit()); wysyłka nastąpi po zatwierdzeniu, a wycofanie
+    transakcji wycofuje też wiadomość. Akceptuje listę odbiorców lub
+    pojedynczy adres. 'template' to ścieżka bez rozszerzenia
+    (np. 'emaile/welcome') - wymagany .txt, opcjonalny .html.
+    Zwraca False, jeśli wiadomości nie udało się przygotować.
     """
-    from extensions import rq, mail # Import wewnątrz funkcji, aby uniknąć problemów
-    from flask_mail import Message
-    from flask import current_app # Potrzebne do kontekstu aplikacji
+    from extensions import db
+    from outbox import add_message
+    from jinja2 import TemplateNotFound
 
     # Upewnij się, że recipients jest listą
     if isinstance(recipients, str):
         recipients = [recipients]
 
-    # Pobierz aktualną aplikację (ważne dla RQ i konfiguracji Mail)
-    app = current_app._get_current_object()
-
-    msg = Message(subject,
-                  sender=app.config.get('MAIL_DEFAULT_SENDER', 'noreply@example.com'),
-                  recipients=recipients)
-    msg.body = render_template(template + '.txt', **context)
-    msg.html = render_template(template + '.html', **context)
-
-    # Sprawdź, czy RQ ma działać asynchronicznie (z config.py)
-    if app.config.get('RQ_ASYNC', True):
-        # Działanie asynchroniczne (produkcja)
-        try:
-            # Używamy _send_email_task jako funkcji do zakolejkowania
-            rq.get_queue().enqueue(_send_email_task, app.config, msg)
-        except Exception as e:
-            app.logger.error(f"Nie udało się zakolejkować e-maila do {recipients}: {e}")
-            # Można rozważyć alternatywną metodę powiadomienia lub logowania
-    else:
-        # Działanie synchroniczne (testy)
+    try:
+        # Szablony renderujemy tutaj - w skrzynce zapisywane są gotowe treści
+        body = render_template(template + '.txt', **context)
         try:
-            with app.app_context(): # Użyj kontekstu aplikacji
-                 mail.send(msg)
-        except Exception as e:
-            app.logger.error(f"Błąd podczas synchronicznego wysyłania e-maila do {recipients}: {e}")
+            html = render_template(template + '.html', **context)
+        except TemplateNotFound:
+            html = None
+    except Exception as e:
+        current_app.logger.error(f"Nie udało się przygotować e-maila '{subject}' do {recipients}: {e}")
+        return False
+    add_message(db.session, subject, current_app.config.get('MAIL_DEFAULT_SENDER'), recipients, body, html)
+    return True
 
 
-def _send_email_task(app_config, msg):
+def deliver_email(subject, sender, recipients, body, html=None):
     """
-    Funkcja pomocnicza wykonywana przez workera RQ.
-    Potrzebuje konfiguracji aplikacji, aby móc ją odtworzyć.
+    Zadanie w tle: wysyła gotową wiadomość z pominięciem skrzynki nadawczej.
+    Zostawione dla zadań RQ zakolejkowanych przed wprowadzeniem outbox.py.
     """
-    # Ta funkcja działa w osobnym procesie workera RQ
-    # Musimy odtworzyć kontekst aplikacji i instancję Mail
-    from flask import Flask
-    from extensions import mail # Importuj instancję mail
-    from config import Config # Importuj swoją klasę Config
-
-    # Stwórz tymczasową instancję aplikacji tylko do wysłania e-maila
-    # Użyj konfiguracji przekazanej jako argument
-    temp_app = Flask(__name__)
-    # Zamiast ładować z obiektu, ładujemy z przekazanego słownika config
-    # To wymaga dostosowania - przekazujemy cały app.config
-    temp_app.config.from_mapping(app_config)
-
-    # Zainicjuj mail z tymczasową aplikacją
-    mail.init_app(temp_app)
+    from extensions import mail
+    from flask_mail import Message
+
+    mail.send(Message(subject, sender=sender, recipients=recipients, body=body, html=html))
+
 
-    try:
-        with temp_app.app_context():
-            mail.send(msg)
-            # Można dodać logowanie sukcesu, jeśli potrzebne
-            # temp_app.logger.info(f"E-mail wysłany do {msg.recipients}")
-    except Exception as e:
-        # Logowanie błędów w kontekście workera
-        # Użycie print, bo logger może nie być skonfigurowany w workerze
-        print(f"Błąd workera RQ podczas wysyłania e-maila do {msg.recipients}: {e}")
 # utils.py
-import os
-from flask import url_for, current_app
+from flask import current_app
 from datetime import datetime, timezone # Upewnij się, że masz ten import
 
-# ... (twoje istniejące funkcje: nl2br_filter, admin_or_manager_required, inject_current_year, send_email_in_background, _send_email_task) ...
+# ... (twoje istniejące funkcje: nl2br_filter, admin_or_manager_required, inject_current_year, send_email_in_background, deliver_email) ...
 
 # --- NOWA FUNKCJA (AUDYT 3.2 - Cache Busting) ---
 def url_for_static_bust(filename):
     """
-    Generuje URL dla pliku statycznego z dodanym parametrem 'v'
-    zawierającym timestamp ostatniej modyfikacji pliku.
-    To zmusza przeglądarkę do pobrania nowej wersji tylko wtedy, gdy plik się zmienił.
+    Generuje URL dla pliku statycznego z hashem treści w nazwie
+    (np. /static/dist/css/style.3f2a9c1b04.css) na podstawie manifestu
+    zbudowanego poleceniem 'flask assets build'.
+    To zwykłe wyszukanie w słowniku wczytanym przy starcie - bez dostępu do dysku.
+    Bez manifestu zwraca adres z parametrem '?v=<mtime>' (liczonym raz na plik).
     """
-    filepath = os.path.join(current_app.static_folder, filename)
-    if os.path.exists(filepath):
-        timestamp = int(os.path.getmtime(filepath))
-        return f"{url_for('static', filename=filename)}?v={timestamp}"
-    # Zwróć standardowy URL, jeśli plik nie istnieje (np. błąd ścieżki)
-    return url_for('static', filename=filename)
-# --- KONIEC NOWEJ FUNKCJI ---
\ No newline at end of file
+    return current_app.extensions['assets'].url_for(filename)
+# --- KONIEC NOWEJ FUNKCJI ---